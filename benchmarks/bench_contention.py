@@ -0,0 +1,88 @@
+# coding=utf-8
+"""
+Cost of temperature_callback while other threads hold the state lock.
+
+The monitoring timer, on_event and the settings and API handlers take the
+plugin's state lock from their own threads. Background threads here do the
+same in a loop, holding the lock for a short while each time, and the
+callback is timed on the main thread. Recording a sample takes no lock, so
+its latency should barely change with the number of contending threads.
+The per-sample locking the callback used to do is emulated for comparison.
+
+Run with: python3 benchmarks/bench_contention.py
+"""
+
+from __future__ import absolute_import
+import threading
+import time
+
+from common import make_plugin, report
+
+CONTENDERS = (0, 1, 4)
+HOLD_SECONDS = 0.00005  # How long a contending thread keeps (and then leaves) the lock each time
+SAMPLES = 20000
+
+
+def contend(lock, stop):
+    while not stop.is_set():
+        with lock:
+            # Sleeping releases the GIL, so this measures waiting on the lock rather than on the interpreter
+            time.sleep(HOLD_SECONDS)
+        time.sleep(HOLD_SECONDS)
+
+
+def timed_run(func, sample_count):
+    timings = []
+    perf_counter_ns = time.perf_counter_ns
+    for _ in range(sample_count):
+        started = perf_counter_ns()
+        func()
+        timings.append(perf_counter_ns() - started)
+    timings.sort()
+    return sum(timings) / float(sample_count), timings[int(sample_count * 0.99) - 1]
+
+
+def run_case(contenders, locked_recording):
+    plugin = make_plugin()
+    sample = {"tool0": (210.0, 210.0), "tool1": (205.0, 205.0), "bed": (60.0, 60.0)}
+    lock = plugin._state_lock
+    warned = plugin._warned_missing_sensors
+
+    def callback():
+        plugin.temperature_callback(None, sample)
+
+    def locked_callback():
+        # What recording cost before: one lock round trip and membership check per sensor
+        for _ in sample:
+            with lock:
+                "hotend" in warned
+        plugin.temperature_callback(None, sample)
+
+    func = locked_callback if locked_recording else callback
+    stop = threading.Event()
+    threads = [threading.Thread(target=contend, args=(lock, stop)) for _ in range(contenders)]
+    for thread in threads:
+        thread.start()
+    try:
+        timed_run(func, 1000)  # Warm up
+        return timed_run(func, SAMPLES)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        plugin.on_shutdown()
+
+
+def main():
+    rows = []
+    for contenders in CONTENDERS:
+        for locked_recording, label in ((False, "lock-free"), (True, "locked (previous)")):
+            mean, p99 = run_case(contenders, locked_recording)
+            prefix = "{}, {} contending thread{}".format(label, contenders, "" if contenders == 1 else "s")
+            rows.append((prefix + ", mean", mean))
+            rows.append((prefix + ", p99", p99))
+    report("temperature_callback under state lock contention (3 sensors)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# coding=utf-8
+"""
+Cost of the Prometheus metrics endpoint.
+
+Measures the cost of temperature_callback with its call counter against
+the bare counter increment, rendering the exposition for a printer with
+three hotends, a heatbed and a chamber, and a scrape served from the body
+cached for the current second.
+
+Run with: python3 benchmarks/bench_exposition.py
+"""
+
+from __future__ import absolute_import
+import itertools
+
+from common import make_plugin, measure, report
+
+SAMPLES = [
+    {"T0": (210.0 + offset, 210.0), "T1": (205.0 - offset, 205.0), "T2": (25.0, 0.0),
+     "B": (60.0 + offset, 60.0), "C": (35.0 + offset, None)}
+    for offset in (0.0, 0.3, -0.2, 0.1, -0.4)
+]
+
+
+def main():
+    plugin = make_plugin()
+    samples = itertools.cycle(SAMPLES)
+    callback = measure(lambda: plugin.temperature_callback(None, next(samples)))
+    metrics = plugin._metrics
+
+    def increment():
+        metrics.calls += 1
+
+    report("temperature_callback, 3 hotends + heatbed + chamber", [
+        ("whole callback", callback),
+        ("  call counter increment", measure(increment)),
+    ])
+    print()
+
+    now = itertools.count(1000)
+    exposition = plugin._get_exposition()
+    report("metrics endpoint, {} bytes".format(len(exposition.body())), [
+        ("render on scrape", measure(lambda: plugin._render_metrics(next(now)), iterations=2000)),
+        ("scrape within the cached second", measure(exposition.body)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# coding=utf-8
+"""
+Throughput of the fleet aggregator.
+
+Streams from many simulated printers are pushed through a single
+aggregator over a Unix socket and the ingestion rate is reported, followed
+by the cost of one fleet-wide evaluation for growing fleet sizes, using
+numpy when it is installed and the pure Python evaluation otherwise.
+
+Run with: python3 benchmarks/bench_fleet.py
+"""
+
+from __future__ import absolute_import
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import common  # noqa: F401 (installs the OctoPrint stand-ins)
+
+from octoprint_octo_fire_guard import aggregator as aggregator_module
+from octoprint_octo_fire_guard.aggregator import FleetAggregator, FleetTable, simulate_printer
+
+STREAM_PRINTERS = (100, 500)
+STREAM_SECONDS = 2.0
+STREAM_INTERVAL = 0.05  # 20 reports per second per printer, far above OctoPrint's usual 0.5 Hz
+FLEET_SIZES = (100, 1000, 10000)
+
+
+async def stream_case(printers, folder):
+    path = os.path.join(folder, "fleet.sock")
+    aggregator = FleetAggregator()
+    await aggregator.listen("unix:" + path)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(simulate_printer("unix:" + path, "printer-{}".format(index), STREAM_SECONDS,
+                                                interval=STREAM_INTERVAL) for index in range(printers)))
+        elapsed = time.perf_counter() - started
+        return aggregator.messages, elapsed
+    finally:
+        await aggregator.close()
+
+
+def evaluate_case(size):
+    table = FleetTable()
+    for index in range(size):
+        slot = table.slot("printer-{}".format(index))
+        table.set_connected(slot, True)
+        table.apply(slot, dict(
+            thresholds=dict(hotend=250.0, heatbed=100.0),
+            temps=dict(tool0=[200.0 + index % 60, 210.0], bed=[60.0, 60.0]),
+            alert=dict(hotend=False, heatbed=False),
+            timeout=[],
+        ))
+    repeat = max(10, 100000 // size)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        table.evaluate()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    folder = tempfile.mkdtemp(prefix="octo_fire_guard_bench_")
+    try:
+        print("Stream ingestion ({} s at {:g} reports/s per printer)".format(STREAM_SECONDS, 1 / STREAM_INTERVAL))
+        for printers in STREAM_PRINTERS:
+            messages, elapsed = asyncio.run(stream_case(printers, folder))
+            print("  {:>5} printers  {:>8} messages  {:>10.0f} messages/s".format(
+                printers, messages, messages / elapsed))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    print("Fleet evaluation ({})".format("numpy" if aggregator_module.numpy is not None else "pure Python"))
+    for size in FLEET_SIZES:
+        print("  {:>5} printers  {:>10.1f} us".format(size, evaluate_case(size) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# coding=utf-8
+"""
+Cost of reading the temperature reports of a serial log.
+
+Writes a synthetic serial.log of a long print, where every temperature
+report is followed by GCode traffic as it is while printing, and compares
+reading it line by line in Python with the memory-mapped scan of
+IndexedLog: a first read that builds the index, a later read that reuses
+the stored index, and a read of a one hour window.
+
+Run with: python3 benchmarks/bench_ingest.py [--reports N] [--traffic N]
+"""
+
+from __future__ import absolute_import
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import common  # noqa: F401 (puts the plugin on the path)
+
+from octoprint_octo_fire_guard.ingest import IndexedLog, INDEX_SUFFIX
+
+START = 1772323200  # 2026-03-01 00:00:00
+REPORT_INTERVAL = 2
+
+_LINE_TIMESTAMP = re.compile(rb"(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)[,.](\d{3})")
+_LINE_TEMPERATURE = re.compile(rb"\b([TBCP]\d*):\s*(-?\d+(?:\.\d*)?)(?:\s*/\s*(-?\d+(?:\.\d*)?))?")
+
+
+def write_log(path, reports, traffic):
+    with open(path, "wb") as log:
+        for number in range(reports):
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(START + number * REPORT_INTERVAL)).encode("ascii")
+            lines = [b"%s,000 - Recv:  T:%.2f /210.00 B:%.2f /60.00 @:64 B@:0\n"
+                     % (stamp, 210.0 + number % 7 * 0.1, 60.0 + number % 5 * 0.1)]
+            for line in range(traffic // 2):
+                lines.append(b"%s,%03d - Send: N%d G1 X%d.4 Y%d.2 E0.0421*71\n" % (stamp, line, number, line, line))
+                lines.append(b"%s,%03d - Recv: ok\n" % (stamp, line))
+            log.write(b"".join(lines))
+
+
+def read_lines(path):
+    """Reading every line in Python and matching it, as a log is usually read"""
+    count = 0
+    with open(path, "rb") as log:
+        for line in log:
+            if _LINE_TIMESTAMP.match(line) is None:
+                continue
+            start = line.find(b"Recv:")
+            if start < 0:
+                continue
+            message = line[start + 5:].lstrip()
+            if message.startswith(b"ok "):
+                message = message[3:]
+            if _LINE_TEMPERATURE.match(message) is None:
+                continue
+            readings = [(key, float(actual)) for key, actual, _ in _LINE_TEMPERATURE.findall(message)]
+            if readings:
+                count += 1
+    return count
+
+
+def read_indexed(path, start=None, end=None):
+    with IndexedLog(path) as log:
+        return sum(1 for _ in log.reports(start, end))
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--reports", type=int, default=200000, help="temperature reports in the log")
+    parser.add_argument("--traffic", type=int, default=20, help="GCode lines sent and acknowledged per report")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, "serial.log")
+        write_log(path, args.reports, args.traffic)
+        size = os.path.getsize(path)
+        print("serial.log: {:.1f} MB, {} reports, {} lines, {:.1f} h of log time".format(
+            size / 1e6, args.reports, args.reports * (1 + args.traffic // 2 * 2),
+            args.reports * REPORT_INTERVAL / 3600.0))
+
+        rows = [("line by line", timed(read_lines, path))]
+        rows.append(("mmap scan, building the index", timed(read_indexed, path)))
+        rows.append(("mmap scan, stored index", timed(read_indexed, path)))
+        middle = START + args.reports * REPORT_INTERVAL // 2
+        rows.append(("one hour window", timed(read_indexed, path, middle, middle + 3600)))
+
+        width = max(len(label) for label, _ in rows)
+        for label, (elapsed, count) in rows:
+            print("  {}  {:>8.3f} s  {:>8d} reports  {:>8.0f} MB/s".format(
+                label.ljust(width), elapsed, count, size / 1e6 / elapsed))
+        print("  index size  {} bytes".format(os.path.getsize(path + INDEX_SUFFIX)))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
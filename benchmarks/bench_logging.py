@@ -0,0 +1,47 @@
+# coding=utf-8
+"""
+Overhead of temperature_callback's debug logging.
+
+With DEBUG disabled, the callback should cost little more than the bare
+threshold comparisons it exists to perform. The DEBUG-enabled run (records
+are formatted but discarded) is shown for reference.
+
+Run with: python3 benchmarks/bench_logging.py
+"""
+
+from __future__ import absolute_import
+import logging
+
+from common import make_plugin, measure, report
+
+
+def main():
+    sample = {"tool0": (210.0, 210.0), "tool1": (205.0, 205.0), "bed": (60.0, 60.0)}
+    quiet_plugin = make_plugin(log_level=logging.INFO)
+    hotend_threshold = quiet_plugin._guard_settings.hotend_threshold
+    heatbed_threshold = quiet_plugin._guard_settings.heatbed_threshold
+
+    def bare_comparisons():
+        for key, temp_data in sample.items():
+            threshold = heatbed_threshold if key == "bed" else hotend_threshold
+            temp_data[0] > threshold
+
+    def quiet_callback():
+        quiet_plugin.temperature_callback(None, sample)
+
+    bare = measure(bare_comparisons)
+    quiet = measure(quiet_callback)
+    rows = [
+        ("bare threshold comparisons", bare),
+        ("callback, DEBUG disabled", quiet),
+        ("callback overhead, DEBUG disabled", quiet - bare),
+    ]
+
+    verbose_plugin = make_plugin(log_level=logging.DEBUG)
+    rows.append(("callback, DEBUG enabled", measure(lambda: verbose_plugin.temperature_callback(None, sample),
+                                                    iterations=5000)))
+    report("temperature_callback logging overhead (3 sensors)", rows)
+
+
+if __name__ == "__main__":
+    main()
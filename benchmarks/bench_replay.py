@@ -0,0 +1,208 @@
+# coding=utf-8
+"""
+Replay benchmark suite for temperature_callback throughput.
+
+Drives the callback with synthetic temperature streams for printers with 1,
+2, 5 and 8 tools plus a heatbed and a chamber, at report rates from 1 Hz to
+1 kHz. The plugin sees a simulated clock that advances by one report
+interval per sample, so rate-dependent behaviour is exercised without
+actually waiting; the cost of every call is measured with the real clock.
+
+For every stream and rate the suite reports the mean cost per sample (one
+temperature report, i.e. one callback invocation), p50/p99/max latency, the
+bytes allocated while handling a sample and the memory blocks a sample
+leaves behind. Results are written as JSON. Passing a previous result file
+with --baseline turns the run into a regression check that exits non-zero
+when a case got slower than the allowed margin.
+
+Run with: python3 benchmarks/bench_replay.py --output bench_output.json
+"""
+
+from __future__ import absolute_import
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from array import array
+from unittest.mock import patch
+
+from common import make_plugin
+
+import octoprint_octo_fire_guard as plugin_module
+
+TOOL_COUNTS = (1, 2, 5, 8)
+RATES_HZ = (1, 10, 100, 1000)
+DISTINCT_SAMPLES = 500  # Length of the pre-generated stream that is replayed in a loop
+
+
+class ReplayClock(object):
+    """Simulated clock handed to the plugin in place of the time module"""
+
+    def __init__(self, rate_hz, start=1700000000.0):
+        self.interval = 1.0 / rate_hz
+        self.now = start
+
+    def advance(self):
+        self.now += self.interval
+
+    def time(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def stream_name(tool_count):
+    return "{} tool{} + bed + chamber".format(tool_count, "" if tool_count == 1 else "s")
+
+
+def generate_stream(tool_count, length=DISTINCT_SAMPLES):
+    """Realistic, safe readings: every heater hovers around its target"""
+    samples = []
+    for i in range(length):
+        sample = {}
+        for tool in range(tool_count):
+            sample["T{}".format(tool)] = (210.0 + 1.5 * math.sin(i / 7.0 + tool), 210.0)
+        sample["B"] = (60.0 + 0.4 * math.sin(i / 11.0), 60.0)
+        sample["C"] = (35.0 + 0.2 * math.sin(i / 13.0), 0.0)
+        samples.append(sample)
+    return samples
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(math.ceil(fraction * len(sorted_values))) - 1)
+    return sorted_values[max(index, 0)]
+
+
+def run_case(tool_count, rate_hz, sample_count):
+    plugin = make_plugin()
+    clock = ReplayClock(rate_hz)
+    stream = generate_stream(tool_count)
+    callback = plugin.temperature_callback
+    timings = array("q", bytes(8 * sample_count))
+    perf_counter_ns = time.perf_counter_ns
+
+    with patch.object(plugin_module, "time", clock):
+        # Warm up so sensor classification and first-sample setup are not measured
+        for sample in stream:
+            clock.advance()
+            callback(None, sample)
+
+        gc.collect()
+        gc.disable()
+        try:
+            blocks_before = sys.getallocatedblocks()
+            for i in range(sample_count):
+                sample = stream[i % DISTINCT_SAMPLES]
+                clock.advance()
+                started = perf_counter_ns()
+                callback(None, sample)
+                timings[i] = perf_counter_ns() - started
+            blocks_after = sys.getallocatedblocks()
+        finally:
+            gc.enable()
+
+        alloc_samples = min(sample_count, 200)
+        tracemalloc.start()
+        try:
+            allocated = 0
+            for i in range(alloc_samples):
+                sample = stream[i % DISTINCT_SAMPLES]
+                clock.advance()
+                tracemalloc.reset_peak()
+                baseline, _ = tracemalloc.get_traced_memory()
+                callback(None, sample)
+                _, peak = tracemalloc.get_traced_memory()
+                allocated += peak - baseline
+        finally:
+            tracemalloc.stop()
+
+    plugin.on_shutdown()
+    sorted_timings = sorted(timings)
+    sensor_count = tool_count + 2
+    mean = sum(timings) / float(sample_count)
+    return dict(
+        stream=stream_name(tool_count),
+        tools=tool_count,
+        sensors=sensor_count,
+        rate_hz=rate_hz,
+        samples=sample_count,
+        ns_per_sample=round(mean, 1),
+        ns_per_sensor=round(mean / sensor_count, 1),
+        p50_ns=percentile(sorted_timings, 0.50),
+        p99_ns=percentile(sorted_timings, 0.99),
+        max_ns=sorted_timings[-1],
+        alloc_bytes_per_sample=round(allocated / float(alloc_samples), 1),
+        retained_blocks_per_sample=round((blocks_after - blocks_before) / float(sample_count), 3),
+    )
+
+
+def run_suite(sample_count):
+    results = []
+    for tool_count in TOOL_COUNTS:
+        for rate_hz in RATES_HZ:
+            results.append(run_case(tool_count, rate_hz, sample_count))
+    return dict(
+        benchmark="temperature_callback_replay",
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        machine=platform.machine(),
+        results=results,
+    )
+
+
+def find_regressions(report, baseline, max_regression):
+    """Cases whose mean or p99 cost grew by more than max_regression (a fraction)"""
+    previous = dict(((r["tools"], r["rate_hz"]), r) for r in baseline.get("results", []))
+    regressions = []
+    for result in report["results"]:
+        old = previous.get((result["tools"], result["rate_hz"]))
+        if old is None:
+            continue
+        for metric in ("ns_per_sample", "p99_ns"):
+            if old[metric] and result[metric] > old[metric] * (1.0 + max_regression):
+                regressions.append("{} @ {} Hz: {} {} -> {}".format(
+                    result["stream"], result["rate_hz"], metric, old[metric], result[metric]
+                ))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=20000, help="measured samples per case")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed slowdown against the baseline as a fraction (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.samples)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.max_regression)
+        for regression in regressions:
+            sys.stderr.write("REGRESSION: {}\n".format(regression))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
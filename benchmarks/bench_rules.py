@@ -0,0 +1,99 @@
+# coding=utf-8
+"""
+Per-sample cost of the custom guard rules.
+
+Compiles 50 rules over a printer with three hotends, a heatbed and a
+chamber, then measures evaluate() for the whole rule set against the cost
+of a single rule, and temperature_callback with no rules and with all 50.
+None of the rules holds for the replayed readings, so every rule is fully
+evaluated on every report, which is the steady state of a healthy print.
+
+Run with: python3 benchmarks/bench_rules.py
+"""
+
+from __future__ import absolute_import
+import itertools
+import time
+
+from common import make_plugin, measure, report
+
+from octoprint_octo_fire_guard.rules import GuardRules
+from octoprint_octo_fire_guard.sensors import SensorRegistry
+
+TEMPLATES = (
+    "tool{i} > {limit}",
+    "T{i} > tool{i}.target + {margin} for 5s",
+    "chamber > {chamber} and bed.target == 0",
+    "any tool > target + {margin} for 3s",
+    "all tools > {limit} or bed > {bed}",
+    "(tool{i} - tool{i}.target) * 2 > {margin} and not chamber < 20",
+    "bed > B.target + {bed_margin} for 10s",
+    "tool{i} >= {limit} or (bed > {bed} and chamber > {chamber})",
+    "chamber.target != 0 and chamber > chamber.target + {margin}",
+    "any tool > {limit} for 500ms",
+)
+RULE_COUNT = 50
+
+
+def rule_text(count=RULE_COUNT):
+    lines = []
+    for n in range(count):
+        lines.append(TEMPLATES[n % len(TEMPLATES)].format(
+            i=n % 3, limit=280 + n, margin=20 + n % 10, chamber=60 + n % 5, bed=110 + n % 7, bed_margin=15 + n % 5,
+        ))
+    return "\n".join(lines)
+
+
+SAMPLES = [
+    {"T0": (210.0 + offset, 210.0), "T1": (205.0 - offset, 205.0), "T2": (25.0, 0.0),
+     "B": (60.0 + offset, 60.0), "C": (35.0 + offset, None)}
+    for offset in (0.0, 0.3, -0.2, 0.1, -0.4)
+]
+
+
+def compile_cost(text, iterations=200):
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        GuardRules.compile(text)
+    return (time.perf_counter_ns() - start) / float(iterations)
+
+
+def evaluate_cost(text):
+    guard_rules, problems = GuardRules.compile(text)
+    assert not problems, problems
+    registry = SensorRegistry()
+    for key, temp_data in SAMPLES[0].items():
+        guard_rules.update(registry[key], temp_data)
+    now = itertools.count()
+    return measure(lambda: guard_rules.evaluate(next(now)))
+
+
+def callback_cost(text):
+    plugin = make_plugin(dict(custom_rules=text))
+    samples = itertools.cycle(SAMPLES)
+    return measure(lambda: plugin.temperature_callback(None, next(samples)))
+
+
+def main():
+    text = rule_text()
+    single = evaluate_cost(rule_text(1))
+    every = evaluate_cost(text)
+    report("GuardRules, {} rules on 3 hotends + heatbed + chamber".format(RULE_COUNT), [
+        ("compile, whole rule text", compile_cost(text)),
+        ("evaluate(), 1 rule", single),
+        ("evaluate(), {} rules".format(RULE_COUNT), every),
+        ("  per rule", every / RULE_COUNT),
+    ])
+    print()
+
+    unruled = callback_cost("")
+    ruled = callback_cost(text)
+    report("temperature_callback, 3 hotends + heatbed + chamber", [
+        ("no rules", unruled),
+        ("{} rules".format(RULE_COUNT), ruled),
+        ("  added per report", ruled - unruled),
+    ])
+
+
+if __name__ == "__main__":
+    main()
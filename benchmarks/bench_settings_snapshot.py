@@ -0,0 +1,47 @@
+# coding=utf-8
+"""
+Per-sample cost of reading settings in temperature_callback.
+
+Compares the three layered settings lookups the callback used to make for
+every temperature report with reading the pre-built GuardSettings snapshot,
+and shows the resulting cost of a full callback invocation.
+
+Run with: python3 benchmarks/bench_settings_snapshot.py
+"""
+
+from __future__ import absolute_import
+
+from common import make_plugin, measure, report
+
+
+def main():
+    plugin = make_plugin()
+    settings = plugin._settings
+    sample = {"tool0": (210.0, 210.0), "tool1": (205.0, 205.0), "bed": (60.0, 60.0)}
+
+    def layered_lookups():
+        settings.get_boolean(["enable_monitoring"])
+        settings.get_float(["hotend_threshold"])
+        settings.get_float(["heatbed_threshold"])
+
+    def snapshot_reads():
+        guard_settings = plugin._guard_settings
+        guard_settings.enable_monitoring
+        guard_settings.hotend_threshold
+        guard_settings.heatbed_threshold
+
+    def callback():
+        plugin.temperature_callback(None, sample)
+
+    lookups = measure(layered_lookups)
+    snapshot = measure(snapshot_reads)
+    report("Settings access per temperature sample", [
+        ("layered settings lookups", lookups),
+        ("GuardSettings snapshot", snapshot),
+        ("saved per sample", lookups - snapshot),
+        ("full temperature_callback", measure(callback)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# coding=utf-8
+"""
+Per-sample cost of the spike-rejection filters.
+
+Measures push() of every filter on its own, the cost of a full
+temperature_callback for two hotends and a heatbed with each filter in
+front of the threshold comparison, the memory blocks retained by a filter
+while it is fed, and the worst-case detection latency each configuration
+adds at common report intervals.
+
+Run with: python3 benchmarks/bench_spike_filter.py
+"""
+
+from __future__ import absolute_import
+import itertools
+import sys
+
+from common import make_plugin, measure, report
+
+from octoprint_octo_fire_guard.spike import make_spike_filter
+
+CONFIGURATIONS = (
+    ("n_of_m 3 of 5", ("n_of_m", 5, 3)),
+    ("n_of_m 5 of 15", ("n_of_m", 15, 5)),
+    ("median of 5", ("median", 5, 1)),
+    ("median of 15", ("median", 15, 1)),
+)
+REPORT_INTERVALS = (0.5, 1.0, 2.0)  # Seconds between temperature reports
+
+
+def push_cost(spec):
+    spike_filter = make_spike_filter(*spec)
+    readings = itertools.cycle([210.0, 210.4, 209.7, 210.1, 209.9, 210.3, 209.8])
+    return measure(lambda: spike_filter.push(next(readings), 250.0))
+
+
+def retained_blocks(spec, samples=10000):
+    """Memory blocks still allocated after feeding a filter, which stays 0 for an allocation-free filter"""
+    spike_filter = make_spike_filter(*spec)
+    readings = [210.0 + (i % 7) * 0.1 for i in range(samples)]
+    for temperature in readings[:100]:
+        spike_filter.push(temperature, 250.0)
+    before = sys.getallocatedblocks()
+    for temperature in readings:
+        spike_filter.push(temperature, 250.0)
+    return sys.getallocatedblocks() - before
+
+
+def callback_cost(mode, window, count):
+    plugin = make_plugin(dict(spike_filter=mode, spike_filter_window=window, spike_filter_count=count))
+    samples = itertools.cycle([
+        {"tool0": (210.0 + offset, 210.0), "tool1": (205.0 - offset, 205.0), "bed": (60.0 + offset, 60.0)}
+        for offset in (0.0, 0.3, -0.2, 0.1, -0.4)
+    ])
+    return measure(lambda: plugin.temperature_callback(None, next(samples)))
+
+
+def main():
+    report("spike_filter.push() per reading", [(label, push_cost(spec)) for label, spec in CONFIGURATIONS])
+    print()
+
+    unfiltered = callback_cost("off", 5, 3)
+    rows = [("no filter", unfiltered)]
+    for label, spec in CONFIGURATIONS:
+        cost = callback_cost(*spec)
+        rows.append((label, cost))
+        rows.append(("  added per report", cost - unfiltered))
+    report("temperature_callback, 2 hotends + heatbed", rows)
+    print()
+
+    print("Retained memory blocks after 10000 readings")
+    for label, spec in CONFIGURATIONS:
+        print("  {}  {:>6d}".format(label.ljust(16), retained_blocks(spec)))
+    print()
+
+    print("Worst-case added detection latency")
+    print("  {}  {}".format("".ljust(16), "  ".join("{:>6g} s/report".format(i) for i in REPORT_INTERVALS)))
+    for label, spec in CONFIGURATIONS:
+        delay = make_spike_filter(*spec).delay
+        print("  {}  {}".format(label.ljust(16), "  ".join(
+            "{:>12.1f} s".format(delay * interval) for interval in REPORT_INTERVALS
+        )))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# coding=utf-8
+"""
+Wall time from importing the plugin until it guards the printer.
+
+Every run starts a fresh interpreter that installs the OctoPrint stand-ins,
+then times importing the plugin package, __plugin_load__() and
+on_after_startup(), the steps OctoPrint takes for the plugin while it
+boots. Standard library modules that OctoPrint would already have loaded
+are imported within the timed import here, so the figures are an upper
+bound of what the plugin adds to OctoPrint's boot.
+
+Run with: python3 benchmarks/bench_startup.py [--runs N]
+"""
+
+from __future__ import absolute_import
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+STEPS = ("import", "__plugin_load__", "on_after_startup", "total")
+
+
+def child():
+    """A single cold start, printed as JSON"""
+    import time
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from tests.fakes import install_fakes
+    install_fakes()
+    before = set(sys.modules)
+
+    started = time.perf_counter()
+    import octoprint_octo_fire_guard
+    imported = time.perf_counter()
+    octoprint_octo_fire_guard.__plugin_load__()
+    loaded = time.perf_counter()
+    modules = len(set(sys.modules) - before)
+
+    # The benchmark settings and logger; common imports the package, which is loaded by now
+    from common import make_plugin
+    plugin = make_plugin(startup=False, plugin=octoprint_octo_fire_guard.__plugin_implementation__)
+    ready = time.perf_counter()
+    plugin.on_after_startup()
+    finished = time.perf_counter()
+    plugin.on_shutdown()
+
+    print(json.dumps({
+        "import": imported - started,
+        "__plugin_load__": loaded - imported,
+        "on_after_startup": finished - ready,
+        "total": (loaded - started) + (finished - ready),
+        "modules": modules,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--runs", type=int, default=20, help="cold starts to measure")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--child"],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)))
+        runs.append(json.loads(output.decode("utf-8").strip().splitlines()[-1]))
+
+    print("Plugin startup, {} cold starts, {} modules imported".format(args.runs, runs[0]["modules"]))
+    width = max(len(step) for step in STEPS)
+    for step in STEPS:
+        values = [run[step] * 1000.0 for run in runs]
+        print("  {}  median {:>7.2f} ms  min {:>7.2f} ms".format(
+            step.ljust(width), statistics.median(values), min(values)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# coding=utf-8
+"""
+Bandwidth of the live guard status channel.
+
+A printer with five hotends, a heatbed and a chamber reports noisy but
+steady temperatures, with one hotend heating up, for a simulated minute at
+several report rates. The bytes per second a browser receives from the
+coalescing publisher are compared with a naive push of the full status for
+every report, followed by the cost of mark() on the comm thread.
+
+Run with: python3 benchmarks/bench_status.py
+"""
+
+from __future__ import absolute_import
+import json
+import random
+
+from common import make_plugin, measure, report
+
+from octoprint_octo_fire_guard.status import StatusPublisher, DEFAULT_STATUS_INTERVAL
+
+SECONDS = 60
+REPORT_RATES = (1, 10, 100)  # Reports per second
+NOISE = 0.3  # °C of sensor noise around a steady reading
+
+
+def readings(rate, rng):
+    """Yield one temperature report per sample; tool4 heats from 25°C at 2°C/s"""
+    for index in range(SECONDS * rate):
+        elapsed = index / float(rate)
+        data = dict(("tool{}".format(tool), (200.0 + rng.uniform(-NOISE, NOISE), 200.0)) for tool in range(4))
+        data["tool4"] = (min(25.0 + 2.0 * elapsed, 210.0) + rng.uniform(-NOISE, NOISE), 210.0)
+        data["bed"] = (60.0 + rng.uniform(-NOISE, NOISE), 60.0)
+        data["chamber"] = (35.0 + rng.uniform(-NOISE, NOISE), None)
+        yield elapsed, data
+
+
+def bandwidth_case(rate):
+    plugin = make_plugin(dict(status_interval=0), startup=False)
+    sent = []
+    publisher = StatusPublisher(plugin._guard_status, lambda message: sent.append(json.dumps(message)))
+    naive_bytes = 0
+    next_publish = 0.0
+    rng = random.Random(rate)
+    for elapsed, data in readings(rate, rng):
+        plugin.temperature_callback(None, data)
+        naive_bytes += len(json.dumps(dict(type="guard_status", t=elapsed, s=plugin._guard_status())))
+        # The publisher thread wakes at most once per interval
+        if elapsed >= next_publish:
+            publisher.publish()
+            next_publish = elapsed + DEFAULT_STATUS_INTERVAL / 1000.0
+    return naive_bytes / float(SECONDS), sum(len(message) for message in sent) / float(SECONDS), len(sent)
+
+
+def main():
+    print("Bytes per second per browser ({} s, 7 sensors)".format(SECONDS))
+    for rate in REPORT_RATES:
+        naive, coalesced, messages = bandwidth_case(rate)
+        print("  {:>4} reports/s  naive {:>9.0f} B/s  coalesced {:>7.0f} B/s in {:>3} messages".format(
+            rate, naive, coalesced, messages))
+
+    publisher = StatusPublisher(dict, lambda message: None)
+    publisher.mark()  # The publisher is not started, so the pending flag stays set as under load
+    report("Comm thread cost", [("mark() while a publication is pending", measure(publisher.mark))])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# coding=utf-8
+"""
+Shared helpers for the Octo Fire Guard benchmarks.
+
+The benchmarks build the plugin on top of the same OctoPrint stand-ins as the
+unit tests, but use a real logger and a settings object that resolves values
+through layered dictionaries the way OctoPrint's settings do, so the measured
+costs are representative of a live instance.
+"""
+
+from __future__ import absolute_import
+import logging
+import os
+import sys
+import time
+from unittest.mock import Mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+
+
+class LayeredSettings(object):
+    """
+    Approximation of OctoPrint's PluginSettings: every lookup is prefixed with
+    the plugin path and resolved by walking the user config and then the
+    defaults layer, followed by a type conversion.
+    """
+
+    def __init__(self, values, defaults, identifier="octo_fire_guard"):
+        self._prefix = ["plugins", identifier]
+        self._layers = [
+            {"plugins": {identifier: dict(values)}},
+            {"plugins": {identifier: dict(defaults)}},
+        ]
+
+    def _lookup(self, path):
+        full_path = self._prefix + list(path)
+        for layer in self._layers:
+            node = layer
+            for key in full_path:
+                if not isinstance(node, dict) or key not in node:
+                    node = None
+                    break
+                node = node[key]
+            if node is not None:
+                return node
+        return None
+
+    def get(self, path):
+        return self._lookup(path)
+
+    def get_boolean(self, path):
+        value = self._lookup(path)
+        if isinstance(value, str):
+            return value.lower() in ("true", "yes", "y", "1", "on")
+        return bool(value)
+
+    def get_float(self, path):
+        value = self._lookup(path)
+        return float(value) if value is not None else None
+
+    def get_int(self, path):
+        value = self._lookup(path)
+        return int(value) if value is not None else None
+
+    def set(self, path, value):
+        self._layers[0]["plugins"][self._prefix[1]][path[0]] = value
+
+
+def make_logger(level=logging.INFO):
+    """Real logger that formats records like OctoPrint would, but discards the output"""
+    logger = logging.getLogger("octoprint.plugins.octo_fire_guard.benchmark")
+    logger.handlers[:] = [logging.NullHandler()]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+def make_plugin(settings=None, log_level=logging.INFO, startup=True, plugin=None):
+    """
+    Build a plugin instance wired to the benchmark settings and a real logger,
+    or wire an existing one such as the instance __plugin_load__ built
+    """
+    if plugin is None:
+        plugin = OctoFireGuardPlugin()
+    defaults = plugin.get_settings_defaults()
+    values = dict(defaults)
+    values["enable_data_monitoring"] = False
+    values.update(settings or {})
+    plugin._settings = LayeredSettings(values, defaults)
+    plugin._logger = make_logger(log_level)
+    plugin._plugin_manager = Mock()
+    plugin._printer = Mock()
+    plugin._identifier = "octo_fire_guard"
+    plugin._plugin_version = "benchmark"
+    if startup:
+        plugin.on_after_startup()
+    return plugin
+
+
+def measure(func, iterations=20000, repeat=5):
+    """Return the best observed cost of func() in nanoseconds per call"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            func()
+        elapsed = (time.perf_counter_ns() - start) / float(iterations)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(title, rows):
+    """Print (label, ns_per_call) rows as an aligned table"""
+    print(title)
+    width = max(len(label) for label, _ in rows)
+    for label, value in rows:
+        print("  {}  {:>10.1f} ns".format(label.ljust(width), value))
@@ -1,13 +1,33 @@
 # coding=utf-8
 from __future__ import absolute_import
 
+# Only what the temperature hook and the emergency path need is imported here, so the plugin
+# adds as little as possible to OctoPrint's boot, while the printer is not yet guarded. These
+# are imported where they are used instead:
+# - flask and OctoPrint's permissions: the API and the metrics route
+# - socket and the fleet reporter: fleet reporting
+# - the Prometheus exposition: the metrics route
+# - subprocess: the secondary power-off command of the escalation
 import octoprint.plugin
-import octoprint.util
-import octoprint.access.permissions as permissions
-import flask
+import logging
 import time
 import threading
 
+from .emergency import EmergencyExecutor, EmergencyIncident
+from .escalation import EscalationMonitor, STAGE_PSU, STAGE_SECONDARY, STATE_COOLING, STATE_NO_DATA
+from .guard_settings import GuardSettings
+from .guard_state import GuardStateTable
+from .metrics import GuardMetrics
+from .rate import RATE_REARM_FRACTION
+from .history import TemperatureHistory, DEFAULT_HISTORY_POINTS, MAX_HISTORY_POINTS
+from .journal import IncidentJournal, DEFAULT_PAGE_SIZE
+from .killswitch import KillSwitch, KILL_TAG
+from .plan import EmergencyPlan, SECONDARY_POWER_TIMEOUT
+from .rules import GuardRules
+from .sensors import SensorRegistry, SENSOR_HOTEND, SENSOR_HEATBED, SENSOR_IGNORED
+from .status import StatusPublisher, STATUS_EXCEEDED, STATUS_RATE_EXCEEDED, STATUS_DATA_TIMEOUT
+from .watchdog import DeadlineScheduler, MIN_DATA_TIMEOUT, format_duration
+
 __plugin_name__ = "Octo Fire Guard"
 __plugin_pythoncompat__ = ">=3.8,<4"
 
@@ -18,19 +38,53 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
                           octoprint.plugin.StartupPlugin,
                           octoprint.plugin.SimpleApiPlugin,
                           octoprint.plugin.ShutdownPlugin,
-                          octoprint.plugin.EventHandlerPlugin):
+                          octoprint.plugin.EventHandlerPlugin,
+                          octoprint.plugin.BlueprintPlugin):
 
     def __init__(self):
-        self._hotend_threshold_exceeded = False
-        self._heatbed_threshold_exceeded = False
-        self._last_temperatures = {}
+        self._guard_state = GuardStateTable()  # Per-heater thresholds and alert flags
+        self._last_temperatures = {}  # Latest reading per sensor key
+        # Bounded per-sensor history; kept across reconnects so it can be inspected after an alert
+        self._history = TemperatureHistory()
         self._last_hotend_data_time = None
         self._last_heatbed_data_time = None
         self._data_timeout_warning_sent = False
         self._warned_missing_sensors = set()  # Track which sensors we've warned about
         self._monitoring_timer = None
+        # Handles emergency shutdowns off the comm thread once started in on_after_startup
+        self._emergency_executor = EmergencyExecutor(self._handle_emergency)
         self._startup_time = time.time()  # Initial startup time; may be updated in on_after_startup
         self._state_lock = threading.RLock()  # Protect shared state from race conditions
+        self._guard_settings = None  # GuardSettings snapshot read by the temperature callback
+        self._sensor_registry = SensorRegistry()  # Classification cache for reported temperature keys
+        self._metrics = GuardMetrics()  # Latency histograms exposed through the API
+        self._exposition = None  # Prometheus exposition of the guard state, created on the first scrape
+        self._journal = IncidentJournal()  # Incident journal in the data folder, opened in on_after_startup
+        self._fleet_reporter = None  # Streams state to a fleet aggregator while fleet reporting is enabled
+        self._status_publisher = None  # Pushes the live guard status to the frontend once started
+        self._emergency_plan = None  # Compiled termination actions, rebuilt on startup and settings save
+        self._guard_rules = None  # Custom rules compiled to closures, rebuilt on startup and settings save
+        self._guard_rule_problems = []
+        self._kill_switch = KillSwitch()  # Moves the emergency GCode ahead of the comm queue through the GCode hooks
+        # Checks that tripped heaters cool down after an emergency and escalates if not; started in on_after_startup
+        self._escalation = EscalationMonitor(self._escalate_termination, self._on_verification_finished)
+
+    @property
+    def _hotend_threshold_exceeded(self):
+        """True while any hotend is above its threshold"""
+        return self._guard_state.any_hotend_exceeded()
+
+    @_hotend_threshold_exceeded.setter
+    def _hotend_threshold_exceeded(self, exceeded):
+        self._guard_state.set_hotends_exceeded(exceeded)
+
+    @property
+    def _heatbed_threshold_exceeded(self):
+        return self._guard_state.heatbed.exceeded
+
+    @_heatbed_threshold_exceeded.setter
+    def _heatbed_threshold_exceeded(self, exceeded):
+        self._guard_state.heatbed.exceeded = exceeded
 
     ##~~ SettingsPlugin mixin
 
@@ -40,16 +94,99 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
             heatbed_threshold=100,  # Default heatbed threshold in °C
             termination_mode="gcode",  # Options: "gcode" or "psu"
             termination_gcode="M112\nM104 S0\nM140 S0",  # Emergency stop + turn off heaters
+            priority_kill_gcode=True,  # Send the emergency GCode ahead of lines already queued for the printer
             psu_plugin_name="psucontrol",  # Name of PSU control plugin
+            enable_escalation=True,  # Check that the temperature falls after an emergency and escalate if not
+            verification_window=30,  # Seconds after each termination stage within which the temperature must fall
+            secondary_power_command="",  # Command cutting power by other means, the last escalation stage
             enable_monitoring=True,  # Enable/disable monitoring
             check_interval=1,  # Check interval in seconds (not currently used, uses temperature callback)
             enable_data_monitoring=True,  # Enable/disable temperature data timeout monitoring
-            temperature_data_timeout=300  # Timeout in seconds (5 minutes) before warning about missing temperature data
+            temperature_data_timeout=300,  # Timeout in seconds (5 minutes) before warning about missing temperature data
+            enable_rate_monitoring=False,  # Enable/disable the rate-of-rise (thermal runaway) check
+            max_heating_rate=2.0,  # Maximum heating rate in °C/s while the target is steady
+            rate_window=10,  # Number of samples the heating rate is estimated over
+            spike_filter="off",  # Filter against single-sample spikes: "off", "n_of_m" or "median"
+            spike_filter_window=5,  # Readings the spike filter looks at (M, or the median window)
+            spike_filter_count=3,  # Readings of the window that must be above the threshold (N)
+            custom_rules="",  # Custom guard conditions, one rule per line (see rules.GuardRules)
+            enable_fleet_reporting=False,  # Stream guard state to a fleet aggregator
+            fleet_aggregator="127.0.0.1:8765",  # host:port or unix:/path of the aggregator
+            fleet_printer_id="",  # Name reported to the aggregator; the host name if empty
+            fleet_report_interval=1.0,  # Seconds between state reports
+            status_interval=500,  # Minimum milliseconds between live status messages to the frontend; 0 disables
+            status_epsilon=0.5  # °C a reading has to move before the live status is updated
         )
 
     def get_settings_version(self):
         return 1
 
+    def get_settings_restricted_paths(self):
+        # The secondary power-off command is run on the host with OctoPrint's privileges
+        return dict(admin=[["secondary_power_command"]])
+
+    def on_settings_save(self, data):
+        result = octoprint.plugin.SettingsPlugin.on_settings_save(self, data)
+        self._rebuild_guard_settings()
+        self._rebuild_emergency_plan(notify=True)
+        self._rebuild_guard_rules(notify=True)
+        # Apply a changed data timeout, or enabling/disabling data monitoring, right away
+        if self._settings.get_boolean(["enable_data_monitoring"]):
+            self._start_monitoring_timer()
+        else:
+            self._stop_monitoring_timer()
+        self._configure_fleet_reporter()
+        self._configure_status_publisher()
+        return result
+
+    def _rebuild_guard_settings(self):
+        """Build a fresh settings snapshot and swap it in for the temperature callback"""
+        guard_settings = GuardSettings.from_settings(self._settings, self.get_settings_defaults())
+        self._guard_state.configure(guard_settings)
+        # A single attribute assignment, so the comm thread sees either the old or the new snapshot
+        self._guard_settings = guard_settings
+        return guard_settings
+
+    def _rebuild_emergency_plan(self, notify=False):
+        """
+        Compile the emergency actions from the settings and report problems now
+        instead of during an emergency; with notify, also to the frontend.
+        """
+        plan = EmergencyPlan.compile(self._settings, self._plugin_manager)
+        for problem in plan.problems:
+            self._logger.error("Emergency plan: {}".format(problem))
+        self._emergency_plan = plan
+        if notify and plan.problems:
+            self._plugin_manager.send_plugin_message(
+                self._identifier, dict(type="emergency_plan_warning", problems=list(plan.problems))
+            )
+        return plan
+
+    def _rebuild_guard_rules(self, notify=False):
+        """
+        Compile the custom rules and swap them in for the temperature callback;
+        rules that do not compile are left out and reported.
+        """
+        guard_rules, problems = GuardRules.compile(self._settings.get(["custom_rules"]))
+        for problem in problems:
+            self._logger.error("Custom rule skipped: {}".format(problem))
+        if guard_rules is not None:
+            self._logger.info("Custom rules active: %d", len(guard_rules.rules))
+        self._guard_rules = guard_rules
+        self._guard_rule_problems = problems
+        if notify and problems:
+            self._plugin_manager.send_plugin_message(
+                self._identifier, dict(type="guard_rule_warning", problems=problems)
+            )
+        return guard_rules
+
+    def _get_emergency_plan(self):
+        """The compiled emergency plan, compiled on first use before startup"""
+        plan = self._emergency_plan
+        if plan is None:
+            plan = self._rebuild_emergency_plan()
+        return plan
+
     ##~~ AssetPlugin mixin
 
     def get_assets(self):
@@ -63,7 +200,8 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
     def get_template_configs(self):
         return [
             dict(type="settings", custom_bindings=False),
-            dict(type="generic", template="octo_fire_guard_alert_modal.jinja2", custom_bindings=False)
+            dict(type="generic", template="octo_fire_guard_alert_modal.jinja2", custom_bindings=False),
+            dict(type="tab", name="Fire Guard", template="octo_fire_guard_tab.jinja2", custom_bindings=False)
         ]
 
     ##~~ StartupPlugin mixin
@@ -71,21 +209,42 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
     def on_after_startup(self):
         self._logger.debug("Initializing Octo Fire Guard plugin")
         self._startup_time = time.time()  # Set startup time when plugin actually starts
+        guard_settings = self._rebuild_guard_settings()
+        self._guard_state.resize(self._get_extruder_count())
         self._logger.info("Octo Fire Guard plugin started")
-        self._logger.info("Hotend threshold: {}°C".format(self._settings.get(["hotend_threshold"])))
-        self._logger.info("Heatbed threshold: {}°C".format(self._settings.get(["heatbed_threshold"])))
+        self._logger.info("Hotend threshold: {}°C".format(guard_settings.hotend_threshold))
+        self._logger.info("Heatbed threshold: {}°C".format(guard_settings.heatbed_threshold))
         self._logger.info("Termination mode: {}".format(self._settings.get(["termination_mode"])))
-        self._logger.debug("Monitoring enabled: {}".format(self._settings.get_boolean(["enable_monitoring"])))
+        self._logger.debug("Monitoring enabled: {}".format(guard_settings.enable_monitoring))
+        # Other plugins, such as PSU Control, are loaded by now
+        self._rebuild_emergency_plan(notify=True)
+        self._rebuild_guard_rules(notify=True)
         
+        self._emergency_executor.start(self._logger)
+        self._escalation.start(self._logger)
+        try:
+            self._journal.open(self.get_plugin_data_folder(), self._logger)
+        except (IOError, OSError) as e:
+            self._logger.error("Failed to open incident journal: {}".format(str(e)))
+
         # Start background monitoring timer if data monitoring is enabled
         if self._settings.get_boolean(["enable_data_monitoring"]):
             self._start_monitoring_timer()
 
+        self._configure_fleet_reporter()
+        self._configure_status_publisher()
+
         self._logger.debug("Plugin initialization complete")
 
     def on_shutdown(self):
-        """Clean up timer on shutdown"""
+        """Clean up timer, emergency executor and incident journal on shutdown"""
         self._stop_monitoring_timer()
+        self._stop_fleet_reporter()
+        self._stop_status_publisher()
+        self._emergency_executor.stop()
+        self._escalation.stop()
+        # Closed last so incidents handled during the executor's shutdown are still written
+        self._journal.close()
 
     ##~~ EventHandlerPlugin mixin
 
@@ -98,8 +257,9 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
     def _reset_state(self):
         """Reset all local state variables to their initial values"""
         with self._state_lock:
-            self._hotend_threshold_exceeded = False
-            self._heatbed_threshold_exceeded = False
+            self._guard_state.reset()
+            # The printer profile may have changed with the connection
+            self._guard_state.resize(self._get_extruder_count())
             self._last_temperatures = {}
             self._last_hotend_data_time = None
             self._last_heatbed_data_time = None
@@ -107,30 +267,82 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
             self._warned_missing_sensors.clear()
             # Reset startup time on reconnection so timeout logic uses the new reference point
             self._startup_time = time.time()
+            self._metrics.reset_arrivals()
+            guard_rules = self._guard_rules
+            if guard_rules is not None:
+                guard_rules.reset()
+            # Nothing queued before the reconnect is sent anymore
+            self._kill_switch.disarm()
+            if self._status_publisher is not None:
+                # Sensors may differ after the reconnect, so start over with a full status
+                self._status_publisher.reset()
+            if self._monitoring_timer is not None:
+                # Measure the data timeout from the reconnect
+                timeout = self._get_data_timeout()
+                self._arm_data_deadline(SENSOR_HOTEND, timeout)
+                self._arm_data_deadline(SENSOR_HEATBED, timeout)
         self._logger.debug("Plugin state reset complete")
 
+    def _get_extruder_count(self):
+        """Extruder count of the current printer profile, 1 if it cannot be determined"""
+        try:
+            profile = self._printer_profile_manager.get_current_or_default()
+            return max(int(profile["extruder"]["count"]), 1)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return 1
+
     def _start_monitoring_timer(self):
-        """Start the background monitoring timer"""
+        """Start the data timeout watchdog and arm a deadline for every sensor group"""
         if self._monitoring_timer is not None:
             self._stop_monitoring_timer()
-        
-        # Check every 30 seconds for temperature data timeout
-        self._monitoring_timer = octoprint.util.RepeatedTimer(30, self._check_temperature_data_timeout)
-        self._monitoring_timer.start()
+
+        # Wakes up only when a sensor's data timeout may have expired, instead of polling
+        self._monitoring_timer = DeadlineScheduler(self._on_data_deadline)
+        self._monitoring_timer.start(self._logger)
+        timeout = self._get_data_timeout()
+        for sensor_name in (SENSOR_HOTEND, SENSOR_HEATBED):
+            self._monitoring_timer.arm(sensor_name, timeout)
         self._logger.info("Temperature data monitoring timer started")
 
     def _stop_monitoring_timer(self):
-        """Stop the background monitoring timer"""
+        """Stop the data timeout watchdog"""
         if self._monitoring_timer is not None:
-            self._monitoring_timer.cancel()
+            self._monitoring_timer.stop()
             self._monitoring_timer = None
             self._logger.info("Temperature data monitoring timer stopped")
 
+    def _get_data_timeout(self):
+        """Configured data timeout in seconds; fractions of a second are allowed"""
+        try:
+            timeout = float(self._settings.get_float(["temperature_data_timeout"]))
+        except (TypeError, ValueError):
+            timeout = float(self.get_settings_defaults()["temperature_data_timeout"])
+        return max(timeout, MIN_DATA_TIMEOUT)
+
+    def _on_data_deadline(self, sensor_name):
+        """Watchdog handler, runs once the deadline armed for sensor_name has passed"""
+        self._check_temperature_data_timeout()
+
+    def _arm_data_deadline(self, sensor_name, delay):
+        """Re-arm the watchdog for a sensor group, if the watchdog is running"""
+        watchdog = self._monitoring_timer
+        if watchdog is not None:
+            watchdog.arm(sensor_name, delay)
+
     def _check_temperature_data_timeout(self):
-        """Check if we haven't received temperature data in a while"""
+        """
+        Check if we haven't received temperature data in a while.
+
+        Samples only record their timestamp, so the watchdog deadlines are
+        re-armed here: each sensor group is checked again when its timeout
+        would expire given the latest sample, or one full timeout from now if
+        its data is already missing or has never been received.
+        """
         if not self._settings.get_boolean(["enable_data_monitoring"]):
             return
 
+        timeout = self._get_data_timeout()
+
         # Only check if printer is connected
         if not self._printer.is_operational():
             # Reset warning state when printer is not connected
@@ -140,9 +352,10 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
                 self._last_heatbed_data_time = None
                 if self._warned_missing_sensors is not None:
                     self._warned_missing_sensors.clear()
+            self._arm_data_deadline(SENSOR_HOTEND, timeout)
+            self._arm_data_deadline(SENSOR_HEATBED, timeout)
             return
 
-        timeout = self._settings.get_int(["temperature_data_timeout"])
         current_time = time.time()
         
         # Check if we have timeout for hotend or heatbed
@@ -152,19 +365,26 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
             startup_time = self._startup_time if self._startup_time else current_time
             
             if self._last_hotend_data_time is not None:
-                time_since_hotend = current_time - self._last_hotend_data_time
-                if time_since_hotend > timeout:
-                    missing_sensors.append("hotend")
-            elif current_time - startup_time > timeout:
+                hotend_remaining = self._last_hotend_data_time + timeout - current_time
+            else:
                 # If we're operational but never got hotend data after startup timeout, that's a problem
+                hotend_remaining = startup_time + timeout - current_time
+            if hotend_remaining < 0:
                 missing_sensors.append("hotend")
+                hotend_remaining = timeout
             
             if self._last_heatbed_data_time is not None:
-                time_since_heatbed = current_time - self._last_heatbed_data_time
-                if time_since_heatbed > timeout:
+                heatbed_remaining = self._last_heatbed_data_time + timeout - current_time
+                if heatbed_remaining < 0:
                     missing_sensors.append("heatbed")
-            # Note: We don't check for startup timeout on heatbed because not all printers have heatbeds
-            # We only warn if we've previously received heatbed data and then it stops
+                    heatbed_remaining = timeout
+            else:
+                # Note: We don't check for startup timeout on heatbed because not all printers have heatbeds
+                # We only warn if we've previously received heatbed data and then it stops
+                heatbed_remaining = timeout
+
+            self._arm_data_deadline(SENSOR_HOTEND, hotend_remaining)
+            self._arm_data_deadline(SENSOR_HEATBED, heatbed_remaining)
             
             # Send warning if we have missing sensors and haven't already warned about them
             if missing_sensors and not self._data_timeout_warning_sent:
@@ -182,14 +402,150 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
                     dict(type="data_timeout_cleared")
                 )
 
+    ##~~ Fleet reporting
+
+    def _configure_fleet_reporter(self):
+        """Start, restart or stop the fleet reporter to match the settings"""
+        self._stop_fleet_reporter()
+        if not self._settings.get_boolean(["enable_fleet_reporting"]):
+            return
+        import socket
+        from .fleet import FleetReporter
+
+        address = self._settings.get(["fleet_aggregator"])
+        printer_id = self._settings.get(["fleet_printer_id"]) or socket.gethostname()
+        try:
+            interval = float(self._settings.get_float(["fleet_report_interval"]))
+        except (TypeError, ValueError):
+            interval = self.get_settings_defaults()["fleet_report_interval"]
+        try:
+            reporter = FleetReporter(address, printer_id, self._fleet_state, interval)
+        except ValueError as e:
+            self._logger.error("Invalid fleet aggregator address: {}".format(str(e)))
+            return
+        reporter.start(self._logger)
+        self._fleet_reporter = reporter
+        self._logger.info("Reporting to fleet aggregator {} as {}".format(address, printer_id))
+
+    def _stop_fleet_reporter(self):
+        reporter, self._fleet_reporter = self._fleet_reporter, None
+        if reporter is not None:
+            reporter.stop()
+
+    def _wake_fleet_reporter(self):
+        reporter = self._fleet_reporter
+        if reporter is not None:
+            reporter.wake()
+
+    def _fleet_state(self):
+        """
+        Guard state reported to the fleet aggregator. Runs on the reporter
+        thread, so shared containers are copied before they are read.
+        """
+        guard_settings = self._guard_settings or self._rebuild_guard_settings()
+        temperatures = dict(self._last_temperatures)
+        return dict(
+            thresholds=dict(hotend=guard_settings.hotend_threshold, heatbed=guard_settings.heatbed_threshold),
+            # Rounded so sensor noise below the display resolution does not produce a delta
+            temps=dict((key, [round(reading[0], 1), reading[1]]) for key, reading in temperatures.items()),
+            alert=dict(hotend=self._hotend_threshold_exceeded, heatbed=self._heatbed_threshold_exceeded),
+            timeout=sorted(self._warned_sensors()),
+        )
+
+    ##~~ Live guard status
+
+    def _configure_status_publisher(self):
+        """Start, restart or stop the live status publisher to match the settings"""
+        self._stop_status_publisher()
+        try:
+            interval = float(self._settings.get_float(["status_interval"]))
+            epsilon = float(self._settings.get_float(["status_epsilon"]))
+        except (TypeError, ValueError):
+            defaults = self.get_settings_defaults()
+            interval, epsilon = defaults["status_interval"], defaults["status_epsilon"]
+        if interval <= 0:
+            return
+        publisher = StatusPublisher(self._guard_status, self._send_guard_status, interval, max(epsilon, 0.0))
+        publisher.start(self._logger)
+        self._status_publisher = publisher
+
+    def _stop_status_publisher(self):
+        publisher, self._status_publisher = self._status_publisher, None
+        if publisher is not None:
+            publisher.stop()
+
+    def _send_guard_status(self, message):
+        self._plugin_manager.send_plugin_message(self._identifier, message)
+
+    def _guard_status(self):
+        """
+        Live status row of every reporting sensor: [actual, target, headroom, state].
+        Headroom is the distance to the threshold in °C, None for unguarded
+        sensors, and state a combination of the STATUS_* bits.
+        """
+        sensor_registry = self._sensor_registry
+        warned = self._warned_sensors()
+        rows = {}
+        for key, reading in dict(self._last_temperatures).items():
+            actual, target = reading[0], reading[1]
+            state = sensor_registry[key].state
+            if state is None:
+                rows[key] = [round(actual, 1), target, None, 0]
+                continue
+            flags = 0
+            if state.exceeded:
+                flags |= STATUS_EXCEEDED
+            if state.rate_exceeded:
+                flags |= STATUS_RATE_EXCEEDED
+            if state.kind in warned:
+                flags |= STATUS_DATA_TIMEOUT
+            rows[key] = [round(actual, 1), target, round(state.threshold - actual, 1), flags]
+        return rows
+
+    def _warned_sensors(self):
+        """
+        Copy of the sensor groups with a data timeout warning, for readers off
+        the watchdog and comm threads; the set is only changed under the lock.
+        """
+        with self._state_lock:
+            return frozenset(self._warned_missing_sensors)
+
+    def _clear_data_timeout_warning(self, sensor_name):
+        """
+        Clear the data timeout warning for a sensor whose data is arriving again.
+
+        Called from the comm thread after an unlocked membership check, so the
+        check is repeated under the lock before anything is changed.
+        """
+        with self._state_lock:
+            if sensor_name not in self._warned_missing_sensors:
+                return
+            self._warned_missing_sensors.discard(sensor_name)
+            self._logger.info("{} temperature data resumed".format(sensor_name.capitalize()))
+            # If no more sensors are being warned about, clear the warning state
+            if not self._warned_missing_sensors:
+                self._data_timeout_warning_sent = False
+                # Notify frontend to dismiss the warning notification
+                self._plugin_manager.send_plugin_message(
+                    self._identifier,
+                    dict(type="data_timeout_cleared")
+                )
+
     def _send_data_timeout_warning(self, missing_sensors, timeout):
         """Send a warning notification about missing temperature data"""
         sensors_str = " and ".join(missing_sensors)
-        message = "No temperature data received from {} for {} minutes. Plugin may not be monitoring correctly.".format(
-            sensors_str, int(timeout / 60)
+        message = "No temperature data received from {} for {}. Plugin may not be monitoring correctly.".format(
+            sensors_str, format_duration(timeout)
         )
         
         self._logger.warning("TEMPERATURE DATA TIMEOUT: {}".format(message))
+        self._journal.append(dict(
+            time=time.time(),
+            type="data_timeout",
+            sensors=list(missing_sensors),
+            timeout=timeout,
+        ))
+        self._wake_fleet_reporter()
         
         # Send notification to OctoPrint notification system
         self._plugin_manager.send_plugin_message(
@@ -207,10 +563,14 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
     def get_api_commands(self):
         return dict(
             test_alert=[],
-            test_emergency_actions=[]
+            test_emergency_actions=[],
+            list_incidents=[]
         )
 
     def on_api_command(self, command, data):
+        import flask
+        from octoprint.access.permissions import Permissions
+
         if command == "test_alert":
             self._logger.info("Testing alert system")
             self._plugin_manager.send_plugin_message(
@@ -226,21 +586,23 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
             return flask.jsonify(success=True)
         elif command == "test_emergency_actions":
             # Check if user has CONTROL permission
-            if not permissions.Permissions.CONTROL.can():
+            if not Permissions.CONTROL.can():
                 self._logger.warning("User without CONTROL permission attempted to test emergency actions")
                 return flask.jsonify(success=False, error="Insufficient permissions. CONTROL permission required."), 403
             
             self._logger.info("Testing emergency actions")
-            termination_mode = self._settings.get(["termination_mode"])
+            # Runs the compiled plan, exactly as an emergency would
+            plan = self._get_emergency_plan()
+            termination_mode = plan.mode
             
             try:
                 if termination_mode == "gcode":
                     self._logger.info("Testing GCode termination commands")
-                    self._execute_gcode_termination()
+                    self._execute_gcode_termination(plan)
                     return flask.jsonify(success=True, mode="gcode", message="GCode commands executed successfully")
                 elif termination_mode == "psu":
                     self._logger.info("Testing PSU termination")
-                    self._execute_psu_termination()
+                    self._execute_psu_termination(plan)
                     return flask.jsonify(success=True, mode="psu", message="PSU termination executed successfully")
                 else:
                     self._logger.error("Unknown termination mode: {}".format(termination_mode))
@@ -250,8 +612,61 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
                 self._logger.error("Error testing emergency actions: {}".format(str(e)), exc_info=True)
                 # Return a generic error message to the client to avoid exposing sensitive information
                 return flask.jsonify(success=False, error="Failed to execute emergency actions. Check the logs for details."), 500
+        elif command == "list_incidents":
+            # Newest first; offset skips that many of the newest incidents
+            try:
+                offset = int(data.get("offset", 0))
+                limit = int(data.get("limit", DEFAULT_PAGE_SIZE))
+            except (TypeError, ValueError):
+                return flask.jsonify(success=False, error="offset and limit must be integers"), 400
+            try:
+                total, incidents = self._journal.query(offset, limit)
+            except (IOError, OSError, ValueError) as e:
+                self._logger.error("Failed to read incident journal: {}".format(str(e)))
+                return flask.jsonify(success=False, error="Failed to read the incident journal. Check the logs for details."), 500
+            return flask.jsonify(success=True, total=total, offset=offset, incidents=incidents)
 
 
+    def on_api_get(self, request):
+        """
+        Return the latency histograms collected by the guard, with a
+        history parameter the recorded temperature history, or with a status
+        parameter the full live guard status.
+
+        history is a comma-separated list of sensor keys (e.g. tool0,bed) or
+        "all"; start and end limit the range (epoch seconds) and points the
+        number of points per sensor after downsampling.
+        """
+        import flask
+
+        args = request.args
+        if args.get("status"):
+            # Full live status, the same shape as the guard_status messages
+            return flask.jsonify(type="guard_status", t=round(time.time(), 3), s=self._guard_status(),
+                                 plan_problems=list(self._get_emergency_plan().problems),
+                                 rule_problems=list(self._guard_rule_problems))
+        history = args.get("history")
+        if not history:
+            return flask.jsonify(latency=self._metrics.to_dict())
+
+        keys = None if history == "all" else [key.strip() for key in history.split(",") if key.strip()]
+        try:
+            start = self._parse_float_arg(args, "start")
+            end = self._parse_float_arg(args, "end")
+            points = int(args.get("points", DEFAULT_HISTORY_POINTS))
+        except ValueError:
+            flask.abort(400, description="start and end must be numbers and points an integer")
+        points = min(max(points, 2), MAX_HISTORY_POINTS)
+        return flask.jsonify(
+            history=self._history.query(keys, start, end, points),
+            current=dict(self._last_temperatures),
+        )
+
+    @staticmethod
+    def _parse_float_arg(args, name):
+        value = args.get(name)
+        return None if value in (None, "") else float(value)
+
     def is_api_protected(self):
         """
         Explicitly declare API protection status.
@@ -259,6 +674,75 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
         """
         return True
 
+    ##~~ BlueprintPlugin mixin
+
+    @octoprint.plugin.BlueprintPlugin.route("/metrics", methods=["GET"])
+    def get_metrics(self):
+        """Guard state and hot path cost in the Prometheus text exposition format"""
+        import flask
+        from .exposition import CONTENT_TYPE
+
+        return flask.Response(self._get_exposition().body(), content_type=CONTENT_TYPE)
+
+    def is_blueprint_protected(self):
+        """The metrics require an API key, like the rest of the plugin's API"""
+        return True
+
+    def _get_exposition(self):
+        """The metrics exposition, created on the first scrape"""
+        with self._state_lock:
+            if self._exposition is None:
+                from .exposition import MetricsExposition
+                self._exposition = MetricsExposition(self._render_metrics)
+            return self._exposition
+
+    def _render_metrics(self, now):
+        """Text exposition of the guard state at now (epoch seconds), see MetricsExposition"""
+        from .exposition import ExpositionWriter
+
+        guard_settings = self._guard_settings
+        sensor_registry = self._sensor_registry
+        metrics = self._metrics
+        warned = self._warned_sensors()
+        readings, thresholds, ages, alerts = [], [], [], []
+        for key, reading in sorted(dict(self._last_temperatures).items()):
+            sensor = sensor_registry[key]
+            labels = (("sensor", key), ("kind", sensor.kind))
+            readings.append((labels + (("type", "actual"),), reading[0]))
+            readings.append((labels + (("type", "target"),), reading[1]))
+            history = sensor.history
+            latest = history.latest() if history is not None else None
+            ages.append((labels, None if latest is None else max(now - latest, 0.0)))
+            state = sensor.state
+            if state is not None:
+                thresholds.append((labels, state.threshold))
+                alerts.append((labels, state.exceeded or state.rate_exceeded))
+        data_ages = []
+        for kind, last_data_time in ((SENSOR_HOTEND, self._last_hotend_data_time),
+                                     (SENSOR_HEATBED, self._last_heatbed_data_time)):
+            if last_data_time is not None:
+                data_ages.append(((("kind", kind),), max(now - last_data_time, 0.0)))
+
+        writer = ExpositionWriter()
+        writer.family("monitoring_enabled", "gauge", "Whether temperature monitoring is enabled",
+                      [((), guard_settings.enable_monitoring if guard_settings is not None else None)])
+        writer.family("temperature_celsius", "gauge", "Last reported temperature per sensor", readings)
+        writer.family("temperature_age_seconds", "gauge", "Seconds since the sensor's last reading", ages)
+        writer.family("threshold_celsius", "gauge", "Alert threshold per guarded sensor", thresholds)
+        writer.family("alert", "gauge", "Whether a temperature or heating rate alert is raised", alerts)
+        writer.family("trips_total", "counter", "Emergency shutdowns triggered",
+                      [((("kind", kind), ("sensor", key or "")), count)
+                       for (kind, key), count in sorted(list(metrics.trips.items()), key=str)])
+        writer.family("data_age_seconds", "gauge", "Seconds since the last reading of any sensor of a kind",
+                      data_ages)
+        writer.family("data_timeout", "gauge", "Whether no data arrived from a kind within the data timeout",
+                      [((("kind", kind),), kind in warned) for kind in (SENSOR_HOTEND, SENSOR_HEATBED)])
+        writer.family("callback_calls_total", "counter", "temperature_callback invocations",
+                      [((), metrics.calls)])
+        writer.histogram("callback_duration_seconds",
+                         "temperature_callback execution time while monitoring is enabled", metrics.callback)
+        return writer.getvalue()
+
     ##~~ Temperature callback
 
     def temperature_callback(self, comm, parsed_temperatures):
@@ -266,236 +750,504 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
         Called when temperature data is received from the printer.
         This is where we monitor temperatures and trigger alerts.
         """
-        self._logger.debug("temperature_callback invoked - processing temperature data")
-        
-        if not self._settings.get_boolean(["enable_monitoring"]):
-            self._logger.debug("Monitoring is disabled, skipping temperature checks")
+        received = time.perf_counter()
+        self._metrics.calls += 1
+        # Checking the level once keeps the disabled-DEBUG cost to a few local truth tests;
+        # the lazy %-style arguments are only formatted when a record is actually emitted
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self._logger.debug("temperature_callback invoked - processing temperature data")
+
+        guard_settings = self._guard_settings
+        if guard_settings is None:
+            # Samples can arrive before on_after_startup has built the snapshot
+            guard_settings = self._rebuild_guard_settings()
+
+        if not guard_settings.enable_monitoring:
+            if debug:
+                self._logger.debug("Monitoring is disabled, skipping temperature checks")
             return parsed_temperatures
 
         current_time = time.time()
-        self._logger.debug("Monitoring is enabled, checking temperatures")
-        self._logger.debug("Received parsed_temperatures: {}".format(parsed_temperatures))
-        
-        hotend_threshold = self._settings.get_float(["hotend_threshold"])
-        heatbed_threshold = self._settings.get_float(["heatbed_threshold"])
-        self._logger.debug("Current thresholds - Hotend: {}°C, Heatbed: {}°C".format(
-            hotend_threshold, heatbed_threshold
-        ))
+        if debug:
+            self._logger.debug("Monitoring is enabled, checking temperatures")
+            self._logger.debug("Received parsed_temperatures: %s", parsed_temperatures)
+            self._logger.debug("Current thresholds - Hotend: %s°C, Heatbed: %s°C",
+                               guard_settings.hotend_threshold, guard_settings.heatbed_threshold)
+
+        sensor_registry = self._sensor_registry
+        guard_state = self._guard_state
+        history = self._history
+        escalation = self._escalation
+        guard_rules = self._guard_rules
+        last_temperatures = self._last_temperatures
+        for sensor_key, temp_data in parsed_temperatures.items():
+            # Keys are classified once and cached, both old (tool0, bed) and new (T0, B) formats
+            sensor = sensor_registry[sensor_key]
+            sensor_kind = sensor.kind
+            if guard_rules is not None and sensor_kind != SENSOR_IGNORED and \
+                    isinstance(temp_data, tuple) and len(temp_data) >= 2:
+                guard_rules.update(sensor, temp_data)
 
-        # Check hotend temperature (tool0, tool1, etc. or T0, T1, etc.)
-        for tool_key in parsed_temperatures:
-            # Support both old format (tool0, tool1) and new format (T0, T1)
-            # For new format: starts with 'T', has at least one more character, and all chars after 'T' are digits
-            is_new_format_tool = (tool_key.startswith("T") and len(tool_key) >= 2 and 
-                                  tool_key[1:].isdigit())
-            if tool_key.startswith("tool") or is_new_format_tool:
-                self._logger.debug("Checking hotend temperature for {}".format(tool_key))
-                temp_data = parsed_temperatures[tool_key]
+            if sensor_kind == SENSOR_HOTEND:
+                # Check hotend temperature (tool0, tool1, etc. or T0, T1, etc.)
+                if debug:
+                    self._logger.debug("Checking hotend temperature for %s", sensor_key)
                 if isinstance(temp_data, tuple) and len(temp_data) >= 2:
                     current_temp = temp_data[0]
+                    # Each tool has its own state, so one tripped tool does not mask another
+                    state = sensor.state or guard_state.bind(sensor)
                     # Update last data time if we got valid temperature data
                     if current_temp is not None:
-                        with self._state_lock:
-                            self._last_hotend_data_time = current_time
-                            # Remove hotend from warned sensors if it was warned about
-                            if "hotend" in self._warned_missing_sensors:
-                                self._warned_missing_sensors.discard("hotend")
-                                self._logger.info("Hotend temperature data resumed")
-                                # If no more sensors are being warned about, clear the warning state
-                                if not self._warned_missing_sensors:
-                                    self._data_timeout_warning_sent = False
-                                    # Notify frontend to dismiss the warning notification
-                                    self._plugin_manager.send_plugin_message(
-                                        self._identifier,
-                                        dict(type="data_timeout_cleared")
-                                    )
+                        self._metrics.observe_arrival(sensor_key, received)
+                        # Plain attribute stores need no lock; it is only taken when the warning is cleared
+                        self._last_hotend_data_time = current_time
+                        last_temperatures[sensor_key] = temp_data
+                        history.record(sensor, current_time, current_temp, temp_data[1])
+                        if escalation.watching:
+                            escalation.observe(sensor_key, received, current_temp)
+                        if "hotend" in self._warned_missing_sensors:
+                            self._clear_data_timeout_warning("hotend")
                     
-                    self._logger.debug("{} current temperature: {}°C".format(tool_key, current_temp))
-                    if current_temp is not None and current_temp > hotend_threshold:
-                        self._logger.debug("{} temperature {} exceeds threshold {}".format(
-                            tool_key, current_temp, hotend_threshold
-                        ))
-                        if not self._hotend_threshold_exceeded:
-                            self._logger.debug("Hotend threshold flag not yet set, triggering alert")
+                    if debug:
+                        self._logger.debug("%s current temperature: %s°C", sensor_key, current_temp)
+                    above = current_temp is not None and current_temp > state.threshold
+                    spike_filter = state.spike_filter
+                    if spike_filter is not None and current_temp is not None:
+                        # Isolated glitches above the threshold do not count until the filter confirms them
+                        filtered = spike_filter.push(current_temp, state.threshold)
+                        if debug and above and not filtered:
+                            self._logger.debug("%s reading %s°C above threshold held back by spike filter",
+                                               sensor_key, current_temp)
+                        above = filtered
+                    if above:
+                        if debug:
+                            self._logger.debug("%s temperature %s exceeds threshold %s",
+                                               sensor_key, current_temp, state.threshold)
+                        if not state.exceeded:
+                            if debug:
+                                self._logger.debug("%s threshold flag not yet set, triggering alert", sensor_key)
                             self._logger.warning(
-                                "HOTEND TEMPERATURE ALERT! Current: {}°C, Threshold: {}°C".format(
-                                    current_temp, hotend_threshold
+                                "HOTEND TEMPERATURE ALERT! Sensor: {}, Current: {}°C, Threshold: {}°C".format(
+                                    sensor_key, current_temp, state.threshold
                                 )
                             )
-                            self._trigger_emergency_shutdown("hotend", current_temp, hotend_threshold)
-                            self._hotend_threshold_exceeded = True
-                            self._logger.debug("Hotend threshold exceeded flag set to True")
-                        else:
-                            self._logger.debug("Hotend threshold already exceeded, skipping duplicate alert")
-                    elif current_temp is not None and current_temp <= hotend_threshold - 10:
+                            self._trigger_emergency_shutdown("hotend", current_temp, state.threshold, received,
+                                                             sensor_key=sensor_key)
+                            with self._state_lock:
+                                state.exceeded = True
+                            if debug:
+                                self._logger.debug("%s threshold exceeded flag set to True", sensor_key)
+                        elif debug:
+                            self._logger.debug("%s threshold already exceeded, skipping duplicate alert", sensor_key)
+                    elif current_temp is not None and current_temp <= state.reset_threshold:
                         # Reset flag if temperature drops significantly below threshold
-                        if self._hotend_threshold_exceeded:
-                            self._logger.debug("Hotend temperature dropped to {}°C, resetting threshold flag".format(
-                                current_temp
-                            ))
-                            self._hotend_threshold_exceeded = False
-                            self._logger.debug("Hotend threshold exceeded flag reset to False")
-
-        # Check heatbed temperature (support both "bed" and "B" formats)
-        bed_key = None
-        if "bed" in parsed_temperatures:
-            bed_key = "bed"
-        elif "B" in parsed_temperatures:
-            bed_key = "B"
-        
-        if bed_key:
-            self._logger.debug("Checking heatbed temperature")
-            temp_data = parsed_temperatures[bed_key]
-            if isinstance(temp_data, tuple) and len(temp_data) >= 2:
-                current_temp = temp_data[0]
-                # Update last data time if we got valid temperature data
-                if current_temp is not None:
-                    with self._state_lock:
+                        if state.exceeded:
+                            if debug:
+                                self._logger.debug("%s temperature dropped to %s°C, resetting threshold flag",
+                                                   sensor_key, current_temp)
+                            with self._state_lock:
+                                state.exceeded = False
+                            if debug:
+                                self._logger.debug("%s threshold exceeded flag reset to False", sensor_key)
+                    if state.rate is not None and current_temp is not None:
+                        self._check_heating_rate("hotend", sensor_key, state, current_temp, temp_data[1],
+                                                 received, guard_settings.max_heating_rate)
+
+            elif sensor_kind == SENSOR_HEATBED:
+                # Check heatbed temperature (support both "bed" and "B" formats)
+                if debug:
+                    self._logger.debug("Checking heatbed temperature")
+                if isinstance(temp_data, tuple) and len(temp_data) >= 2:
+                    current_temp = temp_data[0]
+                    state = sensor.state or guard_state.bind(sensor)
+                    # Update last data time if we got valid temperature data
+                    if current_temp is not None:
+                        self._metrics.observe_arrival(sensor_key, received)
+                        # Plain attribute stores need no lock; it is only taken when the warning is cleared
                         self._last_heatbed_data_time = current_time
-                        # Remove heatbed from warned sensors if it was warned about
+                        last_temperatures[sensor_key] = temp_data
+                        history.record(sensor, current_time, current_temp, temp_data[1])
+                        if escalation.watching:
+                            escalation.observe(sensor_key, received, current_temp)
                         if "heatbed" in self._warned_missing_sensors:
-                            self._warned_missing_sensors.discard("heatbed")
-                            self._logger.info("Heatbed temperature data resumed")
-                            # If no more sensors are being warned about, clear the warning state
-                            if not self._warned_missing_sensors:
-                                self._data_timeout_warning_sent = False
-                                # Notify frontend to dismiss the warning notification
-                                self._plugin_manager.send_plugin_message(
-                                    self._identifier,
-                                    dict(type="data_timeout_cleared")
-                                )
+                            self._clear_data_timeout_warning("heatbed")
                 
-                self._logger.debug("Heatbed current temperature: {}°C".format(current_temp))
-                if current_temp is not None and current_temp > heatbed_threshold:
-                    self._logger.debug("Heatbed temperature {} exceeds threshold {}".format(
-                        current_temp, heatbed_threshold
-                    ))
-                    if not self._heatbed_threshold_exceeded:
-                        self._logger.debug("Heatbed threshold flag not yet set, triggering alert")
-                        self._logger.warning(
-                            "HEATBED TEMPERATURE ALERT! Current: {}°C, Threshold: {}°C".format(
-                                current_temp, heatbed_threshold
+                    if debug:
+                        self._logger.debug("Heatbed current temperature: %s°C", current_temp)
+                    above = current_temp is not None and current_temp > state.threshold
+                    spike_filter = state.spike_filter
+                    if spike_filter is not None and current_temp is not None:
+                        # Isolated glitches above the threshold do not count until the filter confirms them
+                        filtered = spike_filter.push(current_temp, state.threshold)
+                        if debug and above and not filtered:
+                            self._logger.debug("%s reading %s°C above threshold held back by spike filter",
+                                               sensor_key, current_temp)
+                        above = filtered
+                    if above:
+                        if debug:
+                            self._logger.debug("Heatbed temperature %s exceeds threshold %s",
+                                               current_temp, state.threshold)
+                        if not state.exceeded:
+                            if debug:
+                                self._logger.debug("Heatbed threshold flag not yet set, triggering alert")
+                            self._logger.warning(
+                                "HEATBED TEMPERATURE ALERT! Current: {}°C, Threshold: {}°C".format(
+                                    current_temp, state.threshold
+                                )
                             )
-                        )
-                        self._trigger_emergency_shutdown("heatbed", current_temp, heatbed_threshold)
-                        self._heatbed_threshold_exceeded = True
-                        self._logger.debug("Heatbed threshold exceeded flag set to True")
-                    else:
-                        self._logger.debug("Heatbed threshold already exceeded, skipping duplicate alert")
-                elif current_temp is not None and current_temp <= heatbed_threshold - 10:
-                    # Reset flag if temperature drops significantly below threshold
-                    if self._heatbed_threshold_exceeded:
-                        self._logger.debug("Heatbed temperature dropped to {}°C, resetting threshold flag".format(
-                            current_temp
-                        ))
-                        self._heatbed_threshold_exceeded = False
-                        self._logger.debug("Heatbed threshold exceeded flag reset to False")
-
-        self._logger.debug("temperature_callback complete, returning parsed_temperatures")
+                            self._trigger_emergency_shutdown("heatbed", current_temp, state.threshold, received,
+                                                             sensor_key=sensor_key)
+                            with self._state_lock:
+                                state.exceeded = True
+                            if debug:
+                                self._logger.debug("Heatbed threshold exceeded flag set to True")
+                        elif debug:
+                            self._logger.debug("Heatbed threshold already exceeded, skipping duplicate alert")
+                    elif current_temp is not None and current_temp <= state.reset_threshold:
+                        # Reset flag if temperature drops significantly below threshold
+                        if state.exceeded:
+                            if debug:
+                                self._logger.debug("Heatbed temperature dropped to %s°C, resetting threshold flag",
+                                                   current_temp)
+                            with self._state_lock:
+                                state.exceeded = False
+                            if debug:
+                                self._logger.debug("Heatbed threshold exceeded flag reset to False")
+                    if state.rate is not None and current_temp is not None:
+                        self._check_heating_rate("heatbed", sensor_key, state, current_temp, temp_data[1],
+                                                 received, guard_settings.max_heating_rate)
+
+            elif sensor_kind != SENSOR_IGNORED:
+                # Chamber and probe are not guarded, but their readings are kept for the history
+                if isinstance(temp_data, tuple) and len(temp_data) >= 2 and temp_data[0] is not None:
+                    last_temperatures[sensor_key] = temp_data
+                    history.record(sensor, current_time, temp_data[0], temp_data[1])
+
+        if guard_rules is not None:
+            # Every rule is a single closure call over the readings updated above
+            tripped = guard_rules.evaluate(received)
+            if tripped is not None:
+                for rule in tripped:
+                    self._logger.warning("CUSTOM RULE ALERT! Rule {}: {}".format(rule.number, rule.source))
+                    self._trigger_emergency_shutdown("rule", None, None, received, rule=rule.source)
+
+        status_publisher = self._status_publisher
+        if status_publisher is not None:
+            status_publisher.mark()
+        if debug:
+            self._logger.debug("temperature_callback complete, returning parsed_temperatures")
+        self._metrics.observe_callback(time.perf_counter() - received)
         return parsed_temperatures
 
-    def _trigger_emergency_shutdown(self, sensor_type, current_temp, threshold):
+    def _check_heating_rate(self, sensor_type, sensor_key, state, current_temp, target, received, max_rate):
+        """
+        Rate-of-rise check for one reading: trips when the heater warms faster than
+        max_rate °C/s although its target has been steady for the whole window.
+        """
+        rate = state.update_rate(received, current_temp, target)
+        if rate is None:
+            return
+        if rate > max_rate:
+            if not state.rate_exceeded:
+                self._logger.warning(
+                    "{} HEATING RATE ALERT! Sensor: {}, Rate: {:.2f}°C/s, Maximum: {}°C/s, Current: {}°C".format(
+                        sensor_type.upper(), sensor_key, rate, max_rate, current_temp
+                    )
+                )
+                with self._state_lock:
+                    state.rate_exceeded = True
+                self._trigger_emergency_shutdown(sensor_type, current_temp, state.threshold, received,
+                                                 rate=rate, max_rate=max_rate, sensor_key=sensor_key)
+        elif state.rate_exceeded and rate < max_rate * RATE_REARM_FRACTION:
+            with self._state_lock:
+                state.rate_exceeded = False
+
+    def _trigger_emergency_shutdown(self, sensor_type, current_temp, threshold, detected_perf=None,
+                                    rate=None, max_rate=None, sensor_key=None, rule=None):
         """
         Trigger emergency shutdown when temperature threshold is exceeded.
+
+        This runs on the serial comm thread, so the incident is only handed to the
+        emergency executor. Before startup (or after shutdown) it is handled inline.
+        detected_perf is the time.perf_counter() value at which the offending sample
+        was received and serves as the reference for the termination latencies.
+        rate and max_rate are set when the heating rate, not the temperature, tripped.
+        sensor_key is the reported temperature key, recorded in the incident journal.
+        rule is the source of the custom rule that tripped, with sensor_type "rule".
+        """
+        self._logger.debug("_trigger_emergency_shutdown called for %s - temp: %s, threshold: %s",
+                           sensor_type, current_temp, threshold)
+        self._metrics.observe_trip(sensor_type, sensor_key)
+        incident = EmergencyIncident(sensor_type, current_temp, threshold, detected_perf, rate, max_rate,
+                                     sensor_key, rule)
+        if not self._emergency_executor.submit(incident):
+            self._handle_emergency(incident)
+        self._wake_fleet_reporter()
+
+    def _handle_emergency(self, incident):
         """
-        self._logger.debug("_trigger_emergency_shutdown called for {} - temp: {}, threshold: {}".format(
-            sensor_type, current_temp, threshold
+        Carry out the emergency shutdown for an incident.
+
+        The heaters are killed first. The frontend notification then runs in parallel
+        with the PSU shutdown, so a slow PSU plugin cannot delay the alert. The
+        outcome is recorded in the incident journal.
+        """
+        plan = self._get_emergency_plan()
+        termination_mode = plan.mode
+        self._logger.debug("Executing termination mode: %s", termination_mode)
+        errors = []
+
+        try:
+            if termination_mode == "gcode":
+                incident.run_step("gcode", self._execute_gcode_termination, plan, incident)
+            elif termination_mode == "psu":
+                incident.run_step("gcode", self._execute_heater_shutdown, plan, incident)
+        except Exception as e:
+            self._logger.error("Failed to send emergency GCode: {}".format(str(e)))
+            errors.append("gcode: {}".format(str(e)))
+
+        notification = self._emergency_executor.run_parallel(
+            incident.run_step, "notify", self._notify_emergency, incident
+        )
+
+        if termination_mode == "psu":
+            try:
+                incident.run_step("psu", self._execute_psu_power_off, plan, incident)
+            except Exception as e:
+                # Raised when the GCode fallback fails as well
+                self._logger.error("Failed to power off via PSU or GCode fallback: {}".format(str(e)))
+                errors.append("psu: {}".format(str(e)))
+        elif termination_mode != "gcode":
+            self._logger.error("Unknown termination mode: {}".format(termination_mode))
+            errors.append("unknown termination mode")
+
+        try:
+            notification.result()
+        except Exception as e:
+            self._logger.error("Failed to send temperature alert to frontend: {}".format(str(e)))
+            errors.append("notify: {}".format(str(e)))
+
+        self._metrics.observe_incident(incident)
+        self._journal.append(self._incident_record(incident, termination_mode, errors))
+        self._logger.info("Emergency shutdown for %s handled in: %s", incident.sensor_type, ", ".join(
+            "{} {:.1f} ms".format(name, duration) for name, duration in sorted(incident.step_durations().items())
         ))
-        self._logger.error(
-            "EMERGENCY SHUTDOWN TRIGGERED! {} temperature {} exceeded threshold {}".format(
-                sensor_type.upper(), current_temp, threshold
-            )
+
+        if plan.verification_window and termination_mode in ("gcode", "psu") and self._escalation.is_running:
+            self._escalation.begin(incident, termination_mode, plan.escalation_stages, plan.verification_window)
+
+    def _escalate_termination(self, verification, stage):
+        """Carry out the next termination stage for a heater that is not cooling down"""
+        plan = self._get_emergency_plan()
+        if stage == STAGE_PSU:
+            if plan.power_off is None:
+                raise Exception("No PSU turn off method resolved")
+            plan.power_off()
+        elif stage == STAGE_SECONDARY:
+            self._execute_secondary_power_off(plan)
+        self._logger.warning("Escalated termination for %s to %s", verification.sensor_key, stage)
+
+    def _execute_secondary_power_off(self, plan=None):
+        """Run the secondary power-off command, raising if it fails or times out"""
+        plan = plan or self._get_emergency_plan()
+        if not plan.secondary_power_off:
+            raise Exception("No secondary power-off command configured")
+        self._logger.info("Running secondary power-off command: %s", " ".join(plan.secondary_power_off))
+        import subprocess
+        result = subprocess.run(list(plan.secondary_power_off), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                timeout=SECONDARY_POWER_TIMEOUT)
+        if result.returncode != 0:
+            raise Exception("Secondary power-off command exited with {}: {}".format(
+                result.returncode, result.stdout.decode("utf-8", "replace").strip()))
+
+    def _on_verification_finished(self, verification):
+        """Journal the outcome of a termination check, alerting the frontend if all stages failed"""
+        self._journal.append(dict(
+            time=verification.transitions[-1]["time"],
+            type="termination_verification",
+            sensor=verification.incident.sensor_type,
+            sensor_key=verification.sensor_key,
+            temperature=verification.last_temp,
+            result=verification.state,
+            transitions=verification.transitions,
+        ))
+        if verification.state == STATE_NO_DATA:
+            message = "EMERGENCY: No {} temperature reported after every termination stage, " \
+                      "check that the heater is off! Last reading: {:.1f}°C".format(
+                          verification.incident.sensor_type.upper(), verification.last_temp)
+        elif verification.state != STATE_COOLING:
+            message = "EMERGENCY: {} temperature ({:.1f}°C) is not falling after every termination stage!".format(
+                verification.incident.sensor_type.upper(), verification.last_temp)
+        else:
+            return
+        self._plugin_manager.send_plugin_message(self._identifier, dict(
+            type="temperature_alert",
+            sensor=verification.incident.sensor_type,
+            current_temp=verification.last_temp,
+            threshold=verification.incident.threshold,
+            message=message
+        ))
+
+    @staticmethod
+    def _incident_record(incident, termination_mode, errors):
+        """Journal record for a handled incident, with step durations in milliseconds"""
+        record = dict(
+            time=incident.detected_at,
+            type="rule_alert" if incident.rule is not None else
+                 "temperature_alert" if incident.rate is None else "heating_rate_alert",
+            sensor=incident.sensor_type,
+            sensor_key=incident.sensor_key,
+            temperature=incident.current_temp,
+            threshold=incident.threshold,
+            mode=termination_mode,
+            steps=dict((name, round(duration, 3)) for name, duration in incident.step_durations().items()),
+            result="failed" if errors else "ok",
+            errors=errors,
         )
+        if incident.rate is not None:
+            record["rate"] = round(incident.rate, 3)
+            record["max_rate"] = incident.max_rate
+        if incident.rule is not None:
+            record["rule"] = incident.rule
+        return record
 
-        # Send alert to frontend
-        self._logger.debug("Sending temperature alert to frontend")
-        self._plugin_manager.send_plugin_message(
-            self._identifier,
-            dict(
-                type="temperature_alert",
-                sensor=sensor_type,
-                current_temp=current_temp,
-                threshold=threshold,
-                message="EMERGENCY: {} temperature ({:.1f}°C) exceeded threshold ({:.1f}°C)!".format(
+    def _notify_emergency(self, incident):
+        """
+        Log the emergency and send the alert to the frontend.
+        """
+        sensor_type = incident.sensor_type
+        current_temp = incident.current_temp
+        threshold = incident.threshold
+        alert = dict(
+            type="temperature_alert",
+            sensor=sensor_type,
+            current_temp=current_temp,
+            threshold=threshold,
+        )
+        if incident.rule is not None:
+            self._logger.error("EMERGENCY SHUTDOWN TRIGGERED! Custom rule: {}".format(incident.rule))
+            alert["rule"] = incident.rule
+            alert["message"] = "EMERGENCY: Custom rule triggered: {}".format(incident.rule)
+        elif incident.rate is None:
+            self._logger.error(
+                "EMERGENCY SHUTDOWN TRIGGERED! {} temperature {} exceeded threshold {}".format(
                     sensor_type.upper(), current_temp, threshold
                 )
             )
-        )
-
-        # Execute termination command
-        termination_mode = self._settings.get(["termination_mode"])
-        self._logger.debug("Executing termination mode: {}".format(termination_mode))
-
-        if termination_mode == "gcode":
-            self._execute_gcode_termination()
-        elif termination_mode == "psu":
-            self._execute_psu_termination()
+            alert["message"] = "EMERGENCY: {} temperature ({:.1f}°C) exceeded threshold ({:.1f}°C)!".format(
+                sensor_type.upper(), current_temp, threshold
+            )
         else:
-            self._logger.error("Unknown termination mode: {}".format(termination_mode))
+            self._logger.error(
+                "EMERGENCY SHUTDOWN TRIGGERED! {} heating at {:.2f}°C/s exceeded maximum rate {}°C/s at {}°C".format(
+                    sensor_type.upper(), incident.rate, incident.max_rate, current_temp
+                )
+            )
+            alert["rate"] = incident.rate
+            alert["max_rate"] = incident.max_rate
+            alert["message"] = "EMERGENCY: {} heating at {:.1f}°C/s with a steady target exceeded the maximum rate ({:.1f}°C/s)!".format(
+                sensor_type.upper(), incident.rate, incident.max_rate
+            )
+
+        # Send alert to frontend
+        self._logger.debug("Sending temperature alert to frontend")
+        self._plugin_manager.send_plugin_message(self._identifier, alert)
 
-    def _execute_gcode_termination(self):
+    def _execute_gcode_termination(self, plan=None, incident=None):
         """
-        Execute GCode termination commands.
+        Send the termination GCode of the emergency plan in a single batch,
+        ahead of the queued lines when handling an incident.
         """
-        termination_gcode = self._settings.get(["termination_gcode"])
+        plan = plan or self._get_emergency_plan()
         self._logger.debug("_execute_gcode_termination called")
-        self._logger.info("Executing GCode termination: {}".format(termination_gcode))
-
-        # Split by newlines and send each command
-        if termination_gcode:
-            commands = termination_gcode.split("\n")
-            self._logger.debug("Termination GCode split into {} commands".format(len(commands)))
-            for command in commands:
-                command = command.strip()
-                if command:
-                    self._logger.info("Sending emergency GCode: {}".format(command))
-                    self._printer.commands(command)
+        self._logger.info("Executing GCode termination: %s", ", ".join(plan.commands))
+
+        if plan.commands:
+            self._send_emergency_commands(plan.commands, plan, incident)
         self._logger.debug("GCode termination complete")
 
-    def _execute_psu_termination(self):
+    def _send_emergency_commands(self, commands, plan, incident):
+        """
+        Queue commands in one call. For an incident with priority sending, the
+        kill switch moves them ahead of whatever is queued already.
+        """
+        if incident is None or not plan.priority_send or \
+                not self._kill_switch.arm(commands, incident.detected_perf, self._on_kill_command_written):
+            self._printer.commands(list(commands))
+            return
+        try:
+            self._printer.commands(list(commands), tags={KILL_TAG})
+        except Exception:
+            self._kill_switch.disarm()
+            raise
+
+    def _on_kill_command_written(self, command, latency):
+        """Called on the comm thread once the first emergency command was written to the printer"""
+        self._metrics.observe_termination("serial_write", latency)
+        self._logger.info("Emergency GCode %s written to the printer %.1f ms after detection", command, latency * 1000.0)
+
+    def _execute_psu_termination(self, plan=None):
         """
-        Execute PSU control termination (turn off power).
+        Execute PSU control termination (turn off heaters, then turn off power).
         """
-        psu_plugin_name = self._settings.get(["psu_plugin_name"])
+        plan = plan or self._get_emergency_plan()
         self._logger.debug("_execute_psu_termination called")
-        self._logger.info("Attempting to turn off PSU via plugin: {}".format(psu_plugin_name))
+        try:
+            self._execute_heater_shutdown(plan)
+        except Exception as e:
+            # Still cut the power even if the heater commands could not be sent
+            self._logger.error("Failed to turn off heaters before PSU shutdown: {}".format(str(e)))
+        self._execute_psu_power_off(plan)
+
+    def _execute_heater_shutdown(self, plan=None, incident=None):
+        """
+        Turn off the heaters with GCode ahead of a PSU shutdown.
+        """
+        plan = plan or self._get_emergency_plan()
+        self._logger.debug("Turning off heaters before PSU shutdown")
+        self._send_emergency_commands(plan.heater_commands, plan, incident)
+
+    def _execute_psu_power_off(self, plan=None, incident=None):
+        """
+        Turn off power with the PSU control method resolved by the emergency plan,
+        falling back to GCode termination. For an incident the fallback goes through
+        the kill switch, which the heater commands may still be holding armed.
+        """
+        plan = plan or self._get_emergency_plan()
+        self._logger.info("Attempting to turn off PSU via plugin: %s", plan.psu_plugin_name)
 
-        # Try to send turn off command via PSU control plugin
         try:
-            # First, try to turn off heaters with GCode
-            self._logger.debug("Turning off heaters before PSU shutdown")
-            self._printer.commands("M104 S0")  # Turn off hotend
-            self._printer.commands("M140 S0")  # Turn off bed
-
-            # Try to access PSU control plugin and call its turn_psu_off method
-            self._logger.debug("Looking up PSU plugin: {}".format(psu_plugin_name))
-            psu_plugin = self._plugin_manager.get_plugin_info(psu_plugin_name)
-            if psu_plugin and psu_plugin.implementation:
-                self._logger.debug("PSU plugin found, checking for turn off methods")
-                # Try different methods that PSU control plugins might use
-                if hasattr(psu_plugin.implementation, 'turn_psu_off'):
-                    self._logger.info("Calling turn_psu_off method")
-                    psu_plugin.implementation.turn_psu_off()
-                elif hasattr(psu_plugin.implementation, 'turnPSUOff'):
-                    self._logger.info("Calling turnPSUOff method")
-                    psu_plugin.implementation.turnPSUOff()
-                else:
-                    self._logger.warning("PSU plugin found but no turn off method available")
-                    raise Exception("No turn off method found in PSU plugin")
-                
-                self._logger.info("PSU shutdown command sent successfully")
-            else:
-                self._logger.error("PSU control plugin '{}' not found or not loaded".format(psu_plugin_name))
-                raise Exception("PSU plugin not found")
-                
+            if plan.power_off is None:
+                # Reported when the plan was compiled
+                raise Exception("No PSU turn off method resolved")
+            plan.power_off()
+            self._logger.info("PSU shutdown command sent successfully")
         except Exception as e:
             self._logger.error("Failed to execute PSU termination: {}".format(str(e)))
             # Fallback to GCode termination
             self._logger.warning("Falling back to GCode termination")
-            self._execute_gcode_termination()
+            self._execute_gcode_termination(plan, incident)
         
         self._logger.debug("PSU termination process complete")
 
+    ##~~ GCode hooks
+
+    def gcode_queuing_hook(self, comm_instance, phase, cmd, cmd_type, gcode, subcode=None, tags=None,
+                           *args, **kwargs):
+        """Holds back new lines while the emergency GCode is being sent"""
+        return self._kill_switch.on_queuing(cmd, tags)
+
+    def gcode_sending_hook(self, comm_instance, phase, cmd, cmd_type, gcode, subcode=None, tags=None,
+                           *args, **kwargs):
+        """Puts the emergency GCode in place of the next line to be sent"""
+        return self._kill_switch.on_sending(cmd, tags)
+
+    def gcode_sent_hook(self, comm_instance, phase, cmd, cmd_type, gcode, subcode=None, tags=None,
+                        *args, **kwargs):
+        """Measures when the emergency GCode reached the printer"""
+        self._kill_switch.on_sent(cmd)
+
     ##~~ Softwareupdate hook
 
     def get_update_information(self):
@@ -516,9 +1268,6 @@ class OctoFireGuardPlugin(octoprint.plugin.SettingsPlugin,
         )
 
 
-__plugin_implementation__ = OctoFireGuardPlugin()
-
-
 def __plugin_load__():
     global __plugin_implementation__
     __plugin_implementation__ = OctoFireGuardPlugin()
@@ -526,5 +1275,9 @@ def __plugin_load__():
     global __plugin_hooks__
     __plugin_hooks__ = {
         "octoprint.plugin.softwareupdate.check_config": __plugin_implementation__.get_update_information,
-        "octoprint.comm.protocol.temperatures.received": __plugin_implementation__.temperature_callback
+        "octoprint.comm.protocol.temperatures.received": __plugin_implementation__.temperature_callback,
+        # Run first, so other plugins see the emergency GCode rather than the lines it replaces
+        "octoprint.comm.protocol.gcode.queuing": (__plugin_implementation__.gcode_queuing_hook, 1),
+        "octoprint.comm.protocol.gcode.sending": (__plugin_implementation__.gcode_sending_hook, 1),
+        "octoprint.comm.protocol.gcode.sent": __plugin_implementation__.gcode_sent_hook
     }
@@ -0,0 +1,459 @@
+# coding=utf-8
+"""
+Standalone fleet aggregator for Octo Fire Guard.
+
+Every OctoPrint instance with fleet reporting enabled streams its guard
+state to this daemon, which evaluates the whole fleet at once and serves a
+single JSON summary over HTTP:
+
+    python -m octoprint_octo_fire_guard.aggregator --listen 0.0.0.0:8765 --http 127.0.0.1:8766
+
+Run with --simulate N to try it out locally with N simulated printers.
+numpy is used for the fleet-wide evaluation when it is installed.
+
+The aggregator does not use OctoPrint itself, but it ships in the plugin
+package, whose __init__ imports OctoPrint, so it runs in an environment with
+OctoPrint installed (the plugin package cannot be installed without it).
+"""
+from __future__ import absolute_import
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .fleet import PROTOCOL_VERSION, encode_message, parse_address
+from .sensors import SensorRegistry, SENSOR_HOTEND, SENSOR_HEATBED
+
+# A printer whose last message is older than this is reported as stale
+DEFAULT_STALE_AFTER = 15.0
+# A heater within this many °C of its threshold is reported as near the threshold
+DEFAULT_NEAR_MARGIN = 10.0
+# A heater this many °C above a non-zero target is reported as overshooting
+DEFAULT_OVERSHOOT = 15.0
+MAX_LINE_LENGTH = 64 * 1024
+# Room for a whole fleet reconnecting at once, e.g. after the aggregator restarts
+LISTEN_BACKLOG = 1024
+
+_NAN = float("nan")
+
+# Per-printer columns evaluated across the fleet
+_COLUMNS = ("hotend_temp", "hotend_target", "hotend_threshold", "bed_temp", "bed_target", "bed_threshold",
+            "updated", "alert", "timeout", "connected")
+
+logger = logging.getLogger("octoprint.plugins.octo_fire_guard.aggregator")
+
+
+class FleetTable(object):
+    """
+    Guard state of every printer in the fleet, stored column-wise.
+
+    Each printer owns one slot in a set of array('d') columns. evaluate()
+    then runs every check over whole columns: with numpy through zero-copy
+    views of the arrays, without it as plain loops. Slots are kept when a
+    printer disconnects, so a printer that went away is reported as stale
+    instead of vanishing from the summary.
+    """
+
+    def __init__(self):
+        self.slots = {}  # Printer id -> slot
+        self.ids = []  # Slot -> printer id
+        self.temps = []  # Slot -> {key: [actual, target]}
+        self.columns = dict((name, array("d")) for name in _COLUMNS)
+        self._sensor_registry = SensorRegistry()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def slot(self, printer_id):
+        """Slot of a printer, allocated on first sight"""
+        slot = self.slots.get(printer_id)
+        if slot is None:
+            slot = self.slots[printer_id] = len(self.ids)
+            self.ids.append(printer_id)
+            self.temps.append({})
+            for column in self.columns.values():
+                column.append(_NAN)
+            self.columns["alert"][slot] = 0.0
+            self.columns["timeout"][slot] = 0.0
+        return slot
+
+    def set_connected(self, slot, connected):
+        self.columns["connected"][slot] = 1.0 if connected else 0.0
+
+    def apply(self, slot, delta, received=None):
+        """
+        Merge a state delta from the stream into a printer's slot. Fields and
+        readings of the wrong type are left out; returns their names.
+        """
+        columns = self.columns
+        columns["updated"][slot] = time.monotonic() if received is None else received
+        malformed = []
+
+        thresholds = delta.get("thresholds")
+        if not isinstance(thresholds, (dict, type(None))):
+            malformed.append("thresholds")
+        elif thresholds:
+            if "hotend" in thresholds:
+                columns["hotend_threshold"][slot] = _to_float(thresholds["hotend"])
+            if "heatbed" in thresholds:
+                columns["bed_threshold"][slot] = _to_float(thresholds["heatbed"])
+        if "alert" in delta:
+            alert = delta["alert"]
+            if isinstance(alert, (dict, type(None))):
+                columns["alert"][slot] = 1.0 if any((alert or {}).values()) else 0.0
+            else:
+                malformed.append("alert")
+        if "timeout" in delta:
+            columns["timeout"][slot] = 1.0 if delta["timeout"] else 0.0
+
+        changed = delta.get("temps")
+        if not isinstance(changed, (dict, type(None))):
+            malformed.append("temps")
+        elif changed:
+            temps = self.temps[slot]
+            for key, reading in changed.items():
+                if reading is None:
+                    temps.pop(key, None)
+                elif isinstance(reading, list) and reading:
+                    temps[key] = reading
+                else:
+                    malformed.append("temps." + key)
+            self._update_temperatures(slot, temps)
+        return malformed
+
+    def _update_temperatures(self, slot, temps):
+        """Reduce a printer's readings to its hottest hotend and its heatbed"""
+        hotend = bed = None
+        for key, reading in temps.items():
+            kind = self._sensor_registry[key].kind
+            if kind == SENSOR_HOTEND:
+                if hotend is None or _to_float(reading[0]) > _to_float(hotend[0]):
+                    hotend = reading
+            elif kind == SENSOR_HEATBED:
+                bed = reading
+        columns = self.columns
+        columns["hotend_temp"][slot], columns["hotend_target"][slot] = _reading(hotend)
+        columns["bed_temp"][slot], columns["bed_target"][slot] = _reading(bed)
+
+    def evaluate(self, stale_after=DEFAULT_STALE_AFTER, near_margin=DEFAULT_NEAR_MARGIN,
+                 overshoot=DEFAULT_OVERSHOOT, now=None):
+        """
+        Fleet-wide checks, as lists of printer ids per finding: alert
+        (reported by the plugin), over_threshold, near_threshold, overshoot,
+        timeout, stale and disconnected.
+        """
+        now = time.monotonic() if now is None else now
+        if not self.ids:
+            return dict((name, []) for name in _FINDINGS)
+        if numpy is not None:
+            flags = self._evaluate_numpy(now, stale_after, near_margin, overshoot)
+        else:
+            flags = self._evaluate_python(now, stale_after, near_margin, overshoot)
+        ids = self.ids
+        return dict((name, [ids[slot] for slot in slots]) for name, slots in flags.items())
+
+    def _evaluate_numpy(self, now, stale_after, near_margin, overshoot):
+        count = len(self.ids)
+        c = dict((name, numpy.frombuffer(column, dtype=numpy.float64, count=count))
+                 for name, column in self.columns.items())
+        # Comparisons against NaN (no reading yet) are False, so missing data never raises a finding
+        with numpy.errstate(invalid="ignore"):
+            over = (c["hotend_temp"] > c["hotend_threshold"]) | (c["bed_temp"] > c["bed_threshold"])
+            near = ~over & ((c["hotend_temp"] > c["hotend_threshold"] - near_margin) |
+                            (c["bed_temp"] > c["bed_threshold"] - near_margin))
+            hot = ((c["hotend_target"] > 0) & (c["hotend_temp"] > c["hotend_target"] + overshoot)) | \
+                  ((c["bed_target"] > 0) & (c["bed_temp"] > c["bed_target"] + overshoot))
+            stale = (now - c["updated"]) > stale_after
+        flags = dict(
+            alert=c["alert"] > 0,
+            over_threshold=over,
+            near_threshold=near,
+            overshoot=hot,
+            timeout=c["timeout"] > 0,
+            stale=stale,
+            disconnected=c["connected"] == 0,
+        )
+        return dict((name, numpy.flatnonzero(flags[name]).tolist()) for name in _FINDINGS)
+
+    def _evaluate_python(self, now, stale_after, near_margin, overshoot):
+        c = self.columns
+        flags = dict((name, []) for name in _FINDINGS)
+        for slot in range(len(self.ids)):
+            hotend_temp, hotend_threshold = c["hotend_temp"][slot], c["hotend_threshold"][slot]
+            bed_temp, bed_threshold = c["bed_temp"][slot], c["bed_threshold"][slot]
+            hotend_target, bed_target = c["hotend_target"][slot], c["bed_target"][slot]
+            # As with numpy, every comparison involving NaN is False
+            over = hotend_temp > hotend_threshold or bed_temp > bed_threshold
+            if c["alert"][slot] > 0:
+                flags["alert"].append(slot)
+            if over:
+                flags["over_threshold"].append(slot)
+            elif hotend_temp > hotend_threshold - near_margin or bed_temp > bed_threshold - near_margin:
+                flags["near_threshold"].append(slot)
+            if (hotend_target > 0 and hotend_temp > hotend_target + overshoot) or \
+                    (bed_target > 0 and bed_temp > bed_target + overshoot):
+                flags["overshoot"].append(slot)
+            if c["timeout"][slot] > 0:
+                flags["timeout"].append(slot)
+            if now - c["updated"][slot] > stale_after:
+                flags["stale"].append(slot)
+            if c["connected"][slot] == 0:
+                flags["disconnected"].append(slot)
+        return flags
+
+    def printer_summary(self, slot):
+        c = self.columns
+        return dict(
+            hotend=_summary_reading(c["hotend_temp"][slot], c["hotend_target"][slot], c["hotend_threshold"][slot]),
+            heatbed=_summary_reading(c["bed_temp"][slot], c["bed_target"][slot], c["bed_threshold"][slot]),
+            alert=c["alert"][slot] > 0,
+            timeout=c["timeout"][slot] > 0,
+            connected=c["connected"][slot] > 0,
+        )
+
+
+_FINDINGS = ("alert", "over_threshold", "near_threshold", "overshoot", "timeout", "stale", "disconnected")
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+def _reading(reading):
+    if reading is None:
+        return _NAN, _NAN
+    return _to_float(reading[0]), _to_float(reading[1]) if len(reading) > 1 else _NAN
+
+
+def _summary_reading(temp, target, threshold):
+    return [None if math.isnan(value) else value for value in (temp, target, threshold)]
+
+
+class FleetAggregator(object):
+    """
+    asyncio server that ingests guard state streams from many plugins.
+
+    Each connection is one printer: a hello line naming it, then one JSON
+    delta per line (see fleet.FleetReporter). All streams are handled on a
+    single event loop and only merge their deltas into the FleetTable, so
+    hundreds of printers cost one coroutine each. The summary is evaluated
+    on request and served as JSON by GET /summary on the HTTP listener.
+    """
+
+    def __init__(self, stale_after=DEFAULT_STALE_AFTER, near_margin=DEFAULT_NEAR_MARGIN,
+                 overshoot=DEFAULT_OVERSHOOT):
+        self.table = FleetTable()
+        self.stale_after = stale_after
+        self.near_margin = near_margin
+        self.overshoot = overshoot
+        self.messages = 0
+        self._servers = []
+        self._connections = {}  # Writer -> handler task of every open stream
+
+    async def listen(self, address):
+        """Accept plugin streams on a unix:/path or host:port address; returns the asyncio server"""
+        return await self._serve(self._handle_stream, address)
+
+    async def listen_http(self, address):
+        """Serve the summary over HTTP on a unix:/path or host:port address"""
+        return await self._serve(self._handle_http, address)
+
+    async def _serve(self, handler, address):
+        family, target = parse_address(address)
+        if family == "unix":
+            if os.path.exists(target):
+                os.unlink(target)
+            server = await asyncio.start_unix_server(handler, path=target, limit=MAX_LINE_LENGTH,
+                                                    backlog=LISTEN_BACKLOG)
+        else:
+            server = await asyncio.start_server(handler, target[0], target[1], limit=MAX_LINE_LENGTH,
+                                               backlog=LISTEN_BACKLOG)
+        self._servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+        connections = list(self._connections.items())
+        for writer, _ in connections:
+            writer.close()
+        # Closing a stream ends its handler; wait for them so none is left to be cancelled
+        await asyncio.gather(*(task for _, task in connections), return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+
+    async def _handle_stream(self, reader, writer):
+        self._connections[writer] = asyncio.current_task()
+        slot = None
+        peer = writer.get_extra_info("peername")
+        try:
+            hello = await reader.readline()
+            message = json.loads(hello.decode("utf-8")) if hello else {}
+            if not isinstance(message, dict) or message.get("hello") != PROTOCOL_VERSION or not message.get("id"):
+                logger.warning("Rejected stream from %s: bad hello %r", peer, hello[:200])
+                return
+            slot = self.table.slot(str(message["id"]))
+            self.table.set_connected(slot, True)
+            logger.info("Printer %s connected from %s", message["id"], peer)
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    delta = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    logger.warning("Dropping malformed message from %s", self.table.ids[slot])
+                    continue
+                if isinstance(delta, dict):
+                    malformed = self.table.apply(slot, delta)
+                    if malformed:
+                        logger.warning("Ignoring malformed %s from %s", ", ".join(malformed), self.table.ids[slot])
+                    self.messages += 1
+        except (ConnectionError, ValueError, asyncio.LimitOverrunError) as e:
+            logger.info("Stream from %s ended: %s", peer, e)
+        finally:
+            if slot is not None:
+                self.table.set_connected(slot, False)
+            self._connections.pop(writer, None)
+            writer.close()
+
+    def summary(self, now=None):
+        findings = self.table.evaluate(self.stale_after, self.near_margin, self.overshoot, now)
+        table = self.table
+        return dict(
+            printers=len(table),
+            connected=sum(1 for value in table.columns["connected"] if value > 0),
+            messages=self.messages,
+            evaluated_with="numpy" if numpy is not None else "python",
+            findings=findings,
+            status=dict((printer_id, table.printer_summary(slot)) for printer_id, slot in table.slots.items()),
+        )
+
+    async def _handle_http(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            # Skip the headers
+            while True:
+                line = await reader.readline()
+                if not line or line in (b"\r\n", b"\n"):
+                    break
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/summary"):
+                status, body = "200 OK", json.dumps(self.summary()).encode("utf-8")
+            else:
+                status, body = "404 Not Found", b'{"error":"not found"}'
+            writer.write("HTTP/1.0 {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n".format(
+                status, len(body)).encode("latin-1") + body)
+            await writer.drain()
+        except (ConnectionError, ValueError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+
+async def simulate_printer(address, printer_id, duration, interval=1.0, hotend_target=210.0, runaway=False):
+    """
+    Simulated plugin client for local testing: streams a printer holding its
+    targets, or with runaway=True a hotend that keeps heating past its target.
+    """
+    family, target = parse_address(address)
+    if family == "unix":
+        reader, writer = await asyncio.open_unix_connection(target)
+    else:
+        reader, writer = await asyncio.open_connection(target[0], target[1])
+    writer.write(encode_message(dict(hello=PROTOCOL_VERSION, id=printer_id)))
+    writer.write(encode_message(dict(s=0, t=time.time(), thresholds=dict(hotend=250.0, heatbed=100.0),
+                                     alert=dict(hotend=False, heatbed=False), timeout=[])))
+    rng = random.Random(printer_id)
+    hotend = hotend_target
+    sequence = 0
+    deadline = time.monotonic() + duration
+    try:
+        while time.monotonic() < deadline:
+            sequence += 1
+            hotend = hotend + 3.0 if runaway else hotend_target + rng.uniform(-1.0, 1.0)
+            writer.write(encode_message(dict(s=sequence, t=time.time(), temps=dict(
+                tool0=[round(hotend, 1), hotend_target], bed=[round(60.0 + rng.uniform(-0.5, 0.5), 1), 60.0]))))
+            await writer.drain()
+            await asyncio.sleep(interval)
+    finally:
+        writer.close()
+
+
+async def _main(args):
+    aggregator = FleetAggregator(args.stale_after, args.near_margin, args.overshoot)
+    bound = []
+    for address in args.listen:
+        server = await aggregator.listen(address)
+        if parse_address(address)[0] == "tcp":
+            # Resolves port 0 to the port actually bound
+            address = "{}:{}".format(*server.sockets[0].getsockname()[:2])
+        bound.append(address)
+        logger.info("Listening for plugin streams on %s", address)
+    if args.http:
+        server = await aggregator.listen_http(args.http)
+        address = args.http
+        if parse_address(address)[0] == "tcp":
+            address = "{}:{}".format(*server.sockets[0].getsockname()[:2])
+        logger.info("Serving the fleet summary on http://%s/summary", address)
+
+    tasks = []
+    if args.simulate:
+        for index in range(args.simulate):
+            tasks.append(asyncio.ensure_future(simulate_printer(
+                bound[0], "simulated-{}".format(index), args.duration,
+                runaway=(index == 0),
+            )))
+    try:
+        if tasks:
+            await asyncio.gather(*tasks)
+            print(json.dumps(aggregator.summary()["findings"], indent=2))
+        else:
+            while True:
+                await asyncio.sleep(3600)
+    finally:
+        await aggregator.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fleet aggregator for Octo Fire Guard")
+    parser.add_argument("--listen", action="append", default=None,
+                        help="unix:/path or host:port to accept plugin streams on (repeatable; "
+                             "default: 127.0.0.1:8765)")
+    parser.add_argument("--http", default="127.0.0.1:8766", help="host:port for the summary endpoint")
+    parser.add_argument("--stale-after", type=float, default=DEFAULT_STALE_AFTER,
+                        help="seconds without a message before a printer is stale")
+    parser.add_argument("--near-margin", type=float, default=DEFAULT_NEAR_MARGIN,
+                        help="°C below a threshold that count as near it")
+    parser.add_argument("--overshoot", type=float, default=DEFAULT_OVERSHOOT,
+                        help="°C above a non-zero target that count as overshooting")
+    parser.add_argument("--simulate", type=int, default=0, metavar="N",
+                        help="stream N simulated printers (one running away) and print the findings")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run the simulation for")
+    args = parser.parse_args(argv)
+    args.listen = args.listen or ["127.0.0.1:8765"]
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
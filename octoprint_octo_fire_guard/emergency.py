@@ -0,0 +1,128 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class EmergencyIncident(object):
+    """
+    A detected threshold breach together with the timing of every step
+    taken to handle it. Step timestamps come from time.perf_counter() so
+    they can be compared with the detection timestamp.
+
+    Incidents raised by the rate-of-rise check also carry the measured
+    heating rate and the configured limit, both in °C/s. sensor_key is the
+    reported temperature key (e.g. tool1) when it is known. Incidents raised
+    by a custom rule carry its source as rule, without a temperature.
+    """
+    __slots__ = ("sensor_type", "sensor_key", "current_temp", "threshold", "rate", "max_rate", "rule",
+                 "detected_at", "detected_perf", "steps")
+
+    def __init__(self, sensor_type, current_temp, threshold, detected_perf=None, rate=None, max_rate=None,
+                 sensor_key=None, rule=None):
+        self.sensor_type = sensor_type
+        self.sensor_key = sensor_key
+        self.rule = rule
+        self.current_temp = current_temp
+        self.threshold = threshold
+        self.rate = rate
+        self.max_rate = max_rate
+        self.detected_at = time.time()
+        self.detected_perf = detected_perf if detected_perf is not None else time.perf_counter()
+        self.steps = {}
+
+    def run_step(self, name, func, *args):
+        """Run func(*args) and record when it started and finished under name"""
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.steps[name] = (started, time.perf_counter())
+
+    def step_durations(self):
+        """Duration of every recorded step in milliseconds"""
+        return dict((name, (finished - started) * 1000.0) for name, (started, finished) in self.steps.items())
+
+
+class EmergencyExecutor(object):
+    """
+    Dedicated worker that handles emergency shutdowns off the serial comm thread.
+
+    submit() only appends the incident to a queue, so the temperature callback
+    hands work over in O(1) and keeps processing serial data no matter how
+    long the termination steps take. A second, pre-started lane lets steps
+    that do not depend on each other run in parallel.
+    """
+
+    def __init__(self, handler, name="octo_fire_guard.emergency"):
+        self._handler = handler
+        self._logger = None
+        self._name = name
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._parallel_lane = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None
+
+    def start(self, logger):
+        if self._thread is not None:
+            return
+        self._logger = logger
+        self._parallel_lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self._name + ".parallel")
+        # Spawn the lane's worker now rather than in the middle of an emergency
+        self._parallel_lane.submit(lambda: None).result()
+        self._thread = threading.Thread(target=self._run, name=self._name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the worker once incidents that are already queued have been handled"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+        self._parallel_lane.shutdown(wait=False)
+        self._parallel_lane = None
+
+    def submit(self, incident):
+        """Queue an incident for the worker; returns False if the worker is not running"""
+        if self._thread is None:
+            return False
+        self._queue.put(incident)
+        return True
+
+    def run_parallel(self, func, *args):
+        """
+        Run func(*args) on the parallel lane and return a Future for it.
+        Without a running lane the function runs inline.
+        """
+        lane = self._parallel_lane
+        if lane is not None:
+            try:
+                return lane.submit(func, *args)
+            except RuntimeError:
+                # Lane shut down concurrently, fall through to running inline
+                pass
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _run(self):
+        while True:
+            incident = self._queue.get()
+            if incident is None:
+                return
+            try:
+                self._handler(incident)
+            except Exception:
+                self._logger.exception("Error while handling emergency shutdown for %s", incident.sensor_type)
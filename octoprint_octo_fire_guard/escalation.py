@@ -0,0 +1,190 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+import time
+
+from .rate import SlopeEstimator
+from .watchdog import DeadlineScheduler
+
+# Termination stages, in the order they are escalated through
+STAGE_GCODE = "gcode"
+STAGE_PSU = "psu"
+STAGE_SECONDARY = "secondary"
+
+# Verification states
+STATE_VERIFYING = "verifying"  # Waiting for the window to end after a stage was carried out
+STATE_ESCALATING = "escalating"  # Still heating, carrying out the next stage
+STATE_COOLING = "cooling"  # Falling trend seen, done
+STATE_EXHAUSTED = "exhausted"  # Still heating with no stage left, done
+STATE_NO_DATA = "no_data"  # No readings in the last window with no stage left, done
+
+DEFAULT_VERIFICATION_WINDOW = 30.0
+MIN_VERIFICATION_WINDOW = 2.0
+# Samples the trend of a window is estimated over; older samples of a long window drop out
+TREND_SAMPLES = 32
+
+
+class Verification(object):
+    """
+    Post-trip check of one sensor: the stages that were carried out, the
+    samples of the current window and every state transition with its time.
+    """
+    __slots__ = ("incident", "sensor_key", "stages", "stage", "state", "trend", "last_temp", "transitions")
+
+    def __init__(self, incident, stage, stages):
+        self.incident = incident
+        self.sensor_key = incident.sensor_key
+        self.stages = list(stages)  # Stages left to escalate to
+        self.stage = stage
+        self.state = None
+        self.trend = SlopeEstimator(TREND_SAMPLES)
+        self.last_temp = incident.current_temp
+        self.transitions = []
+
+    @property
+    def finished(self):
+        return self.state in (STATE_COOLING, STATE_EXHAUSTED, STATE_NO_DATA)
+
+
+class EscalationMonitor(object):
+    """
+    Verifies that tripped heaters actually cool down, escalating if they do not.
+
+    After an emergency, begin() starts a verification window for the tripped
+    sensor. The comm thread feeds the sensor's readings in through observe(),
+    which only pushes them into a fixed-size slope estimator. A
+    DeadlineScheduler wakes up once the window is over instead of polling:
+
+    - falling trend (negative least-squares slope): the sensor is cooling,
+      verification ends
+    - rising or flat trend, or no readings at all: the next stage is carried
+      out through escalate(verification, stage) and a new window starts
+    - no stage left: verification ends as exhausted, or as no data if the
+      last window had no readings
+
+    Every transition is logged and kept with its time on the verification,
+    which is handed to finished(verification) at the end.
+    """
+
+    def __init__(self, escalate, finished, name="octo_fire_guard.escalation"):
+        self._escalate = escalate
+        self._finished = finished
+        self._logger = None
+        self._lock = threading.Lock()
+        self._scheduler = DeadlineScheduler(self._on_deadline, name=name)
+        self._verifications = {}
+        self._windows = {}
+
+    @property
+    def is_running(self):
+        return self._scheduler.is_running
+
+    @property
+    def watching(self):
+        """True while any sensor is being verified"""
+        return bool(self._verifications)
+
+    def start(self, logger):
+        self._logger = logger
+        self._scheduler.start(logger)
+
+    def stop(self, timeout=5.0):
+        self._scheduler.stop(timeout)
+
+    def get(self, sensor_key):
+        return self._verifications.get(sensor_key)
+
+    def begin(self, incident, stage, stages, window):
+        """
+        Start verifying incident's sensor after stage was carried out, with
+        stages left to escalate to. Returns the verification, or None if the
+        sensor is unknown or already being verified.
+        """
+        if incident.sensor_key is None:
+            return None
+        with self._lock:
+            if incident.sensor_key in self._verifications:
+                return None
+            verification = Verification(incident, stage, stages)
+            verification.trend.push(incident.detected_perf, incident.current_temp)
+            self._verifications[incident.sensor_key] = verification
+            self._windows[incident.sensor_key] = window
+        self._transition(verification, STATE_VERIFYING)
+        self._scheduler.arm(incident.sensor_key, window)
+        return verification
+
+    def observe(self, sensor_key, timestamp, temperature):
+        """Record a reading of a sensor under verification; called on the comm thread"""
+        verification = self._verifications.get(sensor_key)
+        if verification is None:
+            return
+        with self._lock:
+            verification.trend.push(timestamp, temperature)
+            verification.last_temp = temperature
+
+    def cancel_all(self):
+        with self._lock:
+            self._verifications.clear()
+            self._windows.clear()
+        self._scheduler.cancel_all()
+
+    def _on_deadline(self, sensor_key):
+        with self._lock:
+            verification = self._verifications.get(sensor_key)
+            if verification is None:
+                return
+            slope = verification.trend.slope()
+            # Restart the trend from the latest reading for the next window
+            verification.trend.clear()
+            verification.trend.push(time.perf_counter(), verification.last_temp)
+
+        if slope is not None and slope < 0:
+            self._transition(verification, STATE_COOLING, slope)
+            self._finish(verification)
+            return
+        if not verification.stages:
+            self._transition(verification, STATE_EXHAUSTED if slope is not None else STATE_NO_DATA, slope)
+            self._finish(verification)
+            return
+
+        stage = verification.stages.pop(0)
+        verification.stage = stage
+        self._transition(verification, STATE_ESCALATING, slope)
+        try:
+            self._escalate(verification, stage)
+        except Exception as e:
+            self._logger.error("Escalation to {} for {} failed: {}".format(stage, sensor_key, str(e)))
+        self._transition(verification, STATE_VERIFYING)
+        self._scheduler.arm(sensor_key, self._windows[sensor_key])
+
+    def _transition(self, verification, state, slope=None):
+        previous = verification.state
+        verification.state = state
+        now = time.time()
+        verification.transitions.append(dict(
+            time=round(now, 3),
+            state=state,
+            stage=verification.stage,
+            temperature=verification.last_temp,
+            slope=None if slope is None else round(slope, 4),
+        ))
+        log = self._logger.error if state in (STATE_ESCALATING, STATE_EXHAUSTED, STATE_NO_DATA) else self._logger.info
+        if state == STATE_VERIFYING:
+            trend = ""
+        else:
+            trend = ", trend: " + ("no readings" if slope is None else "{:+.2f}°C/s".format(slope))
+        log("Termination check for {}: {} -> {} at {} (stage: {}, temperature: {}°C{})".format(
+            verification.sensor_key, previous or "tripped", state,
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)) + ".{:03d}".format(int(now * 1000) % 1000),
+            verification.stage, verification.last_temp, trend
+        ))
+
+    def _finish(self, verification):
+        with self._lock:
+            self._verifications.pop(verification.sensor_key, None)
+            self._windows.pop(verification.sensor_key, None)
+        try:
+            self._finished(verification)
+        except Exception:
+            self._logger.exception("Error while finishing termination check for %s", verification.sensor_key)
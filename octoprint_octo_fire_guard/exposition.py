@@ -0,0 +1,102 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import math
+import threading
+import time
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = "octo_fire_guard_"
+
+
+def format_value(value):
+    """A sample value as the exposition format writes it"""
+    if value is True or value is False:
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, _escape(value)) for name, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class ExpositionWriter(object):
+    """
+    Builds a text exposition one metric family at a time. Names are given
+    without the octo_fire_guard_ prefix and labels as (name, value) pairs.
+    """
+
+    def __init__(self):
+        self._lines = []
+
+    def family(self, name, kind, description, samples):
+        """A gauge or counter family from (labels, value) samples; value None leaves a sample out"""
+        name = METRIC_PREFIX + name
+        lines = self._lines
+        lines.append("# HELP {} {}".format(name, description))
+        lines.append("# TYPE {} {}".format(name, kind))
+        for labels, value in samples:
+            if value is not None:
+                lines.append("{}{} {}".format(name, format_labels(labels), format_value(value)))
+
+    def histogram(self, name, description, histogram, labels=()):
+        """A LatencyHistogram as a histogram family with cumulative buckets"""
+        name = METRIC_PREFIX + name
+        lines = self._lines
+        lines.append("# HELP {} {}".format(name, description))
+        lines.append("# TYPE {} histogram".format(name))
+        # Copied first, as the comm thread may be recording into the histogram
+        counts, count, total = list(histogram.counts), histogram.count, histogram.total
+        cumulative = 0
+        for upper, bucket in zip(histogram.bounds + (float("inf"),), counts):
+            cumulative += bucket
+            lines.append("{}_bucket{} {}".format(
+                name, format_labels(tuple(labels) + (("le", format_value(upper)),)), cumulative))
+        lines.append("{}_sum{} {}".format(name, format_labels(labels), format_value(total)))
+        lines.append("{}_count{} {}".format(name, format_labels(labels), count))
+
+    def getvalue(self):
+        return "\n".join(self._lines) + "\n"
+
+
+class MetricsExposition(object):
+    """
+    Scrape endpoint body, rendered only when scraped.
+
+    render is called with the current time and returns the exposition text.
+    The body is cached for the rest of the wall-clock second it was rendered
+    in, so concurrent scrapes, or several Prometheus servers scraping the
+    same printer, share one rendering; a scrape arriving while another one
+    renders waits for it and reuses its body.
+    """
+
+    def __init__(self, render, clock=time.time):
+        self._render = render
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._second = None
+        self._body = None
+        self.renders = 0
+
+    def body(self):
+        with self._lock:
+            now = self._clock()
+            second = int(now)
+            if second != self._second:
+                self._body = self._render(now)
+                self._second = second
+                self.renders += 1
+            return self._body
@@ -0,0 +1,196 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+import socket
+import threading
+import time
+
+# Version of the newline-delimited JSON stream between a plugin and the aggregator
+PROTOCOL_VERSION = 1
+DEFAULT_REPORT_INTERVAL = 1.0
+MIN_REPORT_INTERVAL = 0.1
+# An unchanged state is still reported this often, so the aggregator can tell a quiet printer from a lost one
+HEARTBEAT_INTERVAL = 5.0
+MAX_RECONNECT_DELAY = 30.0
+SOCKET_TIMEOUT = 5.0
+
+
+def parse_address(address):
+    """
+    Parse an aggregator address into (family, target).
+
+    "unix:/path/to.sock" gives ("unix", "/path/to.sock"); "host:port" and
+    "tcp:host:port" give ("tcp", (host, port)). Raises ValueError otherwise.
+    """
+    address = (address or "").strip()
+    if address.startswith("unix:"):
+        path = address[len("unix:"):]
+        if not path:
+            raise ValueError("Missing socket path in {!r}".format(address))
+        return "unix", path
+    if address.startswith("tcp:"):
+        address = address[len("tcp:"):]
+    host, separator, port = address.rpartition(":")
+    if not separator or not host:
+        raise ValueError("Expected unix:/path or host:port, got {!r}".format(address))
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError("Invalid port in {!r}".format(address))
+    return "tcp", (host.strip("[]"), port)
+
+
+def encode_message(message):
+    """One protocol message as a compact JSON line"""
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def state_delta(previous, current):
+    """
+    Fields of a guard state that changed since previous, for the stream.
+
+    A state is a dict of thresholds, temps ({key: [actual, target]}), alert
+    and timeout. Temperatures are diffed per sensor key, and a key that is no
+    longer reported is sent as None.
+    """
+    delta = {}
+    for field, value in current.items():
+        if field == "temps":
+            old_temps = previous.get("temps", {})
+            changed = dict((key, reading) for key, reading in value.items() if old_temps.get(key) != reading)
+            for key in old_temps:
+                if key not in value:
+                    changed[key] = None
+            if changed:
+                delta["temps"] = changed
+        elif previous.get(field) != value:
+            delta[field] = value
+    return delta
+
+
+class FleetReporter(object):
+    """
+    Streams guard state deltas from the plugin to a fleet aggregator.
+
+    The reporter thread reads the state through state_func every interval,
+    so the temperature callback does no extra work per sample; a change that
+    should go out right away (an alert) only calls wake(). Each message holds
+    the fields that changed since the previous one, and the full state after
+    every (re)connect. Connection failures are retried with exponential
+    backoff and never reach the caller. state_func must return a new dict on
+    every call, as the previous one is kept to compute the next delta.
+    """
+
+    def __init__(self, address, printer_id, state_func, interval=DEFAULT_REPORT_INTERVAL,
+                 name="octo_fire_guard.fleet"):
+        self.family, self.target = parse_address(address)
+        self.printer_id = printer_id
+        self.interval = max(interval, MIN_REPORT_INTERVAL)
+        self._state_func = state_func
+        self._name = name
+        self._logger = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._socket = None
+        self._sent = None  # Last state the aggregator acknowledged by a successful send
+        self._sequence = 0
+
+    @property
+    def is_running(self):
+        return self._thread is not None
+
+    @property
+    def is_connected(self):
+        return self._socket is not None
+
+    def start(self, logger):
+        if self._thread is not None:
+            return
+        self._logger = logger
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self._name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def wake(self):
+        """Report the current state now instead of at the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        reconnect_delay = self.interval
+        last_sent_at = 0.0
+        try:
+            while not self._stopping:
+                if self._socket is None:
+                    try:
+                        self._connect()
+                        reconnect_delay = self.interval
+                    except (OSError, ValueError) as e:
+                        self._logger.debug("Fleet aggregator unavailable: %s", e)
+                        self._wake.wait(reconnect_delay)
+                        self._wake.clear()
+                        reconnect_delay = min(reconnect_delay * 2, MAX_RECONNECT_DELAY)
+                        continue
+
+                # Cleared before the state is read, so a wake() from here on triggers another report
+                self._wake.clear()
+                state = self._state_func()
+                delta = state_delta(self._sent, state)
+                now = time.monotonic()
+                if delta or now - last_sent_at >= HEARTBEAT_INTERVAL:
+                    self._sequence += 1
+                    delta["s"] = self._sequence
+                    delta["t"] = time.time()
+                    try:
+                        self._socket.sendall(encode_message(delta))
+                        self._sent = state
+                        last_sent_at = now
+                    except OSError as e:
+                        self._logger.info("Lost connection to fleet aggregator: {}".format(str(e)))
+                        self._disconnect()
+                        continue
+
+                self._wake.wait(self.interval)
+        finally:
+            self._disconnect()
+
+    def _connect(self):
+        if self.family == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(SOCKET_TIMEOUT)
+            try:
+                sock.connect(self.target)
+            except OSError:
+                sock.close()
+                raise
+        else:
+            sock = socket.create_connection(self.target, timeout=SOCKET_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            sock.sendall(encode_message(dict(hello=PROTOCOL_VERSION, id=self.printer_id)))
+        except OSError:
+            sock.close()
+            raise
+        self._socket = sock
+        # A new connection starts from the full state
+        self._sent = {}
+        self._logger.info("Connected to fleet aggregator at {}".format(self.target))
+
+    def _disconnect(self):
+        sock, self._socket = self._socket, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
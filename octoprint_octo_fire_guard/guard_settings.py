@@ -0,0 +1,84 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from collections import namedtuple
+
+from .spike import SPIKE_FILTER_MODES, SPIKE_FILTER_OFF, MIN_SPIKE_WINDOW, MAX_SPIKE_WINDOW
+
+# Temperature drop below a threshold required before an alert can re-arm
+THRESHOLD_HYSTERESIS = 10.0
+# Bounds for the number of samples the heating rate is estimated over
+MIN_RATE_WINDOW = 3
+MAX_RATE_WINDOW = 120
+
+
+class GuardSettings(namedtuple("GuardSettings", [
+    "enable_monitoring",
+    "hotend_threshold",
+    "heatbed_threshold",
+    "hotend_reset_threshold",
+    "heatbed_reset_threshold",
+    "enable_rate_monitoring",
+    "max_heating_rate",
+    "rate_window",
+    "spike_filter",
+    "spike_filter_window",
+    "spike_filter_count",
+])):
+    """
+    Immutable, pre-validated snapshot of the settings read by temperature_callback.
+
+    OctoPrint resolves every settings lookup by walking its layered config tree,
+    which is too expensive to repeat for every temperature report on the serial
+    comm thread. The plugin builds one snapshot on startup and swaps in a new one
+    on every settings save, so the callback only ever does attribute reads.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_settings(cls, settings, defaults):
+        """
+        Build a snapshot from the plugin settings, falling back to the
+        default value for anything missing or not parseable.
+        """
+        hotend_threshold = _read_float(settings, "hotend_threshold", defaults)
+        heatbed_threshold = _read_float(settings, "heatbed_threshold", defaults)
+        spike_filter = settings.get(["spike_filter"])
+        if spike_filter not in SPIKE_FILTER_MODES:
+            spike_filter = SPIKE_FILTER_OFF
+        spike_filter_window = min(max(_read_int(settings, "spike_filter_window", defaults), MIN_SPIKE_WINDOW),
+                                  MAX_SPIKE_WINDOW)
+        return cls(
+            enable_monitoring=_read_boolean(settings, "enable_monitoring", defaults),
+            hotend_threshold=hotend_threshold,
+            heatbed_threshold=heatbed_threshold,
+            hotend_reset_threshold=hotend_threshold - THRESHOLD_HYSTERESIS,
+            heatbed_reset_threshold=heatbed_threshold - THRESHOLD_HYSTERESIS,
+            enable_rate_monitoring=_read_boolean(settings, "enable_rate_monitoring", defaults),
+            max_heating_rate=_read_float(settings, "max_heating_rate", defaults),
+            rate_window=min(max(_read_int(settings, "rate_window", defaults), MIN_RATE_WINDOW), MAX_RATE_WINDOW),
+            spike_filter=spike_filter,
+            spike_filter_window=spike_filter_window,
+            spike_filter_count=min(max(_read_int(settings, "spike_filter_count", defaults), 1), spike_filter_window),
+        )
+
+
+def _read_float(settings, key, defaults):
+    try:
+        return float(settings.get_float([key]))
+    except (TypeError, ValueError):
+        return float(defaults[key])
+
+
+def _read_int(settings, key, defaults):
+    try:
+        return int(settings.get_int([key]))
+    except (TypeError, ValueError):
+        return int(defaults[key])
+
+
+def _read_boolean(settings, key, defaults):
+    value = settings.get_boolean([key])
+    if value is None:
+        return bool(defaults[key])
+    return bool(value)
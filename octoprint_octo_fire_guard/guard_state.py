@@ -0,0 +1,165 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from .guard_settings import THRESHOLD_HYSTERESIS
+from .rate import SlopeEstimator, RATE_STEADY_TOLERANCE, RATE_TARGET_MARGIN
+from .sensors import SENSOR_HOTEND, SENSOR_HEATBED
+from .spike import make_spike_filter
+
+
+class SensorState(object):
+    """
+    Guard state of one physical heater: its threshold and hysteresis, and
+    whether it is currently above the threshold. Each heater trips and re-arms
+    independently of the others; the data timeout watchdog tracks the time of
+    the latest reading per sensor group instead (hotend, heatbed).
+
+    With rate monitoring enabled, rate holds a SlopeEstimator over the
+    heater's recent readings; it is restarted whenever the target changes,
+    so a full window means the target has been steady throughout.
+
+    With a spike filter configured, spike_filter decides whether a reading
+    counts as above the threshold (see spike.py); spike_filter_spec is the
+    (mode, window, count) it was built from.
+    """
+    __slots__ = ("kind", "index", "threshold", "hysteresis", "reset_threshold", "exceeded", "target",
+                 "rate", "rate_exceeded", "spike_filter", "spike_filter_spec")
+
+    def __init__(self, kind, index=None):
+        self.kind = kind
+        self.index = index
+        self.threshold = 0.0
+        self.hysteresis = THRESHOLD_HYSTERESIS
+        self.reset_threshold = 0.0
+        self.exceeded = False
+        self.target = None
+        self.rate = None
+        self.rate_exceeded = False
+        self.spike_filter = None
+        self.spike_filter_spec = None
+
+    def configure(self, threshold, hysteresis=THRESHOLD_HYSTERESIS, rate_window=None, spike_filter=None):
+        """
+        Set the threshold, enable (rate_window samples) or disable (None) the
+        rate estimator, and set up the spike filter from a (mode, window, count)
+        spec, or none.
+        """
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.reset_threshold = threshold - hysteresis
+        if rate_window is None:
+            self.rate = None
+        elif self.rate is None or self.rate.size != rate_window:
+            self.rate = SlopeEstimator(rate_window)
+        if spike_filter != self.spike_filter_spec:
+            self.spike_filter_spec = spike_filter
+            self.spike_filter = make_spike_filter(*spike_filter) if spike_filter is not None else None
+
+    def reset(self):
+        self.exceeded = False
+        self.target = None
+        self.rate_exceeded = False
+        if self.rate is not None:
+            self.rate.clear()
+        if self.spike_filter is not None:
+            self.spike_filter.clear()
+
+    def update_rate(self, timestamp, temperature, target):
+        """
+        Feed a reading to the rate estimator. Returns the heating rate in °C/s
+        once the target has been steady for a full window and the temperature
+        has come within RATE_TARGET_MARGIN of it, otherwise None.
+        """
+        rate = self.rate
+        if rate is None:
+            return None
+        target = target or 0.0
+        if self.target is None or abs(target - self.target) > RATE_STEADY_TOLERANCE:
+            self.target = target
+            rate.clear()
+        rate.push(timestamp, temperature)
+        if rate.count < rate.size or temperature < target - RATE_TARGET_MARGIN:
+            return None
+        return rate.slope()
+
+    @property
+    def name(self):
+        return self.kind if self.index is None else "{}{}".format(self.kind, self.index)
+
+    def __repr__(self):
+        return "SensorState(name={!r}, threshold={!r}, exceeded={!r})".format(
+            self.name, self.threshold, self.exceeded
+        )
+
+
+class GuardStateTable(object):
+    """
+    Per-heater guard state, one SensorState per hotend plus one for the heatbed.
+
+    Hotend states are preallocated for the extruder count of the printer
+    profile. A SensorRecord is bound to its state the first time its key is
+    seen, so a sample then reaches its state through a single attribute read
+    and updates it in place, without allocating. States are never replaced,
+    only added, which keeps existing bindings valid when the table grows or
+    is reset.
+    """
+
+    def __init__(self, extruder_count=1):
+        self.hotends = []
+        self.heatbed = SensorState(SENSOR_HEATBED)
+        self._guard_settings = None
+        self.resize(extruder_count)
+
+    def resize(self, extruder_count):
+        """Make sure there is a state for every extruder; never shrinks"""
+        while len(self.hotends) < extruder_count:
+            state = SensorState(SENSOR_HOTEND, len(self.hotends))
+            if self._guard_settings is not None:
+                state.configure(self._guard_settings.hotend_threshold, rate_window=self._rate_window(),
+                                spike_filter=self._spike_filter())
+            self.hotends.append(state)
+
+    def configure(self, guard_settings):
+        """Apply the thresholds and rate settings of a settings snapshot to every state"""
+        self._guard_settings = guard_settings
+        rate_window = self._rate_window()
+        spike_filter = self._spike_filter()
+        for state in list(self.hotends):
+            state.configure(guard_settings.hotend_threshold, rate_window=rate_window, spike_filter=spike_filter)
+        self.heatbed.configure(guard_settings.heatbed_threshold, rate_window=rate_window, spike_filter=spike_filter)
+
+    def _rate_window(self):
+        guard_settings = self._guard_settings
+        return guard_settings.rate_window if guard_settings.enable_rate_monitoring else None
+
+    def _spike_filter(self):
+        guard_settings = self._guard_settings
+        return (guard_settings.spike_filter, guard_settings.spike_filter_window, guard_settings.spike_filter_count)
+
+    def bind(self, sensor):
+        """Look up the state for a SensorRecord and cache it on the record; None for unguarded sensors"""
+        if sensor.kind == SENSOR_HOTEND:
+            # Tools beyond the profile's extruder count get a state on first sight
+            self.resize(sensor.index + 1)
+            state = self.hotends[sensor.index]
+        elif sensor.kind == SENSOR_HEATBED:
+            state = self.heatbed
+        else:
+            return None
+        sensor.state = state
+        return state
+
+    def reset(self):
+        for state in list(self.hotends):
+            state.reset()
+        self.heatbed.reset()
+
+    def any_hotend_exceeded(self):
+        for state in list(self.hotends):
+            if state.exceeded:
+                return True
+        return False
+
+    def set_hotends_exceeded(self, exceeded):
+        for state in list(self.hotends):
+            state.exceeded = exceeded
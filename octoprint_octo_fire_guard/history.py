@@ -0,0 +1,167 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .sensors import SENSOR_IGNORED
+
+# Samples kept per sensor: one hour at OctoPrint's default 2 s reporting interval
+HISTORY_CAPACITY = 1800
+# Sensors tracked per printer; with 16 bytes per sample this caps the history at about 350 KB
+MAX_HISTORY_SENSORS = 12
+DEFAULT_HISTORY_POINTS = 300
+MAX_HISTORY_POINTS = 2000
+
+_NAN = float("nan")
+
+
+class SensorHistory(object):
+    """
+    Fixed-capacity ring of (timestamp, actual, target) samples for one sensor.
+
+    Timestamps are stored as doubles and temperatures as floats in
+    preallocated arrays, so memory stays at 16 bytes per sample for the
+    lifetime of the plugin and appending does not allocate. A missing target
+    is stored as NaN.
+
+    The comm thread is the only writer. Readers take a consistent copy with
+    snapshot(), which retries if a sample was appended while copying.
+    """
+    __slots__ = ("key", "capacity", "times", "actuals", "targets", "head", "count", "version")
+
+    def __init__(self, key, capacity=HISTORY_CAPACITY):
+        self.key = key
+        self.capacity = capacity
+        self.times = array("d", [0.0]) * capacity
+        self.actuals = array("f", [0.0]) * capacity
+        self.targets = array("f", [0.0]) * capacity
+        self.head = 0  # Index the next sample is written to
+        self.count = 0
+        self.version = 0  # Bumped after every append, lets readers detect a concurrent write
+
+    def append(self, timestamp, actual, target):
+        head = self.head
+        self.times[head] = timestamp
+        self.actuals[head] = actual
+        self.targets[head] = _NAN if target is None else target
+        self.head = (head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.version += 1
+
+    def latest(self):
+        """Timestamp of the newest sample, None if there is none"""
+        if not self.count:
+            return None
+        return self.times[self.head - 1]
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        self.version += 1
+
+    def snapshot(self, attempts=5):
+        """Copy of the samples as (times, actuals, targets) arrays, oldest first"""
+        for _ in range(attempts):
+            version = self.version
+            head, count = self.head, self.count
+            times, actuals, targets = self.times[:], self.actuals[:], self.targets[:]
+            if version == self.version:
+                break
+        start = (head - count) % self.capacity
+        if start + count <= self.capacity:
+            end = start + count
+            return times[start:end], actuals[start:end], targets[start:end]
+        return (times[start:] + times[:head], actuals[start:] + actuals[:head],
+                targets[start:] + targets[:head])
+
+    def query(self, start=None, end=None, points=DEFAULT_HISTORY_POINTS):
+        """Samples between start and end (inclusive, epoch seconds) downsampled to about `points` points"""
+        times, actuals, targets = self.snapshot()
+        first = 0 if start is None else bisect_left(times, start)
+        last = len(times) if end is None else bisect_right(times, end)
+        return dict(
+            count=max(last - first, 0),
+            points=downsample_min_max(times, actuals, targets, first, last, points),
+        )
+
+
+class TemperatureHistory(object):
+    """
+    Histories of all recognised sensors of a printer, keyed by the reported
+    temperature key. A SensorRecord caches its history on first sight, the
+    same way it caches its guard state.
+    """
+
+    def __init__(self, capacity=HISTORY_CAPACITY, max_sensors=MAX_HISTORY_SENSORS):
+        self.capacity = capacity
+        self.max_sensors = max_sensors
+        self.sensors = {}
+
+    def bind(self, sensor):
+        """History for a SensorRecord, created on first use; None for ignored keys or past the sensor cap"""
+        if sensor.kind == SENSOR_IGNORED:
+            return None
+        history = self.sensors.get(sensor.key)
+        if history is None:
+            if len(self.sensors) >= self.max_sensors:
+                return None
+            history = self.sensors[sensor.key] = SensorHistory(sensor.key, self.capacity)
+        sensor.history = history
+        return history
+
+    def record(self, sensor, timestamp, actual, target):
+        history = sensor.history
+        if history is None:
+            history = self.bind(sensor)
+            if history is None:
+                return
+        history.append(timestamp, actual, target)
+
+    def clear(self):
+        for history in list(self.sensors.values()):
+            history.clear()
+
+    def query(self, keys=None, start=None, end=None, points=DEFAULT_HISTORY_POINTS):
+        """Downsampled history of the given sensor keys, or of every sensor"""
+        sensors = dict(self.sensors)
+        if keys is not None:
+            sensors = dict((key, sensors[key]) for key in keys if key in sensors)
+        return dict((key, history.query(start, end, points)) for key, history in sensors.items())
+
+
+def downsample_min_max(times, actuals, targets, first, last, points):
+    """
+    Reduce samples[first:last] to at most `points` [timestamp, actual, target]
+    points by splitting the range into points // 2 buckets and keeping the
+    lowest and highest reading of each, in time order. Unlike averaging, this
+    keeps short spikes, which matter most when looking back at an alert.
+    """
+    count = last - first
+    if count <= 0:
+        return []
+    if count <= points:
+        return [_point(times, actuals, targets, i) for i in range(first, last)]
+
+    buckets = max(points // 2, 1)
+    result = []
+    for bucket in range(buckets):
+        bucket_start = first + bucket * count // buckets
+        bucket_end = first + (bucket + 1) * count // buckets
+        low = high = bucket_start
+        for i in range(bucket_start + 1, bucket_end):
+            if actuals[i] < actuals[low]:
+                low = i
+            elif actuals[i] > actuals[high]:
+                high = i
+        for i in sorted({low, high}):
+            result.append(_point(times, actuals, targets, i))
+    return result
+
+
+def _point(times, actuals, targets, index):
+    target = targets[index]
+    return [times[index], round(actuals[index], 2), None if math.isnan(target) else round(target, 2)]
+
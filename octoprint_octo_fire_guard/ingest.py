@@ -0,0 +1,261 @@
+# coding=utf-8
+"""
+Memory-mapped ingestion of OctoPrint logs.
+
+The temperature reports in serial.log (and octoprint.log lines holding one)
+are found with a bytes-level regular expression scan over the mapped file
+for what follows a line's timestamp, so lines that are not reports are
+never copied or decoded. A persisted sparse index maps log time to byte
+offsets, so reading a time window seeks straight to it.
+"""
+from __future__ import absolute_import
+
+import calendar
+import gzip
+import mmap
+import os
+import re
+import struct
+import zlib
+from bisect import bisect_right
+
+from .sensors import SensorRegistry, SENSOR_IGNORED
+
+INDEX_SUFFIX = ".fgidx"
+# Log time between two index entries, in seconds
+INDEX_INTERVAL = 60.0
+# Bytes at the start of a log whose checksum tells a grown log from a rotated one
+INDEX_HEAD_SIZE = 4096
+
+_INDEX_MAGIC = b"OFGLOGIX"
+_INDEX_VERSION = 2
+# Magic, version, indexed size, head checksum and the number of bytes it covers,
+# then one (time, offset) entry per interval
+_INDEX_HEADER = struct.Struct("<8sIQII")
+_INDEX_ENTRY = struct.Struct("<dQ")
+
+_NAN = float("nan")
+_UNKNOWN = object()
+
+# Length of the "2026-03-01 10:23:45,123" timestamp at the start of every line OctoPrint logs
+_STAMP_LENGTH = 23
+_MINUTE = re.compile(rb"\d{4}-\d\d-\d\d \d\d:\d\d")
+# What follows the timestamp of a report: " - Recv: [ok] T:..." in serial.log, " - <logger> - <LEVEL> - T:..."
+# in other logs. Starting with a literal lets the scan skip ahead instead of trying every line start
+_REPORT = re.compile(rb" - (?:Recv: *|[\w.]+ - [A-Z]+ - )(?:ok +)?([TBCP]\d*:[^\n]*)")
+# The tokens OctoPrint's own temperature parser reads: T, T0..N, B, C and P with an optional /target
+_TEMPERATURE = re.compile(rb"\b([TBCP]\d*):\s*(-?\d+(?:\.\d*)?)(?:\s*/\s*(-?\d+(?:\.\d*)?))?")
+
+
+class LogIndex(object):
+    """
+    Sparse index of a log: the time and byte offset of the first report of
+    every INDEX_INTERVAL seconds of log time, for the first `size` bytes of
+    the log. `head` is the checksum of the log's first `head_size` bytes (at
+    most INDEX_HEAD_SIZE of the indexed ones), which changes when the log is
+    rotated and a new file takes its name.
+    """
+
+    def __init__(self, size=0, head=0, head_size=0, times=None, offsets=None):
+        self.size = size
+        self.head = head
+        self.head_size = head_size
+        self.times = times if times is not None else []
+        self.offsets = offsets if offsets is not None else []
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self, reported, offset):
+        if not self.times or reported >= self.times[-1] + INDEX_INTERVAL:
+            self.times.append(reported)
+            self.offsets.append(offset)
+
+    def seek(self, start):
+        """Offset to start scanning from for reports at or after start"""
+        entry = bisect_right(self.times, start) - 1
+        return self.offsets[entry] if entry >= 0 else 0
+
+    def stop(self, end):
+        """Offset at which no more reports before end follow, or None for the end of the indexed part"""
+        entry = bisect_right(self.times, end)
+        return self.offsets[entry] if entry < len(self.times) else None
+
+    @classmethod
+    def load(cls, path):
+        """The index stored at path, or None if there is none or it cannot be read"""
+        try:
+            with open(path, "rb") as stored:
+                data = stored.read()
+        except OSError:
+            return None
+        if len(data) < _INDEX_HEADER.size:
+            return None
+        magic, version, size, head, head_size = _INDEX_HEADER.unpack_from(data)
+        entries = data[_INDEX_HEADER.size:]
+        if magic != _INDEX_MAGIC or version != _INDEX_VERSION or len(entries) % _INDEX_ENTRY.size:
+            return None
+        index = cls(size, head, head_size)
+        for reported, offset in _INDEX_ENTRY.iter_unpack(entries):
+            index.times.append(reported)
+            index.offsets.append(offset)
+        return index
+
+    def save(self, path):
+        """Store the index, replacing the stored one in a single rename"""
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as stored:
+            stored.write(_INDEX_HEADER.pack(_INDEX_MAGIC, _INDEX_VERSION, self.size, self.head, self.head_size))
+            stored.write(b"".join(_INDEX_ENTRY.pack(reported, offset)
+                                  for reported, offset in zip(self.times, self.offsets)))
+        os.replace(temporary, path)
+
+
+class IndexedLog(object):
+    """
+    An OctoPrint log opened for reading temperature reports.
+
+    The log is memory-mapped (.gz logs are decompressed into memory) and
+    only read up to its last complete line, as OctoPrint may be writing to
+    it. The index is stored next to the log, or in index_dir, as
+    <log name>.fgidx; it is extended when the log has grown since, rebuilt
+    when the log was rotated, and kept in memory only if it cannot be
+    stored. Report keys are classified by the plugin's sensor registry.
+    """
+
+    def __init__(self, path, index_dir=None, registry=None):
+        self.path = path
+        self.index_path = None
+        if not path.endswith(".gz"):
+            folder = index_dir if index_dir is not None else os.path.dirname(os.path.abspath(path))
+            self.index_path = os.path.join(folder, os.path.basename(path) + INDEX_SUFFIX)
+        self._registry = registry if registry is not None else SensorRegistry()
+        self._sensors = {}  # Reported key as bytes -> SensorRecord, None if ignored
+        self._minutes = {}  # "YYYY-MM-DD HH:MM" -> seconds since the epoch
+        self._buffer = None
+        self._map = None
+        self._file = None
+        self._size = 0
+        self.index = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        if self.path.endswith(".gz"):
+            with gzip.open(self.path, "rb") as log:
+                self._buffer = log.read()
+        else:
+            self._file = open(self.path, "rb")
+            if os.fstat(self._file.fileno()).st_size:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._buffer = self._map
+            else:
+                self._buffer = b""
+        # Only complete lines; the last one may still be being written
+        self._size = self._buffer.rfind(b"\n") + 1
+        self.index = self._load_index()
+
+    def close(self):
+        self._buffer = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def reports(self, start=None, end=None):
+        """
+        Yield (time, readings) for every report in the log, or only for those
+        with start <= time < end, where readings is a list of
+        (SensorRecord, actual, target) with NaN for a missing target. A bare
+        T is read as T0 unless the report also holds T0.
+        """
+        position = self.index.seek(start) if start is not None else 0
+        stop = self.index.stop(end) if end is not None else None
+        sensors = self._sensors
+        for line, reported, message in self._scan(position, stop if stop is not None else self._size):
+            if (start is not None and reported < start) or (end is not None and reported >= end):
+                continue
+            indexed = b"T0:" in message
+            readings = []
+            for key, actual, target in _TEMPERATURE.findall(message):
+                sensor = sensors.get(key, _UNKNOWN)
+                if sensor is _UNKNOWN:
+                    sensor = self._classify(key)
+                if sensor is None or (key == b"T" and indexed):
+                    continue
+                readings.append((sensor, float(actual), float(target) if target else _NAN))
+            if readings:
+                yield reported, readings
+
+    def _scan(self, position, stop):
+        """Yield (line offset, time, message) for the report lines starting in [position, stop)"""
+        buffer = self._buffer
+        minutes = self._minutes
+        for report in _REPORT.finditer(buffer, position + _STAMP_LENGTH, stop + _STAMP_LENGTH):
+            line = report.start() - _STAMP_LENGTH
+            if line < position or line >= stop or (line and buffer[line - 1] != 10):
+                # Not preceded by a timestamp at the start of a line
+                continue
+            stamp = buffer[line:line + _STAMP_LENGTH]
+            reported = minutes.get(stamp[:16], _UNKNOWN)
+            if reported is _UNKNOWN:
+                reported = self._minute_start(stamp[:16])
+            if reported is None or stamp[16] != 58 or not stamp[17:19].isdigit() or not stamp[20:23].isdigit():
+                continue
+            yield line, reported + int(stamp[17:19]) + int(stamp[20:23]) / 1000.0, report.group(1)
+
+    def _classify(self, key):
+        # T is the active tool, which OctoPrint reports as tool0 on a single tool printer
+        sensor = self._registry["T0" if key == b"T" else key.decode("ascii")]
+        if sensor.kind == SENSOR_IGNORED:
+            sensor = None
+        self._sensors[key] = sensor
+        return sensor
+
+    def _minute_start(self, minute):
+        """Seconds since the epoch at the start of a "YYYY-MM-DD HH:MM" minute, or None if it is not one"""
+        start = None
+        if _MINUTE.match(minute):
+            try:
+                # Log timestamps are local time; only differences between them matter here
+                start = calendar.timegm((int(minute[0:4]), int(minute[5:7]), int(minute[8:10]),
+                                         int(minute[11:13]), int(minute[14:16]), 0))
+            except ValueError:
+                pass
+        self._minutes[minute] = start
+        return start
+
+    def _load_index(self):
+        index = LogIndex.load(self.index_path) if self.index_path is not None else None
+        if index is not None and (index.size > self._size or
+                                  zlib.crc32(self._buffer[:index.head_size]) != index.head):
+            # The log was rotated or truncated since it was indexed
+            index = None
+        if index is None:
+            index = LogIndex()
+        if index.size < self._size:
+            self._extend_index(index)
+            if self.index_path is not None:
+                try:
+                    index.save(self.index_path)
+                except OSError:
+                    # A read-only log folder; the index is rebuilt on the next run
+                    pass
+        return index
+
+    def _extend_index(self, index):
+        """Index the reports after the indexed part of the log"""
+        for line, reported, _ in self._scan(index.size, self._size):
+            index.add(reported, line)
+        index.size = self._size
+        if index.head_size < INDEX_HEAD_SIZE:
+            # Only complete lines count, so a short log that is still being written keeps its head
+            index.head_size = min(INDEX_HEAD_SIZE, self._size)
+            index.head = zlib.crc32(self._buffer[:index.head_size])
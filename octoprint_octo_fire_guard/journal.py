@@ -0,0 +1,185 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+import os
+import queue
+import struct
+import threading
+
+JOURNAL_FILENAME = "incidents.jsonl"
+INDEX_FILENAME = "incidents.idx"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# One little-endian unsigned 64-bit journal offset per record
+_INDEX_ENTRY = struct.Struct("<Q")
+
+
+class IncidentJournal(object):
+    """
+    Append-only journal of incidents in the plugin data folder.
+
+    Every record is one line of JSON in incidents.jsonl. A sidecar index,
+    incidents.idx, holds the byte offset of every line as a fixed-width
+    entry, so record n is found with a single seek into the index and a page
+    of records is read without scanning the journal, however many years of
+    incidents it holds.
+
+    append() only puts the record on a queue. A writer thread serialises it,
+    writes the line and then its index entry and syncs both, so the caller
+    never waits for the disk. Because the index entry is written after the
+    line, every indexed offset points at a complete record; a line without
+    an index entry, left by a crash, is indexed (or a partial one cut off)
+    the next time the journal is opened.
+    """
+
+    def __init__(self, name="octo_fire_guard.journal"):
+        self._name = name
+        self._logger = None
+        self._folder = None
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    @property
+    def is_open(self):
+        return self._thread is not None
+
+    @property
+    def journal_path(self):
+        return os.path.join(self._folder, JOURNAL_FILENAME)
+
+    @property
+    def index_path(self):
+        return os.path.join(self._folder, INDEX_FILENAME)
+
+    def open(self, folder, logger):
+        if self._thread is not None:
+            return
+        self._folder = folder
+        self._logger = logger
+        journal, index = self._recover()
+        self._thread = threading.Thread(target=self._run, args=(journal, index), name=self._name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self, timeout=5.0):
+        """Stop the writer once records that are already queued have been written"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+
+    def append(self, record):
+        """Queue a record (a JSON-serialisable dict) for writing; returns False if the journal is not open"""
+        if self._thread is None:
+            return False
+        self._queue.put(record)
+        return True
+
+    def count(self):
+        """Number of records that have been written"""
+        if self._folder is None:
+            return 0
+        try:
+            return os.path.getsize(self.index_path) // _INDEX_ENTRY.size
+        except OSError:
+            return 0
+
+    def query(self, offset=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        A page of records, newest first, skipping the `offset` newest ones.
+        Returns (total, records).
+        """
+        total = self.count()
+        offset = max(offset, 0)
+        limit = min(max(limit, 0), MAX_PAGE_SIZE)
+        # Records [first, last) in file order; the page is returned in reverse
+        last = total - offset
+        first = max(last - limit, 0)
+        if last <= first:
+            return total, []
+
+        with open(self.index_path, "rb") as index:
+            index.seek(first * _INDEX_ENTRY.size)
+            entries = index.read((last - first) * _INDEX_ENTRY.size)
+        records = []
+        with open(self.journal_path, "rb") as journal:
+            for (position,) in _INDEX_ENTRY.iter_unpack(entries):
+                journal.seek(position)
+                records.append(json.loads(journal.readline().decode("utf-8")))
+        records.reverse()
+        return total, records
+
+    def _recover(self):
+        """
+        Open the journal and index for appending, first bringing the index in
+        line with the journal after an unclean shutdown.
+        """
+        journal = open(self.journal_path, "ab+")
+        index = open(self.index_path, "ab+")
+        try:
+            journal_size = journal.seek(0, os.SEEK_END)
+            index_size = index.seek(0, os.SEEK_END)
+            entries = index_size // _INDEX_ENTRY.size
+            position = 0
+            if entries:
+                index.seek((entries - 1) * _INDEX_ENTRY.size)
+                (last_offset,) = _INDEX_ENTRY.unpack(index.read(_INDEX_ENTRY.size))
+                journal.seek(last_offset)
+                line = journal.readline()
+                if last_offset >= journal_size or not line.endswith(b"\n"):
+                    # The index points past the journal; rebuild it from scratch
+                    entries = 0
+                else:
+                    position = last_offset + len(line)
+            if entries * _INDEX_ENTRY.size != index_size:
+                index.truncate(entries * _INDEX_ENTRY.size)
+
+            journal.seek(position)
+            missing = []
+            for line in journal:
+                if not line.endswith(b"\n"):
+                    break
+                missing.append(position)
+                position += len(line)
+            if position != journal_size:
+                # Drop a record that was only partially written
+                journal.truncate(position)
+            if missing:
+                index.seek(0, os.SEEK_END)
+                index.write(b"".join(_INDEX_ENTRY.pack(offset) for offset in missing))
+            journal.flush()
+            index.flush()
+        except Exception:
+            journal.close()
+            index.close()
+            raise
+        return journal, index
+
+    def _run(self, journal, index):
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                try:
+                    self._write(journal, index, record)
+                except Exception:
+                    self._logger.exception("Failed to write incident to the journal")
+        finally:
+            journal.close()
+            index.close()
+
+    @staticmethod
+    def _write(journal, index, record):
+        line = (json.dumps(record, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+        position = journal.seek(0, os.SEEK_END)
+        journal.write(line)
+        journal.flush()
+        os.fsync(journal.fileno())
+        index.write(_INDEX_ENTRY.pack(position))
+        index.flush()
+        os.fsync(index.fileno())
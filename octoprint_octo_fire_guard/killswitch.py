@@ -0,0 +1,142 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+import time
+from collections import Counter
+
+# Tag carried by the kill commands the plugin queues itself
+KILL_TAG = "plugin:octo_fire_guard:kill"
+# Other lines are not held back for longer than this, e.g. when the printer disconnected meanwhile
+KILL_TIMEOUT = 10.0
+
+
+class KillSwitch(object):
+    """
+    Moves the emergency GCode ahead of everything OctoPrint is about to send.
+
+    printer.commands() puts the kill commands behind whatever the comm layer
+    already has queued, such as the lines buffered by a streaming job. Once
+    armed, the switch works through OctoPrint's GCode hooks on the comm
+    thread:
+
+    - queuing: lines other than the tagged kill commands are dropped, so no
+      new job lines get in front of the kill sequence
+    - sending: the next line about to be written to the serial port is
+      replaced by the next kill command, until the sequence is out; the
+      tagged copies queued by the plugin are then dropped when they come up
+    - sent: the time from detection until the first kill command was
+      written is reported through on_written
+
+    The switch disarms once the sequence is out, or after KILL_TIMEOUT. Arming
+    it again before that adds the commands to the end of the sequence, such as
+    a GCode fallback after the heater commands. While it is not armed, every
+    hook returns after a single attribute check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._armed = False
+        self._pending = []  # Kill commands still to be sent, in order
+        self._duplicates = Counter()  # Tagged copies to drop, their command was sent in place of another line
+        self._first = None
+        self._detected_perf = None
+        self._deadline = 0.0
+        self._on_written = None
+        self.last_latency = None  # Seconds from detection until the first kill command was written
+
+    @property
+    def is_armed(self):
+        return self._armed
+
+    def arm(self, commands, detected_perf=None, on_written=None):
+        """Start moving commands to the front; returns False if there is nothing to send"""
+        commands = list(commands)
+        if not commands:
+            return False
+        with self._lock:
+            if self._armed:
+                # The sequence is still going out, these follow it
+                self._pending.extend(commands)
+                self._deadline = time.monotonic() + KILL_TIMEOUT
+                return True
+            self._pending = commands
+            self._duplicates.clear()
+            self._first = commands[0]
+            self._detected_perf = detected_perf if detected_perf is not None else time.perf_counter()
+            self._deadline = time.monotonic() + KILL_TIMEOUT
+            self._on_written = on_written
+            self._armed = True
+        return True
+
+    def disarm(self):
+        with self._lock:
+            self._release()
+            self._duplicates.clear()
+
+    def on_queuing(self, cmd, tags):
+        """Queuing phase; None keeps the line, (None,) drops it"""
+        if not self._armed:
+            return None
+        if tags and KILL_TAG in tags:
+            return None
+        if time.monotonic() >= self._deadline:
+            with self._lock:
+                self._release()
+            return None
+        return (None,)
+
+    def on_sending(self, cmd, tags):
+        """Sending phase; None keeps the line, a string replaces it and (None,) drops it"""
+        if not self._armed and not self._duplicates:
+            return None
+        with self._lock:
+            if tags and KILL_TAG in tags:
+                if self._duplicates[cmd] > 0:
+                    # Already sent in place of another line
+                    self._duplicates[cmd] -= 1
+                    if self._duplicates[cmd] <= 0:
+                        del self._duplicates[cmd]
+                    return (None,)
+                if self._pending and self._pending[0] == cmd:
+                    self._pending.pop(0)
+                    self._disarm_when_done()
+                return None
+            if not self._armed:
+                return None
+            if time.monotonic() >= self._deadline:
+                self._release()
+                return None
+            if not self._pending:
+                return (None,)
+            command = self._pending.pop(0)
+            self._duplicates[command] += 1
+            self._disarm_when_done()
+            return command
+
+    def on_sent(self, cmd):
+        """Sent phase; reports when the first kill command reached the serial port"""
+        if self._first is None or cmd != self._first:
+            return
+        with self._lock:
+            if self._first is None:
+                return
+            self._first = None
+            on_written = self._on_written
+            self.last_latency = time.perf_counter() - self._detected_perf
+            latency = self.last_latency
+            if not self._pending:
+                self._armed = False
+        if on_written is not None:
+            on_written(cmd, latency)
+
+    def _disarm_when_done(self):
+        # Called with the lock held; stays armed until the first command was reported written
+        if not self._pending and self._first is None:
+            self._armed = False
+
+    def _release(self):
+        # Called with the lock held; stops holding back other lines, tagged copies are still dropped
+        self._armed = False
+        self._pending = []
+        self._first = None
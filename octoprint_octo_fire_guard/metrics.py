@@ -0,0 +1,111 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from bisect import bisect_left
+
+# Upper bucket bounds in seconds
+CALLBACK_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001,
+    0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+)
+INTER_ARRIVAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0, 60.0)
+TERMINATION_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class LatencyHistogram(object):
+    """
+    Histogram of durations over fixed bucket bounds.
+
+    Recording a value is a binary search over the bounds plus a few integer
+    and float updates, with no allocation, so it is cheap enough for the comm
+    thread. Each histogram is expected to be written by a single thread.
+    """
+    __slots__ = ("bounds", "counts", "count", "total", "maximum")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last bucket counts values above every bound
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+    def to_dict(self):
+        """Non-cumulative bucket counts; the overflow bucket has an upper bound of None"""
+        upper_bounds = self.bounds + (None,)
+        return dict(
+            unit="s",
+            buckets=[[upper, count] for upper, count in zip(upper_bounds, list(self.counts))],
+            count=self.count,
+            sum=self.total,
+            max=self.maximum,
+        )
+
+
+class GuardMetrics(object):
+    """
+    Latency instrumentation for the guard: temperature_callback execution time,
+    inter-arrival time of samples per sensor, and time from detection until
+    every termination step has finished.
+
+    calls counts every temperature_callback invocation, including those made
+    while monitoring is disabled, and trips the emergency shutdowns per
+    (kind, sensor key). Both are plain integers the comm thread increments
+    in place.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.trips = {}
+        self.callback = LatencyHistogram(CALLBACK_BUCKETS)
+        self.inter_arrival = {}
+        self.termination = {}
+        self._last_arrival = {}
+
+    def observe_callback(self, duration):
+        self.callback.observe(duration)
+
+    def observe_trip(self, kind, sensor_key):
+        key = (kind, sensor_key)
+        self.trips[key] = self.trips.get(key, 0) + 1
+
+    def observe_arrival(self, sensor_key, now):
+        """Record the gap since the previous sample of sensor_key"""
+        last_arrival = self._last_arrival.get(sensor_key)
+        self._last_arrival[sensor_key] = now
+        if last_arrival is not None:
+            histogram = self.inter_arrival.get(sensor_key)
+            if histogram is None:
+                histogram = self.inter_arrival[sensor_key] = LatencyHistogram(INTER_ARRIVAL_BUCKETS)
+            histogram.observe(now - last_arrival)
+
+    def reset_arrivals(self):
+        """Forget previous arrivals, e.g. after a reconnect, so the gap is not recorded"""
+        self._last_arrival.clear()
+
+    def observe_incident(self, incident):
+        """Record detection-to-completion latency of every step taken for an incident"""
+        for step, (_, finished) in list(incident.steps.items()):
+            self.observe_termination(step, finished - incident.detected_perf)
+
+    def observe_termination(self, step, latency):
+        """Record the latency from detection until a termination step was done"""
+        histogram = self.termination.get(step)
+        if histogram is None:
+            histogram = self.termination[step] = LatencyHistogram(TERMINATION_BUCKETS)
+        histogram.observe(latency)
+
+    def to_dict(self):
+        return dict(
+            callback=self.callback.to_dict(),
+            inter_arrival=dict((key, histogram.to_dict()) for key, histogram in list(self.inter_arrival.items())),
+            termination=dict((step, histogram.to_dict()) for step, histogram in list(self.termination.items())),
+        )
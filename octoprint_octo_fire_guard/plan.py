@@ -0,0 +1,161 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import re
+import shlex
+from collections import namedtuple
+
+from .escalation import STAGE_GCODE, STAGE_PSU, STAGE_SECONDARY, DEFAULT_VERIFICATION_WINDOW, \
+    MIN_VERIFICATION_WINDOW
+
+# Sent ahead of a PSU shutdown, so the heaters are off even if the power stays on
+HEATER_OFF_COMMANDS = ("M104 S0", "M140 S0")
+# Power-off methods of PSU control plugins, in order of preference
+PSU_OFF_METHODS = ("turn_psu_off", "turnPSUOff")
+# Seconds the secondary power-off command may take
+SECONDARY_POWER_TIMEOUT = 10.0
+
+# A GCode word (G28, M112, T0, M104.1) or an OctoPrint @ command
+_COMMAND_PATTERN = re.compile(r"^(?:[GMT]\d+(?:\.\d+)?(?![^\s;])|@\S+)", re.IGNORECASE)
+
+
+def parse_commands(gcode):
+    """Split the termination GCode setting into a tuple of commands, dropping blank lines"""
+    if not gcode:
+        return ()
+    return tuple(line.strip() for line in gcode.split("\n") if line.strip())
+
+
+def resolve_power_off(plugin_manager, plugin_name):
+    """
+    Look up the power-off method of a PSU control plugin.
+
+    Returns (method, None) on success and (None, problem) when the plugin is
+    not loaded or offers none of PSU_OFF_METHODS.
+    """
+    if not plugin_name:
+        return None, "No PSU control plugin configured"
+    try:
+        plugin_info = plugin_manager.get_plugin_info(plugin_name)
+    except Exception as e:
+        return None, "Failed to look up PSU control plugin '{}': {}".format(plugin_name, str(e))
+    implementation = getattr(plugin_info, "implementation", None) if plugin_info else None
+    if implementation is None:
+        return None, "PSU control plugin '{}' not found or not loaded".format(plugin_name)
+    for method in PSU_OFF_METHODS:
+        if hasattr(implementation, method):
+            return getattr(implementation, method), None
+    return None, "PSU control plugin '{}' has no turn off method".format(plugin_name)
+
+
+def parse_secondary_command(command):
+    """
+    Split the secondary power-off command into an argument list.
+
+    Returns (args, None), with an empty tuple if no command is configured,
+    or ((), problem) if the command cannot be parsed.
+    """
+    if not command or not command.strip():
+        return (), None
+    try:
+        return tuple(shlex.split(command)), None
+    except ValueError as e:
+        return (), "Secondary power-off command cannot be parsed: {}".format(str(e))
+
+
+def _read_window(settings):
+    try:
+        window = float(settings.get_float(["verification_window"]))
+    except (TypeError, ValueError):
+        window = DEFAULT_VERIFICATION_WINDOW
+    return max(window, MIN_VERIFICATION_WINDOW)
+
+
+class EmergencyPlan(namedtuple("EmergencyPlan", [
+    "mode",
+    "commands",
+    "heater_commands",
+    "psu_plugin_name",
+    "power_off",
+    "priority_send",
+    "secondary_power_off",
+    "escalation_stages",
+    "verification_window",
+    "problems",
+])):
+    """
+    Emergency actions compiled from the settings ahead of time.
+
+    Splitting and checking the termination GCode and looking up the PSU
+    control plugin used to happen while the printer was overheating. The
+    plugin now compiles a plan on startup and on every settings save, logs
+    its problems right away, and an emergency only runs what was resolved:
+
+    - gcode mode: send commands in one batch
+    - psu mode: send heater_commands, call power_off, and send commands if
+      power_off is unresolved or fails
+
+    With priority_send, the first batch is moved ahead of the lines already
+    queued for the printer (see KillSwitch).
+
+    verification_window is the number of seconds after which the tripped
+    sensor has to show a falling trend, or None if this is not checked.
+    escalation_stages are the stages tried in turn while it does not (see
+    EscalationMonitor): the PSU plugin after GCode termination, and then
+    secondary_power_off, the argument list of an external command.
+
+    problems lists everything that would make the configured mode fall back
+    or do nothing. An empty tuple means the plan can run as configured.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def compile(cls, settings, plugin_manager):
+        mode = settings.get(["termination_mode"])
+        commands = parse_commands(settings.get(["termination_gcode"]))
+        psu_plugin_name = settings.get(["psu_plugin_name"])
+        priority_send = settings.get_boolean(["priority_kill_gcode"])
+        enable_escalation = settings.get_boolean(["enable_escalation"])
+        problems = []
+
+        if not commands:
+            problems.append("No termination GCode configured")
+        for command in commands:
+            if not _COMMAND_PATTERN.match(command):
+                problems.append("Termination GCode line {!r} is not a GCode command".format(command))
+
+        # Also resolved in GCode mode, where testing the PSU termination can still use it
+        power_off, problem = resolve_power_off(plugin_manager, psu_plugin_name)
+        if mode == "psu":
+            if problem:
+                problems.append(problem + ", the termination GCode will be sent instead")
+        elif mode != "gcode":
+            problems.append("Unknown termination mode: {}".format(mode))
+
+        secondary_power_off, problem = parse_secondary_command(settings.get(["secondary_power_command"]))
+        if problem:
+            problems.append(problem)
+
+        if enable_escalation is None or enable_escalation:
+            verification_window = _read_window(settings)
+            escalation_stages = []
+            if mode == STAGE_GCODE and power_off is not None:
+                escalation_stages.append(STAGE_PSU)
+            if secondary_power_off:
+                escalation_stages.append(STAGE_SECONDARY)
+        else:
+            verification_window = None
+            escalation_stages = ()
+
+        return cls(
+            mode=mode,
+            commands=commands,
+            heater_commands=HEATER_OFF_COMMANDS,
+            psu_plugin_name=psu_plugin_name,
+            power_off=power_off,
+            priority_send=True if priority_send is None else bool(priority_send),
+            secondary_power_off=secondary_power_off,
+            escalation_stages=tuple(escalation_stages),
+            verification_window=verification_window,
+            problems=tuple(problems),
+        )
@@ -0,0 +1,106 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from array import array
+
+# A target that moves by no more than this (°C) counts as unchanged
+RATE_STEADY_TOLERANCE = 0.5
+# The heating rate is only judged once the temperature is within this distance (°C) below its
+# target, so a normal heat-up towards a freshly set target never counts as a runaway
+RATE_TARGET_MARGIN = 5.0
+# After a rate alert the sensor re-arms once its rate falls below this fraction of the limit
+RATE_REARM_FRACTION = 0.5
+
+
+class SlopeEstimator(object):
+    """
+    Least-squares slope of the last `size` (time, value) samples.
+
+    Samples live in a fixed-size ring buffer of doubles and the regression
+    sums are updated incrementally, so push() and slope() are O(1) and do not
+    allocate. To keep rounding errors from accumulating, the sums are
+    recomputed from the buffer (and the time origin moved to the oldest
+    sample) once per full turn of the ring, i.e. O(1) amortised.
+    """
+    __slots__ = ("size", "times", "values", "count", "head", "origin", "pushes",
+                 "sum_t", "sum_y", "sum_tt", "sum_ty")
+
+    def __init__(self, size):
+        if size < 2:
+            raise ValueError("A slope needs a window of at least 2 samples")
+        self.size = size
+        self.times = array("d", [0.0]) * size
+        self.values = array("d", [0.0]) * size
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.head = 0  # Index the next sample is written to
+        self.origin = None
+        self.pushes = 0
+        self.sum_t = 0.0
+        self.sum_y = 0.0
+        self.sum_tt = 0.0
+        self.sum_ty = 0.0
+
+    @property
+    def full(self):
+        return self.count == self.size
+
+    def push(self, timestamp, value):
+        if self.origin is None:
+            self.origin = timestamp
+        t = timestamp - self.origin
+        head = self.head
+        if self.count == self.size:
+            old_t = self.times[head]
+            old_y = self.values[head]
+            self.sum_t -= old_t
+            self.sum_y -= old_y
+            self.sum_tt -= old_t * old_t
+            self.sum_ty -= old_t * old_y
+        else:
+            self.count += 1
+        self.times[head] = t
+        self.values[head] = value
+        self.sum_t += t
+        self.sum_y += value
+        self.sum_tt += t * t
+        self.sum_ty += t * value
+        self.head = (head + 1) % self.size
+
+        self.pushes += 1
+        if self.pushes >= self.size:
+            self._rebase()
+
+    def slope(self):
+        """Rate of change in value units per time unit, or None with fewer than two distinct times"""
+        n = self.count
+        if n < 2:
+            return None
+        denominator = n * self.sum_tt - self.sum_t * self.sum_t
+        if denominator <= 1e-12:
+            return None
+        return (n * self.sum_ty - self.sum_t * self.sum_y) / denominator
+
+    def _rebase(self):
+        """Move the time origin to the oldest sample and recompute the sums exactly"""
+        size = self.size
+        start = self.head if self.count == size else 0
+        shift = self.times[start]
+        self.origin += shift
+        sum_t = sum_y = sum_tt = sum_ty = 0.0
+        for i in range(self.count):
+            index = (start + i) % size
+            t = self.times[index] - shift
+            y = self.values[index]
+            self.times[index] = t
+            sum_t += t
+            sum_y += y
+            sum_tt += t * t
+            sum_ty += t * y
+        self.sum_t = sum_t
+        self.sum_y = sum_y
+        self.sum_tt = sum_tt
+        self.sum_ty = sum_ty
+        self.pushes = 0
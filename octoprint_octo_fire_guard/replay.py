@@ -0,0 +1,435 @@
+# coding=utf-8
+"""
+Offline threshold sweep over OctoPrint serial logs.
+
+Reads the temperature reports in serial.log (or any log with OctoPrint's
+timestamped "Recv: T:... B:..." lines) into per-heater columns and replays
+the guard's threshold check over a grid of thresholds, hystereses and spike
+filters, reporting for every setting how often it would have tripped
+without a real overheat and how late it caught the real ones:
+
+    octo-fire-guard-replay serial.log serial.log.1 --hotend-thresholds 240,250,260 --filters off,n_of_m:3/5
+
+A real overheat is a run of readings above --hotend-overheat or
+--heatbed-overheat lasting at least --sustain seconds. numpy is used for
+the sweep when it is installed.
+"""
+from __future__ import absolute_import
+
+import argparse
+import calendar
+import json
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .guard_settings import THRESHOLD_HYSTERESIS
+from .ingest import IndexedLog
+from .sensors import SensorRegistry, SENSOR_HOTEND, SENSOR_HEATBED
+from .spike import (
+    make_spike_filter, SPIKE_FILTER_OFF, SPIKE_FILTER_CONSECUTIVE, SPIKE_FILTER_MEDIAN,
+    MIN_SPIKE_WINDOW, MAX_SPIKE_WINDOW,
+)
+
+DEFAULT_HOTEND_THRESHOLDS = (240.0, 250.0, 260.0, 270.0, 280.0)
+DEFAULT_HEATBED_THRESHOLDS = (90.0, 100.0, 110.0, 120.0)
+# Temperatures above which a sustained run of readings counts as a real overheat
+DEFAULT_HOTEND_OVERHEAT = 250.0
+DEFAULT_HEATBED_OVERHEAT = 100.0
+DEFAULT_SUSTAIN = 10.0
+
+# Marks a sensor that has not been assigned a series yet
+_UNSERIES = object()
+
+Setting = namedtuple("Setting", ["kind", "threshold", "hysteresis", "spike_filter"])
+
+
+class HeaterSeries(object):
+    """Readings of one heater as columns of report time, actual and target temperature"""
+
+    def __init__(self, key, kind):
+        self.key = key
+        self.kind = kind
+        self.times = array("d")
+        self.actual = array("d")
+        self.target = array("d")
+
+    def __len__(self):
+        return len(self.times)
+
+    def columns(self):
+        """(times, actual) as numpy views of the columns without copying, or the arrays themselves"""
+        if numpy is not None:
+            return numpy.frombuffer(self.times, dtype=numpy.float64), numpy.frombuffer(self.actual, dtype=numpy.float64)
+        return self.times, self.actual
+
+
+class TemperatureLog(object):
+    """
+    The heater readings of one or more logs, one HeaterSeries per hotend and
+    heatbed, read through IndexedLog, so tool0 and T0 end up in the same
+    series.
+    """
+
+    def __init__(self):
+        self.series = {}
+        self.reports = 0
+        self._registry = SensorRegistry()
+        self._by_sensor = {}
+
+    def parse(self, path, start=None, end=None, index_dir=None):
+        """Add the temperature reports of a log file, or only those with start <= time < end"""
+        chunk = TemperatureLog()
+        with IndexedLog(path, index_dir, self._registry) as log:
+            for reported, readings in log.reports(start, end):
+                if chunk.add(reported, readings):
+                    chunk.reports += 1
+        self._merge(chunk)
+
+    def add(self, reported, readings):
+        """Add the heater readings of one report; returns whether it held any"""
+        found = False
+        for sensor, actual, target in readings:
+            series = self._by_sensor.get(sensor, _UNSERIES)
+            if series is _UNSERIES:
+                series = self._series_of(sensor)
+            if series is None:
+                continue
+            series.times.append(reported)
+            series.actual.append(actual)
+            series.target.append(target)
+            found = True
+        return found
+
+    def _series_of(self, sensor):
+        """The series a sensor's readings go into, or None for sensors other than heaters"""
+        series = None
+        if sensor.kind in (SENSOR_HOTEND, SENSOR_HEATBED):
+            name = "T{}".format(sensor.index) if sensor.kind == SENSOR_HOTEND else "B"
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = HeaterSeries(name, sensor.kind)
+        self._by_sensor[sensor] = series
+        return series
+
+    def _merge(self, chunk):
+        """Add a parsed file, keeping every series in time order whichever order rotated logs are given in"""
+        self.reports += chunk.reports
+        for name, added in chunk.series.items():
+            series = self.series.get(name)
+            if series is None:
+                self.series[name] = added
+                continue
+            if not series.times or added.times[0] >= series.times[-1]:
+                series.times.extend(added.times)
+                series.actual.extend(added.actual)
+                series.target.extend(added.target)
+                continue
+            order = sorted(range(len(series) + len(added)),
+                           key=(series.times + added.times).__getitem__)
+            for column in ("times", "actual", "target"):
+                values = getattr(series, column) + getattr(added, column)
+                setattr(series, column, array("d", (values[index] for index in order)))
+
+    def heaters(self, kind):
+        return [self.series[name] for name in sorted(self.series) if self.series[name].kind == kind]
+
+    @property
+    def span(self):
+        """Seconds between the first and the last report"""
+        times = [t for series in self.series.values() if len(series) for t in (series.times[0], series.times[-1])]
+        return max(times) - min(times) if times else 0.0
+
+
+def parse_filter(text):
+    """Parse off, n_of_m:N/M or median:M into a (mode, window, count) spike filter spec"""
+    text = text.strip()
+    if text == SPIKE_FILTER_OFF:
+        return SPIKE_FILTER_OFF, 1, 1
+    mode, _, arguments = text.partition(":")
+    try:
+        if mode == SPIKE_FILTER_CONSECUTIVE:
+            count, _, window = arguments.partition("/")
+            count, window = int(count), int(window)
+        elif mode == SPIKE_FILTER_MEDIAN:
+            count, window = 1, int(arguments)
+        else:
+            raise ValueError(text)
+    except ValueError:
+        raise ValueError("Not a spike filter: {!r} (expected off, n_of_m:N/M or median:M)".format(text))
+    if not MIN_SPIKE_WINDOW <= window <= MAX_SPIKE_WINDOW or not 1 <= count <= window:
+        raise ValueError("Spike filter {!r} is out of range (1 <= N <= M <= {})".format(text, MAX_SPIKE_WINDOW))
+    return mode, window, count
+
+
+def filter_label(spec):
+    mode, window, count = spec
+    if mode == SPIKE_FILTER_CONSECUTIVE:
+        return "{}:{}/{}".format(mode, count, window)
+    if mode == SPIKE_FILTER_MEDIAN:
+        return "{}:{}".format(mode, window)
+    return mode
+
+
+def replay(actual, threshold, hysteresis, spike_filter):
+    """
+    Run the guard's threshold check over a heater's readings, with the same
+    semantics as temperature_callback: a reading trips the guard if the
+    spike filter counts it as above the threshold and the guard has not
+    tripped yet, and the guard re-arms once a reading that does not count
+    as above is at or below threshold - hysteresis. Returns the indices of
+    the readings that tripped and of those that re-armed.
+    """
+    if numpy is not None:
+        return _replay_numpy(actual, threshold, hysteresis, spike_filter)
+    return _replay_python(actual, threshold, hysteresis, spike_filter)
+
+
+def _replay_python(actual, threshold, hysteresis, spike_filter):
+    spike_filter = make_spike_filter(*spike_filter)
+    reset_threshold = threshold - hysteresis
+    exceeded = False
+    trips = []
+    resets = []
+    for index, temperature in enumerate(actual):
+        above = temperature > threshold
+        if spike_filter is not None:
+            above = spike_filter.push(temperature, threshold)
+        if above:
+            if not exceeded:
+                exceeded = True
+                trips.append(index)
+        elif exceeded and temperature <= reset_threshold:
+            exceeded = False
+            resets.append(index)
+    return trips, resets
+
+
+def _replay_numpy(actual, threshold, hysteresis, spike_filter):
+    if not len(actual):
+        return [], []
+    raw = actual > threshold
+    mode, window, count = spike_filter
+    if (mode == SPIKE_FILTER_CONSECUTIVE and count > 1) or (mode == SPIKE_FILTER_MEDIAN and window > 1):
+        # Readings above the threshold among the last `window`, which is all both filters depend on
+        cumulative = numpy.cumsum(raw, dtype=numpy.int64)
+        counts = cumulative.copy()
+        counts[window:] -= cumulative[:-window]
+        if mode == SPIKE_FILTER_CONSECUTIVE:
+            above = raw & (counts >= count)
+        else:
+            # The lower median of the window, with its empty slots below the threshold until it
+            # has filled, is above the threshold iff window - (window - 1) // 2 readings are
+            above = counts >= window - (window - 1) // 2
+    else:
+        above = raw
+    clear = ~above & (actual <= threshold - hysteresis)
+    # The latch only changes on an above or a clearing reading: it trips on an above reading
+    # following a clearing one (or none) and re-arms on a clearing reading following an above one
+    events = numpy.flatnonzero(above | clear)
+    if not len(events):
+        return [], []
+    kinds = above[events]
+    tripping = kinds.copy()
+    tripping[1:] &= ~kinds[:-1]
+    rearming = ~kinds
+    rearming[1:] &= kinds[:-1]
+    rearming[0] = False
+    return events[tripping].tolist(), events[rearming].tolist()
+
+
+def find_overheats(times, actual, limit, sustain):
+    """(first, last) reading indices of every run of readings above limit lasting at least sustain seconds"""
+    if numpy is not None:
+        hot = numpy.concatenate(([False], numpy.asarray(actual) > limit, [False]))
+        edges = numpy.flatnonzero(hot[1:] != hot[:-1])
+        runs = zip(edges[0::2].tolist(), (edges[1::2] - 1).tolist())
+    else:
+        runs = []
+        first = None
+        for index, temperature in enumerate(actual):
+            if temperature > limit:
+                if first is None:
+                    first = index
+            elif first is not None:
+                runs.append((first, index - 1))
+                first = None
+        if first is not None:
+            runs.append((first, len(actual) - 1))
+    return [(first, last) for first, last in runs if times[last] - times[first] >= sustain]
+
+
+def score(times, trips, resets, overheats):
+    """
+    Match trips against overheats. A trip latches the guard until the
+    reading that re-arms it; it caught every overheat that starts before it
+    re-arms and ends after it tripped, and is a false trip if there is none.
+    Returns (false trips, delay from overheat start to the first trip
+    catching it in seconds or None if missed, for every overheat).
+    """
+    ends = [last for _, last in overheats]
+    caught = [None] * len(overheats)
+    false_trips = 0
+    for number, trip in enumerate(trips):
+        rearmed = resets[number] if number < len(resets) else len(times)
+        index = bisect_left(ends, trip)
+        if index == len(overheats) or overheats[index][0] >= rearmed:
+            false_trips += 1
+            continue
+        while index < len(overheats) and overheats[index][0] < rearmed:
+            if caught[index] is None:
+                caught[index] = trip
+            index += 1
+    delays = [None if trip is None else times[trip] - times[first]
+              for (first, _), trip in zip(overheats, caught)]
+    return false_trips, delays
+
+
+def sweep(heaters, kind, thresholds, hystereses, filters, overheat, sustain):
+    """Replay every combination of threshold, hysteresis and spike filter over the heaters; one dict per setting"""
+    columns = []
+    for series in heaters:
+        times, actual = series.columns()
+        columns.append((times, actual, find_overheats(times, actual, overheat, sustain)))
+
+    results = []
+    for threshold in thresholds:
+        for hysteresis in hystereses:
+            for spike_filter in filters:
+                trips = false_trips = 0
+                delays = []
+                for times, actual, overheats in columns:
+                    tripped, rearmed = replay(actual, threshold, hysteresis, spike_filter)
+                    false_count, overheat_delays = score(times, tripped, rearmed, overheats)
+                    trips += len(tripped)
+                    false_trips += false_count
+                    delays.extend(overheat_delays)
+                caught = [delay for delay in delays if delay is not None]
+                results.append(dict(
+                    setting=Setting(kind, threshold, hysteresis, filter_label(spike_filter)),
+                    trips=trips,
+                    false_trips=false_trips,
+                    overheats=len(delays),
+                    caught=len(caught),
+                    mean_delay=sum(caught) / len(caught) if caught else None,
+                    max_delay=max(caught) if caught else None,
+                ))
+    return results
+
+
+def _format_delay(delay):
+    return "-" if delay is None else "{:.1f}".format(delay)
+
+
+def print_results(results, out=sys.stdout):
+    out.write("{:>8} {:>5} {:>15} {:>6} {:>6} {:>9} {:>10} {:>10}\n".format(
+        "thresh", "hyst", "filter", "trips", "false", "caught", "mean dly s", "max dly s"))
+    for result in results:
+        setting = result["setting"]
+        out.write("{:>8g} {:>5g} {:>15} {:>6d} {:>6d} {:>9} {:>10} {:>10}\n".format(
+            setting.threshold, setting.hysteresis, setting.spike_filter, result["trips"], result["false_trips"],
+            "{}/{}".format(result["caught"], result["overheats"]),
+            _format_delay(result["mean_delay"]), _format_delay(result["max_delay"])))
+
+
+def _float_list(text):
+    try:
+        return [float(value) for value in text.split(",") if value.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a comma-separated list of numbers: {!r}".format(text))
+
+
+def _filter_list(text):
+    try:
+        return [parse_filter(value) for value in text.split(",") if value.strip()]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _log_time(text):
+    """A log timestamp such as 2026-03-01 or "2026-03-01 10:00[:00]" in the convention of IndexedLog"""
+    for layout in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return float(calendar.timegm(time.strptime(text.strip(), layout)))
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError("not a time like 2026-03-01 or '2026-03-01 10:00': {!r}".format(text))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay OctoPrint serial logs over a grid of Octo Fire Guard threshold settings")
+    parser.add_argument("logs", nargs="+", help="serial.log or octoprint.log files, rotated and .gz ones included")
+    parser.add_argument("--hotend-thresholds", type=_float_list, default=list(DEFAULT_HOTEND_THRESHOLDS),
+                        help="comma-separated hotend thresholds in °C")
+    parser.add_argument("--heatbed-thresholds", type=_float_list, default=list(DEFAULT_HEATBED_THRESHOLDS),
+                        help="comma-separated heatbed thresholds in °C")
+    parser.add_argument("--hysteresis", type=_float_list, default=[THRESHOLD_HYSTERESIS],
+                        help="comma-separated drops below the threshold in °C that re-arm the guard")
+    parser.add_argument("--filters", type=_filter_list, default=[parse_filter(SPIKE_FILTER_OFF)],
+                        help="comma-separated spike filters: off, n_of_m:N/M or median:M")
+    parser.add_argument("--hotend-overheat", type=float, default=DEFAULT_HOTEND_OVERHEAT,
+                        help="hotend temperature in °C above which a sustained run of readings is a real overheat")
+    parser.add_argument("--heatbed-overheat", type=float, default=DEFAULT_HEATBED_OVERHEAT,
+                        help="heatbed temperature in °C above which a sustained run of readings is a real overheat")
+    parser.add_argument("--sustain", type=float, default=DEFAULT_SUSTAIN,
+                        help="seconds a run of readings must last to be a real overheat")
+    parser.add_argument("--since", type=_log_time, default=None,
+                        help="only replay reports logged at or after this time, e.g. '2026-03-01 08:00'")
+    parser.add_argument("--until", type=_log_time, default=None,
+                        help="only replay reports logged before this time")
+    parser.add_argument("--index-dir", default=None,
+                        help="folder for the log indexes (default: next to each log)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    log = TemperatureLog()
+    for path in args.logs:
+        log.parse(path, args.since, args.until, args.index_dir)
+    parsed = time.perf_counter()
+
+    sweeps = (
+        ("hotend", SENSOR_HOTEND, args.hotend_thresholds, args.hotend_overheat),
+        ("heatbed", SENSOR_HEATBED, args.heatbed_thresholds, args.heatbed_overheat),
+    )
+    results = dict((name, sweep(log.heaters(kind), name, thresholds, args.hysteresis, args.filters,
+                                overheat, args.sustain))
+                   for name, kind, thresholds, overheat in sweeps)
+    finished = time.perf_counter()
+
+    if args.json:
+        json.dump(dict(
+            reports=log.reports,
+            span=log.span,
+            heaters=sorted(log.series),
+            evaluated_with="numpy" if numpy is not None else "python",
+            results=dict((name, [dict(result, setting=result["setting"]._asdict()) for result in rows])
+                         for name, rows in results.items()),
+        ), sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 0
+
+    print("{} temperature reports over {:.1f} h from {} log(s), heaters: {}".format(
+        log.reports, log.span / 3600.0, len(args.logs), ", ".join(sorted(log.series)) or "none"))
+    print("Parsed in {:.2f} s, swept in {:.2f} s with {}".format(
+        parsed - started, finished - parsed, "numpy" if numpy is not None else "python"))
+    for name, kind, _, overheat in sweeps:
+        if not log.heaters(kind):
+            continue
+        print()
+        print("{} (real overheat: above {:g}°C for {:g} s; a negative delay trips before that)".format(
+            name.capitalize(), overheat, args.sustain))
+        print_results(results[name])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,519 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import operator
+import re
+
+from .sensors import classify_sensor_key, SENSOR_HOTEND, SENSOR_HEATBED, SENSOR_CHAMBER, SENSOR_PROBE
+
+# Canonical sensor names the rules refer to, whichever key format the printer reports
+_CANONICAL_NAMES = {
+    SENSOR_HEATBED: "bed",
+    SENSOR_CHAMBER: "chamber",
+    SENSOR_PROBE: "probe",
+}
+_ATTRIBUTES = ("actual", "target")
+_COMPARISONS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+# The comparison with its operands swapped, used to put a constant on the right
+_MIRRORED = {">": "<", ">=": "<=", "<": ">", "<=": ">=", "==": "==", "!=": "!="}
+_ARITHMETIC = {"+": operator.add, "-": operator.sub, "*": operator.mul}
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "sec": 1.0, "min": 60.0}
+_KEYWORDS = ("and", "or", "not", "any", "all", "for")
+
+_TOKEN = re.compile(r"\s*(?:(\d+(?:\.\d*)?|\.\d+)|([A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_]+)?)|(>=|<=|==|!=|[<>()+\-*]))")
+
+
+class RuleError(ValueError):
+    pass
+
+
+class Reading(object):
+    """Latest actual and target temperature of one sensor; None until reported"""
+    __slots__ = ("name", "actual", "target")
+
+    def __init__(self, name):
+        self.name = name
+        self.actual = None
+        self.target = None
+
+
+class _Cursor(object):
+    """The tool an any/all rule is currently looking at"""
+    __slots__ = ("reading",)
+
+    def __init__(self):
+        self.reading = Reading("tool")
+
+
+class Rule(object):
+    """
+    A compiled rule: condition is a closure without arguments returning True
+    while the rule's condition holds, duration how long it must hold in
+    seconds before the rule trips.
+    """
+    __slots__ = ("number", "source", "condition", "duration", "since", "tripped")
+
+    def __init__(self, number, source, condition, duration):
+        self.number = number
+        self.source = source
+        self.condition = condition
+        self.duration = duration
+        self.since = None
+        self.tripped = False
+
+    def held(self, now):
+        """Seconds the condition has held for at now, None if it does not hold"""
+        if self.condition():
+            since = self.since
+            if since is None:
+                since = self.since = now
+            return now - since
+        self.since = None
+        return None
+
+    def reset(self):
+        self.since = None
+        self.tripped = False
+
+    def __repr__(self):
+        return "Rule({}: {!r})".format(self.number, self.source)
+
+
+class _AnyToolRule(Rule):
+    """
+    An any rule with a duration. The hold is timed for every tool on its own,
+    so the rule only trips once a single tool has met the condition for the
+    whole duration, not when the tools take turns meeting it.
+    """
+    __slots__ = ("tools", "cursor", "tool_condition", "tool_since")
+
+    def __init__(self, number, source, condition, duration, tools, cursor, tool_condition):
+        Rule.__init__(self, number, source, condition, duration)
+        self.tools = tools
+        self.cursor = cursor
+        self.tool_condition = tool_condition
+        self.tool_since = {}  # Reading -> time the tool started meeting the condition
+
+    def held(self, now):
+        longest = None
+        cursor, tool_condition, tool_since = self.cursor, self.tool_condition, self.tool_since
+        for reading in self.tools:
+            cursor.reading = reading
+            if tool_condition():
+                since = tool_since.get(reading)
+                if since is None:
+                    since = tool_since[reading] = now
+                if longest is None or now - since > longest:
+                    longest = now - since
+            elif reading in tool_since:
+                del tool_since[reading]
+        self.since = None if longest is None else now - longest
+        return longest
+
+    def reset(self):
+        Rule.reset(self)
+        self.tool_since.clear()
+
+
+class GuardRules(object):
+    """
+    Custom guard conditions, compiled once from the rule text in the settings.
+
+    Every line holds one rule (blank lines and lines starting with # are
+    skipped):
+
+        chamber > 60 and bed.target == 0
+        any tool > target + 25 for 5s
+        T1 >= 280 or (tool1 > tool1.target + 15 and bed > 110)
+
+    A sensor is named like OctoPrint reports it (tool0/T0, bed/B, chamber/C,
+    probe/P) and stands for its actual temperature, or its target with
+    .target. Rules starting with any or all hold if their condition holds
+    for any or all tools, which it refers to as tool (or just actual and
+    target). Conditions combine comparisons (> >= < <= == !=) of sums with
+    and, or, not and parentheses; for <duration> (ms, s or min) requires
+    the condition to hold that long, for an any rule by a single tool.
+
+    The parser emits closures instead of a syntax tree, with comparisons
+    against constants specialised and constant subexpressions folded, so
+    evaluating a rule is a single call without any interpretation. The
+    closures read Reading objects that update() fills in from the
+    temperature reports. A comparison with a sensor that has not reported a
+    value yet does not hold.
+    """
+
+    def __init__(self):
+        self.rules = []
+        self._readings = {}  # Canonical name -> Reading
+        self._by_key = {}  # Reported key -> Reading
+        self._tools = []
+
+    @classmethod
+    def compile(cls, text):
+        """Compile the rule text; returns (rules or None if there are none, list of problems)"""
+        guard_rules = cls()
+        problems = []
+        for number, line in enumerate((text or "").split("\n"), 1):
+            source = line.strip()
+            if not source or source.startswith("#"):
+                continue
+            try:
+                rule = _Parser(guard_rules, source).parse(number)
+            except RuleError as e:
+                problems.append("Rule {} ({}): {}".format(number, source, str(e)))
+                continue
+            guard_rules.rules.append(rule)
+        return (guard_rules if guard_rules.rules else None), problems
+
+    def reading(self, name):
+        """The Reading of a canonical sensor name, created on first use"""
+        reading = self._readings.get(name)
+        if reading is None:
+            reading = self._readings[name] = Reading(name)
+            if name.startswith("tool"):
+                self._tools.append(reading)
+        return reading
+
+    @property
+    def tools(self):
+        return self._tools
+
+    def update(self, sensor, temp_data):
+        """Record a temperature report of a classified sensor; called on the comm thread"""
+        reading = self._by_key.get(sensor.key)
+        if reading is None:
+            reading = self._by_key[sensor.key] = self.reading(canonical_name(sensor))
+        reading.actual = temp_data[0]
+        reading.target = temp_data[1]
+
+    def evaluate(self, now):
+        """
+        Evaluate every rule against the latest readings; returns the rules that
+        tripped with this evaluation, or None. A tripped rule trips again only
+        after its condition has stopped holding.
+        """
+        tripped = None
+        for rule in self.rules:
+            held = rule.held(now)
+            if held is None:
+                rule.tripped = False
+            elif not rule.tripped and held >= rule.duration:
+                rule.tripped = True
+                if tripped is None:
+                    tripped = []
+                tripped.append(rule)
+        return tripped
+
+    def reset(self):
+        """Forget readings and rule state, e.g. after a reconnect"""
+        for reading in self._readings.values():
+            reading.actual = None
+            reading.target = None
+        for rule in self.rules:
+            rule.reset()
+
+
+def canonical_name(sensor):
+    if sensor.kind == SENSOR_HOTEND:
+        return "tool{}".format(sensor.index)
+    return _CANONICAL_NAMES.get(sensor.kind, sensor.key)
+
+
+class _Number(object):
+    """A numeric subexpression: a constant, or a getter returning a float or None"""
+    __slots__ = ("const", "getter")
+
+    def __init__(self, const=None, getter=None):
+        self.const = const
+        self.getter = getter
+
+
+class _Parser(object):
+    """Recursive descent parser emitting closures"""
+
+    def __init__(self, guard_rules, source):
+        self._guard_rules = guard_rules
+        self._source = source
+        self._tokens = _tokenize(source)
+        self._position = 0
+        self._cursor = None
+        self._sensors = 0
+
+    def parse(self, number):
+        """The Rule for the source, numbered number"""
+        quantifier = None
+        if self._peek() in ("any", "all"):
+            quantifier = self._next()
+            self._cursor = _Cursor()
+        condition = self._or()
+        if isinstance(condition, _Number) or not callable(condition):
+            raise RuleError("condition must compare temperatures")
+        duration = 0.0
+        if self._peek() == "for":
+            self._next()
+            duration = self._duration()
+        if self._peek() is not None:
+            raise RuleError("unexpected '{}'".format(self._peek()))
+        if not self._sensors:
+            raise RuleError("rule does not refer to any sensor")
+        if quantifier is None:
+            return Rule(number, self._source, condition, duration)
+        tools = self._guard_rules.tools
+        quantified = _quantified(quantifier, self._cursor, tools, condition)
+        if quantifier == "any" and duration > 0:
+            return _AnyToolRule(number, self._source, quantified, duration, tools, self._cursor, condition)
+        return Rule(number, self._source, quantified, duration)
+
+    def _peek(self):
+        return self._tokens[self._position] if self._position < len(self._tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise RuleError("unexpected end of rule")
+        self._position += 1
+        return token
+
+    def _expect(self, token):
+        if self._next() != token:
+            raise RuleError("expected '{}'".format(token))
+
+    def _duration(self):
+        value = self._next()
+        try:
+            seconds = float(value)
+        except ValueError:
+            raise RuleError("expected a duration after 'for'")
+        unit = self._peek()
+        if unit in _DURATION_UNITS:
+            self._next()
+            seconds *= _DURATION_UNITS[unit]
+        return seconds
+
+    # Conditions are closures returning a bool; the bools True and False stand for folded constants.
+    # A parenthesised group is parsed once, as whatever it holds, so the methods below return a
+    # condition or a _Number, and the operators check what they got
+
+    def _or(self):
+        left = self._and()
+        while self._peek() == "or":
+            self._next()
+            left = _or(self._condition(left), self._condition(self._and()))
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self._peek() == "and":
+            self._next()
+            left = _and(self._condition(left), self._condition(self._not()))
+        return left
+
+    def _not(self):
+        if self._peek() == "not":
+            self._next()
+            return _not(self._condition(self._not()))
+        return self._comparison()
+
+    def _comparison(self):
+        left = self._sum()
+        if not isinstance(left, _Number) or self._peek() not in _COMPARISONS:
+            # A parenthesised condition, or a sum the caller must accept or reject
+            return left
+        op = self._next()
+        right = self._number(self._sum())
+        return _compare(left, op, right)
+
+    def _condition(self, value):
+        if isinstance(value, _Number):
+            raise RuleError("expected a comparison, got '{}'".format(self._peek() or "end of rule"))
+        return value
+
+    def _number(self, value):
+        if not isinstance(value, _Number):
+            raise RuleError("expected a temperature or number, not a condition")
+        return value
+
+    def _sum(self):
+        left = self._product()
+        while self._peek() in ("+", "-"):
+            op = self._next()
+            left = _arithmetic(self._number(left), op, self._number(self._product()))
+        return left
+
+    def _product(self):
+        left = self._unary()
+        while self._peek() == "*":
+            op = self._next()
+            left = _arithmetic(self._number(left), op, self._number(self._unary()))
+        return left
+
+    def _unary(self):
+        if self._peek() == "-":
+            self._next()
+            return _arithmetic(_Number(const=0.0), "-", self._number(self._unary()))
+        return self._operand()
+
+    def _operand(self):
+        token = self._next()
+        if token == "(":
+            value = self._or()
+            self._expect(")")
+            return value
+        try:
+            return _Number(const=float(token))
+        except ValueError:
+            pass
+        if token in _KEYWORDS or not (token[0].isalpha() or token[0] == "_"):
+            raise RuleError("unexpected '{}'".format(token))
+        return self._sensor(token)
+
+    def _sensor(self, token):
+        name, _, attribute = token.partition(".")
+        if name in _ATTRIBUTES and not attribute:
+            name, attribute = "tool", name
+        attribute = attribute or "actual"
+        if attribute not in _ATTRIBUTES:
+            raise RuleError("unknown attribute '{}', use actual or target".format(attribute))
+        self._sensors += 1
+        if name in ("tool", "tools"):
+            if self._cursor is None:
+                raise RuleError("'{}' needs a rule starting with any or all".format(token))
+            return _Number(getter=_cursor_getter(self._cursor, attribute))
+        sensor = classify_sensor_key(name)
+        if sensor.ignored:
+            raise RuleError("unknown sensor '{}'".format(name))
+        reading = self._guard_rules.reading(canonical_name(sensor))
+        return _Number(getter=_reading_getter(reading, attribute))
+
+
+def _tokenize(source):
+    tokens = []
+    position = 0
+    source = source.rstrip()
+    while position < len(source):
+        match = _TOKEN.match(source, position)
+        if match is None or match.end() == position:
+            raise RuleError("unexpected '{}'".format(source[position:].strip()[:1]))
+        tokens.append(match.group(match.lastindex))
+        position = match.end()
+    return tokens
+
+
+def _reading_getter(reading, attribute):
+    if attribute == "target":
+        return lambda: reading.target
+    return lambda: reading.actual
+
+
+def _cursor_getter(cursor, attribute):
+    if attribute == "target":
+        return lambda: cursor.reading.target
+    return lambda: cursor.reading.actual
+
+
+def _arithmetic(left, op, right):
+    func = _ARITHMETIC[op]
+    if left.getter is None and right.getter is None:
+        return _Number(const=func(left.const, right.const))
+    if right.getter is None:
+        get, const = left.getter, right.const
+
+        def value():
+            a = get()
+            return None if a is None else func(a, const)
+    elif left.getter is None:
+        const, get = left.const, right.getter
+
+        def value():
+            b = get()
+            return None if b is None else func(const, b)
+    else:
+        get_a, get_b = left.getter, right.getter
+
+        def value():
+            a = get_a()
+            if a is None:
+                return None
+            b = get_b()
+            return None if b is None else func(a, b)
+    return _Number(getter=value)
+
+
+def _compare(left, op, right):
+    if left.getter is None and right.getter is None:
+        return bool(_COMPARISONS[op](left.const, right.const))
+    if left.getter is None:
+        left, right, op = right, left, _MIRRORED[op]
+    func = _COMPARISONS[op]
+    get = left.getter
+    if right.getter is None:
+        const = right.const
+
+        def condition():
+            a = get()
+            return a is not None and func(a, const)
+    else:
+        get_b = right.getter
+
+        def condition():
+            a = get()
+            if a is None:
+                return False
+            b = get_b()
+            return b is not None and func(a, b)
+    return condition
+
+
+def _and(left, right):
+    if left is False or right is False:
+        return False
+    if left is True:
+        return right
+    if right is True:
+        return left
+    return lambda: left() and right()
+
+
+def _or(left, right):
+    if left is True or right is True:
+        return True
+    if left is False:
+        return right
+    if right is False:
+        return left
+    return lambda: left() or right()
+
+
+def _not(condition):
+    if condition is True or condition is False:
+        return not condition
+    return lambda: not condition()
+
+
+def _quantified(quantifier, cursor, tools, condition):
+    if quantifier == "any":
+        def holds():
+            for reading in tools:
+                cursor.reading = reading
+                if condition():
+                    return True
+            return False
+    else:
+        def holds():
+            seen = False
+            for reading in tools:
+                if reading.actual is None:
+                    continue  # Tools that have not reported are skipped
+                cursor.reading = reading
+                if not condition():
+                    return False
+                seen = True
+            return seen
+    return holds
@@ -0,0 +1,85 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+SENSOR_HOTEND = "hotend"
+SENSOR_HEATBED = "heatbed"
+SENSOR_CHAMBER = "chamber"
+SENSOR_PROBE = "probe"
+SENSOR_IGNORED = "ignored"
+
+# Keys that name a single heater, in both the old (bed) and new (B) OctoPrint formats
+_NAMED_SENSORS = {
+    "bed": SENSOR_HEATBED,
+    "B": SENSOR_HEATBED,
+    "chamber": SENSOR_CHAMBER,
+    "C": SENSOR_CHAMBER,
+    "probe": SENSOR_PROBE,
+    "P": SENSOR_PROBE,
+}
+
+# Prefixes of numbered heaters, in both the old (tool0) and new (T0) formats
+_INDEXED_PREFIXES = (
+    ("tool", SENSOR_HOTEND),
+    ("T", SENSOR_HOTEND),
+)
+
+
+class SensorRecord(object):
+    """
+    Classification of a key reported in parsed_temperatures.
+
+    state is the guard state of the heater behind the key (see
+    guard_state.GuardStateTable.bind) and history its temperature history
+    (see history.TemperatureHistory.bind). Both are cached on the record the
+    first time the key is seen and stay None where they do not apply.
+    """
+    __slots__ = ("key", "kind", "index", "state", "history")
+
+    def __init__(self, key, kind, index=None):
+        self.key = key
+        self.kind = kind
+        self.index = index
+        self.state = None
+        self.history = None
+
+    @property
+    def ignored(self):
+        return self.kind == SENSOR_IGNORED
+
+    def __repr__(self):
+        return "SensorRecord(key={!r}, kind={!r}, index={!r})".format(self.key, self.kind, self.index)
+
+
+def classify_sensor_key(key):
+    """
+    Classify a temperature key reported by OctoPrint.
+
+    Hotends are reported as tool0..N or T0..N, the heatbed as bed or B, the
+    chamber as chamber or C and the probe as probe or P. Anything else,
+    including malformed keys such as "T" or "Ta", is classified as ignored.
+    """
+    kind = _NAMED_SENSORS.get(key)
+    if kind is not None:
+        return SensorRecord(key, kind)
+
+    for prefix, kind in _INDEXED_PREFIXES:
+        if key.startswith(prefix):
+            suffix = key[len(prefix):]
+            if suffix.isascii() and suffix.isdigit():
+                return SensorRecord(key, kind, int(suffix))
+
+    return SensorRecord(key, SENSOR_IGNORED)
+
+
+class SensorRegistry(dict):
+    """
+    Cache of SensorRecords keyed by the reported temperature key.
+
+    A key is classified the first time it is seen; after that, looking it up
+    with registry[key] is a single dict hit. Unknown keys are cached as
+    ignored records so they cost nothing on later samples either.
+    """
+
+    def __missing__(self, key):
+        record = self[key] = classify_sensor_key(key)
+        return record
@@ -0,0 +1,116 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from bisect import bisect_left, insort
+
+SPIKE_FILTER_OFF = "off"
+SPIKE_FILTER_CONSECUTIVE = "n_of_m"
+SPIKE_FILTER_MEDIAN = "median"
+SPIKE_FILTER_MODES = (SPIKE_FILTER_OFF, SPIKE_FILTER_CONSECUTIVE, SPIKE_FILTER_MEDIAN)
+
+# Bounds for the number of samples a filter looks at
+MIN_SPIKE_WINDOW = 1
+MAX_SPIKE_WINDOW = 15
+
+
+class NOfMFilter(object):
+    """
+    Reports a reading above the threshold only once `required` of the last
+    `size` readings were above it.
+
+    The last `size` verdicts live in a preallocated bytearray ring with a
+    running count of the readings above, so push() is O(1) and does not
+    allocate. A sustained overheat is reported `required - 1` readings late.
+    """
+    __slots__ = ("size", "required", "marks", "head", "above")
+
+    def __init__(self, size, required):
+        self.size = size
+        self.required = required
+        self.marks = bytearray(size)
+        self.clear()
+
+    def clear(self):
+        marks = self.marks
+        for index in range(self.size):
+            marks[index] = 0
+        self.head = 0
+        self.above = 0
+
+    @property
+    def delay(self):
+        """Readings an overheat is reported late by, at most"""
+        return self.required - 1
+
+    def push(self, temperature, threshold):
+        """Record a reading; True if it counts as above threshold"""
+        mark = 1 if temperature > threshold else 0
+        head = self.head
+        self.above += mark - self.marks[head]
+        self.marks[head] = mark
+        head += 1
+        self.head = 0 if head == self.size else head
+        return mark == 1 and self.above >= self.required
+
+
+class MedianFilter(object):
+    """
+    Compares the running median of the last `size` readings with the threshold.
+
+    The readings are kept twice in lists of fixed length: in arrival order in
+    a ring, and sorted. Each push() finds the oldest reading in the sorted
+    list by bisection and replaces it with the new one, moving the elements
+    in between in place, so the lists never grow past `size` and no container
+    is allocated. The lower median is used for even sizes. Until the window
+    has filled, its empty slots count as below the threshold, so a single
+    glitch as the first reading does not trip either. A sustained overheat is
+    reported once size - (size - 1) // 2 readings were above the threshold,
+    e.g. 2 readings late for size 5.
+    """
+    __slots__ = ("size", "ring", "ordered", "head", "count")
+
+    def __init__(self, size):
+        self.size = size
+        self.ring = [0.0] * size
+        self.ordered = []
+        self.clear()
+
+    def clear(self):
+        del self.ordered[:]
+        self.head = 0
+        self.count = 0
+
+    @property
+    def delay(self):
+        """Readings an overheat is reported late by, at most"""
+        return self.size - (self.size - 1) // 2 - 1
+
+    def push(self, temperature, threshold):
+        """Record a reading; True if the median is above threshold"""
+        ordered = self.ordered
+        head = self.head
+        if self.count == self.size:
+            old = self.ring[head]
+            index = bisect_left(ordered, old)
+            if index == self.count or ordered[index] != old:
+                # A NaN is not found by bisection, but by identity
+                index = ordered.index(old)
+            del ordered[index]
+        else:
+            self.count += 1
+        insort(ordered, temperature)
+        self.ring[head] = temperature
+        head += 1
+        self.head = 0 if head == self.size else head
+        # Position of the median with the empty slots sorted below every reading
+        index = (self.size - 1) // 2 - (self.size - self.count)
+        return index >= 0 and ordered[index] > threshold
+
+
+def make_spike_filter(mode, size, required):
+    """A new filter for the mode, or None if readings are compared unfiltered"""
+    if mode == SPIKE_FILTER_CONSECUTIVE and required > 1:
+        return NOfMFilter(size, required)
+    if mode == SPIKE_FILTER_MEDIAN and size > 1:
+        return MedianFilter(size)
+    return None
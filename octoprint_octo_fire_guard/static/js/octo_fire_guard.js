@@ -25,7 +25,21 @@ $(function() {
         self.alertCurrentTemp = ko.observable(0);
         self.alertThreshold = ko.observable(0);
         self.alertAudioInterval = null;  // For continuous beeping
+        self.alarmPeriod = 2;  // Seconds from one beep to the next
+        self.alarmContext = null;  // Web Audio context, created on the first alarm
+        self.alarmBuffer = null;  // One decoded beep period, reused by every alarm
+        self.alarmSource = null;  // Looping source of the playing alarm
+        self.alarmGeneration = 0;  // Bumped on start and stop, so a late decode cannot restart a stopped alarm
         self.dataTimeoutNotification = null;  // Store reference to timeout notification for dismissal
+        self.planWarningNotification = null;  // Emergency plan problems, replaced when the plan changes
+        self.guardStatus = ko.observable({});  // Live status per sensor key: [actual, target, headroom, state]
+        self.sparklineWindow = 600;  // Seconds of history shown in the headroom tab
+        self.sparklineRowHeight = 48;  // Pixels per sensor
+        self.sparklineScrollInterval = 2000;  // Milliseconds between redraws without new data
+        self.sparklineSeries = {};  // Sensor key -> [[time, actual, threshold], ...] within the window
+        self.sparklineFrame = null;  // Pending animation frame, at most one at a time
+        self.sparklineVisible = false;  // Only drawn while the tab is shown
+        self.sparklineTimer = null;
         
         // Alert sound data (base64-encoded WAV)
         self.alertSoundData = "data:audio/wav;base64,UklGRnoGAABXQVZFZm10IBAAAAABAAEAQB8AAEAfAAABAAgAZGF0YQoGAACBhYqFbF1fdJivrJBhNjVgodDbq2EcBj+a2/LDciUFLIHO8tiJNwgZaLvt559NEAxQp+PwtmMcBjiR1/LMeSwFJHfH8N2QQAoUXrTp66hVFApGn+DyvmwhBDCA0PLQgyoHHm7A7+OZSA8PVqzn77BdGAo+ltzy0H8pBSl+zPDTizUJHGq77OWdTQ0PUqvl8LdnGwo8j9nyw38oBCN7yfDXkTYKHGO57OWhUBEOTqjj87JlHAhCmdzy0oQtBSZ+zPDSjTcKG2G37eWfURENS6bi9rtnHQhFm9vyzIUtBSh+y/HSjTcKGl627ueYThIMS6bi9rxlHwhBmNvyz4cpBSh9yvHWkDoJGmC27OmdUREMSabi97JjHgdBmdry0IYqBSd9y/HVkToJGl+37OmdUREMSaXh9bNkHQhCmNry0YcpBSh9y/HUkDsKGV+37OmeUhIMSabg9bRkHQhBl9ry0oYqBCh8yvHVkToKGV627umeUhEMSabh9bJjHgdBl9ny0oYpBSh9y/HVkToJGl+37OmeUhIMSKXh9rRjHQhBl9ry0oYqBSh8yvHVkToJGl+37OieUhEMSKXh9rJjHgdAl9ny04YpBSh8yvDVkToKGV+27OmeUhEMSKXh9rJjHghAl9ny0oYqBSh8yvHVkDoKGV+37OieUhEMR6bh9rJjHQhAl9ry0oYpBSh8y/HVkDoJGV627umeUhEMSKXh9rJjHgdAl9ny0oYqBSh8yvHVkDoKGV+37OieUREMSKXh9rJjHQhAl9ny04YpBSh8yvDVkToKGV+37OieUhEMSKXh9rJjHghAl9ny0oYqBSh8yvHVkDoKGV+37OieUREMSKbh9rJjHQhBmNry0oYpBSh8y/HVkDoJGV627umeUhEMSKXh9rJjHgdAl9ny0oYqBSh8yvHVkDoKGV+37OieURENSKXh9rJjHghAl9ny04YpBSh8yvDVkToKGV+37OieUhEMSKXh9rJjHgdBmNry0oYqBSh8yvHVkDoKGV+37OieUhINSKXh9rJjHQhBl9ry0oYpBSh8y/HVkDoKGV627umeUhIMSKbh9rJjHgdBl9ny04YqBSh8yvDVkToJGV+27OmeUhEMSKXh9rJjHghBl9ny0oYqBSh8yvHVkDoKGV+37OmeUhENSKbh9rJjHghBmNry0oYpBSh8y/HVkDoKGV+37OieUhIMSKXh9rJjHgdBl9ry0oYqBSh8yvHVkDoKGV+37OieUhIMSKXh9rJjHgdBl9ny04YqBSh8yvDVkToKGV+37OieUhEMSKbh9rJjHghBl9ny0oYqBSh8yvHVkDoKGV+37OieURENSKXh9rJjHwhBmNry0oYpBSh8y/HVkDoKGV627umeUhIMSKXh9rJjHgdBl9ny0oYqBSh8yvHVkDoKGV+37OmeUhENSKbh9rJjHQhBl9ry0oYqBSh8yvHVkDoKGV+37OieUhEMSKXh9rJjHgdBl9ny04YqBSh8yvDVkToKGV+37OieUhIMSKXh9rJjHghBl9ny0oYqBSh8yvHVkDoKGV+37OieUhENSKXh9rJjHghBmNry0oYpBSh8y/HVkDoKGV627umeUhIMSKbh9rJjHgdBl9ny0oYqBSh8yvHVkDoKGV+37OmeUhIMSKXh9rJjHgdBl9ny04YqBSh8yvDVkToKGV+37OieUhEMSKbh9rJjHghBl9ny0oYqBSh8yvHVkDoKGV+37OieURENSKXh9rJjHwhBmNry0oYpBSh8y/HVkDoKGV627umeUhIMSKXh9rJjHgdBl9ny0oYqBSh8yvHVkDoKGV+37OmeUhENSKbh9rJjHQhBl9ry0oYqBSh8yvHVkDoKGV+37OieUhEMSKXh9rJjHgdBl9ny04YqBSh8yvDVkToKGV+37OieUhIMSKXh9rJjHghBl9ny0oYqBSh8yvHVkDoKGV+37OieUhENSKXh9rJjHghBmNry0oYpBSh8y/HVkDoKGV627umeUhIMSKbh9rJjHgdBl9ny0oYqBSh8yvHVkDoKGV+37OmeUhIMSKXh9rJjHgdBl9ny04YqBSh8yvDVkToKGV+37OieUhEMSKbh9rJjHghBl9ny0oYqBSh8yvHVkDoKGV+37OieURENSKXh9rJjHwhBmNry0oYpBSh8y/HVkDoKGV627umeUhIMSKXh9rJjHgdBl9ny0oYqBSh8yvHVkDoKGV+37OmeUhENSKbh9rJjHQhBl9ry0oYqBSh8yvHVkDoKGV+37OieUhEMSKXh9rJjHgdBl9ny04YqBSh8yvDVkToKGV+37OieUhIMSKXh9rJjHghBl9ny0oYqBSh8yvHVkDoKGV+37OieUhENSKXh9w==";
@@ -92,6 +106,305 @@ $(function() {
                 self.showDataTimeoutWarning(data);
             } else if (data.type === "data_timeout_cleared") {
                 self.dismissDataTimeoutWarning();
+            } else if (data.type === "guard_status") {
+                self.applyGuardStatus(data, false);
+            } else if (data.type === "emergency_plan_warning") {
+                self.showPlanWarning(data.problems);
+            } else if (data.type === "guard_rule_warning") {
+                self.showRuleWarning(data.problems);
+            }
+        };
+
+        // Status messages only hold the sensors that changed, so fetch the full status once connected
+        self.onStartupComplete = function() {
+            self.requestGuardStatus();
+        };
+
+        self.onServerReconnect = function() {
+            self.requestGuardStatus();
+        };
+
+        self.requestGuardStatus = function() {
+            try {
+                if (typeof OctoPrint === "undefined" || !OctoPrint.simpleApiGet) {
+                    return;
+                }
+                OctoPrint.simpleApiGet("octo_fire_guard", {data: {status: 1}})
+                    .done(function(response) {
+                        self.applyGuardStatus(response, true);
+                        if (response && response.plan_problems && response.plan_problems.length) {
+                            self.showPlanWarning(response.plan_problems);
+                        }
+                        if (response && response.rule_problems && response.rule_problems.length) {
+                            self.showRuleWarning(response.rule_problems);
+                        }
+                    });
+            } catch (e) {
+                console.error("Octo Fire Guard: Error requesting guard status", e);
+            }
+        };
+
+        // Merge a guard status message into the live status; full replaces it
+        self.applyGuardStatus = function(data, full) {
+            var status = {};
+            var key;
+            if (!full) {
+                var current = self.guardStatus();
+                for (key in current) {
+                    if (Object.prototype.hasOwnProperty.call(current, key)) {
+                        status[key] = current[key];
+                    }
+                }
+            }
+            var rows = (data && data.s) || {};
+            for (key in rows) {
+                if (!Object.prototype.hasOwnProperty.call(rows, key)) {
+                    continue;
+                }
+                if (rows[key] === null) {
+                    delete status[key];
+                } else {
+                    status[key] = rows[key];
+                }
+            }
+            self.guardStatus(status);
+            self.recordSparklines(rows, full);
+        };
+
+        // Append the rows of a status message to the sparkline series and schedule a redraw
+        self.recordSparklines = function(rows, full) {
+            var now = Date.now() / 1000;
+            var start = now - self.sparklineWindow;
+            var key;
+            if (full) {
+                for (key in self.sparklineSeries) {
+                    if (Object.prototype.hasOwnProperty.call(self.sparklineSeries, key) && !rows[key]) {
+                        delete self.sparklineSeries[key];
+                    }
+                }
+            }
+            for (key in rows) {
+                if (!Object.prototype.hasOwnProperty.call(rows, key)) {
+                    continue;
+                }
+                var row = rows[key];
+                if (row === null) {
+                    delete self.sparklineSeries[key];
+                    continue;
+                }
+                var points = self.sparklineSeries[key] || (self.sparklineSeries[key] = []);
+                points.push([now, row[0], row[2] === null ? null : row[0] + row[2]]);
+                // Keep one point before the window, so the line still starts at its left edge
+                var expired = 0;
+                while (expired + 1 < points.length && points[expired + 1][0] <= start) {
+                    expired++;
+                }
+                if (expired > 0) {
+                    points.splice(0, expired);
+                }
+            }
+            self.scheduleSparklineDraw();
+        };
+
+        // However many messages arrive, the canvas is drawn at most once per animation frame
+        self.scheduleSparklineDraw = function() {
+            if (self.sparklineFrame !== null || !self.sparklineVisible) {
+                return;
+            }
+            var requestFrame = typeof requestAnimationFrame !== "undefined" ? requestAnimationFrame :
+                function(callback) { return setTimeout(callback, 16); };
+            self.sparklineFrame = requestFrame(function() {
+                self.sparklineFrame = null;
+                try {
+                    self.drawSparklines();
+                } catch (e) {
+                    console.error("Octo Fire Guard: Error drawing sparklines", e);
+                }
+            });
+        };
+
+        self.onTabChange = function(current, previous) {
+            self.sparklineVisible = current === "#tab_plugin_octo_fire_guard";
+            if (self.sparklineVisible) {
+                self.scheduleSparklineDraw();
+                // Steady sensors send no messages, so keep the time axis moving
+                if (!self.sparklineTimer) {
+                    self.sparklineTimer = setInterval(self.scheduleSparklineDraw, self.sparklineScrollInterval);
+                }
+            } else if (self.sparklineTimer) {
+                clearInterval(self.sparklineTimer);
+                self.sparklineTimer = null;
+            }
+        };
+
+        // One canvas for all sensors; a row per sensor with its temperature and threshold over the window
+        self.drawSparklines = function() {
+            var canvas = document.getElementById("octo_fire_guard_sparklines");
+            if (!canvas || !canvas.getContext) {
+                return;
+            }
+            var keys = Object.keys(self.sparklineSeries).sort();
+            var ratio = (typeof window !== "undefined" && window.devicePixelRatio) || 1;
+            var width = canvas.clientWidth || canvas.width / ratio;
+            var height = Math.max(keys.length, 1) * self.sparklineRowHeight;
+            // Resizing clears the canvas and its state, so it is only done when the size changed
+            if (canvas.width !== Math.round(width * ratio) || canvas.height !== Math.round(height * ratio)) {
+                canvas.width = Math.round(width * ratio);
+                canvas.height = Math.round(height * ratio);
+                canvas.style.height = height + "px";
+            }
+
+            var context = canvas.getContext("2d");
+            context.setTransform(ratio, 0, 0, ratio, 0, 0);
+            context.clearRect(0, 0, width, height);
+            context.font = "12px sans-serif";
+            if (!keys.length) {
+                context.fillStyle = "#999";
+                context.fillText("Waiting for temperature data", 8, 24);
+                return;
+            }
+
+            var now = Date.now() / 1000;
+            var status = self.guardStatus();
+            for (var index = 0; index < keys.length; index++) {
+                self.drawSparkline(context, keys[index], self.sparklineSeries[keys[index]], status[keys[index]],
+                    index * self.sparklineRowHeight, width, now);
+            }
+        };
+
+        self.drawSparkline = function(context, key, points, row, top, width, now) {
+            var labelWidth = 130;
+            var rowHeight = self.sparklineRowHeight;
+            var left = labelWidth;
+            var right = width - 8;
+            var start = now - self.sparklineWindow;
+            var last = points[points.length - 1];
+            var state = row ? row[3] : 0;
+
+            // Scale to the readings and threshold in the window, with some margin
+            var low = Infinity;
+            var high = -Infinity;
+            for (var i = 0; i < points.length; i++) {
+                low = Math.min(low, points[i][1]);
+                high = Math.max(high, points[i][1]);
+                if (points[i][2] !== null) {
+                    low = Math.min(low, points[i][2]);
+                    high = Math.max(high, points[i][2]);
+                }
+            }
+            var margin = Math.max((high - low) * 0.1, 2);
+            low -= margin;
+            high += margin;
+            var x = function(t) {
+                return left + (Math.max(t, start) - start) / self.sparklineWindow * (right - left);
+            };
+            var y = function(value) {
+                return top + 4 + (high - value) / (high - low) * (rowHeight - 8);
+            };
+
+            var headroom = last[2] === null ? null : last[2] - last[1];
+            var color = state ? "#d9534f" : (headroom !== null && headroom < 10 ? "#f0ad4e" : "#5cb85c");
+            context.fillStyle = color;
+            context.fillText(key, 8, top + 18);
+            context.fillStyle = "#666";
+            context.fillText(last[1].toFixed(1) + (last[2] === null ? "°C" : " / " + last[2].toFixed(0) + "°C"), 8, top + 34);
+
+            // Threshold as a dashed step line
+            context.strokeStyle = "#d9534f";
+            context.lineWidth = 1;
+            context.setLineDash([4, 3]);
+            context.beginPath();
+            var drawing = false;
+            for (i = 0; i < points.length; i++) {
+                if (points[i][2] === null) {
+                    drawing = false;
+                    continue;
+                }
+                var next = i + 1 < points.length ? points[i + 1][0] : now;
+                if (!drawing) {
+                    context.moveTo(x(points[i][0]), y(points[i][2]));
+                    drawing = true;
+                } else {
+                    context.lineTo(x(points[i][0]), y(points[i][2]));
+                }
+                context.lineTo(x(next), y(points[i][2]));
+            }
+            context.stroke();
+            context.setLineDash([]);
+
+            // Temperature, held until the next message as the publisher only sends changes
+            context.strokeStyle = color;
+            context.lineWidth = 1.5;
+            context.beginPath();
+            context.moveTo(x(points[0][0]), y(points[0][1]));
+            for (i = 1; i < points.length; i++) {
+                context.lineTo(x(points[i][0]), y(points[i - 1][1]));
+                context.lineTo(x(points[i][0]), y(points[i][1]));
+            }
+            context.lineTo(x(now), y(last[1]));
+            context.stroke();
+
+            context.strokeStyle = "#eee";
+            context.lineWidth = 1;
+            context.beginPath();
+            context.moveTo(0, top + rowHeight - 0.5);
+            context.lineTo(width, top + rowHeight - 0.5);
+            context.stroke();
+        };
+
+        // Problems found while compiling the emergency actions, shown until dismissed
+        self.showPlanWarning = function(problems) {
+            try {
+                if (self.planWarningNotification) {
+                    self.planWarningNotification.remove();
+                    self.planWarningNotification = null;
+                }
+                if (!problems || !problems.length) {
+                    return;
+                }
+                console.warn("Octo Fire Guard: Emergency plan problems - " + problems.join("; "));
+                if (typeof PNotify !== "undefined") {
+                    self.planWarningNotification = new PNotify({
+                        title: "Octo Fire Guard: Emergency Actions",
+                        text: "The configured emergency actions have problems: " + problems.join("; ") + ". " +
+                              "Please check the plugin settings.",
+                        type: "error",
+                        hide: false,  // Don't auto-hide
+                        icon: "fa fa-exclamation-triangle",
+                        title_escape: true,
+                        text_escape: true
+                    });
+                }
+            } catch (e) {
+                console.error("Octo Fire Guard: Error showing emergency plan warning", e);
+            }
+        };
+
+        // Custom rules that did not compile, shown until dismissed
+        self.showRuleWarning = function(problems) {
+            try {
+                if (self.ruleWarningNotification) {
+                    self.ruleWarningNotification.remove();
+                    self.ruleWarningNotification = null;
+                }
+                if (!problems || !problems.length) {
+                    return;
+                }
+                console.warn("Octo Fire Guard: Custom rule problems - " + problems.join("; "));
+                if (typeof PNotify !== "undefined") {
+                    self.ruleWarningNotification = new PNotify({
+                        title: "Octo Fire Guard: Custom Rules",
+                        text: "These custom rules are not active: " + problems.join("; ") + ". " +
+                              "Please check the plugin settings.",
+                        type: "error",
+                        hide: false,  // Don't auto-hide
+                        icon: "fa fa-exclamation-triangle",
+                        title_escape: true,
+                        text_escape: true
+                    });
+                }
+            } catch (e) {
+                console.error("Octo Fire Guard: Error showing custom rule warning", e);
             }
         };
 
@@ -121,7 +434,9 @@ $(function() {
                 if (typeof PNotify !== "undefined") {
                     new PNotify({
                         title: "Temperature Alert!",
-                        text: data.message + " - " + data.sensor + ": " + data.current_temp + "°C (Threshold: " + data.threshold + "°C)",
+                        // Custom rule alerts have no single temperature
+                        text: data.rule ? data.message :
+                              data.message + " - " + data.sensor + ": " + data.current_temp + "°C (Threshold: " + data.threshold + "°C)",
                         type: "error",
                         hide: false,  // Don't auto-hide
                         icon: "fa fa-fire",
@@ -139,6 +454,125 @@ $(function() {
             // Stop any existing alert sound
             self.stopAlertSound();
 
+            if (!self.startWebAudioAlarm()) {
+                self.startFallbackAlarm();
+            }
+        };
+
+        // Loop one decoded beep period on the AudioContext clock. Nothing is allocated per beep
+        // and timer throttling in background tabs does not apply. Returns false without Web Audio.
+        self.startWebAudioAlarm = function() {
+            var context;
+            try {
+                context = self.getAlarmContext();
+            } catch(e) {
+                console.error("Could not create audio context:", e);
+                return false;
+            }
+            if (!context) {
+                return false;
+            }
+
+            var generation = self.alarmGeneration;
+            if (context.state === "suspended" && context.resume) {
+                var resumed = context.resume();
+                if (resumed && resumed.catch) {
+                    resumed.catch(function(e) {
+                        console.error("Could not resume audio context:", e);
+                    });
+                }
+            }
+
+            self.loadAlarmBuffer(context, function(buffer) {
+                // Stopped, or restarted, while the sound was being decoded
+                if (generation !== self.alarmGeneration) {
+                    return;
+                }
+                try {
+                    var source = context.createBufferSource();
+                    source.buffer = buffer;
+                    source.loop = true;
+                    source.connect(context.destination);
+                    source.start(context.currentTime);
+                    self.alarmSource = source;
+                } catch(e) {
+                    console.error("Could not play alert sound with Web Audio:", e);
+                    self.startFallbackAlarm();
+                }
+            }, function(e) {
+                console.error("Could not decode alert sound:", e);
+                if (generation === self.alarmGeneration) {
+                    self.startFallbackAlarm();
+                }
+            });
+            return true;
+        };
+
+        // Created on the first alarm and kept, suspended while no alarm is playing
+        self.getAlarmContext = function() {
+            if (!self.alarmContext) {
+                var AudioContextClass = typeof AudioContext !== "undefined" ? AudioContext :
+                    (typeof webkitAudioContext !== "undefined" ? webkitAudioContext : null);
+                if (!AudioContextClass) {
+                    return null;
+                }
+                self.alarmContext = new AudioContextClass();
+            }
+            return self.alarmContext;
+        };
+
+        // Decode the alert sound once into a buffer of one beep followed by silence up to the period
+        self.loadAlarmBuffer = function(context, done, fail) {
+            if (self.alarmBuffer) {
+                done(self.alarmBuffer);
+                return;
+            }
+
+            var settled = false;
+            var onDecoded = function(beep) {
+                if (settled) {
+                    return;
+                }
+                settled = true;
+                try {
+                    var length = Math.round(self.alarmPeriod * context.sampleRate);
+                    var period = context.createBuffer(beep.numberOfChannels, length, context.sampleRate);
+                    for (var channel = 0; channel < beep.numberOfChannels; channel++) {
+                        var samples = beep.getChannelData(channel);
+                        period.getChannelData(channel).set(samples.length > length ? samples.subarray(0, length) : samples);
+                    }
+                    self.alarmBuffer = period;
+                } catch(e) {
+                    fail(e);
+                    return;
+                }
+                done(self.alarmBuffer);
+            };
+            var onError = function(e) {
+                if (!settled) {
+                    settled = true;
+                    fail(e);
+                }
+            };
+
+            try {
+                var encoded = atob(self.alertSoundData.substring(self.alertSoundData.indexOf(",") + 1));
+                var bytes = new Uint8Array(encoded.length);
+                for (var i = 0; i < encoded.length; i++) {
+                    bytes[i] = encoded.charCodeAt(i);
+                }
+                // Older Safari only supports the callback form, newer browsers also return a promise
+                var decoding = context.decodeAudioData(bytes.buffer, onDecoded, onError);
+                if (decoding && decoding.then) {
+                    decoding.then(onDecoded, onError);
+                }
+            } catch(e) {
+                onError(e);
+            }
+        };
+
+        // Previous implementation, used where Web Audio is unavailable or fails
+        self.startFallbackAlarm = function() {
             if (typeof Audio !== "undefined") {
                 try {
                     var audio = new Audio(self.alertSoundData);
@@ -154,7 +588,7 @@ $(function() {
                         } catch(e) {
                             console.error("Could not play continuous alert sound:", e);
                         }
-                    }, 2000);
+                    }, self.alarmPeriod * 1000);
                 } catch(e) {
                     console.error("Could not start alert sound:", e);
                 }
@@ -163,6 +597,20 @@ $(function() {
 
         // Stop continuous alert sound
         self.stopAlertSound = function() {
+            self.alarmGeneration++;
+            if (self.alarmSource) {
+                try {
+                    self.alarmSource.stop();
+                    self.alarmSource.disconnect();
+                } catch(e) {
+                    console.error("Could not stop alert sound:", e);
+                }
+                self.alarmSource = null;
+            }
+            if (self.alarmContext && self.alarmContext.state === "running" && self.alarmContext.suspend) {
+                // An idle running context still drives the audio hardware
+                self.alarmContext.suspend();
+            }
             if (self.alertAudioInterval) {
                 clearInterval(self.alertAudioInterval);
                 self.alertAudioInterval = null;
@@ -191,7 +639,14 @@ $(function() {
         self.showDataTimeoutWarning = function(data) {
             try {
                 var sensorsStr = data.sensors.join(" and ");
-                var timeoutMinutes = Math.floor(data.timeout / 60);
+                // Whole minutes where exact, seconds otherwise (the timeout may be sub-second)
+                var timeoutText;
+                if (data.timeout >= 60 && data.timeout % 60 === 0) {
+                    var timeoutMinutes = data.timeout / 60;
+                    timeoutText = timeoutMinutes + (timeoutMinutes === 1 ? " minute" : " minutes");
+                } else {
+                    timeoutText = data.timeout + (data.timeout === 1 ? " second" : " seconds");
+                }
                 
                 console.warn("Octo Fire Guard: Temperature data timeout - " + data.message);
                 
@@ -199,7 +654,7 @@ $(function() {
                 if (typeof PNotify !== "undefined") {
                     self.dataTimeoutNotification = new PNotify({
                         title: "Octo Fire Guard: Self-Test Warning",
-                        text: "No temperature data received from " + sensorsStr + " for " + timeoutMinutes + " minutes. " +
+                        text: "No temperature data received from " + sensorsStr + " for " + timeoutText + ". " +
                               "The plugin may not be monitoring correctly. Please check your printer connection.",
                         type: "warning",
                         hide: false,  // Don't auto-hide
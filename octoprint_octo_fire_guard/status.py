@@ -0,0 +1,140 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+import time
+
+DEFAULT_STATUS_INTERVAL = 500  # Milliseconds between status messages at most
+DEFAULT_STATUS_EPSILON = 0.5  # °C a reading has to move before it is published again
+MIN_STATUS_INTERVAL = 50
+
+# Bits of the state field of a status row
+STATUS_EXCEEDED = 1  # Above the threshold, alert raised
+STATUS_RATE_EXCEEDED = 2  # Heating rate alert raised
+STATUS_DATA_TIMEOUT = 4  # No data from the sensor's group within the data timeout
+
+
+def status_changes(published, current, epsilon):
+    """
+    Rows of current that differ from what was last published.
+
+    A row is [actual, target, headroom, state]. It counts as changed when
+    its target or state changed, or when its actual temperature or headroom
+    moved by at least epsilon, so sensor noise does not produce messages.
+    Sensors that are no longer reported map to None.
+    """
+    changes = {}
+    for key, row in current.items():
+        old = published.get(key)
+        if old is None or old[1] != row[1] or old[3] != row[3] or \
+                _moved(old[0], row[0], epsilon) or _moved(old[2], row[2], epsilon):
+            changes[key] = row
+    for key in published:
+        if key not in current:
+            changes[key] = None
+    return changes
+
+
+def _moved(old, new, epsilon):
+    if old is None or new is None:
+        return old is not new
+    return abs(new - old) >= epsilon
+
+
+class StatusPublisher(object):
+    """
+    Coalescing publisher of the live guard status to the frontend.
+
+    The comm thread only calls mark() after handling a report, which costs a
+    flag check while a publication is already pending. The publisher thread
+    then waits out the rest of the interval, reads the latest status through
+    state_func and sends the rows that changed beyond epsilon. However many
+    reports arrive, at most one message goes out per interval, and none at
+    all while the readings are steady or no data arrives.
+
+    Messages have the form {"type": "guard_status", "t": <epoch>, "s": rows},
+    where rows maps sensor keys to [actual, target, headroom, state] (see
+    status_changes) or to None for sensors that disappeared.
+    """
+
+    def __init__(self, state_func, send, interval=DEFAULT_STATUS_INTERVAL, epsilon=DEFAULT_STATUS_EPSILON,
+                 name="octo_fire_guard.status"):
+        self._state_func = state_func
+        self._send = send
+        self.interval = max(interval, MIN_STATUS_INTERVAL) / 1000.0
+        self.epsilon = epsilon
+        self._name = name
+        self._logger = None
+        self._pending = False
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._published = {}
+        self._last_publish = 0.0
+
+    @property
+    def is_running(self):
+        return self._thread is not None
+
+    def start(self, logger):
+        if self._thread is not None:
+            return
+        self._logger = logger
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self._name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def mark(self):
+        """Note that the status may have changed; called from the comm thread"""
+        if not self._pending:
+            self._pending = True
+            self._wake.set()
+
+    def reset(self):
+        """Forget what was published, so the next message holds every sensor again"""
+        self._published = {}
+
+    def publish(self):
+        """Send the rows that changed since the last message; returns the number of rows sent"""
+        current = self._state_func()
+        changes = status_changes(self._published, current, self.epsilon)
+        if not changes:
+            return 0
+        published = dict(self._published)
+        for key, row in changes.items():
+            if row is None:
+                published.pop(key, None)
+            else:
+                published[key] = row
+        self._published = published
+        self._send(dict(type="guard_status", t=round(time.time(), 3), s=changes))
+        return len(changes)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            if self._stopping:
+                return
+            # Coalesce everything that arrives until the interval since the last message is over
+            delay = self._last_publish + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+                if self._stopping:
+                    return
+            self._wake.clear()
+            self._pending = False
+            self._last_publish = time.monotonic()
+            try:
+                self.publish()
+            except Exception:
+                self._logger.exception("Failed to publish guard status")
@@ -0,0 +1,119 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import heapq
+import threading
+import time
+
+# Shortest supported data timeout in seconds; anything lower would keep the watchdog spinning
+MIN_DATA_TIMEOUT = 0.1
+
+
+def format_duration(seconds):
+    """Human readable duration, in whole minutes where that is exact and in seconds otherwise"""
+    if seconds >= 60 and seconds % 60 == 0:
+        minutes = int(seconds // 60)
+        return "{} minute{}".format(minutes, "" if minutes == 1 else "s")
+    return "{:g} second{}".format(seconds, "" if seconds == 1 else "s")
+
+
+class DeadlineScheduler(object):
+    """
+    Calls handler(key) once a key's deadline has passed.
+
+    Deadlines are kept in a heap, and the worker thread sleeps until the
+    earliest one instead of polling, so an idle printer causes no wake-ups
+    and timeouts well below a second are honoured. Arming a key replaces its
+    previous deadline; superseded heap entries are skipped when they come up.
+    The handler runs on the worker thread and usually re-arms its key.
+    """
+
+    def __init__(self, handler, name="octo_fire_guard.watchdog"):
+        self._handler = handler
+        self._logger = None
+        self._name = name
+        self._condition = threading.Condition()
+        self._heap = []
+        self._deadlines = {}
+        self._thread = None
+        self._stopping = False
+
+    @property
+    def is_running(self):
+        return self._thread is not None
+
+    def start(self, logger):
+        if self._thread is not None:
+            return
+        self._logger = logger
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self._name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the worker; armed deadlines are kept and fire after the next start()"""
+        thread = self._thread
+        if thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        thread.join(timeout)
+        self._thread = None
+
+    def arm(self, key, delay):
+        """Fire key delay seconds from now, replacing any deadline it already has"""
+        deadline = time.monotonic() + max(delay, 0.0)
+        with self._condition:
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, key))
+            # Only wake the worker if it is sleeping towards a later deadline
+            if self._heap[0][0] == deadline:
+                self._condition.notify()
+
+    def cancel(self, key):
+        with self._condition:
+            self._deadlines.pop(key, None)
+
+    def cancel_all(self):
+        with self._condition:
+            self._deadlines.clear()
+            del self._heap[:]
+
+    def deadline(self, key):
+        """Seconds until key fires, or None if it is not armed"""
+        with self._condition:
+            deadline = self._deadlines.get(key)
+        return None if deadline is None else deadline - time.monotonic()
+
+    def _next_due(self):
+        """Pop and return the next key whose deadline has passed, or the time to wait for one"""
+        heap = self._heap
+        while heap:
+            deadline, key = heap[0]
+            if self._deadlines.get(key) != deadline:
+                heapq.heappop(heap)  # Superseded or cancelled
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                return None, remaining
+            heapq.heappop(heap)
+            del self._deadlines[key]
+            return key, None
+        return None, None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopping:
+                        return
+                    key, remaining = self._next_due()
+                    if key is not None:
+                        break
+                    self._condition.wait(remaining)
+            try:
+                self._handler(key)
+            except Exception:
+                self._logger.exception("Error while handling deadline for %s", key)
@@ -59,7 +59,14 @@ plugin_ignored_packages = []
 # Example:
 #     plugin_requires = ["someDependency==dev"]
 #     additional_setup_parameters = {"dependency_links": ["https://github.com/someUser/someRepo/archive/master.zip#egg=someDependency-dev"]}
-additional_setup_parameters = {}
+additional_setup_parameters = {
+    # numpy speeds up the fleet-wide evaluation of the standalone fleet aggregator and the log replay sweep.
+    # The aggregator runs from the plugin package, which imports OctoPrint, also on hosts that run no printer.
+    "extras_require": {"fleet": ["OctoPrint", "numpy"], "replay": ["numpy"]},
+    "entry_points": {
+        "console_scripts": ["octo-fire-guard-replay = octoprint_octo_fire_guard.replay:main"]
+    }
+}
 
 ########################################################################################################################
 
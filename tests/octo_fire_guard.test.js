@@ -129,7 +129,21 @@ describe('OctoFireGuardViewModel', () => {
             alertCurrentTemp: ko.observable(0),
             alertThreshold: ko.observable(0),
             alertAudioInterval: null,
+            alarmPeriod: 2,
+            alarmContext: null,
+            alarmBuffer: null,
+            alarmSource: null,
+            alarmGeneration: 0,
             dataTimeoutNotification: null,
+            planWarningNotification: null,
+            guardStatus: ko.observable({}),
+            sparklineWindow: 600,
+            sparklineRowHeight: 48,
+            sparklineScrollInterval: 2000,
+            sparklineSeries: {},
+            sparklineFrame: null,
+            sparklineVisible: false,
+            sparklineTimer: null,
             alertSoundData: "data:audio/wav;base64,UklGRnoGAABXQVZFZm10IBAAAAABAAEAQB8AAEAfAAABAAgAZGF0YQoGAAA="
         };
 
@@ -193,6 +207,305 @@ describe('OctoFireGuardViewModel', () => {
                 vm.showDataTimeoutWarning(data);
             } else if (data.type === "data_timeout_cleared") {
                 vm.dismissDataTimeoutWarning();
+            } else if (data.type === "guard_status") {
+                vm.applyGuardStatus(data, false);
+            } else if (data.type === "emergency_plan_warning") {
+                vm.showPlanWarning(data.problems);
+            } else if (data.type === "guard_rule_warning") {
+                vm.showRuleWarning(data.problems);
+            }
+        };
+
+        // Status messages only hold the sensors that changed, so fetch the full status once connected
+        vm.onStartupComplete = function() {
+            vm.requestGuardStatus();
+        };
+
+        vm.onServerReconnect = function() {
+            vm.requestGuardStatus();
+        };
+
+        vm.requestGuardStatus = function() {
+            try {
+                if (typeof OctoPrint === "undefined" || !OctoPrint.simpleApiGet) {
+                    return;
+                }
+                OctoPrint.simpleApiGet("octo_fire_guard", {data: {status: 1}})
+                    .done(function(response) {
+                        vm.applyGuardStatus(response, true);
+                        if (response && response.plan_problems && response.plan_problems.length) {
+                            vm.showPlanWarning(response.plan_problems);
+                        }
+                        if (response && response.rule_problems && response.rule_problems.length) {
+                            vm.showRuleWarning(response.rule_problems);
+                        }
+                    });
+            } catch (e) {
+                console.error("Octo Fire Guard: Error requesting guard status", e);
+            }
+        };
+
+        // Merge a guard status message into the live status; full replaces it
+        vm.applyGuardStatus = function(data, full) {
+            var status = {};
+            var key;
+            if (!full) {
+                var current = vm.guardStatus();
+                for (key in current) {
+                    if (Object.prototype.hasOwnProperty.call(current, key)) {
+                        status[key] = current[key];
+                    }
+                }
+            }
+            var rows = (data && data.s) || {};
+            for (key in rows) {
+                if (!Object.prototype.hasOwnProperty.call(rows, key)) {
+                    continue;
+                }
+                if (rows[key] === null) {
+                    delete status[key];
+                } else {
+                    status[key] = rows[key];
+                }
+            }
+            vm.guardStatus(status);
+            vm.recordSparklines(rows, full);
+        };
+
+        // Append the rows of a status message to the sparkline series and schedule a redraw
+        vm.recordSparklines = function(rows, full) {
+            var now = Date.now() / 1000;
+            var start = now - vm.sparklineWindow;
+            var key;
+            if (full) {
+                for (key in vm.sparklineSeries) {
+                    if (Object.prototype.hasOwnProperty.call(vm.sparklineSeries, key) && !rows[key]) {
+                        delete vm.sparklineSeries[key];
+                    }
+                }
+            }
+            for (key in rows) {
+                if (!Object.prototype.hasOwnProperty.call(rows, key)) {
+                    continue;
+                }
+                var row = rows[key];
+                if (row === null) {
+                    delete vm.sparklineSeries[key];
+                    continue;
+                }
+                var points = vm.sparklineSeries[key] || (vm.sparklineSeries[key] = []);
+                points.push([now, row[0], row[2] === null ? null : row[0] + row[2]]);
+                // Keep one point before the window, so the line still starts at its left edge
+                var expired = 0;
+                while (expired + 1 < points.length && points[expired + 1][0] <= start) {
+                    expired++;
+                }
+                if (expired > 0) {
+                    points.splice(0, expired);
+                }
+            }
+            vm.scheduleSparklineDraw();
+        };
+
+        // However many messages arrive, the canvas is drawn at most once per animation frame
+        vm.scheduleSparklineDraw = function() {
+            if (vm.sparklineFrame !== null || !vm.sparklineVisible) {
+                return;
+            }
+            var requestFrame = typeof requestAnimationFrame !== "undefined" ? requestAnimationFrame :
+                function(callback) { return setTimeout(callback, 16); };
+            vm.sparklineFrame = requestFrame(function() {
+                vm.sparklineFrame = null;
+                try {
+                    vm.drawSparklines();
+                } catch (e) {
+                    console.error("Octo Fire Guard: Error drawing sparklines", e);
+                }
+            });
+        };
+
+        vm.onTabChange = function(current, previous) {
+            vm.sparklineVisible = current === "#tab_plugin_octo_fire_guard";
+            if (vm.sparklineVisible) {
+                vm.scheduleSparklineDraw();
+                // Steady sensors send no messages, so keep the time axis moving
+                if (!vm.sparklineTimer) {
+                    vm.sparklineTimer = setInterval(vm.scheduleSparklineDraw, vm.sparklineScrollInterval);
+                }
+            } else if (vm.sparklineTimer) {
+                clearInterval(vm.sparklineTimer);
+                vm.sparklineTimer = null;
+            }
+        };
+
+        // One canvas for all sensors; a row per sensor with its temperature and threshold over the window
+        vm.drawSparklines = function() {
+            var canvas = document.getElementById("octo_fire_guard_sparklines");
+            if (!canvas || !canvas.getContext) {
+                return;
+            }
+            var keys = Object.keys(vm.sparklineSeries).sort();
+            var ratio = (typeof window !== "undefined" && window.devicePixelRatio) || 1;
+            var width = canvas.clientWidth || canvas.width / ratio;
+            var height = Math.max(keys.length, 1) * vm.sparklineRowHeight;
+            // Resizing clears the canvas and its state, so it is only done when the size changed
+            if (canvas.width !== Math.round(width * ratio) || canvas.height !== Math.round(height * ratio)) {
+                canvas.width = Math.round(width * ratio);
+                canvas.height = Math.round(height * ratio);
+                canvas.style.height = height + "px";
+            }
+
+            var context = canvas.getContext("2d");
+            context.setTransform(ratio, 0, 0, ratio, 0, 0);
+            context.clearRect(0, 0, width, height);
+            context.font = "12px sans-serif";
+            if (!keys.length) {
+                context.fillStyle = "#999";
+                context.fillText("Waiting for temperature data", 8, 24);
+                return;
+            }
+
+            var now = Date.now() / 1000;
+            var status = vm.guardStatus();
+            for (var index = 0; index < keys.length; index++) {
+                vm.drawSparkline(context, keys[index], vm.sparklineSeries[keys[index]], status[keys[index]],
+                    index * vm.sparklineRowHeight, width, now);
+            }
+        };
+
+        vm.drawSparkline = function(context, key, points, row, top, width, now) {
+            var labelWidth = 130;
+            var rowHeight = vm.sparklineRowHeight;
+            var left = labelWidth;
+            var right = width - 8;
+            var start = now - vm.sparklineWindow;
+            var last = points[points.length - 1];
+            var state = row ? row[3] : 0;
+
+            // Scale to the readings and threshold in the window, with some margin
+            var low = Infinity;
+            var high = -Infinity;
+            for (var i = 0; i < points.length; i++) {
+                low = Math.min(low, points[i][1]);
+                high = Math.max(high, points[i][1]);
+                if (points[i][2] !== null) {
+                    low = Math.min(low, points[i][2]);
+                    high = Math.max(high, points[i][2]);
+                }
+            }
+            var margin = Math.max((high - low) * 0.1, 2);
+            low -= margin;
+            high += margin;
+            var x = function(t) {
+                return left + (Math.max(t, start) - start) / vm.sparklineWindow * (right - left);
+            };
+            var y = function(value) {
+                return top + 4 + (high - value) / (high - low) * (rowHeight - 8);
+            };
+
+            var headroom = last[2] === null ? null : last[2] - last[1];
+            var color = state ? "#d9534f" : (headroom !== null && headroom < 10 ? "#f0ad4e" : "#5cb85c");
+            context.fillStyle = color;
+            context.fillText(key, 8, top + 18);
+            context.fillStyle = "#666";
+            context.fillText(last[1].toFixed(1) + (last[2] === null ? "°C" : " / " + last[2].toFixed(0) + "°C"), 8, top + 34);
+
+            // Threshold as a dashed step line
+            context.strokeStyle = "#d9534f";
+            context.lineWidth = 1;
+            context.setLineDash([4, 3]);
+            context.beginPath();
+            var drawing = false;
+            for (i = 0; i < points.length; i++) {
+                if (points[i][2] === null) {
+                    drawing = false;
+                    continue;
+                }
+                var next = i + 1 < points.length ? points[i + 1][0] : now;
+                if (!drawing) {
+                    context.moveTo(x(points[i][0]), y(points[i][2]));
+                    drawing = true;
+                } else {
+                    context.lineTo(x(points[i][0]), y(points[i][2]));
+                }
+                context.lineTo(x(next), y(points[i][2]));
+            }
+            context.stroke();
+            context.setLineDash([]);
+
+            // Temperature, held until the next message as the publisher only sends changes
+            context.strokeStyle = color;
+            context.lineWidth = 1.5;
+            context.beginPath();
+            context.moveTo(x(points[0][0]), y(points[0][1]));
+            for (i = 1; i < points.length; i++) {
+                context.lineTo(x(points[i][0]), y(points[i - 1][1]));
+                context.lineTo(x(points[i][0]), y(points[i][1]));
+            }
+            context.lineTo(x(now), y(last[1]));
+            context.stroke();
+
+            context.strokeStyle = "#eee";
+            context.lineWidth = 1;
+            context.beginPath();
+            context.moveTo(0, top + rowHeight - 0.5);
+            context.lineTo(width, top + rowHeight - 0.5);
+            context.stroke();
+        };
+
+        // Problems found while compiling the emergency actions, shown until dismissed
+        vm.showPlanWarning = function(problems) {
+            try {
+                if (vm.planWarningNotification) {
+                    vm.planWarningNotification.remove();
+                    vm.planWarningNotification = null;
+                }
+                if (!problems || !problems.length) {
+                    return;
+                }
+                console.warn("Octo Fire Guard: Emergency plan problems - " + problems.join("; "));
+                if (typeof PNotify !== "undefined") {
+                    vm.planWarningNotification = new PNotify({
+                        title: "Octo Fire Guard: Emergency Actions",
+                        text: "The configured emergency actions have problems: " + problems.join("; ") + ". " +
+                              "Please check the plugin settings.",
+                        type: "error",
+                        hide: false,  // Don't auto-hide
+                        icon: "fa fa-exclamation-triangle",
+                        title_escape: true,
+                        text_escape: true
+                    });
+                }
+            } catch (e) {
+                console.error("Octo Fire Guard: Error showing emergency plan warning", e);
+            }
+        };
+
+        // Custom rules that did not compile, shown until dismissed
+        vm.showRuleWarning = function(problems) {
+            try {
+                if (vm.ruleWarningNotification) {
+                    vm.ruleWarningNotification.remove();
+                    vm.ruleWarningNotification = null;
+                }
+                if (!problems || !problems.length) {
+                    return;
+                }
+                console.warn("Octo Fire Guard: Custom rule problems - " + problems.join("; "));
+                if (typeof PNotify !== "undefined") {
+                    vm.ruleWarningNotification = new PNotify({
+                        title: "Octo Fire Guard: Custom Rules",
+                        text: "These custom rules are not active: " + problems.join("; ") + ". " +
+                              "Please check the plugin settings.",
+                        type: "error",
+                        hide: false,  // Don't auto-hide
+                        icon: "fa fa-exclamation-triangle",
+                        title_escape: true,
+                        text_escape: true
+                    });
+                }
+            } catch (e) {
+                console.error("Octo Fire Guard: Error showing custom rule warning", e);
             }
         };
 
@@ -219,7 +532,9 @@ describe('OctoFireGuardViewModel', () => {
                 if (typeof PNotify !== "undefined") {
                     new PNotify({
                         title: "Temperature Alert!",
-                        text: data.message + " - " + data.sensor + ": " + data.current_temp + "°C (Threshold: " + data.threshold + "°C)",
+                        // Custom rule alerts have no single temperature
+                        text: data.rule ? data.message :
+                              data.message + " - " + data.sensor + ": " + data.current_temp + "°C (Threshold: " + data.threshold + "°C)",
                         type: "error",
                         hide: false,
                         icon: "fa fa-fire",
@@ -234,13 +549,136 @@ describe('OctoFireGuardViewModel', () => {
 
         // Implement startAlertSound
         vm.startAlertSound = function() {
+            // Stop any existing alert sound
             vm.stopAlertSound();
 
+            if (!vm.startWebAudioAlarm()) {
+                vm.startFallbackAlarm();
+            }
+        };
+
+        // Loop one decoded beep period on the AudioContext clock. Nothing is allocated per beep
+        // and timer throttling in background tabs does not apply. Returns false without Web Audio.
+        vm.startWebAudioAlarm = function() {
+            var context;
+            try {
+                context = vm.getAlarmContext();
+            } catch(e) {
+                console.error("Could not create audio context:", e);
+                return false;
+            }
+            if (!context) {
+                return false;
+            }
+
+            var generation = vm.alarmGeneration;
+            if (context.state === "suspended" && context.resume) {
+                var resumed = context.resume();
+                if (resumed && resumed.catch) {
+                    resumed.catch(function(e) {
+                        console.error("Could not resume audio context:", e);
+                    });
+                }
+            }
+
+            vm.loadAlarmBuffer(context, function(buffer) {
+                // Stopped, or restarted, while the sound was being decoded
+                if (generation !== vm.alarmGeneration) {
+                    return;
+                }
+                try {
+                    var source = context.createBufferSource();
+                    source.buffer = buffer;
+                    source.loop = true;
+                    source.connect(context.destination);
+                    source.start(context.currentTime);
+                    vm.alarmSource = source;
+                } catch(e) {
+                    console.error("Could not play alert sound with Web Audio:", e);
+                    vm.startFallbackAlarm();
+                }
+            }, function(e) {
+                console.error("Could not decode alert sound:", e);
+                if (generation === vm.alarmGeneration) {
+                    vm.startFallbackAlarm();
+                }
+            });
+            return true;
+        };
+
+        // Created on the first alarm and kept, suspended while no alarm is playing
+        vm.getAlarmContext = function() {
+            if (!vm.alarmContext) {
+                var AudioContextClass = typeof AudioContext !== "undefined" ? AudioContext :
+                    (typeof webkitAudioContext !== "undefined" ? webkitAudioContext : null);
+                if (!AudioContextClass) {
+                    return null;
+                }
+                vm.alarmContext = new AudioContextClass();
+            }
+            return vm.alarmContext;
+        };
+
+        // Decode the alert sound once into a buffer of one beep followed by silence up to the period
+        vm.loadAlarmBuffer = function(context, done, fail) {
+            if (vm.alarmBuffer) {
+                done(vm.alarmBuffer);
+                return;
+            }
+
+            var settled = false;
+            var onDecoded = function(beep) {
+                if (settled) {
+                    return;
+                }
+                settled = true;
+                try {
+                    var length = Math.round(vm.alarmPeriod * context.sampleRate);
+                    var period = context.createBuffer(beep.numberOfChannels, length, context.sampleRate);
+                    for (var channel = 0; channel < beep.numberOfChannels; channel++) {
+                        var samples = beep.getChannelData(channel);
+                        period.getChannelData(channel).set(samples.length > length ? samples.subarray(0, length) : samples);
+                    }
+                    vm.alarmBuffer = period;
+                } catch(e) {
+                    fail(e);
+                    return;
+                }
+                done(vm.alarmBuffer);
+            };
+            var onError = function(e) {
+                if (!settled) {
+                    settled = true;
+                    fail(e);
+                }
+            };
+
+            try {
+                var encoded = atob(vm.alertSoundData.substring(vm.alertSoundData.indexOf(",") + 1));
+                var bytes = new Uint8Array(encoded.length);
+                for (var i = 0; i < encoded.length; i++) {
+                    bytes[i] = encoded.charCodeAt(i);
+                }
+                // Older Safari only supports the callback form, newer browsers also return a promise
+                var decoding = context.decodeAudioData(bytes.buffer, onDecoded, onError);
+                if (decoding && decoding.then) {
+                    decoding.then(onDecoded, onError);
+                }
+            } catch(e) {
+                onError(e);
+            }
+        };
+
+        // Previous implementation, used where Web Audio is unavailable or fails
+        vm.startFallbackAlarm = function() {
             if (typeof Audio !== "undefined") {
                 try {
                     var audio = new Audio(vm.alertSoundData);
+                    
+                    // Play sound immediately
                     audio.play();
                     
+                    // Set up interval for continuous beeping (every 2 seconds)
                     vm.alertAudioInterval = setInterval(function() {
                         try {
                             var beep = new Audio(vm.alertSoundData);
@@ -248,15 +686,29 @@ describe('OctoFireGuardViewModel', () => {
                         } catch(e) {
                             console.error("Could not play continuous alert sound:", e);
                         }
-                    }, 2000);
+                    }, vm.alarmPeriod * 1000);
                 } catch(e) {
                     console.error("Could not start alert sound:", e);
                 }
             }
         };
 
-        // Implement stopAlertSound
+        // Stop continuous alert sound
         vm.stopAlertSound = function() {
+            vm.alarmGeneration++;
+            if (vm.alarmSource) {
+                try {
+                    vm.alarmSource.stop();
+                    vm.alarmSource.disconnect();
+                } catch(e) {
+                    console.error("Could not stop alert sound:", e);
+                }
+                vm.alarmSource = null;
+            }
+            if (vm.alarmContext && vm.alarmContext.state === "running" && vm.alarmContext.suspend) {
+                // An idle running context still drives the audio hardware
+                vm.alarmContext.suspend();
+            }
             if (vm.alertAudioInterval) {
                 clearInterval(vm.alertAudioInterval);
                 vm.alertAudioInterval = null;
@@ -282,14 +734,21 @@ describe('OctoFireGuardViewModel', () => {
         vm.showDataTimeoutWarning = function(data) {
             try {
                 var sensorsStr = data.sensors.join(" and ");
-                var timeoutMinutes = Math.floor(data.timeout / 60);
+                // Whole minutes where exact, seconds otherwise (the timeout may be sub-second)
+                var timeoutText;
+                if (data.timeout >= 60 && data.timeout % 60 === 0) {
+                    var timeoutMinutes = data.timeout / 60;
+                    timeoutText = timeoutMinutes + (timeoutMinutes === 1 ? " minute" : " minutes");
+                } else {
+                    timeoutText = data.timeout + (data.timeout === 1 ? " second" : " seconds");
+                }
                 
                 console.warn("Octo Fire Guard: Temperature data timeout - " + data.message);
                 
                 if (typeof PNotify !== "undefined") {
                     vm.dataTimeoutNotification = new PNotify({
                         title: "Octo Fire Guard: Self-Test Warning",
-                        text: "No temperature data received from " + sensorsStr + " for " + timeoutMinutes + " minutes. " +
+                        text: "No temperature data received from " + sensorsStr + " for " + timeoutText + ". " +
                               "The plugin may not be monitoring correctly. Please check your printer connection.",
                         type: "warning",
                         hide: false,
@@ -551,7 +1010,240 @@ describe('OctoFireGuardViewModel', () => {
         });
     });
 
+    describe('Guard Status', () => {
+        test('should merge guard_status messages', () => {
+            viewModel.onDataUpdaterPluginMessage('octo_fire_guard', {
+                type: 'guard_status', t: 1, s: { T0: [200, 210, 50, 0], B: [60, 60, 40, 0] }
+            });
+            viewModel.onDataUpdaterPluginMessage('octo_fire_guard', {
+                type: 'guard_status', t: 2, s: { T0: [201, 210, 49, 0] }
+            });
+
+            expect(viewModel.guardStatus()).toEqual({ T0: [201, 210, 49, 0], B: [60, 60, 40, 0] });
+        });
+
+        test('should drop sensors that were removed', () => {
+            viewModel.applyGuardStatus({ s: { T0: [200, 210, 50, 0], C: [35, null, null, 0] } }, false);
+            viewModel.applyGuardStatus({ s: { C: null } }, false);
+
+            expect(viewModel.guardStatus()).toEqual({ T0: [200, 210, 50, 0] });
+        });
+
+        test('should replace the status with a full snapshot', () => {
+            viewModel.applyGuardStatus({ s: { T0: [200, 210, 50, 0] } }, false);
+            viewModel.applyGuardStatus({ s: { T1: [190, 200, 60, 0] } }, true);
+
+            expect(viewModel.guardStatus()).toEqual({ T1: [190, 200, 60, 0] });
+        });
+
+        test('should request the full status on startup', () => {
+            mockOctoPrint.simpleApiGet = jest.fn(() => ({
+                done: jest.fn((callback) => {
+                    callback({ type: 'guard_status', t: 1, s: { T0: [200, 210, 50, 0] } });
+                })
+            }));
+
+            viewModel.onStartupComplete();
+
+            expect(mockOctoPrint.simpleApiGet).toHaveBeenCalledWith('octo_fire_guard', { data: { status: 1 } });
+            expect(viewModel.guardStatus()).toEqual({ T0: [200, 210, 50, 0] });
+        });
+
+        test('should not fail without simpleApiGet', () => {
+            expect(() => {
+                viewModel.onStartupComplete();
+            }).not.toThrow();
+        });
+    });
+
+    describe('Headroom Sparklines', () => {
+        let frames;
+        let canvasContext;
+        let canvas;
+
+        beforeEach(() => {
+            frames = [];
+            global.requestAnimationFrame = jest.fn((callback) => {
+                frames.push(callback);
+                return frames.length;
+            });
+            canvasContext = {};
+            ['setTransform', 'clearRect', 'fillText', 'beginPath', 'moveTo', 'lineTo', 'stroke', 'setLineDash']
+                .forEach((name) => { canvasContext[name] = jest.fn(); });
+            canvas = { width: 0, height: 0, clientWidth: 400, style: {}, getContext: jest.fn(() => canvasContext) };
+            document.getElementById = jest.fn((id) => (id === 'octo_fire_guard_sparklines' ? canvas : null));
+        });
+
+        afterEach(() => {
+            delete global.requestAnimationFrame;
+        });
+
+        function runFrames() {
+            const pending = frames;
+            frames = [];
+            pending.forEach((callback) => callback());
+        }
+
+        test('should draw at most once per animation frame', () => {
+            viewModel.onTabChange('#tab_plugin_octo_fire_guard', '#temp');
+            for (let i = 0; i < 50; i++) {
+                viewModel.applyGuardStatus({ s: { T0: [200 + i, 210, 50 - i, 0] } }, false);
+            }
+            const drawSpy = jest.spyOn(viewModel, 'drawSparklines');
+
+            expect(requestAnimationFrame).toHaveBeenCalledTimes(1);
+            runFrames();
+
+            expect(drawSpy).toHaveBeenCalledTimes(1);
+            expect(canvasContext.clearRect).toHaveBeenCalledTimes(1);
+        });
+
+        test('should not draw while the tab is hidden', () => {
+            viewModel.applyGuardStatus({ s: { T0: [200, 210, 50, 0] } }, false);
+
+            expect(requestAnimationFrame).not.toHaveBeenCalled();
+            expect(viewModel.sparklineSeries.T0.length).toBe(1);
+        });
+
+        test('should keep the time axis moving while the tab is shown', () => {
+            viewModel.onTabChange('#tab_plugin_octo_fire_guard', '#temp');
+
+            expect(setInterval).toHaveBeenCalledWith(viewModel.scheduleSparklineDraw, 2000);
+
+            viewModel.onTabChange('#temp', '#tab_plugin_octo_fire_guard');
+
+            expect(clearInterval).toHaveBeenCalledWith(12345);
+            expect(viewModel.sparklineTimer).toBeNull();
+        });
+
+        test('should record temperature and threshold per sensor', () => {
+            viewModel.applyGuardStatus({ s: { T0: [200, 210, 50, 0], C: [35, null, null, 0] } }, false);
+
+            expect(viewModel.sparklineSeries.T0[0].slice(1)).toEqual([200, 250]);
+            expect(viewModel.sparklineSeries.C[0].slice(1)).toEqual([35, null]);
+        });
+
+        test('should drop series of removed sensors', () => {
+            viewModel.applyGuardStatus({ s: { T0: [200, 210, 50, 0], B: [60, 60, 40, 0] } }, false);
+            viewModel.applyGuardStatus({ s: { B: null } }, false);
+
+            expect(Object.keys(viewModel.sparklineSeries)).toEqual(['T0']);
+
+            viewModel.applyGuardStatus({ s: { T1: [190, 200, 60, 0] } }, true);
+
+            expect(Object.keys(viewModel.sparklineSeries)).toEqual(['T1']);
+        });
+
+        test('should drop points older than the window', () => {
+            viewModel.sparklineSeries.T0 = [[0, 20, 250], [1, 21, 250], [2, 22, 250]];
+
+            viewModel.applyGuardStatus({ s: { T0: [200, 210, 50, 0] } }, false);
+
+            expect(viewModel.sparklineSeries.T0.length).toBe(2);
+            expect(viewModel.sparklineSeries.T0[0][0]).toBe(2);
+        });
+
+        test('should size the canvas to one row per sensor', () => {
+            viewModel.applyGuardStatus({ s: { T0: [200, 210, 50, 0], B: [60, 60, 40, 0] } }, false);
+
+            viewModel.drawSparklines();
+
+            expect(canvas.width).toBe(400);
+            expect(canvas.height).toBe(96);
+            expect(canvasContext.fillText).toHaveBeenCalledWith('B', 8, 18);
+            expect(canvasContext.fillText).toHaveBeenCalledWith('T0', 8, 66);
+        });
+
+        test('should handle a missing canvas', () => {
+            document.getElementById = jest.fn(() => null);
+
+            expect(() => {
+                viewModel.drawSparklines();
+            }).not.toThrow();
+        });
+    });
+
+    describe('Emergency Plan Warning', () => {
+        test('should show emergency_plan_warning messages', () => {
+            viewModel.onDataUpdaterPluginMessage('octo_fire_guard', {
+                type: 'emergency_plan_warning',
+                problems: ['No termination GCode configured']
+            });
+
+            expect(PNotify).toHaveBeenCalledWith(expect.objectContaining({
+                type: 'error',
+                hide: false,
+                text_escape: true
+            }));
+        });
+
+        test('should replace an earlier warning', () => {
+            const remove = jest.fn();
+            viewModel.planWarningNotification = { remove: remove };
+
+            viewModel.showPlanWarning([]);
+
+            expect(remove).toHaveBeenCalled();
+            expect(viewModel.planWarningNotification).toBeNull();
+            expect(PNotify).not.toHaveBeenCalled();
+        });
+
+        test('should show plan problems from the status request', () => {
+            mockOctoPrint.simpleApiGet = jest.fn(() => ({
+                done: jest.fn((callback) => {
+                    callback({ type: 'guard_status', t: 1, s: {}, plan_problems: ['Unknown termination mode: x'] });
+                })
+            }));
+
+            viewModel.onStartupComplete();
+
+            expect(PNotify).toHaveBeenCalled();
+        });
+    });
+
+    describe('Custom Rule Warning', () => {
+        test('should show guard_rule_warning messages', () => {
+            viewModel.onDataUpdaterPluginMessage('octo_fire_guard', {
+                type: 'guard_rule_warning',
+                problems: ["Rule 1 (foo > 3): unknown sensor 'foo'"]
+            });
+
+            expect(PNotify).toHaveBeenCalledWith(expect.objectContaining({
+                title: 'Octo Fire Guard: Custom Rules',
+                hide: false,
+                text_escape: true
+            }));
+        });
+
+        test('should show rule problems from the status request', () => {
+            mockOctoPrint.simpleApiGet = jest.fn(() => ({
+                done: jest.fn((callback) => {
+                    callback({ type: 'guard_status', t: 1, s: {}, rule_problems: ['Rule 2 (bed >): unexpected end of rule'] });
+                })
+            }));
+
+            viewModel.onStartupComplete();
+
+            expect(PNotify).toHaveBeenCalledWith(expect.objectContaining({ title: 'Octo Fire Guard: Custom Rules' }));
+        });
+    });
+
     describe('showAlert', () => {
+        test('should show custom rule alerts without temperatures', () => {
+            viewModel.showAlert({
+                type: 'temperature_alert',
+                sensor: 'rule',
+                current_temp: null,
+                threshold: null,
+                rule: 'chamber > 60',
+                message: 'EMERGENCY: Custom rule triggered: chamber > 60'
+            });
+
+            expect(PNotify).toHaveBeenCalledWith(expect.objectContaining({
+                text: 'EMERGENCY: Custom rule triggered: chamber > 60'
+            }));
+        });
+
         test('should set alert observables correctly', () => {
             const alertData = {
                 message: 'Temperature too high!',
@@ -702,6 +1394,129 @@ describe('OctoFireGuardViewModel', () => {
         });
     });
 
+    describe('Web Audio Alarm', () => {
+        let context;
+        let pendingDecode;
+
+        function createMockAudioContext(options) {
+            const ctx = {
+                state: 'running',
+                sampleRate: 8000,
+                currentTime: 0,
+                destination: {},
+                sources: [],
+                resume: jest.fn(() => Promise.resolve()),
+                suspend: jest.fn(function() { ctx.state = 'suspended'; }),
+                createBufferSource: jest.fn(() => {
+                    const source = { connect: jest.fn(), start: jest.fn(), stop: jest.fn(), disconnect: jest.fn() };
+                    ctx.sources.push(source);
+                    return source;
+                }),
+                createBuffer: jest.fn((channels, length) => {
+                    const data = new Float32Array(length);
+                    return { numberOfChannels: channels, length: length, getChannelData: () => data };
+                }),
+                decodeAudioData: jest.fn((buffer, done, fail) => {
+                    const beep = { numberOfChannels: 1, getChannelData: () => new Float32Array(100).fill(0.5) };
+                    if (options && options.fail) {
+                        fail(new Error('decode error'));
+                    } else if (options && options.defer) {
+                        pendingDecode = () => done(beep);
+                    } else {
+                        done(beep);
+                    }
+                })
+            };
+            return ctx;
+        }
+
+        function installAudioContext(options) {
+            context = createMockAudioContext(options);
+            global.AudioContext = jest.fn(() => context);
+        }
+
+        afterEach(() => {
+            delete global.AudioContext;
+            pendingDecode = null;
+        });
+
+        test('should loop one decoded beep period instead of creating Audio elements', () => {
+            installAudioContext();
+
+            viewModel.startAlertSound();
+
+            expect(context.sources.length).toBe(1);
+            expect(context.sources[0].loop).toBe(true);
+            expect(context.sources[0].start).toHaveBeenCalled();
+            expect(context.createBuffer).toHaveBeenCalledWith(1, 16000, 8000);
+            expect(Audio).not.toHaveBeenCalled();
+            expect(setInterval).not.toHaveBeenCalled();
+        });
+
+        test('should decode the sound and create the context only once', () => {
+            installAudioContext();
+
+            viewModel.startAlertSound();
+            viewModel.closeAlert();
+            viewModel.startAlertSound();
+
+            expect(AudioContext).toHaveBeenCalledTimes(1);
+            expect(context.decodeAudioData).toHaveBeenCalledTimes(1);
+            expect(context.sources.length).toBe(2);
+        });
+
+        test('should stop the source and suspend the context', () => {
+            installAudioContext();
+            viewModel.startAlertSound();
+            const source = context.sources[0];
+
+            viewModel.stopAlertSound();
+
+            expect(source.stop).toHaveBeenCalled();
+            expect(source.disconnect).toHaveBeenCalled();
+            expect(viewModel.alarmSource).toBeNull();
+            expect(context.suspend).toHaveBeenCalled();
+        });
+
+        test('should resume a suspended context when the alarm starts', () => {
+            installAudioContext();
+            context.state = 'suspended';
+
+            viewModel.startAlertSound();
+
+            expect(context.resume).toHaveBeenCalled();
+        });
+
+        test('should not start after being stopped during decoding', () => {
+            installAudioContext({ defer: true });
+
+            viewModel.startAlertSound();
+            viewModel.stopAlertSound();
+            pendingDecode();
+
+            expect(context.sources.length).toBe(0);
+        });
+
+        test('should fall back to Audio when decoding fails', () => {
+            installAudioContext({ fail: true });
+
+            viewModel.startAlertSound();
+
+            expect(Audio).toHaveBeenCalledWith(viewModel.alertSoundData);
+            expect(setInterval).toHaveBeenCalledWith(expect.any(Function), 2000);
+        });
+
+        test('should fall back to Audio when the context cannot be created', () => {
+            global.AudioContext = jest.fn(() => {
+                throw new Error('not allowed');
+            });
+
+            viewModel.startAlertSound();
+
+            expect(Audio).toHaveBeenCalledWith(viewModel.alertSoundData);
+        });
+    });
+
     describe('closeAlert', () => {
         test('should set isAlertVisible to false', () => {
             viewModel.isAlertVisible(true);
@@ -777,6 +1592,20 @@ describe('OctoFireGuardViewModel', () => {
             }));
         });
 
+        test('showDataTimeoutWarning should show sub-minute timeouts in seconds', () => {
+            const warningData = {
+                sensors: ['hotend'],
+                timeout: 0.5,
+                message: 'Test message'
+            };
+
+            viewModel.showDataTimeoutWarning(warningData);
+
+            expect(mockPNotify).toHaveBeenCalledWith(expect.objectContaining({
+                text: expect.stringContaining('for 0.5 seconds')
+            }));
+        });
+
         test('showDataTimeoutWarning should create PNotify', () => {
             const warningData = {
                 sensors: ['hotend'],
@@ -0,0 +1,232 @@
+# coding=utf-8
+"""
+Unit tests for the emergency executor that handles shutdowns off the comm thread.
+"""
+
+from __future__ import absolute_import
+import threading
+import unittest
+from unittest.mock import Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.emergency import EmergencyExecutor, EmergencyIncident
+
+
+class TestEmergencyIncident(unittest.TestCase):
+    """Test suite for EmergencyIncident"""
+
+    def test_run_step_records_timing(self):
+        """Test that a step's start and finish are recorded"""
+        incident = EmergencyIncident("hotend", 260.0, 250.0)
+
+        result = incident.run_step("gcode", lambda value: value * 2, 21)
+
+        self.assertEqual(result, 42)
+        started, finished = incident.steps["gcode"]
+        self.assertLessEqual(incident.detected_perf, started)
+        self.assertLessEqual(started, finished)
+        self.assertIn("gcode", incident.step_durations())
+
+    def test_run_step_records_timing_on_failure(self):
+        """Test that a failing step is still timed and the error propagates"""
+        incident = EmergencyIncident("hotend", 260.0, 250.0)
+
+        def failing_step():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            incident.run_step("psu", failing_step)
+        self.assertIn("psu", incident.steps)
+
+
+class TestEmergencyExecutor(unittest.TestCase):
+    """Test suite for EmergencyExecutor"""
+
+    def setUp(self):
+        self.handled = []
+        self.handled_event = threading.Event()
+
+        def handler(incident):
+            self.handled.append((incident, threading.current_thread()))
+            self.handled_event.set()
+
+        self.executor = EmergencyExecutor(handler)
+        self.addCleanup(self.executor.stop)
+
+    def test_submit_rejected_when_not_started(self):
+        """Test that submit reports failure before the worker is started"""
+        self.assertFalse(self.executor.is_running)
+        self.assertFalse(self.executor.submit(EmergencyIncident("hotend", 260.0, 250.0)))
+        self.assertEqual(self.handled, [])
+
+    def test_submit_runs_handler_on_worker_thread(self):
+        """Test that submitted incidents are handled on the dedicated thread"""
+        self.executor.start(Mock())
+        incident = EmergencyIncident("hotend", 260.0, 250.0)
+
+        self.assertTrue(self.executor.submit(incident))
+        self.assertTrue(self.handled_event.wait(5))
+
+        handled_incident, thread = self.handled[0]
+        self.assertIs(handled_incident, incident)
+        self.assertIsNot(thread, threading.current_thread())
+
+    def test_handler_errors_do_not_stop_worker(self):
+        """Test that an exception in one incident does not kill the worker"""
+        logger = Mock()
+        calls = []
+        done = threading.Event()
+
+        def handler(incident):
+            calls.append(incident)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            done.set()
+
+        executor = EmergencyExecutor(handler)
+        self.addCleanup(executor.stop)
+        executor.start(logger)
+        executor.submit(EmergencyIncident("hotend", 260.0, 250.0))
+        executor.submit(EmergencyIncident("heatbed", 110.0, 100.0))
+
+        self.assertTrue(done.wait(5))
+        logger.exception.assert_called_once()
+
+    def test_stop_handles_queued_incidents(self):
+        """Test that stopping the executor drains incidents already queued"""
+        self.executor.start(Mock())
+        self.executor.submit(EmergencyIncident("hotend", 260.0, 250.0))
+        self.executor.stop()
+
+        self.assertEqual(len(self.handled), 1)
+        self.assertFalse(self.executor.is_running)
+
+    def test_run_parallel_inline_when_not_started(self):
+        """Test that run_parallel falls back to running inline"""
+        future = self.executor.run_parallel(threading.current_thread)
+        self.assertIs(future.result(), threading.current_thread())
+
+    def test_run_parallel_on_lane_when_started(self):
+        """Test that run_parallel uses the parallel lane once started"""
+        self.executor.start(Mock())
+        future = self.executor.run_parallel(threading.current_thread)
+        self.assertIsNot(future.result(5), threading.current_thread())
+
+    def test_run_parallel_propagates_errors(self):
+        """Test that errors are reported through the returned future"""
+        def failing():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            self.executor.run_parallel(failing).result()
+
+
+class TestPluginEmergencyDispatch(unittest.TestCase):
+    """Test that the plugin dispatches emergencies through the executor"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "psu",
+            "termination_gcode": "M112\nM104 S0\nM140 S0",
+            "psu_plugin_name": "psucontrol",
+            "enable_monitoring": True,
+            "enable_data_monitoring": False,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.addCleanup(self.plugin.on_shutdown)
+
+        # A PSU plugin that blocks until released, like one waiting on a smart plug
+        self.psu_called = threading.Event()
+        self.release_psu = threading.Event()
+        self.psu_implementation = Mock()
+        self.psu_implementation.turn_psu_off = Mock(side_effect=self._slow_psu_off)
+        psu_plugin = Mock()
+        psu_plugin.implementation = self.psu_implementation
+        self.plugin._plugin_manager.get_plugin_info.return_value = psu_plugin
+
+        self.alert_sent = threading.Event()
+        self.plugin._plugin_manager.send_plugin_message = Mock(side_effect=self._on_plugin_message)
+
+    def _on_plugin_message(self, identifier, data):
+        # Ignore the live status messages sent alongside the alert
+        if data["type"] == "temperature_alert":
+            self.alert_sent.set()
+
+    def _slow_psu_off(self):
+        self.psu_called.set()
+        self.release_psu.wait(5)
+
+    def test_on_after_startup_starts_executor(self):
+        """Test that the executor is running after startup and stopped on shutdown"""
+        self.plugin.on_after_startup()
+        self.assertTrue(self.plugin._emergency_executor.is_running)
+
+        self.plugin.on_shutdown()
+        self.assertFalse(self.plugin._emergency_executor.is_running)
+
+    def test_slow_psu_does_not_block_temperature_callback(self):
+        """Test that the comm thread returns while the PSU plugin is still busy"""
+        self.plugin.on_after_startup()
+
+        parsed_temps = {"tool0": (260.0, 250.0)}
+        result = self.plugin.temperature_callback(None, parsed_temps)
+
+        self.assertEqual(result, parsed_temps)
+        self.assertTrue(self.psu_called.wait(5))
+        # The callback already returned although turn_psu_off has not finished
+        self.assertTrue(self.plugin._hotend_threshold_exceeded)
+        self.release_psu.set()
+
+    def test_heaters_killed_first_and_alert_not_delayed_by_psu(self):
+        """Test that GCode goes out first and the alert is sent while the PSU call is pending"""
+        self.plugin.on_after_startup()
+
+        self.plugin.temperature_callback(None, {"tool0": (260.0, 250.0)})
+
+        self.assertTrue(self.psu_called.wait(5))
+        self.assertTrue(self.alert_sent.wait(5))
+        self.plugin._printer.commands.assert_any_call(["M104 S0", "M140 S0"])
+        self.release_psu.set()
+
+    def test_step_timings_are_logged(self):
+        """Test that per-step timings are logged once the incident is handled"""
+        self.release_psu.set()
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0)
+
+        timing_calls = [c for c in self.plugin._logger.info.call_args_list
+                        if "Emergency shutdown for" in c[0][0]]
+        self.assertEqual(len(timing_calls), 1)
+        self.assertEqual(timing_calls[0][0][1], "hotend")
+        for step in ("gcode", "notify", "psu"):
+            self.assertIn(step, timing_calls[0][0][2])
+
+    def test_gcode_failure_still_notifies_frontend(self):
+        """Test that a failing kill command does not prevent the alert"""
+        self.settings_dict["termination_mode"] = "gcode"
+        self.plugin._printer.commands.side_effect = Exception("Printer gone")
+
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0)
+
+        self.assertTrue(self.alert_sent.is_set())
+        self.plugin._logger.error.assert_any_call("Failed to send emergency GCode: Printer gone")
+
+
+if __name__ == '__main__':
+    unittest.main()
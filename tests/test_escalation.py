@@ -0,0 +1,281 @@
+# coding=utf-8
+"""
+Unit tests for the post-trip termination check and escalation.
+"""
+
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.emergency import EmergencyIncident
+from octoprint_octo_fire_guard.escalation import (
+    EscalationMonitor, STATE_VERIFYING, STATE_ESCALATING, STATE_COOLING, STATE_EXHAUSTED, STATE_NO_DATA
+)
+from octoprint_octo_fire_guard.plan import EmergencyPlan
+
+WINDOW = 0.05
+
+
+def incident(sensor_key="T0", temperature=260.0):
+    return EmergencyIncident("hotend", temperature, 250.0, sensor_key=sensor_key)
+
+
+class TestEscalationMonitor(unittest.TestCase):
+    """Test suite for EscalationMonitor"""
+
+    def setUp(self):
+        self.escalate = Mock()
+        self.done = threading.Event()
+        self.finished = Mock(side_effect=lambda verification: self.done.set())
+        self.monitor = EscalationMonitor(self.escalate, self.finished)
+        self.monitor.start(Mock())
+        self.addCleanup(self.monitor.stop)
+
+    def feed(self, sensor_key, temperatures, interval=0.005):
+        for temperature in temperatures:
+            self.monitor.observe(sensor_key, time.perf_counter(), temperature)
+            time.sleep(interval)
+
+    def states(self, verification):
+        return [transition["state"] for transition in verification.transitions]
+
+    def test_falling_temperature_is_verified(self):
+        verification = self.monitor.begin(incident(), "gcode", ["psu", "secondary"], 0.2)
+
+        self.feed("T0", [258.0, 255.0, 251.0, 247.0])
+
+        self.assertTrue(self.done.wait(2))
+        self.escalate.assert_not_called()
+        self.assertEqual(self.states(verification), [STATE_VERIFYING, STATE_COOLING])
+        self.assertLess(verification.transitions[-1]["slope"], 0)
+        self.assertFalse(self.monitor.watching)
+
+    def test_rising_temperature_escalates_through_every_stage(self):
+        verification = self.monitor.begin(incident(), "gcode", ["psu", "secondary"], WINDOW)
+
+        temperature = 261.0
+        while not self.done.is_set() and temperature < 661.0:
+            self.feed("T0", [temperature])
+            temperature += 1.0
+
+        self.assertTrue(self.done.wait(2))
+        self.assertEqual([c[0][1] for c in self.escalate.call_args_list], ["psu", "secondary"])
+        self.assertEqual(self.states(verification), [
+            STATE_VERIFYING, STATE_ESCALATING, STATE_VERIFYING, STATE_ESCALATING, STATE_VERIFYING, STATE_EXHAUSTED
+        ])
+        self.finished.assert_called_once_with(verification)
+
+    def test_missing_readings_escalate(self):
+        verification = self.monitor.begin(incident(), "psu", ["secondary"], WINDOW)
+
+        self.assertTrue(self.done.wait(2))
+
+        self.escalate.assert_called_once_with(verification, "secondary")
+        self.assertEqual(verification.state, STATE_NO_DATA)
+        self.assertIsNone(verification.transitions[1]["slope"])
+
+    def test_readings_stopping_after_the_last_stage_is_no_data(self):
+        """Test that a check without readings in its last window is not taken for a rising temperature"""
+        verification = self.monitor.begin(incident(), "gcode", [], 0.2)
+
+        self.assertTrue(self.done.wait(2))
+
+        self.assertEqual(self.states(verification), [STATE_VERIFYING, STATE_NO_DATA])
+        self.assertIsNone(verification.transitions[-1]["slope"])
+
+    def test_cooling_after_escalation(self):
+        escalated = threading.Event()
+        self.escalate.side_effect = lambda verification, stage: escalated.set()
+        verification = self.monitor.begin(incident(), "gcode", ["psu", "secondary"], 0.2)
+
+        self.assertTrue(escalated.wait(2))
+        self.feed("T0", [259.0, 256.0, 252.0])
+
+        self.assertTrue(self.done.wait(2))
+        self.escalate.assert_called_once_with(verification, "psu")
+        self.assertEqual(verification.state, STATE_COOLING)
+
+    def test_failed_stage_still_escalates_further(self):
+        self.escalate.side_effect = [Exception("plug offline"), None]
+
+        verification = self.monitor.begin(incident(), "gcode", ["psu", "secondary"], WINDOW)
+
+        self.assertTrue(self.done.wait(2))
+        self.assertEqual(self.escalate.call_count, 2)
+        self.assertEqual(verification.state, STATE_NO_DATA)
+
+    def test_readings_of_other_sensors_are_ignored(self):
+        verification = self.monitor.begin(incident("T1"), "gcode", [], 0.2)
+
+        self.feed("T0", [240.0, 230.0, 220.0])
+
+        self.assertTrue(self.done.wait(2))
+        self.assertEqual(verification.state, STATE_NO_DATA)
+
+    def test_sensor_is_verified_once(self):
+        self.assertIsNotNone(self.monitor.begin(incident(), "gcode", [], 1))
+        self.assertIsNone(self.monitor.begin(incident(), "gcode", [], 1))
+        self.assertIsNone(self.monitor.begin(incident(sensor_key=None), "gcode", [], 1))
+
+    def test_cancel_all(self):
+        self.monitor.begin(incident(), "gcode", ["psu"], WINDOW)
+
+        self.monitor.cancel_all()
+
+        self.assertFalse(self.done.wait(0.2))
+        self.escalate.assert_not_called()
+
+
+class TestPluginEscalation(unittest.TestCase):
+    """Test the plugin side of the termination check"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.turn_psu_off = Mock()
+        implementation = Mock(spec=["turn_psu_off"])
+        implementation.turn_psu_off = self.turn_psu_off
+        self.plugin._plugin_manager = Mock()
+        self.plugin._plugin_manager.get_plugin_info.return_value = Mock(implementation=implementation)
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "psu_plugin_name": "psucontrol",
+            "enable_monitoring": True,
+            "enable_escalation": True,
+            "verification_window": 30,
+            "secondary_power_command": "smartplug --off 'printer plug'",
+            "status_interval": 0,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+
+    def test_secondary_command_is_admin_only(self):
+        """Test that only administrators can read or change the command run on the host"""
+        self.assertEqual(self.plugin.get_settings_restricted_paths(), {"admin": [["secondary_power_command"]]})
+
+    def test_plan_escalation_stages(self):
+        plan = EmergencyPlan.compile(self.plugin._settings, self.plugin._plugin_manager)
+
+        self.assertEqual(plan.escalation_stages, ("psu", "secondary"))
+        self.assertEqual(plan.secondary_power_off, ("smartplug", "--off", "printer plug"))
+        self.assertEqual(plan.verification_window, 30.0)
+
+    def test_plan_escalation_disabled(self):
+        self.settings_dict["enable_escalation"] = False
+
+        plan = EmergencyPlan.compile(self.plugin._settings, self.plugin._plugin_manager)
+
+        self.assertIsNone(plan.verification_window)
+        self.assertEqual(plan.escalation_stages, ())
+
+    def test_psu_mode_escalates_to_secondary_only(self):
+        self.settings_dict["termination_mode"] = "psu"
+
+        plan = EmergencyPlan.compile(self.plugin._settings, self.plugin._plugin_manager)
+
+        self.assertEqual(plan.escalation_stages, ("secondary",))
+
+    def test_unparsable_secondary_command_is_a_problem(self):
+        self.settings_dict["secondary_power_command"] = "smartplug 'off"
+
+        plan = EmergencyPlan.compile(self.plugin._settings, self.plugin._plugin_manager)
+
+        self.assertEqual(plan.escalation_stages, ("psu",))
+        self.assertIn("Secondary power-off command", plan.problems[0])
+
+    def test_emergency_starts_verification(self):
+        self.plugin._escalation = Mock(is_running=True)
+
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0, sensor_key="T0")
+
+        args = self.plugin._escalation.begin.call_args[0]
+        self.assertEqual(args[0].sensor_key, "T0")
+        self.assertEqual(args[1:], ("gcode", ("psu", "secondary"), 30.0))
+
+    def test_callback_feeds_readings(self):
+        self.plugin._escalation = Mock(watching=True)
+        self.plugin._trigger_emergency_shutdown = Mock()
+
+        self.plugin.temperature_callback(None, {"T0": (255.0, 0.0), "B": (60.0, 60.0)})
+
+        observed = dict((c[0][0], c[0][2]) for c in self.plugin._escalation.observe.call_args_list)
+        self.assertEqual(observed, {"T0": 255.0, "B": 60.0})
+
+    def test_escalate_to_psu(self):
+        self.plugin._escalate_termination(Mock(sensor_key="T0"), "psu")
+
+        self.turn_psu_off.assert_called_once_with()
+
+    @patch("subprocess.run")
+    def test_escalate_to_secondary(self, mock_run):
+        mock_run.return_value = Mock(returncode=0, stdout=b"")
+
+        self.plugin._escalate_termination(Mock(sensor_key="T0"), "secondary")
+
+        self.assertEqual(mock_run.call_args[0][0], ["smartplug", "--off", "printer plug"])
+
+    @patch("subprocess.run")
+    def test_failing_secondary_command_raises(self, mock_run):
+        mock_run.return_value = Mock(returncode=1, stdout=b"no route to host\n")
+
+        with self.assertRaises(Exception) as context:
+            self.plugin._escalate_termination(Mock(sensor_key="T0"), "secondary")
+
+        self.assertIn("no route to host", str(context.exception))
+
+    def test_unverified_termination_is_journaled_and_alerted(self):
+        self.plugin._journal = Mock()
+        verification = Mock(sensor_key="T0", last_temp=275.0, state=STATE_EXHAUSTED,
+                            incident=incident(), transitions=[dict(time=1.5, state=STATE_EXHAUSTED)])
+
+        self.plugin._on_verification_finished(verification)
+
+        record = self.plugin._journal.append.call_args[0][0]
+        self.assertEqual(record["type"], "termination_verification")
+        self.assertEqual(record["result"], STATE_EXHAUSTED)
+        message = self.plugin._plugin_manager.send_plugin_message.call_args[0][1]
+        self.assertEqual(message["type"], "temperature_alert")
+        self.assertIn("not falling", message["message"])
+
+    def test_termination_without_readings_is_alerted_as_no_data(self):
+        self.plugin._journal = Mock()
+        verification = Mock(sensor_key="T0", last_temp=260.0, state=STATE_NO_DATA,
+                            incident=incident(), transitions=[dict(time=1.5, state=STATE_NO_DATA)])
+
+        self.plugin._on_verification_finished(verification)
+
+        self.assertEqual(self.plugin._journal.append.call_args[0][0]["result"], STATE_NO_DATA)
+        message = self.plugin._plugin_manager.send_plugin_message.call_args[0][1]["message"]
+        self.assertIn("No HOTEND temperature reported", message)
+        self.assertNotIn("not falling", message)
+
+    def test_verified_termination_is_not_alerted(self):
+        self.plugin._journal = Mock()
+        verification = Mock(sensor_key="T0", last_temp=240.0, state=STATE_COOLING,
+                            incident=incident(), transitions=[dict(time=1.5, state=STATE_COOLING)])
+
+        self.plugin._on_verification_finished(verification)
+
+        self.plugin._journal.append.assert_called_once()
+        self.plugin._plugin_manager.send_plugin_message.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+# coding=utf-8
+"""
+Unit tests for the Prometheus metrics endpoint.
+"""
+
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.exposition import (
+    ExpositionWriter, MetricsExposition, CONTENT_TYPE, format_labels, format_value
+)
+from octoprint_octo_fire_guard.metrics import LatencyHistogram
+
+
+def samples(body):
+    """Sample lines of an exposition as {"name{labels}": "value"}"""
+    return dict(line.rsplit(" ", 1) for line in body.splitlines() if line and not line.startswith("#"))
+
+
+class TestExpositionWriter(unittest.TestCase):
+    """Test suite for the text exposition format"""
+
+    def test_format_value(self):
+        self.assertEqual(format_value(True), "1")
+        self.assertEqual(format_value(False), "0")
+        self.assertEqual(format_value(12), "12")
+        self.assertEqual(format_value(0.5), "0.5")
+        self.assertEqual(format_value(float("nan")), "NaN")
+        self.assertEqual(format_value(float("inf")), "+Inf")
+
+    def test_label_values_are_escaped(self):
+        self.assertEqual(format_labels([("rule", 'chamber > 60 and "x"\\\n')]),
+                         '{rule="chamber > 60 and \\"x\\"\\\\\\n"}')
+        self.assertEqual(format_labels(()), "")
+
+    def test_family(self):
+        writer = ExpositionWriter()
+        writer.family("alert", "gauge", "Alert raised", [((("sensor", "T0"),), True), ((("sensor", "B"),), None)])
+
+        self.assertEqual(writer.getvalue(),
+                         "# HELP octo_fire_guard_alert Alert raised\n"
+                         "# TYPE octo_fire_guard_alert gauge\n"
+                         "octo_fire_guard_alert{sensor=\"T0\"} 1\n")
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = LatencyHistogram((0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 5.0):
+            histogram.observe(value)
+        writer = ExpositionWriter()
+
+        writer.histogram("duration_seconds", "Duration", histogram)
+
+        exported = samples(writer.getvalue())
+        self.assertEqual(exported['octo_fire_guard_duration_seconds_bucket{le="0.1"}'], "1")
+        self.assertEqual(exported['octo_fire_guard_duration_seconds_bucket{le="1.0"}'], "3")
+        self.assertEqual(exported['octo_fire_guard_duration_seconds_bucket{le="+Inf"}'], "4")
+        self.assertEqual(exported["octo_fire_guard_duration_seconds_count"], "4")
+        self.assertAlmostEqual(float(exported["octo_fire_guard_duration_seconds_sum"]), 6.25)
+
+
+class TestMetricsExposition(unittest.TestCase):
+    """Test suite for rendering on scrape with a per-second cache"""
+
+    def test_body_is_cached_within_a_second(self):
+        clock = Mock(side_effect=[100.1, 100.9, 101.0])
+        render = Mock(side_effect=lambda now: "body at {}".format(now))
+        exposition = MetricsExposition(render, clock)
+
+        self.assertEqual(exposition.body(), "body at 100.1")
+        self.assertEqual(exposition.body(), "body at 100.1")
+        self.assertEqual(exposition.body(), "body at 101.0")
+        self.assertEqual(render.call_count, 2)
+
+    def test_concurrent_scrapes_share_one_rendering(self):
+        started = threading.Event()
+
+        def render(now):
+            started.set()
+            time.sleep(0.05)
+            return "body"
+
+        exposition = MetricsExposition(render, clock=lambda: 100.0)
+        bodies = []
+        threads = [threading.Thread(target=lambda: bodies.append(exposition.body())) for _ in range(8)]
+        threads[0].start()
+        started.wait(1.0)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(bodies, ["body"] * 8)
+        self.assertEqual(exposition.renders, 1)
+
+
+class TestPluginMetricsEndpoint(unittest.TestCase):
+    """Test the plugin's /metrics route"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112\nM104 S0\nM140 S0",
+            "enable_monitoring": True,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+
+    def scrape(self, now=None):
+        now = time.time() if now is None else now
+        with patch.object(self.plugin._get_exposition(), "_clock", return_value=now):
+            response = self.plugin.get_metrics()
+        self.assertEqual(response.content_type, CONTENT_TYPE)
+        return samples(response.data)
+
+    def test_route_is_registered_and_protected(self):
+        self.assertIn(("/metrics", dict(methods=["GET"])), OctoFireGuardPlugin.get_metrics._blueprint_rules)
+        self.assertTrue(self.plugin.is_blueprint_protected())
+
+    def test_sensor_state(self):
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0), "B": (60.0, None), "C": (35.0, 0.0)})
+
+        exported = self.scrape(time.time() + 5.0)
+
+        self.assertEqual(exported['octo_fire_guard_temperature_celsius{sensor="T0",kind="hotend",type="actual"}'],
+                         "200.0")
+        self.assertEqual(exported['octo_fire_guard_temperature_celsius{sensor="T0",kind="hotend",type="target"}'],
+                         "210.0")
+        self.assertNotIn('octo_fire_guard_temperature_celsius{sensor="B",kind="heatbed",type="target"}', exported)
+        self.assertEqual(exported['octo_fire_guard_threshold_celsius{sensor="B",kind="heatbed"}'], "100.0")
+        self.assertNotIn('octo_fire_guard_threshold_celsius{sensor="C",kind="chamber"}', exported)
+        self.assertAlmostEqual(float(exported['octo_fire_guard_temperature_age_seconds{sensor="C",kind="chamber"}']),
+                               5.0, delta=1.0)
+        self.assertEqual(exported['octo_fire_guard_alert{sensor="T0",kind="hotend"}'], "0")
+        self.assertEqual(exported["octo_fire_guard_monitoring_enabled"], "1")
+        self.assertEqual(exported['octo_fire_guard_data_timeout{kind="hotend"}'], "0")
+
+    def test_trips_and_data_timeout(self):
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0), "B": (60.0, 60.0)})
+        self.plugin.temperature_callback(None, {"T0": (260.0, 210.0), "B": (60.0, 60.0)})
+        self.plugin._warned_missing_sensors.add("heatbed")
+
+        exported = self.scrape()
+
+        self.assertEqual(exported['octo_fire_guard_trips_total{kind="hotend",sensor="T0"}'], "1")
+        self.assertEqual(exported['octo_fire_guard_alert{sensor="T0",kind="hotend"}'], "1")
+        self.assertEqual(exported['octo_fire_guard_data_timeout{kind="heatbed"}'], "1")
+        self.assertIn('octo_fire_guard_data_age_seconds{kind="hotend"}', exported)
+
+    def test_callback_cost(self):
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0)})
+        self.settings_dict["enable_monitoring"] = False
+        self.plugin._rebuild_guard_settings()
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0)})
+
+        exported = self.scrape()
+
+        self.assertEqual(exported["octo_fire_guard_callback_calls_total"], "2")
+        self.assertEqual(exported["octo_fire_guard_callback_duration_seconds_count"], "1")
+        self.assertGreater(float(exported["octo_fire_guard_callback_duration_seconds_sum"]), 0.0)
+        self.assertEqual(exported["octo_fire_guard_monitoring_enabled"], "0")
+
+    def test_scrapes_within_a_second_reuse_the_body(self):
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0)})
+        first = self.scrape(1000.2)
+        self.plugin.temperature_callback(None, {"T0": (201.0, 210.0)})
+
+        self.assertEqual(self.scrape(1000.8), first)
+        self.assertNotEqual(self.scrape(1001.0), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
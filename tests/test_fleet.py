@@ -0,0 +1,418 @@
+# coding=utf-8
+"""
+Unit tests for fleet reporting and the fleet aggregator.
+"""
+
+from __future__ import absolute_import
+import asyncio
+import json
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard import aggregator as aggregator_module
+from octoprint_octo_fire_guard.aggregator import FleetAggregator, FleetTable, simulate_printer
+from octoprint_octo_fire_guard.fleet import FleetReporter, parse_address, state_delta
+
+
+def make_state(hotend=200.0, bed=60.0, alert=False, timeout=()):
+    return dict(
+        thresholds=dict(hotend=250.0, heatbed=100.0),
+        temps=dict(tool0=[hotend, 210.0], bed=[bed, 60.0]),
+        alert=dict(hotend=alert, heatbed=False),
+        timeout=list(timeout),
+    )
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met within {} s".format(timeout))
+        await asyncio.sleep(0.01)
+
+
+class TestProtocol(unittest.TestCase):
+    """Test suite for the stream helpers"""
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("unix:/run/fleet.sock"), ("unix", "/run/fleet.sock"))
+        self.assertEqual(parse_address("printers.local:8765"), ("tcp", ("printers.local", 8765)))
+        self.assertEqual(parse_address("tcp:10.0.0.2:9000"), ("tcp", ("10.0.0.2", 9000)))
+        self.assertEqual(parse_address("[::1]:8765"), ("tcp", ("::1", 8765)))
+
+    def test_parse_address_rejects_invalid(self):
+        for address in ("", "unix:", "no-port", "host:http"):
+            with self.assertRaises(ValueError):
+                parse_address(address)
+
+    def test_delta_of_first_state_is_full_state(self):
+        self.assertEqual(state_delta({}, make_state()), make_state())
+
+    def test_delta_only_holds_changes(self):
+        delta = state_delta(make_state(), make_state(hotend=201.0, alert=True))
+
+        self.assertEqual(delta, dict(temps=dict(tool0=[201.0, 210.0]), alert=dict(hotend=True, heatbed=False)))
+
+    def test_delta_of_unchanged_state_is_empty(self):
+        self.assertEqual(state_delta(make_state(), make_state()), {})
+
+    def test_removed_sensor_is_sent_as_none(self):
+        current = make_state()
+        del current["temps"]["bed"]
+
+        self.assertEqual(state_delta(make_state(), current), dict(temps=dict(bed=None)))
+
+
+class TestFleetTable(unittest.TestCase):
+    """Test suite for the fleet-wide evaluation"""
+
+    def setUp(self):
+        # The pure Python evaluation; the numpy one is compared against it below
+        patcher = patch.object(aggregator_module, "numpy", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.table = FleetTable()
+
+    def add(self, printer_id, state, received=100.0):
+        slot = self.table.slot(printer_id)
+        self.table.set_connected(slot, True)
+        self.table.apply(slot, state, received)
+        return slot
+
+    def test_findings(self):
+        self.add("ok", make_state())
+        self.add("hot", make_state(hotend=255.0))
+        self.add("near", make_state(hotend=245.0))
+        self.add("alerting", make_state(alert=True, timeout=["heatbed"]))
+        self.add("quiet", make_state(), received=50.0)
+        slot = self.add("gone", make_state())
+        self.table.set_connected(slot, False)
+
+        findings = self.table.evaluate(stale_after=15.0, now=100.0)
+
+        self.assertEqual(findings["over_threshold"], ["hot"])
+        self.assertEqual(findings["near_threshold"], ["near"])
+        self.assertEqual(findings["overshoot"], ["hot", "near"])
+        self.assertEqual(findings["alert"], ["alerting"])
+        self.assertEqual(findings["timeout"], ["alerting"])
+        self.assertEqual(findings["stale"], ["quiet"])
+        self.assertEqual(findings["disconnected"], ["gone"])
+
+    def test_hottest_hotend_is_evaluated(self):
+        state = make_state()
+        state["temps"]["T1"] = [260.0, 0.0]
+        self.add("toolchanger", state)
+
+        self.assertEqual(self.table.evaluate(now=100.0)["over_threshold"], ["toolchanger"])
+
+    def test_printer_without_readings_raises_nothing(self):
+        self.add("new", dict(thresholds=dict(hotend=250.0, heatbed=100.0)))
+
+        findings = self.table.evaluate(now=100.0)
+
+        self.assertEqual([name for name, ids in findings.items() if ids], [])
+
+    def test_deltas_merge_into_slot(self):
+        slot = self.add("printer", make_state())
+        self.table.apply(slot, dict(temps=dict(tool0=[255.0, 210.0])), 101.0)
+        self.table.apply(slot, dict(temps=dict(bed=None)), 102.0)
+
+        summary = self.table.printer_summary(slot)
+
+        self.assertEqual(summary["hotend"], [255.0, 210.0, 250.0])
+        self.assertEqual(summary["heatbed"], [None, None, 100.0])
+
+    def test_malformed_delta_fields_are_ignored(self):
+        slot = self.add("printer", make_state())
+
+        malformed = self.table.apply(slot, dict(alert=[1], thresholds=[300.0], temps=dict(tool0=7, bed=[65.0, 60.0])))
+
+        self.assertEqual(sorted(malformed), ["alert", "temps.tool0", "thresholds"])
+        summary = self.table.printer_summary(slot)
+        self.assertEqual(summary["hotend"][2], 250.0)
+        self.assertEqual(summary["heatbed"][0], 65.0)
+        self.assertEqual(self.table.apply(slot, dict(temps=[1])), ["temps"])
+
+    @unittest.skipIf(aggregator_module.numpy is None, "numpy is not installed")
+    def test_numpy_evaluation_matches_python(self):
+        for index in range(50):
+            self.add("p{}".format(index), make_state(hotend=200.0 + index * 2), received=80.0 + index)
+        expected = self.table.evaluate(now=110.0)
+
+        with patch.object(aggregator_module, "numpy", sys.modules.get("numpy")):
+            self.assertEqual(self.table.evaluate(now=110.0), expected)
+
+
+class TestFleetAggregator(unittest.TestCase):
+    """End-to-end tests with the aggregator on a local socket"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="octo_fire_guard_fleet_")
+        self.addCleanup(shutil.rmtree, self.folder, True)
+
+    def run_async(self, coroutine):
+        return asyncio.run(asyncio.wait_for(coroutine, 30))
+
+    def test_reporter_streams_state_deltas(self):
+        """Test that the plugin-side reporter keeps the aggregator's view current"""
+        state = make_state()
+
+        async def scenario():
+            aggregator = FleetAggregator()
+            server = await aggregator.listen("127.0.0.1:0")
+            port = server.sockets[0].getsockname()[1]
+            reporter = FleetReporter("127.0.0.1:{}".format(port), "printer-1",
+                                     lambda: json.loads(json.dumps(state)), interval=0.05)
+            reporter.start(Mock())
+            try:
+                await wait_for(lambda: aggregator.messages >= 1)
+                state["temps"]["tool0"] = [260.0, 210.0]
+                state["alert"] = dict(hotend=True, heatbed=False)
+                reporter.wake()
+                await wait_for(lambda: aggregator.summary()["findings"]["alert"] == ["printer-1"])
+                summary = aggregator.summary()
+            finally:
+                await asyncio.get_running_loop().run_in_executor(None, reporter.stop)
+                await aggregator.close()
+            return summary
+
+        summary = self.run_async(scenario())
+
+        self.assertEqual(summary["findings"]["over_threshold"], ["printer-1"])
+        self.assertEqual(summary["status"]["printer-1"]["hotend"], [260.0, 210.0, 250.0])
+
+    def test_reporter_reconnects_with_full_state(self):
+        """Test that a reporter started before the aggregator connects once it is up"""
+        path = os.path.join(self.folder, "fleet.sock")
+        reporter = FleetReporter("unix:" + path, "printer-1", make_state, interval=0.05)
+        reporter.start(Mock())
+        self.addCleanup(reporter.stop)
+
+        async def scenario():
+            await asyncio.sleep(0.1)  # Reporter is backing off
+            aggregator = FleetAggregator()
+            await aggregator.listen("unix:" + path)
+            try:
+                await wait_for(lambda: len(aggregator.table) == 1 and aggregator.messages >= 1)
+                return aggregator.summary()
+            finally:
+                await aggregator.close()
+
+        summary = self.run_async(scenario())
+
+        self.assertEqual(summary["status"]["printer-1"]["heatbed"], [60.0, 60.0, 100.0])
+
+    def test_hundreds_of_simulated_printers(self):
+        """Test the aggregator with many simulated plugin clients, one of them running away"""
+        path = os.path.join(self.folder, "fleet.sock")
+        count = 200
+
+        async def scenario():
+            aggregator = FleetAggregator()
+            await aggregator.listen("unix:" + path)
+            try:
+                clients = [simulate_printer("unix:" + path, "printer-{}".format(index), duration=0.3,
+                                            interval=0.05, runaway=(index == 7)) for index in range(count)]
+                await asyncio.gather(*clients)
+                await wait_for(lambda: aggregator.table.columns["connected"].count(0.0) == count)
+                return aggregator.summary()
+            finally:
+                await aggregator.close()
+
+        summary = self.run_async(scenario())
+
+        self.assertEqual(summary["printers"], count)
+        self.assertGreaterEqual(summary["messages"], count * 2)
+        self.assertEqual(summary["findings"]["overshoot"], ["printer-7"])
+        self.assertEqual(len(summary["findings"]["disconnected"]), count)
+
+    def test_bad_hello_is_rejected(self):
+        async def scenario():
+            aggregator = FleetAggregator()
+            server = await aggregator.listen("127.0.0.1:0")
+            port = server.sockets[0].getsockname()[1]
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b'{"hello":99,"id":"future"}\n')
+                await writer.drain()
+                self.assertEqual(await reader.read(), b"")
+                writer.close()
+                return len(aggregator.table)
+            finally:
+                await aggregator.close()
+
+        self.assertEqual(self.run_async(scenario()), 0)
+
+    def test_hello_that_is_not_an_object_is_rejected(self):
+        async def scenario():
+            aggregator = FleetAggregator()
+            server = await aggregator.listen("127.0.0.1:0")
+            port = server.sockets[0].getsockname()[1]
+            try:
+                for hello in (b"[]\n", b"1\n"):
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                    writer.write(hello)
+                    await writer.drain()
+                    self.assertEqual(await reader.read(), b"")
+                    writer.close()
+                return len(aggregator.table)
+            finally:
+                await aggregator.close()
+
+        with self.assertLogs("octoprint.plugins.octo_fire_guard.aggregator", "WARNING") as logs:
+            self.assertEqual(self.run_async(scenario()), 0)
+        self.assertEqual(len([line for line in logs.output if "bad hello" in line]), 2)
+
+    def test_malformed_delta_keeps_the_stream(self):
+        """Test that a delta with fields of the wrong type does not end the printer's stream"""
+        async def scenario():
+            aggregator = FleetAggregator()
+            server = await aggregator.listen("127.0.0.1:0")
+            port = server.sockets[0].getsockname()[1]
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b'{"hello":1,"id":"printer"}\n{"alert":[1],"sensors":5}\n{"temps":"hot"}\n'
+                             b'{"alert":{"hotend":true}}\n')
+                await writer.drain()
+                for _ in range(200):
+                    if aggregator.messages == 3:
+                        break
+                    await asyncio.sleep(0.01)
+                summary = aggregator.summary()
+                writer.close()
+                return summary
+            finally:
+                await aggregator.close()
+
+        with self.assertLogs("octoprint.plugins.octo_fire_guard.aggregator", "WARNING") as logs:
+            summary = self.run_async(scenario())
+        self.assertEqual(summary["messages"], 3)
+        self.assertEqual(summary["findings"]["alert"], ["printer"])
+        self.assertEqual(summary["findings"]["disconnected"], [])
+        self.assertEqual(len([line for line in logs.output if "Ignoring malformed" in line]), 2)
+
+    def test_summary_endpoint(self):
+        async def scenario():
+            aggregator = FleetAggregator()
+            stream_server = await aggregator.listen("127.0.0.1:0")
+            http_server = await aggregator.listen_http("127.0.0.1:0")
+            stream_port = stream_server.sockets[0].getsockname()[1]
+            http_port = http_server.sockets[0].getsockname()[1]
+            try:
+                await simulate_printer("127.0.0.1:{}".format(stream_port), "printer-1", duration=0.05,
+                                       interval=0.01)
+                await wait_for(lambda: len(aggregator.table) == 1)
+                responses = []
+                for path in ("/summary", "/other"):
+                    reader, writer = await asyncio.open_connection("127.0.0.1", http_port)
+                    writer.write("GET {} HTTP/1.0\r\nHost: localhost\r\n\r\n".format(path).encode("latin-1"))
+                    await writer.drain()
+                    responses.append(await reader.read())
+                    writer.close()
+                return responses
+            finally:
+                await aggregator.close()
+
+        summary_response, missing_response = self.run_async(scenario())
+
+        head, body = summary_response.split(b"\r\n\r\n", 1)
+        self.assertTrue(head.startswith(b"HTTP/1.0 200"))
+        self.assertEqual(json.loads(body.decode("utf-8"))["printers"], 1)
+        self.assertTrue(missing_response.startswith(b"HTTP/1.0 404"))
+
+
+class TestPluginFleetReporting(unittest.TestCase):
+    """Test the plugin side of fleet reporting"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "enable_monitoring": True,
+            "enable_fleet_reporting": True,
+            "fleet_aggregator": "127.0.0.1:9",
+            "fleet_printer_id": "printer-1",
+            "fleet_report_interval": 1.0,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.addCleanup(self.plugin.on_shutdown)
+
+    def test_fleet_state(self):
+        self.plugin.temperature_callback(None, {"T0": (200.04, 210.0), "B": (60.0, 60.0)})
+        self.plugin._warned_missing_sensors.add("heatbed")
+
+        state = self.plugin._fleet_state()
+
+        self.assertEqual(state["thresholds"], dict(hotend=250.0, heatbed=100.0))
+        self.assertEqual(state["temps"], dict(T0=[200.0, 210.0], B=[60.0, 60.0]))
+        self.assertEqual(state["alert"], dict(hotend=False, heatbed=False))
+        self.assertEqual(state["timeout"], ["heatbed"])
+
+    def test_timeout_state_is_copied_under_the_lock(self):
+        self.plugin._warned_missing_sensors.add("hotend")
+        lock = self.plugin._state_lock = MagicMock()
+
+        state = self.plugin._fleet_state()
+
+        lock.__enter__.assert_called_once_with()
+        self.assertEqual(state["timeout"], ["hotend"])
+
+    def test_reporter_follows_settings(self):
+        self.plugin._configure_fleet_reporter()
+        reporter = self.plugin._fleet_reporter
+        self.assertTrue(reporter.is_running)
+        self.assertEqual(reporter.printer_id, "printer-1")
+
+        self.settings_dict["enable_fleet_reporting"] = False
+        self.plugin._configure_fleet_reporter()
+
+        self.assertIsNone(self.plugin._fleet_reporter)
+        self.assertFalse(reporter.is_running)
+
+    def test_printer_id_defaults_to_host_name(self):
+        self.settings_dict["fleet_printer_id"] = ""
+        with patch("socket.gethostname", return_value="octopi"):
+            self.plugin._configure_fleet_reporter()
+
+        self.assertEqual(self.plugin._fleet_reporter.printer_id, "octopi")
+
+    def test_invalid_address_is_logged(self):
+        self.settings_dict["fleet_aggregator"] = "nowhere"
+
+        self.plugin._configure_fleet_reporter()
+
+        self.assertIsNone(self.plugin._fleet_reporter)
+        self.assertTrue(any("Invalid fleet aggregator address" in c[0][0]
+                            for c in self.plugin._logger.error.call_args_list))
+
+    def test_alert_wakes_reporter(self):
+        self.plugin._fleet_reporter = Mock()
+
+        self.plugin.temperature_callback(None, {"T0": (260.0, 250.0)})
+
+        self.plugin._fleet_reporter.wake.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+# coding=utf-8
+"""
+Unit tests for the GuardSettings snapshot used by the temperature callback.
+"""
+
+from __future__ import absolute_import
+import unittest
+from unittest.mock import Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.guard_settings import GuardSettings
+
+
+class TestGuardSettings(unittest.TestCase):
+    """Test suite for GuardSettings"""
+
+    def setUp(self):
+        self.defaults = OctoFireGuardPlugin().get_settings_defaults()
+        self.settings_dict = {
+            "hotend_threshold": 260.0,
+            "heatbed_threshold": 110.0,
+            "enable_monitoring": True,
+        }
+        self.settings = Mock()
+        self.settings.get_boolean = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.settings.get_float = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+
+    def test_from_settings_reads_values(self):
+        """Test that the snapshot holds the configured values"""
+        snapshot = GuardSettings.from_settings(self.settings, self.defaults)
+
+        self.assertTrue(snapshot.enable_monitoring)
+        self.assertEqual(snapshot.hotend_threshold, 260.0)
+        self.assertEqual(snapshot.heatbed_threshold, 110.0)
+
+    def test_from_settings_precomputes_reset_thresholds(self):
+        """Test that the hysteresis reset points are computed once"""
+        snapshot = GuardSettings.from_settings(self.settings, self.defaults)
+
+        self.assertEqual(snapshot.hotend_reset_threshold, 250.0)
+        self.assertEqual(snapshot.heatbed_reset_threshold, 100.0)
+
+    def test_from_settings_falls_back_to_defaults(self):
+        """Test that missing or invalid values fall back to the defaults"""
+        self.settings_dict = {"hotend_threshold": "not a number"}
+        self.settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+
+        snapshot = GuardSettings.from_settings(self.settings, self.defaults)
+
+        self.assertEqual(snapshot.hotend_threshold, 250.0)
+        self.assertEqual(snapshot.heatbed_threshold, 100.0)
+        self.assertTrue(snapshot.enable_monitoring)
+
+    def test_from_settings_clamps_rate_window(self):
+        """Test that the rate window is kept within its supported bounds"""
+        self.settings_dict["rate_window"] = 1
+        self.settings.get_int = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.assertEqual(GuardSettings.from_settings(self.settings, self.defaults).rate_window, 3)
+
+        self.settings_dict["rate_window"] = 10000
+        self.assertEqual(GuardSettings.from_settings(self.settings, self.defaults).rate_window, 120)
+
+    def test_from_settings_reads_spike_filter(self):
+        """Test that the spike filter mode is validated and its counts clamped"""
+        self.settings_dict.update(spike_filter="median", spike_filter_window=99, spike_filter_count=50)
+        self.settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.settings.get_int = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+
+        snapshot = GuardSettings.from_settings(self.settings, self.defaults)
+        self.assertEqual(snapshot.spike_filter, "median")
+        self.assertEqual(snapshot.spike_filter_window, 15)
+        self.assertEqual(snapshot.spike_filter_count, 15)
+
+        self.settings_dict["spike_filter"] = "bogus"
+        self.assertEqual(GuardSettings.from_settings(self.settings, self.defaults).spike_filter, "off")
+
+    def test_snapshot_is_immutable(self):
+        """Test that the snapshot cannot be modified in place"""
+        snapshot = GuardSettings.from_settings(self.settings, self.defaults)
+
+        with self.assertRaises(AttributeError):
+            snapshot.hotend_threshold = 300.0
+
+
+class TestGuardSettingsLifecycle(unittest.TestCase):
+    """Test how the plugin builds and swaps the settings snapshot"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112\nM104 S0\nM140 S0",
+            "enable_monitoring": True,
+            "enable_data_monitoring": False,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.addCleanup(self.plugin.on_shutdown)
+
+    def test_on_after_startup_builds_snapshot(self):
+        """Test that the snapshot is built on startup"""
+        self.assertIsNone(self.plugin._guard_settings)
+
+        self.plugin.on_after_startup()
+
+        self.assertIsInstance(self.plugin._guard_settings, GuardSettings)
+        self.assertEqual(self.plugin._guard_settings.hotend_threshold, 250.0)
+
+    def test_callback_does_not_read_settings_after_startup(self):
+        """Test that the temperature callback only reads the snapshot"""
+        self.plugin.on_after_startup()
+        self.plugin._settings.get.reset_mock()
+        self.plugin._settings.get_boolean.reset_mock()
+        self.plugin._settings.get_float.reset_mock()
+
+        self.plugin.temperature_callback(None, {"tool0": (200.0, 210.0), "bed": (80.0, 90.0)})
+
+        self.plugin._settings.get.assert_not_called()
+        self.plugin._settings.get_boolean.assert_not_called()
+        self.plugin._settings.get_float.assert_not_called()
+
+    def test_callback_builds_snapshot_before_startup(self):
+        """Test that samples arriving before startup still use the configured thresholds"""
+        self.plugin.temperature_callback(None, {"tool0": (260.0, 250.0)})
+
+        self.assertIsInstance(self.plugin._guard_settings, GuardSettings)
+        self.assertTrue(self.plugin._hotend_threshold_exceeded)
+
+    def test_on_settings_save_swaps_snapshot(self):
+        """Test that saving settings replaces the snapshot with the new values"""
+        self.plugin.on_after_startup()
+        old_snapshot = self.plugin._guard_settings
+
+        self.settings_dict["hotend_threshold"] = 300.0
+        self.plugin.on_settings_save({"hotend_threshold": 300.0})
+
+        self.assertIsNot(self.plugin._guard_settings, old_snapshot)
+        self.assertEqual(self.plugin._guard_settings.hotend_threshold, 300.0)
+
+        # The new threshold is used for the next sample
+        self.plugin.temperature_callback(None, {"tool0": (260.0, 250.0)})
+        self.assertFalse(self.plugin._hotend_threshold_exceeded)
+
+
+if __name__ == '__main__':
+    unittest.main()
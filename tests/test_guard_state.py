@@ -0,0 +1,233 @@
+# coding=utf-8
+"""
+Unit tests for the per-heater guard state table.
+"""
+
+from __future__ import absolute_import
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.guard_settings import GuardSettings
+from octoprint_octo_fire_guard.guard_state import GuardStateTable, SensorState
+from octoprint_octo_fire_guard.sensors import classify_sensor_key
+
+
+def make_guard_settings(hotend_threshold=250.0, heatbed_threshold=100.0, rate_window=None, spike_filter="off"):
+    return GuardSettings(
+        enable_monitoring=True,
+        hotend_threshold=hotend_threshold,
+        heatbed_threshold=heatbed_threshold,
+        hotend_reset_threshold=hotend_threshold - 10.0,
+        heatbed_reset_threshold=heatbed_threshold - 10.0,
+        enable_rate_monitoring=rate_window is not None,
+        max_heating_rate=2.0,
+        rate_window=rate_window or 10,
+        spike_filter=spike_filter,
+        spike_filter_window=5,
+        spike_filter_count=3,
+    )
+
+
+class TestSensorState(unittest.TestCase):
+    """Test suite for SensorState"""
+
+    def test_configure_computes_reset_threshold(self):
+        """Test that the re-arm point follows the threshold and hysteresis"""
+        state = SensorState("hotend", 0)
+
+        state.configure(250.0, hysteresis=15.0)
+
+        self.assertEqual(state.threshold, 250.0)
+        self.assertEqual(state.reset_threshold, 235.0)
+
+    def test_reset(self):
+        """Test that a reset clears the flag but keeps the threshold"""
+        state = SensorState("heatbed")
+        state.configure(100.0)
+        state.exceeded = True
+
+        state.reset()
+
+        self.assertFalse(state.exceeded)
+        self.assertEqual(state.threshold, 100.0)
+
+    def test_name(self):
+        self.assertEqual(SensorState("hotend", 3).name, "hotend3")
+        self.assertEqual(SensorState("heatbed").name, "heatbed")
+
+
+class TestGuardStateTable(unittest.TestCase):
+    """Test suite for GuardStateTable"""
+
+    def test_preallocates_extruders(self):
+        """Test that a state exists for every extruder of the profile"""
+        table = GuardStateTable(extruder_count=6)
+
+        self.assertEqual([state.index for state in table.hotends], list(range(6)))
+
+    def test_resize_never_replaces_states(self):
+        """Test that growing keeps existing states and shrinking is ignored"""
+        table = GuardStateTable(extruder_count=2)
+        first = table.hotends[0]
+
+        table.resize(4)
+        table.resize(1)
+
+        self.assertEqual(len(table.hotends), 4)
+        self.assertIs(table.hotends[0], first)
+
+    def test_configure_applies_to_existing_and_new_states(self):
+        """Test that thresholds reach every state, including ones added later"""
+        table = GuardStateTable(extruder_count=1)
+        table.configure(make_guard_settings(hotend_threshold=280.0, heatbed_threshold=110.0))
+
+        table.resize(3)
+
+        self.assertEqual([state.threshold for state in table.hotends], [280.0, 280.0, 280.0])
+        self.assertEqual(table.hotends[2].reset_threshold, 270.0)
+        self.assertEqual(table.heatbed.threshold, 110.0)
+
+    def test_rate_estimators_follow_settings(self):
+        """Test that estimators are allocated only while rate monitoring is enabled"""
+        table = GuardStateTable(extruder_count=2)
+
+        table.configure(make_guard_settings(rate_window=8))
+        estimator = table.hotends[0].rate
+        self.assertEqual(estimator.size, 8)
+        self.assertEqual(table.heatbed.rate.size, 8)
+
+        # Same window keeps the estimator, disabling drops it
+        table.configure(make_guard_settings(rate_window=8))
+        self.assertIs(table.hotends[0].rate, estimator)
+        table.configure(make_guard_settings())
+        self.assertIsNone(table.hotends[0].rate)
+
+    def test_bind_caches_state_on_record(self):
+        """Test that a record is bound to the state of its heater"""
+        table = GuardStateTable(extruder_count=2)
+        tool_record = classify_sensor_key("T1")
+        bed_record = classify_sensor_key("bed")
+
+        self.assertIs(table.bind(tool_record), table.hotends[1])
+        self.assertIs(tool_record.state, table.hotends[1])
+        self.assertIs(table.bind(bed_record), table.heatbed)
+
+    def test_bind_grows_for_unexpected_tools(self):
+        """Test that a tool beyond the profile's extruder count still gets a state"""
+        table = GuardStateTable(extruder_count=1)
+
+        state = table.bind(classify_sensor_key("tool4"))
+
+        self.assertEqual(len(table.hotends), 5)
+        self.assertIs(state, table.hotends[4])
+
+    def test_bind_ignores_unguarded_sensors(self):
+        """Test that chamber and unknown sensors are not bound"""
+        table = GuardStateTable()
+        record = classify_sensor_key("chamber")
+
+        self.assertIsNone(table.bind(record))
+        self.assertIsNone(record.state)
+
+
+class TestPluginPerToolState(unittest.TestCase):
+    """Test that every tool trips and re-arms on its own"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "enable_monitoring": True,
+            "enable_data_monitoring": False,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.plugin._printer_profile_manager = Mock()
+        self.plugin._printer_profile_manager.get_current_or_default.return_value = {"extruder": {"count": 6}}
+        self.addCleanup(self.plugin.on_shutdown)
+
+    def test_state_sized_from_printer_profile(self):
+        """Test that startup allocates a state for every extruder in the profile"""
+        self.plugin.on_after_startup()
+
+        self.assertEqual(len(self.plugin._guard_state.hotends), 6)
+
+    def test_extruder_count_falls_back_without_profile(self):
+        """Test that an unusable profile results in a single extruder"""
+        self.plugin._printer_profile_manager.get_current_or_default.return_value = None
+
+        self.assertEqual(self.plugin._get_extruder_count(), 1)
+
+    def test_second_tool_trips_while_first_is_tripped(self):
+        """Test that an overheating tool is not masked by another tool that already tripped"""
+        self.plugin._trigger_emergency_shutdown = Mock()
+
+        self.plugin.temperature_callback(None, {"T0": (260.0, 250.0), "T3": (200.0, 210.0)})
+        self.plugin.temperature_callback(None, {"T0": (261.0, 250.0), "T3": (270.0, 210.0)})
+
+        self.assertEqual(self.plugin._trigger_emergency_shutdown.call_count, 2)
+        self.assertEqual(self.plugin._trigger_emergency_shutdown.call_args[0][1], 270.0)
+        self.assertTrue(self.plugin._guard_state.hotends[0].exceeded)
+        self.assertTrue(self.plugin._guard_state.hotends[3].exceeded)
+
+    def test_tools_rearm_independently(self):
+        """Test that one tool cooling down does not clear another tool's flag"""
+        self.plugin._trigger_emergency_shutdown = Mock()
+        self.plugin.temperature_callback(None, {"T0": (260.0, 250.0), "T1": (260.0, 250.0)})
+
+        self.plugin.temperature_callback(None, {"T0": (200.0, 250.0), "T1": (255.0, 250.0)})
+
+        self.assertFalse(self.plugin._guard_state.hotends[0].exceeded)
+        self.assertTrue(self.plugin._guard_state.hotends[1].exceeded)
+        self.assertTrue(self.plugin._hotend_threshold_exceeded)
+
+    def test_records_are_bound_once(self):
+        """Test that later samples reach their state without another lookup"""
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0)})
+
+        with patch.object(self.plugin._guard_state, "bind") as bind:
+            self.plugin.temperature_callback(None, {"T0": (200.0, 210.0)})
+
+        bind.assert_not_called()
+
+    def test_settings_save_updates_every_tool(self):
+        """Test that a new hotend threshold applies to all tools"""
+        self.plugin.on_after_startup()
+
+        self.settings_dict["hotend_threshold"] = 300.0
+        self.plugin.on_settings_save({"hotend_threshold": 300.0})
+
+        self.assertEqual(set(state.threshold for state in self.plugin._guard_state.hotends), {300.0})
+
+    def test_aggregate_flags(self):
+        """Test the hotend/heatbed summary flags over the per-tool states"""
+        self.plugin._guard_state.resize(3)
+        self.plugin._guard_state.hotends[2].exceeded = True
+
+        self.assertTrue(self.plugin._hotend_threshold_exceeded)
+        self.assertFalse(self.plugin._heatbed_threshold_exceeded)
+
+        self.plugin._reset_state()
+
+        self.assertFalse(self.plugin._hotend_threshold_exceeded)
+
+
+if __name__ == '__main__':
+    unittest.main()
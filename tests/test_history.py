@@ -0,0 +1,230 @@
+# coding=utf-8
+"""
+Unit tests for the bounded temperature history and its query API.
+"""
+
+from __future__ import absolute_import
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes, FakeHTTPException
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.history import (
+    SensorHistory, TemperatureHistory, downsample_min_max, HISTORY_CAPACITY, MAX_HISTORY_SENSORS
+)
+from octoprint_octo_fire_guard.sensors import classify_sensor_key
+
+
+class TestSensorHistory(unittest.TestCase):
+    """Test suite for SensorHistory"""
+
+    def test_snapshot_in_time_order(self):
+        history = SensorHistory("tool0", capacity=4)
+        for i in range(3):
+            history.append(float(i), 200.0 + i, 210.0)
+
+        times, actuals, targets = history.snapshot()
+
+        self.assertEqual(list(times), [0.0, 1.0, 2.0])
+        self.assertEqual(list(actuals), [200.0, 201.0, 202.0])
+
+    def test_ring_keeps_latest_samples(self):
+        """Test that the oldest samples are overwritten once the ring is full"""
+        history = SensorHistory("tool0", capacity=4)
+        for i in range(10):
+            history.append(float(i), float(i), None)
+
+        times, _, _ = history.snapshot()
+
+        self.assertEqual(list(times), [6.0, 7.0, 8.0, 9.0])
+        self.assertEqual(history.count, 4)
+
+    def test_latest(self):
+        """Test that the newest timestamp is found across the wrap-around"""
+        history = SensorHistory("tool0", capacity=4)
+        self.assertIsNone(history.latest())
+
+        for i in range(8):
+            history.append(float(i), float(i), None)
+
+        self.assertEqual(history.head, 0)
+        self.assertEqual(history.latest(), 7.0)
+
+    def test_memory_is_fixed(self):
+        """Test that the arrays are allocated once at full capacity"""
+        history = SensorHistory("bed")
+        sizes = (len(history.times), len(history.actuals), len(history.targets))
+
+        for i in range(HISTORY_CAPACITY * 2):
+            history.append(float(i), 60.0, 60.0)
+
+        self.assertEqual((len(history.times), len(history.actuals), len(history.targets)), sizes)
+        self.assertEqual(history.times.itemsize + history.actuals.itemsize + history.targets.itemsize, 16)
+
+    def test_missing_target_is_reported_as_none(self):
+        history = SensorHistory("C", capacity=2)
+        history.append(1.0, 35.0, None)
+
+        self.assertEqual(history.query()["points"], [[1.0, 35.0, None]])
+
+    def test_query_range(self):
+        """Test that start and end select an inclusive time range"""
+        history = SensorHistory("tool0", capacity=10)
+        for i in range(10):
+            history.append(100.0 + i, 200.0, 210.0)
+
+        result = history.query(start=103.0, end=105.0)
+
+        self.assertEqual(result["count"], 3)
+        self.assertEqual([point[0] for point in result["points"]], [103.0, 104.0, 105.0])
+
+    def test_clear(self):
+        history = SensorHistory("tool0", capacity=4)
+        history.append(1.0, 200.0, 210.0)
+
+        history.clear()
+
+        self.assertEqual(history.query()["count"], 0)
+
+
+class TestDownsampleMinMax(unittest.TestCase):
+    """Test suite for downsample_min_max"""
+
+    def test_short_ranges_are_returned_whole(self):
+        times, actuals, targets = [1.0, 2.0], [10.0, 11.0], [0.0, 0.0]
+        self.assertEqual(len(downsample_min_max(times, actuals, targets, 0, 2, 10)), 2)
+
+    def test_reduces_to_point_budget_and_keeps_spikes(self):
+        """Test that a single spike survives downsampling"""
+        count = 1000
+        times = [float(i) for i in range(count)]
+        actuals = [200.0] * count
+        actuals[537] = 290.0
+        actuals[811] = 150.0
+        targets = [210.0] * count
+
+        points = downsample_min_max(times, actuals, targets, 0, count, 50)
+
+        self.assertLessEqual(len(points), 50)
+        self.assertIn([537.0, 290.0, 210.0], points)
+        self.assertIn([811.0, 150.0, 210.0], points)
+        self.assertEqual([p[0] for p in points], sorted(p[0] for p in points))
+
+    def test_empty_range(self):
+        self.assertEqual(downsample_min_max([], [], [], 0, 0, 10), [])
+
+
+class TestTemperatureHistory(unittest.TestCase):
+    """Test suite for TemperatureHistory"""
+
+    def test_record_binds_history_to_sensor(self):
+        histories = TemperatureHistory(capacity=8)
+        record = classify_sensor_key("T0")
+
+        histories.record(record, 1.0, 200.0, 210.0)
+        histories.record(record, 2.0, 201.0, 210.0)
+
+        self.assertIs(record.history, histories.sensors["T0"])
+        self.assertEqual(record.history.count, 2)
+
+    def test_ignored_sensors_are_not_recorded(self):
+        histories = TemperatureHistory(capacity=8)
+        histories.record(classify_sensor_key("X"), 1.0, 1.0, 1.0)
+        self.assertEqual(histories.sensors, {})
+
+    def test_sensor_count_is_capped(self):
+        """Test that memory stays bounded however many keys are reported"""
+        histories = TemperatureHistory(capacity=8)
+        for index in range(MAX_HISTORY_SENSORS + 5):
+            histories.record(classify_sensor_key("T{}".format(index)), 1.0, 200.0, 210.0)
+
+        self.assertEqual(len(histories.sensors), MAX_HISTORY_SENSORS)
+
+    def test_query_selected_keys(self):
+        histories = TemperatureHistory(capacity=8)
+        histories.record(classify_sensor_key("T0"), 1.0, 200.0, 210.0)
+        histories.record(classify_sensor_key("B"), 1.0, 60.0, 60.0)
+
+        result = histories.query(keys=["B", "missing"])
+
+        self.assertEqual(list(result), ["B"])
+
+
+class TestPluginHistory(unittest.TestCase):
+    """Test that the callback fills the history and the API serves it"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "enable_monitoring": True,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(settings_dict.get(path[0])))
+
+    @patch('octoprint_octo_fire_guard.time.time', return_value=1000.0)
+    def test_callback_records_every_recognised_sensor(self, mock_time):
+        parsed_temps = {"T0": (200.0, 210.0), "B": (60.0, 60.0), "C": (35.0, None), "X": (1.0, 1.0)}
+
+        self.plugin.temperature_callback(None, parsed_temps)
+
+        self.assertEqual(set(self.plugin._history.sensors), {"T0", "B", "C"})
+        self.assertEqual(self.plugin._history.sensors["T0"].query()["points"], [[1000.0, 200.0, 210.0]])
+        self.assertEqual(self.plugin._last_temperatures["B"], (60.0, 60.0))
+
+    def test_none_readings_are_not_recorded(self):
+        self.plugin.temperature_callback(None, {"T0": (None, 210.0)})
+        self.assertNotIn("T0", self.plugin._history.sensors)
+
+    def test_history_survives_reconnect(self):
+        """Test that a reconnect after an alert keeps the readings leading up to it"""
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0)})
+
+        self.plugin._reset_state()
+
+        self.assertEqual(self.plugin._history.sensors["T0"].count, 1)
+        self.assertEqual(self.plugin._last_temperatures, {})
+
+    @patch('flask.jsonify')
+    def test_on_api_get_history(self, mock_jsonify):
+        mock_jsonify.side_effect = lambda **kwargs: kwargs
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0), "B": (60.0, 60.0)})
+
+        result = self.plugin.on_api_get(Mock(args={"history": "T0", "points": "100"}))
+
+        self.assertEqual(list(result["history"]), ["T0"])
+        self.assertEqual(result["history"]["T0"]["count"], 1)
+        self.assertIn("B", result["current"])
+
+    @patch('flask.jsonify')
+    def test_on_api_get_history_all(self, mock_jsonify):
+        mock_jsonify.side_effect = lambda **kwargs: kwargs
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0), "B": (60.0, 60.0)})
+
+        result = self.plugin.on_api_get(Mock(args={"history": "all"}))
+
+        self.assertEqual(set(result["history"]), {"T0", "B"})
+
+    def test_on_api_get_rejects_invalid_range(self):
+        with self.assertRaises(FakeHTTPException) as raised:
+            self.plugin.on_api_get(Mock(args={"history": "all", "start": "yesterday"}))
+        self.assertEqual(raised.exception.code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
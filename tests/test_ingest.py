@@ -0,0 +1,277 @@
+# coding=utf-8
+"""
+Unit tests for the memory-mapped, indexed log ingestion.
+"""
+
+from __future__ import absolute_import
+import gzip
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import ingest
+from octoprint_octo_fire_guard.ingest import IndexedLog, LogIndex, INDEX_SUFFIX
+from octoprint_octo_fire_guard.sensors import SensorRegistry, SENSOR_HOTEND, SENSOR_HEATBED, SENSOR_CHAMBER
+
+MIDNIGHT = 1772323200.0  # 2026-03-01 00:00:00
+
+
+def report_line(seconds, hotend=210.0, bed=60.0):
+    minutes, second = divmod(int(seconds), 60)
+    hours, minute = divmod(minutes, 60)
+    return "2026-03-01 {:02d}:{:02d}:{:02d},{:03d} - Recv:  T:{:.2f} /210.00 B:{:.2f} /60.00 @:64 B@:0\n".format(
+        hours, minute, second, int(seconds * 1000) % 1000, hotend, bed).encode("ascii")
+
+
+def print_log(start, count, interval=2.0):
+    """Reports every interval seconds with GCode traffic in between"""
+    lines = []
+    for number in range(count):
+        seconds = start + number * interval
+        lines.append(report_line(seconds, hotend=200.0 + number % 20))
+        lines.append(report_line(seconds).split(b" - ")[0] + b" - Send: N%d G1 X10 Y10*55\n" % number)
+        lines.append(report_line(seconds).split(b" - ")[0] + b" - Recv: ok\n")
+    return b"".join(lines)
+
+
+class TestIndexedLog(unittest.TestCase):
+    """Test suite for reading temperature reports through IndexedLog"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "serial.log")
+
+    def write(self, content, mode="wb"):
+        with open(self.path, mode) as log:
+            log.write(content)
+
+    def read(self, start=None, end=None, index_dir=None):
+        with IndexedLog(self.path, index_dir) as log:
+            return list(log.reports(start, end))
+
+    def test_report_lines(self):
+        self.write(
+            b"2026-03-01 10:00:01,000 - Recv: ok T:210.00 /210.00 B:60.00 /60.00 @:64 B@:0\n"
+            b"2026-03-01 10:00:02,000 - Send: N12 M105*34\n"
+            b"2026-03-01 10:00:03,000 - Recv: echo:busy: processing\n"
+            b"Recv: T:999.0 /0.0\n"
+            b"2026-03-01 10:00:04,500 - Recv: T:210.0 /210.0 T0:209.5 /210.0 T1:180.5 B:61.0 /60.0 C:35.0 X:1\n"
+            b"2026-03-01 10:00:05,000 - octoprint.util.comm - INFO - T:215.5 /0\n"
+            b"2026-03-01 10:00:06,000 - octoprint.server - INFO - Starting\n"
+        )
+
+        reports = self.read()
+
+        self.assertEqual([reported for reported, _ in reports],
+                         [MIDNIGHT + 36001.0, MIDNIGHT + 36004.5, MIDNIGHT + 36005.0])
+        readings = [(sensor.kind, sensor.index, actual, target) for sensor, actual, target in reports[1][1]]
+        self.assertEqual(readings[:3], [
+            (SENSOR_HOTEND, 0, 209.5, 210.0),
+            (SENSOR_HOTEND, 1, 180.5, readings[1][3]),
+            (SENSOR_HEATBED, None, 61.0, 60.0),
+        ])
+        self.assertTrue(math.isnan(readings[1][3]))
+        self.assertEqual(readings[3][0], SENSOR_CHAMBER)
+        self.assertEqual(len(readings), 4)
+        self.assertEqual(reports[0][1][0][0].key, "T0")
+
+    def test_keys_are_classified_by_the_sensor_registry(self):
+        self.write(report_line(1.0))
+        registry = SensorRegistry()
+
+        with IndexedLog(self.path, registry=registry) as log:
+            list(log.reports())
+
+        self.assertEqual(sorted(registry), ["B", "T0"])
+
+    def test_incomplete_last_line_is_skipped(self):
+        self.write(report_line(1.0) + report_line(2.0)[:40])
+
+        self.assertEqual(len(self.read()), 1)
+
+    def test_empty_log(self):
+        self.write(b"")
+
+        self.assertEqual(self.read(), [])
+        self.assertEqual(self.read(MIDNIGHT, MIDNIGHT + 60), [])
+
+    def test_compressed_log(self):
+        self.path += ".1.gz"
+        with gzip.open(self.path, "wb") as log:
+            log.write(print_log(0.0, 10))
+
+        self.assertEqual(len(self.read()), 10)
+        self.assertFalse(os.path.exists(self.path + INDEX_SUFFIX))
+
+    def test_time_window(self):
+        self.write(print_log(0.0, 3600))
+
+        reports = self.read(MIDNIGHT + 3000.0, MIDNIGHT + 3600.0)
+
+        self.assertEqual(len(reports), 300)
+        self.assertEqual(reports[0][0], MIDNIGHT + 3000.0)
+        self.assertEqual(reports[-1][0], MIDNIGHT + 3598.0)
+
+    def test_time_window_seeks_to_the_index(self):
+        self.write(print_log(0.0, 3600))
+        scanned = []
+        finditer = ingest._REPORT.finditer
+
+        def recording_finditer(buffer, position, stop):
+            scanned.append(stop - position)
+            return finditer(buffer, position, stop)
+
+        with IndexedLog(self.path) as log:
+            with patch.object(ingest, "_REPORT") as pattern:
+                pattern.finditer = recording_finditer
+                self.assertEqual(len(list(log.reports(MIDNIGHT + 3000.0, MIDNIGHT + 3100.0))), 50)
+
+        # Two index intervals at most, rather than the whole log
+        self.assertLess(scanned[0], os.path.getsize(self.path) / 20)
+
+
+class TestLogIndex(unittest.TestCase):
+    """Test suite for the persisted log index"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "serial.log")
+        self.index_path = self.path + INDEX_SUFFIX
+
+    def write(self, content, mode="wb"):
+        with open(self.path, mode) as log:
+            log.write(content)
+
+    def open_index(self, index_dir=None):
+        with IndexedLog(self.path, index_dir) as log:
+            return log.index
+
+    def reopen_index(self):
+        """Open the index again, returning it and where each extension of it started"""
+        scanned = []
+        extend = IndexedLog._extend_index
+
+        def recording_extend(log, index):
+            scanned.append(index.size)
+            extend(log, index)
+
+        with patch.object(IndexedLog, "_extend_index", recording_extend):
+            return self.open_index(), scanned
+
+    def test_index_is_persisted(self):
+        self.write(print_log(0.0, 600))
+
+        index = self.open_index()
+
+        self.assertEqual(len(index), 20)
+        self.assertEqual(index.size, os.path.getsize(self.path))
+        stored = LogIndex.load(self.index_path)
+        self.assertEqual((stored.size, stored.head, stored.head_size, stored.times, stored.offsets),
+                         (index.size, index.head, index.head_size, index.times, index.offsets))
+        with open(self.path, "rb") as log:
+            log.seek(index.offsets[5])
+            self.assertTrue(log.readline().startswith(b"2026-03-01 00:05:00,000 - Recv:"))
+
+    def test_stored_index_is_reused(self):
+        self.write(print_log(0.0, 600))
+        self.open_index()
+
+        with patch.object(IndexedLog, "_extend_index") as extend:
+            index = self.open_index()
+
+        extend.assert_not_called()
+        self.assertEqual(len(index), 20)
+
+    def test_grown_log_extends_the_index(self):
+        self.write(print_log(0.0, 600))
+        size = self.open_index().size
+        self.write(print_log(1200.0, 600), "ab")
+
+        index, scanned = self.reopen_index()
+
+        self.assertEqual(scanned, [size])
+        self.assertEqual(len(index), 40)
+        self.assertEqual(LogIndex.load(self.index_path).size, os.path.getsize(self.path))
+
+    def test_short_growing_log_extends_the_index(self):
+        """Test that a log shorter than the checksummed head is not taken for a rotated one"""
+        self.write(print_log(0.0, 10) + b"2026-03-01 00:00:20,000 - Recv:  T:21")
+        first = self.open_index()
+        self.assertLess(first.size, ingest.INDEX_HEAD_SIZE)
+        self.write(b"0.0 /210.0 B:60.0 /60.0\n" + print_log(30.0, 10), "ab")
+
+        index, scanned = self.reopen_index()
+
+        self.assertEqual(scanned, [first.size])
+        self.assertEqual(index.head_size, os.path.getsize(self.path))
+        self.assertEqual(LogIndex.load(self.index_path).head, index.head)
+        index, scanned = self.reopen_index()
+        self.assertEqual(scanned, [])
+
+    def test_rotated_short_log_rebuilds_the_index(self):
+        self.write(print_log(0.0, 10))
+        self.open_index()
+        self.write(print_log(7200.0, 20))
+
+        index, scanned = self.reopen_index()
+
+        self.assertEqual(scanned, [0])
+        self.assertEqual(index.times[0], MIDNIGHT + 7200.0)
+
+    def test_rotated_log_rebuilds_the_index(self):
+        self.write(print_log(0.0, 600))
+        self.open_index()
+        self.write(print_log(7200.0, 900))
+
+        index = self.open_index()
+
+        self.assertEqual(len(index), 30)
+        self.assertEqual(index.times[0], MIDNIGHT + 7200.0)
+
+    def test_damaged_index_is_rebuilt(self):
+        self.write(print_log(0.0, 600))
+        with open(self.index_path, "wb") as stored:
+            stored.write(b"OFGLOGIX\x01")
+
+        self.assertEqual(len(self.open_index()), 20)
+
+    def test_unwritable_index_folder(self):
+        self.write(print_log(0.0, 600))
+
+        index = self.open_index(index_dir=os.path.join(self.directory, "missing"))
+
+        self.assertEqual(len(index), 20)
+
+    def test_index_dir(self):
+        self.write(print_log(0.0, 60))
+        folder = os.path.join(self.directory, "indexes")
+        os.mkdir(folder)
+
+        self.open_index(index_dir=folder)
+
+        self.assertTrue(os.path.exists(os.path.join(folder, "serial.log" + INDEX_SUFFIX)))
+        self.assertFalse(os.path.exists(self.index_path))
+
+    def test_seek_and_stop(self):
+        index = LogIndex(times=[0.0, 60.0, 120.0], offsets=[0, 100, 200])
+
+        self.assertEqual(index.seek(-5.0), 0)
+        self.assertEqual(index.seek(60.0), 100)
+        self.assertEqual(index.seek(90.0), 100)
+        self.assertEqual(index.stop(90.0), 200)
+        self.assertEqual(index.stop(120.0), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
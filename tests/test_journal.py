@@ -0,0 +1,251 @@
+# coding=utf-8
+"""
+Unit tests for the incident journal and its API command.
+"""
+
+from __future__ import absolute_import
+import json
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.journal import IncidentJournal, MAX_PAGE_SIZE
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="octo_fire_guard_test_")
+        self.addCleanup(shutil.rmtree, self.folder, True)
+
+    def open_journal(self):
+        journal = IncidentJournal()
+        journal.open(self.folder, Mock())
+        self.addCleanup(journal.close)
+        return journal
+
+    def write_records(self, count):
+        journal = self.open_journal()
+        for i in range(count):
+            self.assertTrue(journal.append(dict(n=i)))
+        journal.close()
+        return journal
+
+    def read_index(self):
+        with open(os.path.join(self.folder, "incidents.idx"), "rb") as index:
+            data = index.read()
+        return [offset for (offset,) in struct.iter_unpack("<Q", data)]
+
+
+class TestIncidentJournal(JournalTestCase):
+    """Test suite for IncidentJournal"""
+
+    def test_append_rejected_when_not_open(self):
+        journal = IncidentJournal()
+        self.assertFalse(journal.append(dict(n=1)))
+        self.assertEqual(journal.count(), 0)
+
+    def test_records_are_one_json_line_each(self):
+        self.write_records(3)
+
+        with open(os.path.join(self.folder, "incidents.jsonl")) as journal_file:
+            lines = journal_file.read().splitlines()
+
+        self.assertEqual([json.loads(line) for line in lines], [dict(n=0), dict(n=1), dict(n=2)])
+        self.assertEqual(len(self.read_index()), 3)
+
+    def test_query_newest_first_with_pagination(self):
+        journal = self.write_records(10)
+
+        total, first_page = journal.query(offset=0, limit=4)
+        _, last_page = journal.query(offset=8, limit=4)
+
+        self.assertEqual(total, 10)
+        self.assertEqual([record["n"] for record in first_page], [9, 8, 7, 6])
+        self.assertEqual([record["n"] for record in last_page], [1, 0])
+
+    def test_query_past_the_end(self):
+        journal = self.write_records(2)
+        self.assertEqual(journal.query(offset=5), (2, []))
+
+    def test_query_limit_is_capped(self):
+        journal = self.write_records(MAX_PAGE_SIZE + 5)
+
+        total, records = journal.query(limit=MAX_PAGE_SIZE * 2)
+
+        self.assertEqual(total, MAX_PAGE_SIZE + 5)
+        self.assertEqual(len(records), MAX_PAGE_SIZE)
+
+    def test_reopen_appends(self):
+        """Test that a journal reopened after a restart keeps its records"""
+        self.write_records(2)
+        journal = self.open_journal()
+        journal.append(dict(n=2))
+        journal.close()
+
+        self.assertEqual([record["n"] for record in journal.query()[1]], [2, 1, 0])
+
+    def test_recovery_indexes_unindexed_records(self):
+        """Test that lines written without an index entry before a crash are indexed on open"""
+        self.write_records(2)
+        with open(os.path.join(self.folder, "incidents.jsonl"), "ab") as journal_file:
+            journal_file.write(b'{"n":2}\n{"n":3}\n')
+
+        journal = self.open_journal()
+
+        self.assertEqual([record["n"] for record in journal.query()[1]], [3, 2, 1, 0])
+
+    def test_recovery_drops_partial_record(self):
+        """Test that a record cut off mid-write is removed"""
+        self.write_records(2)
+        journal_path = os.path.join(self.folder, "incidents.jsonl")
+        size = os.path.getsize(journal_path)
+        with open(journal_path, "ab") as journal_file:
+            journal_file.write(b'{"n":2')
+        with open(os.path.join(self.folder, "incidents.idx"), "ab") as index_file:
+            index_file.write(b"\x01\x02\x03")  # Partial index entry
+
+        journal = self.open_journal()
+
+        self.assertEqual(os.path.getsize(journal_path), size)
+        self.assertEqual(journal.count(), 2)
+        journal.append(dict(n=2))
+        journal.close()
+        self.assertEqual([record["n"] for record in journal.query()[1]], [2, 1, 0])
+
+    def test_recovery_rebuilds_index_beyond_journal(self):
+        """Test that an index pointing past the journal is rebuilt"""
+        self.write_records(3)
+        with open(os.path.join(self.folder, "incidents.idx"), "ab") as index_file:
+            index_file.write(struct.pack("<Q", 10 ** 6))
+
+        journal = self.open_journal()
+
+        self.assertEqual(journal.count(), 3)
+        self.assertEqual(self.read_index()[0], 0)
+
+
+class TestPluginIncidentJournal(unittest.TestCase):
+    """Test that incidents and data timeouts reach the journal and the API"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "enable_monitoring": True,
+            "enable_data_monitoring": False,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.addCleanup(self.plugin.on_shutdown)
+        self.plugin.on_after_startup()
+
+    def incidents(self):
+        # Shutting down drains the executor and the journal writer
+        self.plugin.on_shutdown()
+        return self.plugin._journal.query()[1]
+
+    def test_journal_opened_in_data_folder(self):
+        self.assertTrue(self.plugin._journal.is_open)
+        self.assertEqual(os.path.dirname(self.plugin._journal.journal_path),
+                         self.plugin.get_plugin_data_folder())
+
+    def test_open_failure_is_logged(self):
+        plugin = OctoFireGuardPlugin()
+        plugin._logger = Mock()
+        plugin._plugin_manager = Mock()
+        plugin._settings = self.plugin._settings
+        plugin.get_plugin_data_folder = Mock(return_value=os.path.join(self.plugin.get_plugin_data_folder(), "missing"))
+        self.addCleanup(plugin.on_shutdown)
+
+        plugin.on_after_startup()
+
+        self.assertFalse(plugin._journal.is_open)
+        self.assertTrue(any("Failed to open incident journal" in c[0][0] for c in plugin._logger.error.call_args_list))
+
+    def test_threshold_incident_recorded(self):
+        self.plugin.temperature_callback(None, {"T1": (260.0, 250.0)})
+
+        incidents = self.incidents()
+
+        self.assertEqual(len(incidents), 1)
+        incident = incidents[0]
+        self.assertEqual(incident["type"], "temperature_alert")
+        self.assertEqual(incident["sensor"], "hotend")
+        self.assertEqual(incident["sensor_key"], "T1")
+        self.assertEqual(incident["temperature"], 260.0)
+        self.assertEqual(incident["threshold"], 250.0)
+        self.assertEqual(incident["mode"], "gcode")
+        self.assertEqual(incident["result"], "ok")
+        self.assertIn("gcode", incident["steps"])
+        self.assertIn("notify", incident["steps"])
+
+    def test_failed_termination_recorded(self):
+        self.plugin._printer.commands.side_effect = Exception("Printer gone")
+
+        self.plugin._trigger_emergency_shutdown("heatbed", 120.0, 100.0)
+
+        incident = self.incidents()[0]
+        self.assertEqual(incident["result"], "failed")
+        self.assertEqual(incident["errors"], ["gcode: Printer gone"])
+
+    def test_rate_incident_recorded(self):
+        self.plugin._trigger_emergency_shutdown("hotend", 220.0, 250.0, rate=3.14159, max_rate=2.0)
+
+        incident = self.incidents()[0]
+        self.assertEqual(incident["type"], "heating_rate_alert")
+        self.assertEqual(incident["rate"], 3.142)
+        self.assertEqual(incident["max_rate"], 2.0)
+
+    def test_data_timeout_recorded(self):
+        self.plugin._send_data_timeout_warning(["hotend", "heatbed"], 300)
+
+        incident = self.incidents()[0]
+        self.assertEqual(incident["type"], "data_timeout")
+        self.assertEqual(incident["sensors"], ["hotend", "heatbed"])
+        self.assertEqual(incident["timeout"], 300)
+
+    @patch('flask.jsonify')
+    def test_list_incidents_command(self, mock_jsonify):
+        mock_jsonify.side_effect = lambda **kwargs: kwargs
+        for temp in (120.0, 130.0, 140.0):
+            self.plugin._trigger_emergency_shutdown("heatbed", temp, 100.0)
+        self.incidents()
+
+        result = self.plugin.on_api_command("list_incidents", dict(offset=1, limit=1))
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["total"], 3)
+        self.assertEqual([incident["temperature"] for incident in result["incidents"]], [130.0])
+
+    @patch('flask.jsonify')
+    def test_list_incidents_rejects_invalid_paging(self, mock_jsonify):
+        mock_jsonify.side_effect = lambda **kwargs: kwargs
+
+        result, status = self.plugin.on_api_command("list_incidents", dict(limit="many"))
+
+        self.assertEqual(status, 400)
+        self.assertFalse(result["success"])
+
+
+if __name__ == '__main__':
+    unittest.main()
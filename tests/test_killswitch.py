@@ -0,0 +1,230 @@
+# coding=utf-8
+"""
+Unit tests for the kill switch moving the emergency GCode ahead of the comm queue.
+"""
+
+from __future__ import absolute_import
+import time
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.killswitch import KillSwitch, KILL_TAG
+
+KILL = {KILL_TAG}
+JOB = {"source:file"}
+
+
+class TestKillSwitch(unittest.TestCase):
+    """Test suite for KillSwitch"""
+
+    def setUp(self):
+        self.switch = KillSwitch()
+
+    def send(self, cmd, tags=None):
+        """Run a line through the sending and sent phases like the comm thread; returns what was written"""
+        result = self.switch.on_sending(cmd, tags)
+        if result == (None,):
+            return None
+        written = cmd if result is None else result
+        self.switch.on_sent(written)
+        return written
+
+    def test_idle_switch_keeps_every_line(self):
+        self.assertIsNone(self.switch.on_queuing("G1 X10", JOB))
+        self.assertIsNone(self.switch.on_sending("G1 X10", JOB))
+        self.switch.on_sent("G1 X10")
+        self.assertIsNone(self.switch.last_latency)
+
+    def test_nothing_to_arm(self):
+        self.assertFalse(self.switch.arm([]))
+        self.assertFalse(self.switch.is_armed)
+
+    def test_kill_commands_replace_queued_lines(self):
+        """Test that the kill sequence is written before the lines queued ahead of it"""
+        self.switch.arm(["M112", "M104 S0", "M140 S0"])
+
+        written = [self.send("G1 X1", JOB), self.send("G1 X2", JOB), self.send("G1 X3", JOB)]
+        self.assertFalse(self.switch.is_armed)
+        # Then the tagged copies come up and are dropped
+        written += [self.send(cmd, KILL) for cmd in ("M112", "M104 S0", "M140 S0")]
+        written.append(self.send("G1 X4", JOB))
+
+        self.assertEqual(written, ["M112", "M104 S0", "M140 S0", None, None, None, "G1 X4"])
+
+    def test_tagged_commands_sent_in_order_when_queue_is_empty(self):
+        self.switch.arm(["M112", "M104 S0"])
+
+        written = [self.send("M112", KILL), self.send("M104 S0", KILL), self.send("G1 X1", JOB)]
+
+        self.assertEqual(written, ["M112", "M104 S0", "G1 X1"])
+        self.assertFalse(self.switch.is_armed)
+
+    def test_partially_queued_sequence(self):
+        """Test a kill sequence whose first command was already sent from the queue"""
+        self.switch.arm(["M112", "M104 S0"])
+
+        written = [self.send("M112", KILL), self.send("G1 X1", JOB), self.send("M104 S0", KILL)]
+
+        self.assertEqual(written, ["M112", "M104 S0", None])
+
+    def test_arming_again_extends_the_sequence(self):
+        """Test that commands armed while the sequence is going out follow it"""
+        self.switch.arm(["M104 S0", "M140 S0"])
+        self.assertEqual(self.send("G1 X1", JOB), "M104 S0")
+
+        self.switch.arm(["M112"])
+
+        self.assertIsNone(self.switch.on_queuing("M112", KILL))
+        self.assertEqual([self.send("G1 X2", JOB), self.send("G1 X3", JOB)], ["M140 S0", "M112"])
+        self.assertFalse(self.switch.is_armed)
+
+    def test_new_lines_are_held_back_while_armed(self):
+        self.switch.arm(["M112"])
+
+        self.assertEqual(self.switch.on_queuing("G1 X1", JOB), (None,))
+        self.assertEqual(self.switch.on_queuing("M105", None), (None,))
+        self.assertIsNone(self.switch.on_queuing("M112", KILL))
+
+        self.send("M112", KILL)
+        self.assertIsNone(self.switch.on_queuing("G1 X1", JOB))
+
+    def test_latency_reported_once_first_command_is_written(self):
+        on_written = Mock()
+        self.switch.arm(["M112", "M104 S0"], time.perf_counter() - 0.25, on_written)
+
+        self.send("G1 X1", JOB)
+        self.send("G1 X2", JOB)
+
+        on_written.assert_called_once()
+        command, latency = on_written.call_args[0]
+        self.assertEqual(command, "M112")
+        self.assertGreaterEqual(latency, 0.25)
+        self.assertEqual(self.switch.last_latency, latency)
+
+    def test_lines_dropped_until_first_command_is_written(self):
+        """Test that nothing overtakes the last kill command before the first one was written"""
+        self.switch.arm(["M112"])
+
+        self.assertEqual(self.switch.on_sending("G1 X1", JOB), "M112")
+        self.assertEqual(self.switch.on_sending("G1 X2", JOB), (None,))
+        self.switch.on_sent("M112")
+
+        self.assertIsNone(self.switch.on_sending("G1 X3", JOB))
+
+    def test_released_after_timeout(self):
+        self.switch.arm(["M112"])
+
+        with patch("octoprint_octo_fire_guard.killswitch.time.monotonic", return_value=time.monotonic() + 60):
+            self.assertIsNone(self.switch.on_queuing("G1 X1", JOB))
+
+        self.assertFalse(self.switch.is_armed)
+        self.assertIsNone(self.switch.on_sending("G1 X1", JOB))
+
+    def test_disarm(self):
+        self.switch.arm(["M112"])
+
+        self.switch.disarm()
+
+        self.assertIsNone(self.switch.on_queuing("G1 X1", JOB))
+        self.assertIsNone(self.switch.on_sending("G1 X1", JOB))
+
+
+class TestPluginKillSwitch(unittest.TestCase):
+    """Test the plugin side of the priority send"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112\nM104 S0",
+            "priority_kill_gcode": True,
+            "enable_monitoring": True,
+            "status_interval": 0,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+
+    def hook(self, name, cmd, tags=None):
+        return getattr(self.plugin, name)(Mock(), "queuing", cmd, None, cmd.split()[0], tags=tags)
+
+    def test_emergency_commands_are_tagged(self):
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0)
+
+        self.plugin._printer.commands.assert_called_once_with(["M112", "M104 S0"], tags={KILL_TAG})
+        self.assertTrue(self.plugin._kill_switch.is_armed)
+
+    def test_priority_send_disabled(self):
+        self.settings_dict["priority_kill_gcode"] = False
+
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0)
+
+        self.plugin._printer.commands.assert_called_once_with(["M112", "M104 S0"])
+        self.assertFalse(self.plugin._kill_switch.is_armed)
+
+    @patch('flask.jsonify')
+    @patch('octoprint.access.permissions.Permissions.CONTROL.can', return_value=True)
+    def test_test_actions_are_not_prioritised(self, mock_can, mock_jsonify):
+        self.plugin.on_api_command("test_emergency_actions", {})
+
+        self.plugin._printer.commands.assert_called_once_with(["M112", "M104 S0"])
+
+    def test_hooks_send_kill_sequence_and_record_latency(self):
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0)
+
+        self.assertEqual(self.hook("gcode_queuing_hook", "G1 X1", JOB), (None,))
+        self.assertEqual(self.hook("gcode_sending_hook", "G1 X0", JOB), "M112")
+        self.hook("gcode_sent_hook", "M112")
+
+        self.assertIn("serial_write", self.plugin._metrics.termination)
+        self.assertEqual(self.plugin._metrics.termination["serial_write"].count, 1)
+
+    def test_psu_fallback_goes_through_the_kill_switch(self):
+        """Test that the GCode fallback for a failed PSU shutdown is not held back as a job line"""
+        self.settings_dict["termination_mode"] = "psu"
+        self.settings_dict["psu_plugin_name"] = "psucontrol"
+        self.plugin._plugin_manager.get_plugin_info.return_value = None
+        self.plugin._rebuild_guard_settings()
+
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0)
+
+        queued = [(cmd, call[1].get("tags")) for call in self.plugin._printer.commands.call_args_list
+                  for cmd in call[0][0]]
+        self.assertEqual([cmd for cmd, _ in queued], ["M104 S0", "M140 S0", "M112", "M104 S0"])
+        for cmd, tags in queued:
+            self.assertIsNone(self.hook("gcode_queuing_hook", cmd, tags), cmd)
+        self.assertEqual([self.hook("gcode_sending_hook", "G1 X{}".format(n), JOB) for n in range(4)],
+                         ["M104 S0", "M140 S0", "M112", "M104 S0"])
+
+    def test_failed_send_disarms(self):
+        self.plugin._printer.commands.side_effect = Exception("not connected")
+
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0)
+
+        self.assertFalse(self.plugin._kill_switch.is_armed)
+
+    def test_reconnect_disarms(self):
+        self.plugin._kill_switch.arm(["M112"])
+
+        self.plugin._reset_state()
+
+        self.assertFalse(self.plugin._kill_switch.is_armed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+# coding=utf-8
+"""
+Unit tests for the latency histograms and their API exposure.
+"""
+
+from __future__ import absolute_import
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.emergency import EmergencyIncident
+from octoprint_octo_fire_guard.metrics import GuardMetrics, LatencyHistogram
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Test suite for LatencyHistogram"""
+
+    def test_observe_places_values_in_buckets(self):
+        """Test that values land in the first bucket whose bound is not smaller"""
+        histogram = LatencyHistogram((0.1, 1.0, 10.0))
+
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(0.5)
+        histogram.observe(20.0)
+
+        self.assertEqual(histogram.counts, [2, 1, 0, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.total, 20.65)
+        self.assertEqual(histogram.maximum, 20.0)
+
+    def test_to_dict(self):
+        """Test the exported shape, including the overflow bucket"""
+        histogram = LatencyHistogram((0.1, 1.0))
+        histogram.observe(5.0)
+
+        exported = histogram.to_dict()
+
+        self.assertEqual(exported["unit"], "s")
+        self.assertEqual(exported["buckets"], [[0.1, 0], [1.0, 0], [None, 1]])
+        self.assertEqual(exported["count"], 1)
+        self.assertEqual(exported["max"], 5.0)
+
+
+class TestGuardMetrics(unittest.TestCase):
+    """Test suite for GuardMetrics"""
+
+    def test_first_arrival_records_nothing(self):
+        """Test that a gap is only recorded from the second sample on"""
+        metrics = GuardMetrics()
+
+        metrics.observe_arrival("tool0", 10.0)
+        self.assertEqual(metrics.inter_arrival, {})
+
+        metrics.observe_arrival("tool0", 11.0)
+        self.assertEqual(metrics.inter_arrival["tool0"].count, 1)
+        self.assertAlmostEqual(metrics.inter_arrival["tool0"].total, 1.0)
+
+    def test_reset_arrivals(self):
+        """Test that the gap across a reset is not recorded"""
+        metrics = GuardMetrics()
+        metrics.observe_arrival("bed", 10.0)
+
+        metrics.reset_arrivals()
+        metrics.observe_arrival("bed", 500.0)
+
+        self.assertNotIn("bed", metrics.inter_arrival)
+
+    def test_observe_incident(self):
+        """Test that every step is measured from the detection timestamp"""
+        metrics = GuardMetrics()
+        incident = EmergencyIncident("hotend", 260.0, 250.0, detected_perf=100.0)
+        incident.steps["gcode"] = (100.001, 100.002)
+        incident.steps["psu"] = (100.002, 100.5)
+
+        metrics.observe_incident(incident)
+
+        self.assertAlmostEqual(metrics.termination["gcode"].total, 0.002)
+        self.assertAlmostEqual(metrics.termination["psu"].total, 0.5)
+
+    def test_to_dict(self):
+        """Test that all stages are exported"""
+        metrics = GuardMetrics()
+        metrics.observe_callback(0.00002)
+        metrics.observe_arrival("tool0", 1.0)
+        metrics.observe_arrival("tool0", 2.0)
+
+        exported = metrics.to_dict()
+
+        self.assertEqual(exported["callback"]["count"], 1)
+        self.assertIn("tool0", exported["inter_arrival"])
+        self.assertEqual(exported["termination"], {})
+
+
+class TestPluginLatencyInstrumentation(unittest.TestCase):
+    """Test that the plugin records latencies and exposes them"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112\nM104 S0\nM140 S0",
+            "enable_monitoring": True,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(settings_dict.get(path[0])))
+
+    def test_callback_records_execution_time_and_arrivals(self):
+        """Test that each callback and each sensor sample is recorded"""
+        parsed_temps = {"tool0": (200.0, 210.0), "bed": (60.0, 60.0)}
+        self.plugin.temperature_callback(None, parsed_temps)
+        self.plugin.temperature_callback(None, parsed_temps)
+
+        metrics = self.plugin._metrics
+        self.assertEqual(metrics.callback.count, 2)
+        self.assertEqual(metrics.inter_arrival["tool0"].count, 1)
+        self.assertEqual(metrics.inter_arrival["bed"].count, 1)
+
+    def test_missing_readings_are_not_arrivals(self):
+        """Test that None readings do not count as samples"""
+        self.plugin.temperature_callback(None, {"tool0": (None, 210.0)})
+        self.plugin.temperature_callback(None, {"tool0": (None, 210.0)})
+
+        self.assertNotIn("tool0", self.plugin._metrics.inter_arrival)
+
+    def test_emergency_records_termination_latency(self):
+        """Test that detection-to-termination latencies are recorded per step"""
+        self.plugin.temperature_callback(None, {"tool0": (260.0, 250.0)})
+
+        termination = self.plugin._metrics.termination
+        self.assertEqual(termination["gcode"].count, 1)
+        self.assertEqual(termination["notify"].count, 1)
+
+    def test_reset_state_forgets_arrivals(self):
+        """Test that a reconnect does not record the gap as an inter-arrival time"""
+        self.plugin.temperature_callback(None, {"tool0": (200.0, 210.0)})
+        self.plugin._reset_state()
+        self.plugin.temperature_callback(None, {"tool0": (200.0, 210.0)})
+
+        self.assertNotIn("tool0", self.plugin._metrics.inter_arrival)
+
+    @patch('flask.jsonify')
+    def test_on_api_get_returns_histograms(self, mock_jsonify):
+        """Test that the latency histograms are served by the API"""
+        mock_jsonify.side_effect = lambda **kwargs: kwargs
+        self.plugin.temperature_callback(None, {"tool0": (200.0, 210.0)})
+
+        result = self.plugin.on_api_get(Mock(args={}))
+
+        self.assertIn("latency", result)
+        self.assertEqual(result["latency"]["callback"]["count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,79 +11,14 @@ from unittest.mock import Mock, MagicMock, patch, call, PropertyMock
 import sys
 import os
 
-# Before importing anything, we need to mock the OctoPrint dependencies
-# We'll patch them at import time to avoid metaclass conflicts
-
-# Mock permissions module first
-class FakePermissions:
-    class Permissions:
-        class CONTROL:
-            @staticmethod
-            def can():
-                # Default to True for existing tests to pass
-                return True
-
-# Create fake access module
-class FakeAccess:
-    permissions = FakePermissions
-
-# Create a module-level mock for octoprint
-class FakeOctoprint:
-    class plugin:
-        class SettingsPlugin:
-            pass
-        
-        class AssetPlugin:
-            pass
-        
-        class TemplatePlugin:
-            pass
-        
-        class StartupPlugin:
-            pass
-        
-        class SimpleApiPlugin:
-            pass
-        
-        class ShutdownPlugin:
-            pass
-        
-        class EventHandlerPlugin:
-            pass
-    
-    class util:
-        class RepeatedTimer:
-            def __init__(self, interval, function):
-                self.interval = interval
-                self.function = function
-                self.is_running = False
-            
-            def start(self):
-                self.is_running = True
-            
-            def cancel(self):
-                self.is_running = False
-    
-    # Add access submodule
-    access = FakeAccess
-
-# Mock flask module
-class FakeFlask:
-    @staticmethod
-    def jsonify(**kwargs):
-        return kwargs
-
-# Install the mocks
-sys.modules['octoprint'] = FakeOctoprint()
-sys.modules['octoprint.plugin'] = FakeOctoprint.plugin
-sys.modules['octoprint.util'] = FakeOctoprint.util
-sys.modules['octoprint.access'] = FakeAccess
-sys.modules['octoprint.access.permissions'] = FakePermissions
-sys.modules['flask'] = FakeFlask()
-
 # Add parent directory to path to import the plugin
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+# Before importing the plugin, we need to mock the OctoPrint dependencies
+# We'll patch them at import time to avoid metaclass conflicts
+from tests.fakes import install_fakes
+install_fakes()
+
 # Now we can import the plugin
 from octoprint_octo_fire_guard import OctoFireGuardPlugin
 
@@ -189,7 +124,7 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         """Test that template configuration is set"""
         configs = self.plugin.get_template_configs()
         
-        self.assertEqual(len(configs), 2)
+        self.assertEqual(len(configs), 3)
         
         # Check settings template
         self.assertEqual(configs[0]["type"], "settings")
@@ -199,6 +134,11 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         self.assertEqual(configs[1]["type"], "generic")
         self.assertEqual(configs[1]["template"], "octo_fire_guard_alert_modal.jinja2")
         self.assertFalse(configs[1]["custom_bindings"])
+        
+        # Check headroom tab
+        self.assertEqual(configs[2]["type"], "tab")
+        self.assertEqual(configs[2]["template"], "octo_fire_guard_tab.jinja2")
+        self.assertFalse(configs[2]["custom_bindings"])
     
     # ===== API Command Tests =====
     
@@ -210,6 +150,8 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         self.assertEqual(commands["test_alert"], [])
         self.assertIn("test_emergency_actions", commands)
         self.assertEqual(commands["test_emergency_actions"], [])
+        self.assertIn("list_incidents", commands)
+        self.assertEqual(commands["list_incidents"], [])
     
     @patch('flask.jsonify')
     def test_on_api_command_test_alert(self, mock_jsonify):
@@ -249,9 +191,8 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         self.plugin._logger.info.assert_any_call("Testing emergency actions")
         self.plugin._logger.info.assert_any_call("Testing GCode termination commands")
         
-        # Verify specific GCode commands were sent
-        self.plugin._printer.commands.assert_has_calls([call("M112"), call("M104 S0"), call("M140 S0")])
-        self.assertEqual(self.plugin._printer.commands.call_count, 3)
+        # Verify specific GCode commands were sent in one batch
+        self.plugin._printer.commands.assert_called_once_with(["M112", "M104 S0", "M140 S0"])
         
         # Verify the API response
         mock_jsonify.assert_called_once_with(success=True, mode="gcode", message="GCode commands executed successfully")
@@ -280,7 +221,7 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         self.plugin._logger.info.assert_any_call("Testing PSU termination")
         
         # Verify heater turn-off commands were sent before PSU shutdown
-        self.plugin._printer.commands.assert_has_calls([call("M104 S0"), call("M140 S0")])
+        self.plugin._printer.commands.assert_called_once_with(["M104 S0", "M140 S0"])
         
         # Verify PSU plugin was called
         mock_psu_implementation.turn_psu_off.assert_called_once()
@@ -557,17 +498,15 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         
         # Verify gcode commands sent
         self.plugin._printer.commands.assert_called()
-        # Should have sent M112, M104 S0, M140 S0
-        self.assertEqual(self.plugin._printer.commands.call_count, 3)
+        # Should have sent M112, M104 S0, M140 S0 in one batch
+        self.plugin._printer.commands.assert_called_once_with(["M112", "M104 S0", "M140 S0"])
     
     def test_execute_gcode_termination(self):
         """Test GCode termination execution"""
         self.plugin._execute_gcode_termination()
         
-        # Verify all commands were sent
-        calls = [call("M112"), call("M104 S0"), call("M140 S0")]
-        self.plugin._printer.commands.assert_has_calls(calls)
-        self.assertEqual(self.plugin._printer.commands.call_count, 3)
+        # Verify all commands were sent in one batch
+        self.plugin._printer.commands.assert_called_once_with(["M112", "M104 S0", "M140 S0"])
     
     def test_execute_gcode_termination_custom_commands(self):
         """Test GCode termination with custom commands"""
@@ -575,9 +514,7 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         self.plugin._execute_gcode_termination()
         
         # Verify custom commands were sent
-        calls = [call("M112"), call("M106 S0")]
-        self.plugin._printer.commands.assert_has_calls(calls)
-        self.assertEqual(self.plugin._printer.commands.call_count, 2)
+        self.plugin._printer.commands.assert_called_once_with(["M112", "M106 S0"])
     
     def test_execute_gcode_termination_empty_lines(self):
         """Test GCode termination handles empty lines"""
@@ -585,9 +522,7 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         self.plugin._execute_gcode_termination()
         
         # Should only send non-empty commands
-        calls = [call("M112"), call("M104 S0")]
-        self.plugin._printer.commands.assert_has_calls(calls)
-        self.assertEqual(self.plugin._printer.commands.call_count, 2)
+        self.plugin._printer.commands.assert_called_once_with(["M112", "M104 S0"])
     
     def test_execute_psu_termination_success(self):
         """Test PSU termination when plugin is available"""
@@ -602,8 +537,7 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         self.plugin._execute_psu_termination()
         
         # Verify heaters turned off first
-        calls = [call("M104 S0"), call("M140 S0")]
-        self.plugin._printer.commands.assert_has_calls(calls)
+        self.plugin._printer.commands.assert_called_once_with(["M104 S0", "M140 S0"])
         
         # Verify PSU plugin called
         mock_psu_implementation.turn_psu_off.assert_called_once()
@@ -638,7 +572,8 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         
         # Should fall back to gcode termination
         # M104 S0, M140 S0 from PSU attempt + M112, M104 S0, M140 S0 from fallback
-        self.assertTrue(self.plugin._printer.commands.call_count >= 3)
+        self.plugin._printer.commands.assert_has_calls([call(["M104 S0", "M140 S0"]),
+                                                        call(["M112", "M104 S0", "M140 S0"])])
     
     def test_execute_psu_termination_no_turn_off_method(self):
         """Test PSU termination falls back when no turn off method exists"""
@@ -655,7 +590,7 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         self.plugin._logger.warning.assert_called()
         
         # Should fall back to gcode
-        self.assertTrue(self.plugin._printer.commands.call_count >= 3)
+        self.plugin._printer.commands.assert_called_with(["M112", "M104 S0", "M140 S0"])
     
     def test_execute_psu_termination_exception_handling(self):
         """Test PSU termination handles exceptions gracefully"""
@@ -769,8 +704,7 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         self.plugin._execute_gcode_termination()
         
         # Commands should be stripped
-        calls = [call("M112"), call("M104 S0")]
-        self.plugin._printer.commands.assert_has_calls(calls)
+        self.plugin._printer.commands.assert_called_once_with(["M112", "M104 S0"])
     
     # ===== New Temperature Format Tests (OctoPrint uppercase keys) =====
     
@@ -920,6 +854,7 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
     def test_on_after_startup_debug_logging(self):
         """Test that on_after_startup logs debug messages"""
         self.plugin.on_after_startup()
+        self.addCleanup(self.plugin.on_shutdown)
         
         # Verify debug logging calls
         debug_calls = self.plugin._logger.debug.call_args_list
@@ -1025,7 +960,6 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         debug_calls = self.plugin._logger.debug.call_args_list
         
         self.assertTrue(any("_execute_gcode_termination called" in str(call) for call in debug_calls))
-        self.assertTrue(any("split into" in str(call) and "commands" in str(call) for call in debug_calls))
         self.assertTrue(any("GCode termination complete" in str(call) for call in debug_calls))
     
     def test_psu_termination_debug_logging(self):
@@ -1044,10 +978,35 @@ class TestOctoFireGuardPlugin(unittest.TestCase):
         
         self.assertTrue(any("_execute_psu_termination called" in str(call) for call in debug_calls))
         self.assertTrue(any("Turning off heaters before PSU shutdown" in str(call) for call in debug_calls))
-        self.assertTrue(any("Looking up PSU plugin" in str(call) for call in debug_calls))
-        self.assertTrue(any("PSU plugin found" in str(call) for call in debug_calls))
         self.assertTrue(any("PSU termination process complete" in str(call) for call in debug_calls))
 
+    def test_temperature_callback_no_debug_calls_when_debug_disabled(self):
+        """Test that temperature_callback skips debug logging entirely when DEBUG is off"""
+        self.plugin._logger.isEnabledFor = Mock(return_value=False)
+
+        # Trip and then reset both flags to walk every branch of the callback
+        self.plugin._trigger_emergency_shutdown = Mock()
+        self.plugin.temperature_callback(None, {"tool0": (260.0, 250.0), "bed": (110.0, 100.0)})
+        self.plugin.temperature_callback(None, {"tool0": (260.0, 250.0), "bed": (110.0, 100.0)})
+        self.plugin.temperature_callback(None, {"tool0": (200.0, 250.0), "bed": (60.0, 100.0)})
+
+        # Alerts are still logged, but no debug record was even requested
+        self.plugin._logger.debug.assert_not_called()
+        self.plugin._logger.warning.assert_called()
+        self.assertEqual(self.plugin._trigger_emergency_shutdown.call_count, 2)
+        self.assertFalse(self.plugin._hotend_threshold_exceeded)
+        self.assertFalse(self.plugin._heatbed_threshold_exceeded)
+
+    def test_temperature_callback_debug_arguments_are_deferred(self):
+        """Test that debug messages pass their arguments instead of pre-formatting them"""
+        parsed_temps = {"tool0": (200.0, 210.0), "bed": (80.0, 90.0)}
+        self.plugin.temperature_callback(None, parsed_temps)
+
+        received_calls = [c for c in self.plugin._logger.debug.call_args_list
+                          if "Received parsed_temperatures" in c[0][0]]
+        self.assertEqual(len(received_calls), 1)
+        self.assertEqual(received_calls[0][0], ("Received parsed_temperatures: %s", parsed_temps))
+
 
 class TestPluginHooks(unittest.TestCase):
     """Test plugin hooks and registration"""
@@ -1063,6 +1022,9 @@ class TestPluginHooks(unittest.TestCase):
         
         self.assertIn("octoprint.plugin.softwareupdate.check_config", __plugin_hooks__)
         self.assertIn("octoprint.comm.protocol.temperatures.received", __plugin_hooks__)
+        self.assertIn("octoprint.comm.protocol.gcode.queuing", __plugin_hooks__)
+        self.assertIn("octoprint.comm.protocol.gcode.sending", __plugin_hooks__)
+        self.assertIn("octoprint.comm.protocol.gcode.sent", __plugin_hooks__)
     
     def test_plugin_implementation_created(self):
         """Test that __plugin_implementation__ is created"""
@@ -1070,9 +1032,39 @@ class TestPluginHooks(unittest.TestCase):
         __plugin_load__()
         
         from octoprint_octo_fire_guard import __plugin_implementation__
-        
+
         self.assertIsInstance(__plugin_implementation__, OctoFireGuardPlugin)
 
+    def test_plugin_is_constructed_once_on_load(self):
+        """Test that loading builds a single instance and the hooks are bound to it"""
+        import octoprint_octo_fire_guard as module
+
+        with patch.object(module, "OctoFireGuardPlugin", wraps=OctoFireGuardPlugin) as plugin_class:
+            module.__plugin_load__()
+
+        self.assertEqual(plugin_class.call_count, 1)
+        callback = module.__plugin_hooks__["octoprint.comm.protocol.temperatures.received"]
+        self.assertIs(callback.__self__, module.__plugin_implementation__)
+
+    def test_import_defers_web_and_optional_modules(self):
+        """Test that importing the plugin leaves the API, metrics, fleet and escalation dependencies unloaded"""
+        import subprocess
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        script = (
+            "import sys\n"
+            "from tests.fakes import install_fakes\n"
+            "install_fakes()\n"
+            "del sys.modules['flask'], sys.modules['octoprint.access.permissions']\n"
+            "import octoprint_octo_fire_guard as module\n"
+            "module.__plugin_load__()\n"
+            "print(sorted(name for name in ('flask', 'octoprint.access.permissions', 'socket', 'subprocess',\n"
+            "    'octoprint_octo_fire_guard.fleet', 'octoprint_octo_fire_guard.exposition') if name in sys.modules))\n"
+        )
+
+        output = subprocess.check_output([sys.executable, "-c", script], cwd=root)
+
+        self.assertEqual(output.decode("utf-8").strip(), "[]")
+
 
 class TestPluginIntegration(unittest.TestCase):
     """Integration tests for complete workflows"""
@@ -0,0 +1,245 @@
+# coding=utf-8
+"""
+Unit tests for the emergency plan compiled from the termination settings.
+"""
+
+from __future__ import absolute_import
+import unittest
+from unittest.mock import Mock, patch, call
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.plan import EmergencyPlan, parse_commands, resolve_power_off, HEATER_OFF_COMMANDS
+
+
+def psu_plugin_manager(**methods):
+    """Plugin manager with a PSU plugin implementing exactly the given methods"""
+    implementation = Mock(spec=list(methods))
+    for name, method in methods.items():
+        setattr(implementation, name, method)
+    plugin_info = Mock()
+    plugin_info.implementation = implementation
+    plugin_manager = Mock()
+    plugin_manager.get_plugin_info.return_value = plugin_info
+    return plugin_manager
+
+
+class TestEmergencyPlan(unittest.TestCase):
+    """Test suite for EmergencyPlan"""
+
+    def setUp(self):
+        self.settings_dict = {
+            "termination_mode": "gcode",
+            "termination_gcode": "M112\nM104 S0\nM140 S0",
+            "psu_plugin_name": "psucontrol",
+            "priority_kill_gcode": True,
+        }
+        self.settings = Mock()
+        self.settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.settings.get_boolean = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+
+    def test_parse_commands(self):
+        self.assertEqual(parse_commands("  M112 \n\n M104 S0\n"), ("M112", "M104 S0"))
+        self.assertEqual(parse_commands(""), ())
+        self.assertEqual(parse_commands(None), ())
+
+    def test_gcode_plan(self):
+        plan = EmergencyPlan.compile(self.settings, psu_plugin_manager())
+
+        self.assertEqual(plan.mode, "gcode")
+        self.assertEqual(plan.commands, ("M112", "M104 S0", "M140 S0"))
+        self.assertEqual(plan.heater_commands, HEATER_OFF_COMMANDS)
+        self.assertTrue(plan.priority_send)
+        self.assertEqual(plan.problems, ())
+
+    def test_priority_send(self):
+        self.settings_dict["priority_kill_gcode"] = False
+        self.assertFalse(EmergencyPlan.compile(self.settings, psu_plugin_manager()).priority_send)
+
+        # Settings saved before the option existed
+        self.settings_dict["priority_kill_gcode"] = None
+        self.assertTrue(EmergencyPlan.compile(self.settings, psu_plugin_manager()).priority_send)
+
+    def test_psu_plan_resolves_power_off(self):
+        self.settings_dict["termination_mode"] = "psu"
+        turn_psu_off = Mock()
+
+        plan = EmergencyPlan.compile(self.settings, psu_plugin_manager(turn_psu_off=turn_psu_off))
+
+        self.assertIs(plan.power_off, turn_psu_off)
+        self.assertEqual(plan.problems, ())
+
+    def test_psu_plan_prefers_turn_psu_off(self):
+        turn_psu_off = Mock()
+
+        power_off, problem = resolve_power_off(psu_plugin_manager(turn_psu_off=turn_psu_off, turnPSUOff=Mock()),
+                                               "psucontrol")
+
+        self.assertIs(power_off, turn_psu_off)
+        self.assertIsNone(problem)
+
+    def test_psu_plan_alternative_method(self):
+        turn_off = Mock()
+
+        power_off, problem = resolve_power_off(psu_plugin_manager(turnPSUOff=turn_off), "psucontrol")
+
+        self.assertIs(power_off, turn_off)
+
+    def test_psu_plan_without_plugin(self):
+        self.settings_dict["termination_mode"] = "psu"
+        plugin_manager = Mock()
+        plugin_manager.get_plugin_info.return_value = None
+
+        plan = EmergencyPlan.compile(self.settings, plugin_manager)
+
+        self.assertIsNone(plan.power_off)
+        self.assertEqual(len(plan.problems), 1)
+        self.assertIn("not found", plan.problems[0])
+
+    def test_psu_plan_without_turn_off_method(self):
+        self.settings_dict["termination_mode"] = "psu"
+
+        plan = EmergencyPlan.compile(self.settings, psu_plugin_manager())
+
+        self.assertIsNone(plan.power_off)
+        self.assertIn("no turn off method", plan.problems[0])
+
+    def test_missing_psu_plugin_is_no_problem_in_gcode_mode(self):
+        plugin_manager = Mock()
+        plugin_manager.get_plugin_info.return_value = None
+
+        plan = EmergencyPlan.compile(self.settings, plugin_manager)
+
+        self.assertEqual(plan.problems, ())
+
+    def test_lookup_failure_is_a_problem(self):
+        self.settings_dict["termination_mode"] = "psu"
+        plugin_manager = Mock()
+        plugin_manager.get_plugin_info.side_effect = Exception("boom")
+
+        plan = EmergencyPlan.compile(self.settings, plugin_manager)
+
+        self.assertIsNone(plan.power_off)
+        self.assertIn("boom", plan.problems[0])
+
+    def test_empty_gcode_is_a_problem(self):
+        self.settings_dict["termination_gcode"] = "\n  \n"
+
+        plan = EmergencyPlan.compile(self.settings, psu_plugin_manager())
+
+        self.assertEqual(plan.commands, ())
+        self.assertEqual(plan.problems, ("No termination GCode configured",))
+
+    def test_unrecognised_lines_are_problems_but_kept(self):
+        self.settings_dict["termination_gcode"] = "M112\nturn off\n@pause\nm104 s0 ; hotend\nG28X"
+
+        plan = EmergencyPlan.compile(self.settings, psu_plugin_manager())
+
+        self.assertEqual(plan.commands, ("M112", "turn off", "@pause", "m104 s0 ; hotend", "G28X"))
+        self.assertEqual(len(plan.problems), 2)
+        self.assertIn("'turn off'", plan.problems[0])
+        self.assertIn("'G28X'", plan.problems[1])
+
+    def test_unknown_mode_is_a_problem(self):
+        self.settings_dict["termination_mode"] = "invalid"
+
+        plan = EmergencyPlan.compile(self.settings, psu_plugin_manager())
+
+        self.assertEqual(plan.problems, ("Unknown termination mode: invalid",))
+
+
+class TestPluginEmergencyPlan(unittest.TestCase):
+    """Test that the plugin compiles the plan ahead of time and runs it"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.turn_psu_off = Mock()
+        self.plugin._plugin_manager = psu_plugin_manager(turn_psu_off=self.turn_psu_off)
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "psu",
+            "termination_gcode": "M112\nM104 S0\nM140 S0",
+            "psu_plugin_name": "psucontrol",
+            "enable_monitoring": True,
+            "enable_data_monitoring": False,
+            "status_interval": 0,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.addCleanup(self.plugin.on_shutdown)
+
+    def test_plan_compiled_on_startup(self):
+        self.plugin.on_after_startup()
+
+        self.assertIsNotNone(self.plugin._emergency_plan)
+        self.assertIs(self.plugin._emergency_plan.power_off, self.turn_psu_off)
+
+    def test_emergency_does_not_read_termination_settings(self):
+        self.plugin.on_after_startup()
+        self.plugin.on_shutdown()  # Handle the incident inline
+        self.plugin._settings.get.reset_mock()
+        self.plugin._plugin_manager.get_plugin_info.reset_mock()
+
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0)
+
+        read = set(c[0][0][0] for c in self.plugin._settings.get.call_args_list)
+        self.assertFalse(read & {"termination_mode", "termination_gcode", "psu_plugin_name"})
+        self.plugin._plugin_manager.get_plugin_info.assert_not_called()
+        self.plugin._printer.commands.assert_called_once_with(["M104 S0", "M140 S0"])
+        self.turn_psu_off.assert_called_once_with()
+
+    def test_settings_save_recompiles_plan(self):
+        self.plugin.on_after_startup()
+        self.settings_dict["termination_mode"] = "gcode"
+        self.settings_dict["termination_gcode"] = "M112"
+
+        with patch('octoprint.plugin.SettingsPlugin.on_settings_save'):
+            self.plugin.on_settings_save({})
+
+        self.assertEqual(self.plugin._emergency_plan.mode, "gcode")
+        self.assertEqual(self.plugin._emergency_plan.commands, ("M112",))
+
+    def test_problems_reported_ahead_of_time(self):
+        self.plugin._plugin_manager.get_plugin_info.return_value = None
+
+        self.plugin.on_after_startup()
+
+        self.assertTrue(any("Emergency plan: PSU control plugin 'psucontrol' not found" in c[0][0]
+                            for c in self.plugin._logger.error.call_args_list))
+        self.plugin._plugin_manager.send_plugin_message.assert_any_call("octo_fire_guard", dict(
+            type="emergency_plan_warning", problems=list(self.plugin._emergency_plan.problems)
+        ))
+
+    def test_unresolved_power_off_falls_back_to_gcode(self):
+        self.plugin._plugin_manager.get_plugin_info.return_value = None
+
+        self.plugin._trigger_emergency_shutdown("hotend", 260.0, 250.0)
+
+        self.plugin._printer.commands.assert_has_calls([call(["M104 S0", "M140 S0"]),
+                                                        call(["M112", "M104 S0", "M140 S0"])])
+        self.plugin._logger.warning.assert_any_call("Falling back to GCode termination")
+
+    @patch('flask.jsonify')
+    def test_status_reports_plan_problems(self, mock_jsonify):
+        mock_jsonify.side_effect = lambda **kwargs: kwargs
+        self.settings_dict["termination_gcode"] = ""
+
+        result = self.plugin.on_api_get(Mock(args={"status": "1"}))
+
+        self.assertEqual(result["plan_problems"], ["No termination GCode configured"])
+
+
+if __name__ == '__main__':
+    unittest.main()
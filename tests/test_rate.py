@@ -0,0 +1,223 @@
+# coding=utf-8
+"""
+Unit tests for the rate-of-rise (thermal runaway) detector.
+"""
+
+from __future__ import absolute_import
+import random
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.guard_state import SensorState
+from octoprint_octo_fire_guard.rate import SlopeEstimator
+
+
+def least_squares_slope(points):
+    n = float(len(points))
+    mean_t = sum(t for t, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    numerator = sum((t - mean_t) * (y - mean_y) for t, y in points)
+    denominator = sum((t - mean_t) ** 2 for t, _ in points)
+    return numerator / denominator
+
+
+class TestSlopeEstimator(unittest.TestCase):
+    """Test suite for SlopeEstimator"""
+
+    def test_needs_two_samples(self):
+        estimator = SlopeEstimator(5)
+        self.assertIsNone(estimator.slope())
+        estimator.push(1.0, 20.0)
+        self.assertIsNone(estimator.slope())
+
+    def test_linear_ramp(self):
+        """Test that a straight line yields its exact slope"""
+        estimator = SlopeEstimator(5)
+        for i in range(5):
+            estimator.push(100.0 + 2.0 * i, 200.0 + 3.0 * i)
+
+        self.assertTrue(estimator.full)
+        self.assertAlmostEqual(estimator.slope(), 1.5)
+
+    def test_window_only_covers_latest_samples(self):
+        """Test that samples falling out of the ring no longer count"""
+        estimator = SlopeEstimator(4)
+        for i in range(10):
+            estimator.push(float(i), 0.0)  # Flat
+        for i in range(10, 14):
+            estimator.push(float(i), 5.0 * (i - 10))  # Rising at 5 per unit
+
+        self.assertAlmostEqual(estimator.slope(), 5.0)
+
+    def test_matches_direct_regression_over_long_runs(self):
+        """Test that the incremental sums do not drift from a full recomputation"""
+        rng = random.Random(42)
+        estimator = SlopeEstimator(10)
+        points = []
+        t = 1700000000.0  # Large wall-clock-like timestamps
+        for _ in range(5000):
+            t += 1.0 + rng.random()
+            y = 210.0 + rng.uniform(-2.0, 2.0)
+            estimator.push(t, y)
+            points.append((t, y))
+
+        self.assertAlmostEqual(estimator.slope(), least_squares_slope(points[-10:]), places=9)
+
+    def test_clear(self):
+        estimator = SlopeEstimator(3)
+        for i in range(3):
+            estimator.push(float(i), float(i))
+
+        estimator.clear()
+
+        self.assertEqual(estimator.count, 0)
+        self.assertIsNone(estimator.slope())
+
+    def test_identical_timestamps(self):
+        """Test that a degenerate window gives no slope instead of dividing by zero"""
+        estimator = SlopeEstimator(3)
+        for _ in range(3):
+            estimator.push(5.0, 200.0)
+        self.assertIsNone(estimator.slope())
+
+    def test_rejects_tiny_window(self):
+        with self.assertRaises(ValueError):
+            SlopeEstimator(1)
+
+
+class TestSensorStateRate(unittest.TestCase):
+    """Test the steady-target rules applied before a rate is reported"""
+
+    def setUp(self):
+        self.state = SensorState("hotend", 0)
+        self.state.configure(250.0, rate_window=4)
+
+    def feed(self, readings, target, start=0.0):
+        result = None
+        for i, temperature in enumerate(readings):
+            result = self.state.update_rate(start + i, temperature, target)
+        return result
+
+    def test_rate_reported_once_window_is_full(self):
+        self.assertIsNone(self.feed([200.0, 203.0, 206.0], 200.0))
+        self.assertAlmostEqual(self.state.update_rate(3.0, 209.0, 200.0), 3.0)
+
+    def test_target_change_restarts_window(self):
+        """Test that a new target means the rate is not judged until a full steady window"""
+        self.feed([200.0, 200.0, 200.0, 200.0], 200.0)
+
+        self.assertIsNone(self.state.update_rate(4.0, 203.0, 220.0))
+        self.assertEqual(self.state.rate.count, 1)
+
+    def test_heating_towards_target_is_not_judged(self):
+        """Test that a normal heat-up with a steady target does not report a rate"""
+        self.assertIsNone(self.feed([100.0, 110.0, 120.0, 130.0], 210.0))
+
+    def test_heater_off_rising_is_judged(self):
+        """Test that a heater warming up with its target at zero (None) is judged"""
+        self.assertAlmostEqual(self.feed([30.0, 32.0, 34.0, 36.0], None), 2.0)
+
+
+class TestPluginRateOfRise(unittest.TestCase):
+    """Test that the callback trips on a runaway before the threshold is reached"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 280.0,
+            "heatbed_threshold": 120.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "enable_monitoring": True,
+            "enable_rate_monitoring": True,
+            "max_heating_rate": 2.0,
+            "rate_window": 5,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_int = Mock(side_effect=lambda path: int(self.settings_dict.get(path[0])))
+        self.clock = [1000.0]
+        patcher = patch('octoprint_octo_fire_guard.time.perf_counter', side_effect=lambda: self.clock[0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def replay(self, readings, target=210.0, key="tool0", interval=1.0):
+        for temperature in readings:
+            self.clock[0] += interval
+            self.plugin.temperature_callback(None, {key: (temperature, target)})
+
+    def test_runaway_trips_below_threshold(self):
+        """Test that a fast rise with a steady target trips although the temperature is below the threshold"""
+        self.plugin._trigger_emergency_shutdown = Mock()
+
+        self.replay([210.0, 210.5, 213.0, 216.0, 219.0, 222.0])
+
+        self.plugin._trigger_emergency_shutdown.assert_called_once()
+        args, kwargs = self.plugin._trigger_emergency_shutdown.call_args
+        self.assertEqual(args[0], "hotend")
+        self.assertGreater(kwargs["rate"], 2.0)
+        self.assertEqual(kwargs["max_rate"], 2.0)
+        self.assertFalse(self.plugin._hotend_threshold_exceeded)
+
+    def test_steady_temperature_does_not_trip(self):
+        self.plugin._trigger_emergency_shutdown = Mock()
+
+        self.replay([209.5, 210.2, 210.0, 209.8, 210.4, 210.1, 209.9, 210.0])
+
+        self.plugin._trigger_emergency_shutdown.assert_not_called()
+
+    def test_alert_is_not_repeated_and_rearms(self):
+        """Test that a rate alert fires once and re-arms when the rise slows down"""
+        self.plugin._trigger_emergency_shutdown = Mock()
+        self.replay([210.0, 213.0, 216.0, 219.0, 222.0, 225.0, 228.0])
+        self.assertEqual(self.plugin._trigger_emergency_shutdown.call_count, 1)
+
+        self.replay([228.0] * 5)
+        self.assertFalse(self.plugin._guard_state.hotends[0].rate_exceeded)
+
+    def test_disabled_by_default(self):
+        """Test that no estimator is kept unless rate monitoring is enabled"""
+        self.settings_dict["enable_rate_monitoring"] = False
+        self.plugin._trigger_emergency_shutdown = Mock()
+
+        self.replay([210.0, 213.0, 216.0, 219.0, 222.0, 225.0])
+
+        self.assertIsNone(self.plugin._guard_state.hotends[0].rate)
+        self.plugin._trigger_emergency_shutdown.assert_not_called()
+
+    def test_rate_alert_message(self):
+        """Test that the frontend alert describes the heating rate"""
+        self.replay([210.0, 213.0, 216.0, 219.0, 222.0])
+
+        alert = self.plugin._plugin_manager.send_plugin_message.call_args[0][1]
+        self.assertEqual(alert["type"], "temperature_alert")
+        self.assertEqual(alert["max_rate"], 2.0)
+        self.assertAlmostEqual(alert["rate"], 3.0)
+        self.assertIn("°C/s", alert["message"])
+
+    def test_samples_do_not_allocate_estimators(self):
+        """Test that the estimator of a sensor is reused for every sample"""
+        self.replay([210.0])
+        estimator = self.plugin._guard_state.hotends[0].rate
+
+        self.replay([210.0] * 20)
+
+        self.assertIs(self.plugin._guard_state.hotends[0].rate, estimator)
+
+
+if __name__ == '__main__':
+    unittest.main()
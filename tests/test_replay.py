@@ -0,0 +1,245 @@
+# coding=utf-8
+"""
+Unit tests for the offline serial log replay and threshold sweep.
+"""
+
+from __future__ import absolute_import
+import gzip
+import io
+import json
+import math
+import random
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard import replay as replay_module
+from octoprint_octo_fire_guard.replay import (
+    TemperatureLog, find_overheats, parse_filter, replay, score, sweep, main
+)
+from octoprint_octo_fire_guard.sensors import SENSOR_HOTEND, SENSOR_HEATBED
+
+SERIAL_LOG = b"""\
+2026-03-01 10:00:00,000 - Connecting to: /dev/ttyUSB0
+2026-03-01 10:00:01,000 - Recv: ok T:210.00 /210.00 B:60.00 /60.00 @:64 B@:0
+2026-03-01 10:00:02,500 - Recv:  T:211.0 /210.0 B:60.2 /60.0 @:64 B@:0
+2026-03-01 10:00:03,000 - Send: N12 M105*34
+2026-03-01 10:00:04,000 - Recv: T:210.0 /210.0 T0:209.5 /210.0 T1:180.5 /180.0 B:61.0 /60.0 C:35.0
+2026-03-01 10:00:05,000 - Recv: echo:busy: processing
+Recv: T:999.0 /0.0
+2026-03-01 10:00:06,000 - Recv: T0:209.0 T1:181.0
+"""
+
+
+def readings(count, seed):
+    """A hotend holding 210°C with glitches and two sustained overheats"""
+    generator = random.Random(seed)
+    values = []
+    for index in range(count):
+        value = 210.0 + generator.uniform(-1.0, 1.0)
+        if generator.random() < 0.05:
+            value = 300.0
+        if 100 <= index < 130 or 300 <= index < 305:
+            value = 255.0 + index % 5 * 5
+        values.append(value)
+    return values
+
+
+class TestTemperatureLog(unittest.TestCase):
+    """Test suite for parsing temperature reports from logs"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content, opener=open):
+        path = os.path.join(self.directory, name)
+        with opener(path, "wb") as log:
+            log.write(content)
+        return path
+
+    def test_serial_log(self):
+        log = TemperatureLog()
+        log.parse(self.write("serial.log", SERIAL_LOG))
+
+        self.assertEqual(log.reports, 4)
+        self.assertEqual(sorted(log.series), ["B", "T0", "T1"])
+        hotend = log.series["T0"]
+        self.assertEqual(list(hotend.actual), [210.0, 211.0, 209.5, 209.0])
+        self.assertEqual(list(hotend.times), [1772359201.0, 1772359202.5, 1772359204.0, 1772359206.0])
+        self.assertTrue(math.isnan(hotend.target[-1]))
+        self.assertEqual(list(log.series["T1"].actual), [180.5, 181.0])
+        self.assertEqual(list(log.series["B"].target), [60.0, 60.0, 60.0])
+        self.assertEqual(log.series["B"].kind, SENSOR_HEATBED)
+        self.assertEqual(log.span, 5.0)
+
+    def test_time_window(self):
+        log = TemperatureLog()
+        log.parse(self.write("serial.log", SERIAL_LOG), start=1772359202.0, end=1772359206.0)
+
+        self.assertEqual(log.reports, 2)
+        self.assertEqual(list(log.series["T0"].actual), [211.0, 209.5])
+
+    def test_rotated_and_compressed_logs(self):
+        older = self.write("serial.log.1.gz", SERIAL_LOG, gzip.open)
+        newer = self.write("serial.log", SERIAL_LOG.replace(b"2026-03-01", b"2026-03-02"))
+
+        log = TemperatureLog()
+        log.parse(newer)
+        log.parse(older)
+
+        times = list(log.series["T0"].times)
+        self.assertEqual(len(times), 8)
+        self.assertEqual(times, sorted(times))
+        self.assertEqual(log.series["T0"].actual[0], 210.0)
+
+    def test_parse_filter(self):
+        self.assertEqual(parse_filter("off"), ("off", 1, 1))
+        self.assertEqual(parse_filter("n_of_m:3/5"), ("n_of_m", 5, 3))
+        self.assertEqual(parse_filter(" median:7 "), ("median", 7, 1))
+        for text in ("n_of_m:5/3", "median:99", "n_of_m:3", "mean:5"):
+            with self.assertRaises(ValueError):
+                parse_filter(text)
+
+
+class TestReplay(unittest.TestCase):
+    """Test that the replay follows temperature_callback"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "enable_monitoring": True,
+            "spike_filter": "off",
+            "spike_filter_window": 5,
+            "spike_filter_count": 3,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_int = Mock(side_effect=lambda path: int(self.settings_dict.get(path[0])))
+
+    def plugin_trips(self, values):
+        self.plugin._rebuild_guard_settings()
+        self.plugin._trigger_emergency_shutdown = Mock()
+        trips = []
+        for index, value in enumerate(values):
+            calls = self.plugin._trigger_emergency_shutdown.call_count
+            self.plugin.temperature_callback(None, {"T0": (value, 210.0)})
+            if self.plugin._trigger_emergency_shutdown.call_count > calls:
+                trips.append(index)
+        return trips
+
+    def check_against_plugin(self):
+        for spec in ("off", "n_of_m:3/5", "median:5"):
+            mode, window, count = parse_filter(spec)
+            self.settings_dict.update(spike_filter=mode, spike_filter_window=window, spike_filter_count=count)
+            # Glitches while the filter window is still filling
+            values = [400.0, 400.0] + readings(500, seed=len(spec))
+
+            trips, resets = replay(values, 250.0, 10.0, (mode, window, count))
+
+            self.assertEqual(trips, self.plugin_trips(values), spec)
+            self.assertEqual(len(resets), len(trips))
+
+    def test_python_replay_matches_plugin(self):
+        with patch.object(replay_module, "numpy", None):
+            self.check_against_plugin()
+
+    @unittest.skipIf(replay_module.numpy is None, "numpy is not installed")
+    def test_numpy_replay_matches_plugin(self):
+        numpy = replay_module.numpy
+        original = replay_module.replay
+
+        def replay_arrays(values, *args):
+            return original(numpy.asarray(values, dtype=numpy.float64), *args)
+
+        with patch.object(sys.modules[__name__], "replay", replay_arrays):
+            self.check_against_plugin()
+
+
+class TestScoring(unittest.TestCase):
+    """Test suite for matching trips against real overheats"""
+
+    def test_find_overheats(self):
+        times = [float(t) for t in range(12)]
+        actual = [210, 300, 210, 260, 261, 262, 263, 210, 255, 256, 257, 258]
+
+        with patch.object(replay_module, "numpy", None):
+            self.assertEqual(find_overheats(times, actual, 250.0, 3.0), [(3, 6), (8, 11)])
+            self.assertEqual(find_overheats(times, actual, 250.0, 0.0), [(1, 1), (3, 6), (8, 11)])
+
+    def test_score(self):
+        times = [float(t) for t in range(20)]
+        overheats = [(5, 9), (12, 14), (17, 19)]
+
+        # A glitch at 1, a trip at 7 latched over the first overheat, one ahead of the second
+        false_trips, delays = score(times, [1, 7, 11], [2, 10, 15], overheats)
+
+        self.assertEqual(false_trips, 1)
+        self.assertEqual(delays, [2.0, -1.0, None])
+
+    def test_sweep(self):
+        series = Mock(kind=SENSOR_HOTEND)
+        values = readings(500, seed=1)
+        series.columns.return_value = ([float(t) for t in range(500)], values)
+
+        with patch.object(replay_module, "numpy", None):
+            results = sweep([series], "hotend", [250.0, 290.0], [10.0],
+                            [parse_filter("off"), parse_filter("n_of_m:3/5")], 250.0, 3.0)
+
+        self.assertEqual([(r["setting"].threshold, r["setting"].spike_filter) for r in results],
+                         [(250.0, "off"), (250.0, "n_of_m:3/5"), (290.0, "off"), (290.0, "n_of_m:3/5")])
+        unfiltered, filtered, high, _ = results
+        self.assertEqual(unfiltered["overheats"], 2)
+        self.assertGreater(unfiltered["false_trips"], 10)
+        self.assertEqual(filtered["false_trips"], 0)
+        self.assertEqual(filtered["caught"], 2)
+        self.assertGreater(filtered["mean_delay"], unfiltered["mean_delay"])
+        self.assertLess(high["caught"], 2)
+
+
+class TestCommandLine(unittest.TestCase):
+    """Test the replay entry point"""
+
+    def test_json_output(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "serial.log")
+        with open(path, "wb") as log:
+            log.write(SERIAL_LOG)
+
+        with patch("sys.stdout", new_callable=io.StringIO) as out:
+            self.assertEqual(main([path, "--hotend-thresholds", "200,250", "--filters", "off,median:3"]), 0)
+            self.assertIn("Hotend", out.getvalue())
+        with patch("sys.stdout", new_callable=io.StringIO) as out:
+            main([path, "--hotend-thresholds", "200,250", "--json"])
+            report = json.loads(out.getvalue())
+
+        self.assertEqual(report["reports"], 4)
+        self.assertEqual([r["setting"]["threshold"] for r in report["results"]["hotend"]], [200.0, 250.0])
+        self.assertEqual(report["results"]["hotend"][0]["trips"], 1)
+
+    def test_invalid_filter(self):
+        with patch("sys.stderr", new_callable=io.StringIO):
+            with self.assertRaises(SystemExit):
+                main(["serial.log", "--filters", "median:99"])
+
+
+if __name__ == '__main__':
+    unittest.main()
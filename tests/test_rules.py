@@ -0,0 +1,307 @@
+# coding=utf-8
+"""
+Unit tests for the custom guard rules compiled to closures.
+"""
+
+from __future__ import absolute_import
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.rules import GuardRules, _Parser, _tokenize
+from octoprint_octo_fire_guard.sensors import SensorRegistry
+
+
+def compile_rules(text):
+    guard_rules, problems = GuardRules.compile(text)
+    if problems:
+        raise AssertionError(problems)
+    return guard_rules
+
+
+def holds(text, readings):
+    """Whether the single rule in text holds for the readings, a dict of reported key -> (actual, target)"""
+    guard_rules = compile_rules(text)
+    registry = SensorRegistry()
+    for key, temp_data in readings.items():
+        guard_rules.update(registry[key], temp_data)
+    return guard_rules.rules[0].condition()
+
+
+class TestRuleLanguage(unittest.TestCase):
+    """Test suite for parsing and evaluating rules"""
+
+    def test_comparisons(self):
+        readings = {"tool0": (210.0, 210.0)}
+        self.assertTrue(holds("tool0 > 200", readings))
+        self.assertTrue(holds("tool0 >= 210", readings))
+        self.assertFalse(holds("tool0 < 210", readings))
+        self.assertTrue(holds("tool0 <= 210", readings))
+        self.assertTrue(holds("tool0 == tool0.target", readings))
+        self.assertFalse(holds("tool0 != 210", readings))
+
+    def test_constant_on_the_left(self):
+        self.assertTrue(holds("200 < tool0", {"tool0": (210.0, 0.0)}))
+        self.assertFalse(holds("220 <= tool0", {"tool0": (210.0, 0.0)}))
+
+    def test_key_formats_name_the_same_sensor(self):
+        readings = {"T1": (230.0, 200.0), "B": (70.0, 60.0), "C": (40.0, None)}
+        self.assertTrue(holds("tool1 > 220 and T1.target == 200", readings))
+        self.assertTrue(holds("bed > B.target", readings))
+        self.assertTrue(holds("chamber < 50", readings))
+
+    def test_arithmetic(self):
+        readings = {"tool0": (236.0, 210.0)}
+        self.assertTrue(holds("tool0 > tool0.target + 25", readings))
+        self.assertFalse(holds("tool0 - 30 > tool0.target", readings))
+        self.assertTrue(holds("tool0 * 2 - 1 > 470", readings))
+        self.assertTrue(holds("-tool0 < -(200 + 30)", readings))
+
+    def test_boolean_operators_and_parentheses(self):
+        readings = {"chamber": (65.0, None), "bed": (20.0, 0.0), "tool0": (100.0, 0.0)}
+        self.assertTrue(holds("chamber > 60 and bed.target == 0", readings))
+        self.assertTrue(holds("tool0 > 300 or chamber > 60", readings))
+        self.assertFalse(holds("not chamber > 60", readings))
+        self.assertTrue(holds("(tool0 > 300 or bed < 30) and not (chamber < 60)", readings))
+        self.assertTrue(holds("(tool0 + 100) > 150", readings))
+
+    def test_deeply_nested_parentheses(self):
+        """Test that every group is parsed once, so nesting does not multiply the parse time"""
+        depth = 40
+        self.assertTrue(holds("(" * depth + "bed > 50" + ")" * depth, {"bed": (60.0, 0.0)}))
+        self.assertTrue(holds("(" * depth + "bed" + " + 1)" * depth + " > 90", {"bed": (60.0, 0.0)}))
+        # An even number of nots cancels out
+        self.assertTrue(holds("not (" * depth + "bed > 50" + ")" * depth, {"bed": (60.0, 0.0)}))
+
+        source = "(" * depth + "bed" + " + 1)" * depth + " > 90"
+        consumed = []
+        next_token = _Parser._next
+
+        def counting_next(parser):
+            consumed.append(parser._position)
+            return next_token(parser)
+
+        with patch.object(_Parser, "_next", counting_next):
+            compile_rules(source)
+        # Every token is read once, rather than once more for every enclosing group
+        self.assertEqual(len(consumed), len(_tokenize(source)))
+
+    def test_groups_are_used_as_what_they_hold(self):
+        _, problems = GuardRules.compile("bed + (chamber > 5) > 3\n(bed > 5) + 1 > 3\n(bed)")
+
+        self.assertIn("not a condition", problems[0])
+        self.assertIn("not a condition", problems[1])
+        self.assertIn("must compare temperatures", problems[2])
+
+    def test_missing_readings_do_not_hold(self):
+        self.assertFalse(holds("chamber > 60", {}))
+        self.assertFalse(holds("chamber.target < 60", {"chamber": (70.0, None)}))
+        self.assertFalse(holds("chamber + 10 > 60", {}))
+
+    def test_any_tool(self):
+        readings = {"T0": (200.0, 200.0), "T1": (240.0, 210.0)}
+        self.assertTrue(holds("any tool > tool.target + 25", readings))
+        self.assertTrue(holds("any tool > target + 25", readings))
+        self.assertFalse(holds("any tool > target + 35", readings))
+
+    def test_all_tools(self):
+        readings = {"T0": (200.0, 200.0), "T1": (240.0, 210.0)}
+        self.assertTrue(holds("all tools >= 200", readings))
+        self.assertFalse(holds("all tool > 210", readings))
+        self.assertFalse(holds("all tool > 0", {"bed": (60.0, 60.0)}))
+
+    def test_problems(self):
+        guard_rules, problems = GuardRules.compile("\n".join([
+            "tool > 5",
+            "foo > 3",
+            "1 > 0",
+            "bed >",
+            "bed > 60 for",
+            "tool0.temperature > 5",
+            "bed > 60 60",
+            "bed ? 60",
+            "bed > 60",
+        ]))
+
+        self.assertEqual(len(guard_rules.rules), 1)
+        self.assertEqual(guard_rules.rules[0].number, 9)
+        self.assertEqual(len(problems), 8)
+        self.assertIn("needs a rule starting with any or all", problems[0])
+        self.assertIn("unknown sensor 'foo'", problems[1])
+        self.assertIn("must compare temperatures", problems[2])
+        self.assertTrue(problems[3].startswith("Rule 4 (bed >): "))
+
+    def test_blank_lines_and_comments(self):
+        guard_rules, problems = GuardRules.compile("\n# chamber guard\n  \nchamber > 60\n")
+
+        self.assertEqual(problems, [])
+        self.assertEqual([rule.number for rule in guard_rules.rules], [4])
+        self.assertEqual(GuardRules.compile("# nothing\n"), (None, []))
+        self.assertEqual(GuardRules.compile(None), (None, []))
+
+    def test_durations(self):
+        guard_rules = compile_rules("bed > 60 for 5s\nbed > 60 for 500 ms\nbed > 60 for 2min\nbed > 60 for 3")
+
+        self.assertEqual([rule.duration for rule in guard_rules.rules], [5.0, 0.5, 120.0, 3.0])
+
+    def test_rules_are_closures(self):
+        """Test that no syntax tree is kept for evaluation"""
+        guard_rules = compile_rules("chamber > 60 and bed.target == 0")
+
+        condition = guard_rules.rules[0].condition
+        self.assertTrue(callable(condition))
+        self.assertEqual(condition.__code__.co_argcount, 0)
+
+
+class TestRuleEvaluation(unittest.TestCase):
+    """Test suite for GuardRules.evaluate"""
+
+    def setUp(self):
+        self.registry = SensorRegistry()
+
+    def update(self, guard_rules, key, actual, target=0.0):
+        guard_rules.update(self.registry[key], (actual, target))
+
+    def test_rule_trips_once_until_condition_clears(self):
+        guard_rules = compile_rules("chamber > 60")
+
+        self.update(guard_rules, "C", 65.0)
+        self.assertEqual([rule.number for rule in guard_rules.evaluate(1.0)], [1])
+        self.assertIsNone(guard_rules.evaluate(2.0))
+
+        self.update(guard_rules, "C", 55.0)
+        self.assertIsNone(guard_rules.evaluate(3.0))
+        self.update(guard_rules, "C", 65.0)
+        self.assertEqual(len(guard_rules.evaluate(4.0)), 1)
+
+    def test_duration_must_hold_continuously(self):
+        guard_rules = compile_rules("any tool > target + 25 for 5s")
+
+        self.update(guard_rules, "T0", 240.0, 210.0)
+        self.assertIsNone(guard_rules.evaluate(10.0))
+        self.assertIsNone(guard_rules.evaluate(14.0))
+        self.update(guard_rules, "T0", 230.0, 210.0)
+        self.assertIsNone(guard_rules.evaluate(16.0))
+        self.update(guard_rules, "T0", 240.0, 210.0)
+        self.assertIsNone(guard_rules.evaluate(17.0))
+        self.assertIsNotNone(guard_rules.evaluate(22.0))
+
+    def test_any_rule_times_the_hold_per_tool(self):
+        """Test that tools taking turns meeting the condition do not add up to the duration"""
+        guard_rules = compile_rules("any tool > 250 for 5s")
+
+        self.update(guard_rules, "T0", 260.0)
+        self.update(guard_rules, "T1", 200.0)
+        self.assertIsNone(guard_rules.evaluate(10.0))
+        self.update(guard_rules, "T0", 200.0)
+        self.update(guard_rules, "T1", 260.0)
+        self.assertIsNone(guard_rules.evaluate(13.0))
+        self.assertIsNone(guard_rules.evaluate(17.0))
+        self.update(guard_rules, "T0", 260.0)
+        self.assertIsNone(guard_rules.evaluate(17.5))
+        # T1 has now held the condition for 5 s on its own
+        self.assertEqual(len(guard_rules.evaluate(18.0)), 1)
+        self.assertIsNone(guard_rules.evaluate(30.0))
+
+        self.update(guard_rules, "T0", 200.0)
+        self.update(guard_rules, "T1", 200.0)
+        self.assertIsNone(guard_rules.evaluate(31.0))
+        self.assertFalse(guard_rules.rules[0].tripped)
+        self.assertEqual(guard_rules.rules[0].tool_since, {})
+
+    def test_reset(self):
+        guard_rules = compile_rules("chamber > 60")
+        self.update(guard_rules, "C", 65.0)
+        guard_rules.evaluate(1.0)
+
+        guard_rules.reset()
+
+        self.assertIsNone(guard_rules.evaluate(2.0))
+        self.assertFalse(guard_rules.rules[0].tripped)
+
+
+class TestPluginRules(unittest.TestCase):
+    """Test the custom rules in the plugin"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "enable_monitoring": True,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "custom_rules": "chamber > 60 and bed.target == 0\nbed >",
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+
+    def test_rules_compiled_and_problems_reported(self):
+        self.plugin._rebuild_guard_rules(notify=True)
+
+        self.assertEqual(len(self.plugin._guard_rules.rules), 1)
+        self.plugin._logger.error.assert_called_once()
+        self.plugin._plugin_manager.send_plugin_message.assert_called_once_with("octo_fire_guard", dict(
+            type="guard_rule_warning", problems=["Rule 2 (bed >): unexpected end of rule"]
+        ))
+
+    def test_settings_save_recompiles_rules(self):
+        self.plugin._rebuild_guard_rules()
+        self.settings_dict["custom_rules"] = ""
+
+        with patch('octoprint.plugin.SettingsPlugin.on_settings_save'):
+            self.plugin.on_settings_save({})
+
+        self.assertIsNone(self.plugin._guard_rules)
+
+    def test_rule_triggers_emergency(self):
+        self.plugin._rebuild_guard_rules()
+        self.plugin._trigger_emergency_shutdown = Mock()
+
+        self.plugin.temperature_callback(None, {"C": (55.0, None), "B": (25.0, 0.0)})
+        self.plugin._trigger_emergency_shutdown.assert_not_called()
+        self.plugin.temperature_callback(None, {"C": (62.0, None), "B": (25.0, 0.0)})
+
+        self.plugin._trigger_emergency_shutdown.assert_called_once()
+        args, kwargs = self.plugin._trigger_emergency_shutdown.call_args
+        self.assertEqual(args[:3], ("rule", None, None))
+        self.assertEqual(kwargs["rule"], "chamber > 60 and bed.target == 0")
+
+    def test_rule_incident_is_handled_and_journaled(self):
+        self.plugin._journal = Mock()
+
+        self.plugin._trigger_emergency_shutdown("rule", None, None, rule="chamber > 60")
+
+        self.plugin._printer.commands.assert_called_once_with(["M112"])
+        alert = self.plugin._plugin_manager.send_plugin_message.call_args[0][1]
+        self.assertEqual(alert["rule"], "chamber > 60")
+        self.assertIn("Custom rule triggered", alert["message"])
+        record = self.plugin._journal.append.call_args[0][0]
+        self.assertEqual(record["type"], "rule_alert")
+        self.assertEqual(record["rule"], "chamber > 60")
+
+    @patch('flask.jsonify')
+    def test_status_reports_rule_problems(self, mock_jsonify):
+        mock_jsonify.side_effect = lambda **kwargs: kwargs
+        self.plugin._rebuild_guard_rules()
+
+        result = self.plugin.on_api_get(Mock(args={"status": "1"}))
+
+        self.assertEqual(result["rule_problems"], ["Rule 2 (bed >): unexpected end of rule"])
+
+
+if __name__ == '__main__':
+    unittest.main()
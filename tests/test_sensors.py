@@ -0,0 +1,200 @@
+# coding=utf-8
+"""
+Unit tests for the temperature sensor key classifier and registry.
+"""
+
+from __future__ import absolute_import
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard import sensors
+from octoprint_octo_fire_guard.sensors import (
+    SensorRegistry, classify_sensor_key,
+    SENSOR_HOTEND, SENSOR_HEATBED, SENSOR_CHAMBER, SENSOR_PROBE, SENSOR_IGNORED
+)
+
+
+class TestClassifySensorKey(unittest.TestCase):
+    """Test suite for classify_sensor_key"""
+
+    def test_old_format_tools(self):
+        """Test that tool0..N are classified as hotends with their index"""
+        for index in (0, 1, 12):
+            record = classify_sensor_key("tool{}".format(index))
+            self.assertEqual(record.kind, SENSOR_HOTEND)
+            self.assertEqual(record.index, index)
+
+    def test_new_format_tools(self):
+        """Test that T0..N are classified as hotends with their index"""
+        record = classify_sensor_key("T3")
+        self.assertEqual(record.kind, SENSOR_HOTEND)
+        self.assertEqual(record.index, 3)
+
+    def test_heatbed_keys(self):
+        """Test that bed and B are classified as heatbed"""
+        self.assertEqual(classify_sensor_key("bed").kind, SENSOR_HEATBED)
+        self.assertEqual(classify_sensor_key("B").kind, SENSOR_HEATBED)
+
+    def test_chamber_keys(self):
+        """Test that chamber and C are classified as chamber"""
+        self.assertEqual(classify_sensor_key("chamber").kind, SENSOR_CHAMBER)
+        self.assertEqual(classify_sensor_key("C").kind, SENSOR_CHAMBER)
+
+    def test_probe_keys(self):
+        """Test that probe and P are classified as probe"""
+        self.assertEqual(classify_sensor_key("probe").kind, SENSOR_PROBE)
+        self.assertEqual(classify_sensor_key("P").kind, SENSOR_PROBE)
+
+    def test_invalid_keys_are_ignored(self):
+        """Test that malformed and unknown keys are classified as ignored"""
+        for key in ("T", "Ta", "Tb", "tool", "toolX", "T²", "W", ""):
+            record = classify_sensor_key(key)
+            self.assertEqual(record.kind, SENSOR_IGNORED, key)
+            self.assertTrue(record.ignored)
+
+
+class TestSensorRegistry(unittest.TestCase):
+    """Test suite for SensorRegistry"""
+
+    def test_lookup_classifies_once(self):
+        """Test that a key is classified on first sight and cached afterwards"""
+        registry = SensorRegistry()
+
+        with patch.object(sensors, "classify_sensor_key", wraps=classify_sensor_key) as classify:
+            first = registry["tool0"]
+            second = registry["tool0"]
+
+        self.assertIs(first, second)
+        classify.assert_called_once_with("tool0")
+
+    def test_unknown_keys_are_cached(self):
+        """Test that ignored keys are cached so later samples skip classification"""
+        registry = SensorRegistry()
+
+        with patch.object(sensors, "classify_sensor_key", wraps=classify_sensor_key) as classify:
+            registry["W"]
+            registry["W"]
+
+        self.assertIn("W", registry)
+        self.assertTrue(registry["W"].ignored)
+        classify.assert_called_once_with("W")
+
+
+class TestPluginSensorClassification(unittest.TestCase):
+    """Test that the temperature callback uses the registry"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "enable_monitoring": True,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(settings_dict.get(path[0])))
+
+    def test_callback_populates_registry(self):
+        """Test that every reported key ends up in the registry"""
+        parsed_temps = {"T0": (200.0, 210.0), "B": (60.0, 60.0), "C": (35.0, 0.0), "X": (1.0, 1.0)}
+        self.plugin.temperature_callback(None, parsed_temps)
+
+        self.assertEqual(set(self.plugin._sensor_registry), set(parsed_temps))
+        self.assertTrue(self.plugin._sensor_registry["X"].ignored)
+
+    def test_chamber_and_probe_do_not_trip_hotend_or_bed(self):
+        """Test that chamber and probe readings are not compared against hotend or bed thresholds"""
+        parsed_temps = {"chamber": (300.0, 0.0), "P": (300.0, 0.0)}
+        self.plugin.temperature_callback(None, parsed_temps)
+
+        self.assertFalse(self.plugin._hotend_threshold_exceeded)
+        self.assertFalse(self.plugin._heatbed_threshold_exceeded)
+        self.plugin._plugin_manager.send_plugin_message.assert_not_called()
+
+
+class TestPluginSampleRecording(unittest.TestCase):
+    """Test that samples are recorded without taking the state lock"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "enable_monitoring": True,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(settings_dict.get(path[0])))
+        self.plugin._state_lock = MagicMock()
+
+    @patch('octoprint_octo_fire_guard.time.time', return_value=1000.0)
+    def test_latest_reading_recorded_per_group(self, mock_time):
+        """Test that the watchdog sees the time of each group's latest valid reading"""
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0), "T1": (None, 0.0), "B": (60.0, 60.0)})
+
+        self.assertEqual(self.plugin._last_hotend_data_time, 1000.0)
+        self.assertEqual(self.plugin._last_heatbed_data_time, 1000.0)
+
+    def test_steady_samples_do_not_take_lock(self):
+        """Test that samples without a state transition never acquire the lock"""
+        for _ in range(3):
+            self.plugin.temperature_callback(None, {"tool0": (200.0, 210.0), "bed": (60.0, 60.0)})
+
+        self.plugin._state_lock.__enter__.assert_not_called()
+
+    def test_threshold_transitions_take_lock(self):
+        """Test that crossing and resetting a threshold are done under the lock"""
+        self.plugin.temperature_callback(None, {"tool0": (260.0, 250.0)})
+        self.assertEqual(self.plugin._state_lock.__enter__.call_count, 1)
+
+        # Staying above the threshold is not a transition
+        self.plugin.temperature_callback(None, {"tool0": (261.0, 250.0)})
+        self.assertEqual(self.plugin._state_lock.__enter__.call_count, 1)
+
+        self.plugin.temperature_callback(None, {"tool0": (200.0, 250.0)})
+        self.assertEqual(self.plugin._state_lock.__enter__.call_count, 2)
+        self.assertFalse(self.plugin._hotend_threshold_exceeded)
+
+    def test_clear_warning_rechecks_under_lock(self):
+        """Test that a stale unlocked check does not clear a warning twice"""
+        self.plugin._data_timeout_warning_sent = True
+        self.plugin._warned_missing_sensors = {"heatbed"}
+
+        self.plugin._clear_data_timeout_warning("hotend")
+
+        self.assertTrue(self.plugin._data_timeout_warning_sent)
+        self.plugin._plugin_manager.send_plugin_message.assert_not_called()
+
+    def test_reset_state_clears_reading_times(self):
+        """Test that a reconnect forgets the time of the latest readings"""
+        self.plugin.temperature_callback(None, {"tool0": (200.0, 210.0)})
+
+        self.plugin._reset_state()
+
+        self.assertIsNone(self.plugin._last_hotend_data_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+# coding=utf-8
+"""
+Unit tests for the spike-rejection filters in front of the threshold comparison.
+"""
+
+from __future__ import absolute_import
+import random
+import unittest
+from unittest.mock import Mock
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.spike import NOfMFilter, MedianFilter, make_spike_filter
+
+THRESHOLD = 250.0
+
+
+def verdicts(spike_filter, temperatures):
+    return [spike_filter.push(temperature, THRESHOLD) for temperature in temperatures]
+
+
+class TestNOfMFilter(unittest.TestCase):
+    """Test suite for NOfMFilter"""
+
+    def test_single_spike_is_rejected(self):
+        self.assertEqual(verdicts(NOfMFilter(5, 3), [200.0, 400.0, 200.0, 200.0, 200.0]), [False] * 5)
+
+    def test_sustained_overheat_reported_after_required_readings(self):
+        spike_filter = NOfMFilter(5, 3)
+
+        self.assertEqual(verdicts(spike_filter, [260.0] * 4), [False, False, True, True])
+        self.assertEqual(spike_filter.delay, 2)
+
+    def test_readings_need_not_be_consecutive(self):
+        self.assertEqual(verdicts(NOfMFilter(5, 3), [260.0, 200.0, 260.0, 200.0, 260.0]),
+                         [False, False, False, False, True])
+
+    def test_old_readings_drop_out_of_window(self):
+        self.assertEqual(verdicts(NOfMFilter(3, 2), [260.0, 200.0, 200.0, 260.0]), [False, False, False, False])
+
+    def test_below_threshold_reading_is_never_reported(self):
+        self.assertEqual(verdicts(NOfMFilter(3, 2), [260.0, 260.0, 200.0]), [False, True, False])
+
+    def test_clear(self):
+        spike_filter = NOfMFilter(3, 2)
+        verdicts(spike_filter, [260.0, 260.0])
+
+        spike_filter.clear()
+
+        self.assertEqual(verdicts(spike_filter, [260.0]), [False])
+
+
+class TestMedianFilter(unittest.TestCase):
+    """Test suite for MedianFilter"""
+
+    def test_single_spike_is_rejected(self):
+        self.assertEqual(verdicts(MedianFilter(5), [200.0, 200.0, 400.0, 200.0, 200.0, 200.0]), [False] * 6)
+
+    def test_spike_as_first_reading_is_rejected(self):
+        """Test that an unfilled window does not take a lone first reading for its median"""
+        spike_filter = MedianFilter(5)
+        self.assertEqual(verdicts(spike_filter, [400.0, 200.0, 200.0]), [False] * 3)
+
+        spike_filter.clear()
+
+        self.assertEqual(verdicts(spike_filter, [400.0, 400.0, 400.0, 400.0]), [False, False, True, True])
+
+    def test_sustained_overheat_reported_after_half_the_window(self):
+        spike_filter = MedianFilter(5)
+        verdicts(spike_filter, [200.0] * 5)
+
+        self.assertEqual(verdicts(spike_filter, [260.0] * 4), [False, False, True, True])
+        self.assertEqual(spike_filter.delay, 2)
+
+    def test_even_window_uses_lower_median(self):
+        spike_filter = MedianFilter(4)
+        verdicts(spike_filter, [200.0] * 4)
+
+        self.assertEqual(verdicts(spike_filter, [260.0] * 3), [False, False, True])
+        self.assertEqual(spike_filter.delay, 2)
+
+    def test_matches_sorted_window(self):
+        """Test the running median against a sort of the window for random readings"""
+        rng = random.Random(7)
+        spike_filter = MedianFilter(7)
+        readings = []
+        for _ in range(500):
+            temperature = round(rng.uniform(240.0, 260.0), 1)
+            readings.append(temperature)
+            window = sorted(readings[-7:])
+            # Empty slots of the filling window count as below the threshold
+            padded = [float("-inf")] * (7 - len(window)) + window
+            self.assertEqual(spike_filter.push(temperature, THRESHOLD), padded[3] > THRESHOLD)
+            self.assertEqual(spike_filter.ordered, window)
+
+
+    def test_nan_reading_leaves_window(self):
+        spike_filter = MedianFilter(3)
+
+        verdicts(spike_filter, [float("nan"), 200.0, 200.0, 260.0, 260.0])
+
+        self.assertEqual(spike_filter.ordered, [200.0, 260.0, 260.0])
+
+
+class TestMakeSpikeFilter(unittest.TestCase):
+    """Test suite for make_spike_filter"""
+
+    def test_modes(self):
+        self.assertIsInstance(make_spike_filter("n_of_m", 5, 3), NOfMFilter)
+        self.assertIsInstance(make_spike_filter("median", 5, 3), MedianFilter)
+        self.assertIsNone(make_spike_filter("off", 5, 3))
+
+    def test_filters_that_would_not_filter_are_skipped(self):
+        self.assertIsNone(make_spike_filter("n_of_m", 5, 1))
+        self.assertIsNone(make_spike_filter("median", 1, 1))
+
+
+class TestPluginSpikeFilter(unittest.TestCase):
+    """Test the spike filter in front of the plugin's threshold comparison"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "enable_monitoring": True,
+            "spike_filter": "n_of_m",
+            "spike_filter_window": 5,
+            "spike_filter_count": 3,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_int = Mock(side_effect=lambda path: int(self.settings_dict.get(path[0])))
+        self.plugin._trigger_emergency_shutdown = Mock()
+
+    def feed(self, key, temperatures):
+        for temperature in temperatures:
+            self.plugin.temperature_callback(None, {key: (temperature, 0.0)})
+
+    def test_glitch_does_not_trip(self):
+        self.feed("T0", [210.0, 999.0, 210.0, 210.0])
+        self.feed("B", [60.0, 999.0, 60.0])
+
+        self.plugin._trigger_emergency_shutdown.assert_not_called()
+
+    def test_sustained_overheat_trips(self):
+        self.feed("T0", [260.0, 261.0])
+        self.plugin._trigger_emergency_shutdown.assert_not_called()
+
+        self.feed("T0", [262.0])
+
+        self.plugin._trigger_emergency_shutdown.assert_called_once()
+        self.assertEqual(self.plugin._trigger_emergency_shutdown.call_args[0][:3], ("hotend", 262.0, 250.0))
+
+    def test_filter_off_trips_on_first_reading(self):
+        self.settings_dict["spike_filter"] = "off"
+        self.plugin._rebuild_guard_settings()
+
+        self.feed("T0", [999.0])
+
+        self.plugin._trigger_emergency_shutdown.assert_called_once()
+
+    def test_reconnect_clears_filter(self):
+        self.feed("T0", [260.0, 261.0])
+
+        self.plugin._reset_state()
+        self.feed("T0", [262.0])
+
+        self.plugin._trigger_emergency_shutdown.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+# coding=utf-8
+"""
+Unit tests for the coalescing live guard status publisher.
+"""
+
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.status import (
+    StatusPublisher, status_changes, STATUS_EXCEEDED, STATUS_DATA_TIMEOUT
+)
+
+
+class TestStatusChanges(unittest.TestCase):
+    """Test suite for status_changes"""
+
+    def test_everything_is_new_at_first(self):
+        current = {"T0": [200.0, 210.0, 50.0, 0], "C": [35.0, None, None, 0]}
+        self.assertEqual(status_changes({}, current, 0.5), current)
+
+    def test_noise_below_epsilon_is_not_published(self):
+        published = {"T0": [200.0, 210.0, 50.0, 0]}
+        self.assertEqual(status_changes(published, {"T0": [200.4, 210.0, 49.6, 0]}, 0.5), {})
+
+    def test_drift_is_measured_against_last_published_value(self):
+        published = {"T0": [200.0, 210.0, 50.0, 0]}
+        self.assertEqual(status_changes(published, {"T0": [200.6, 210.0, 49.4, 0]}, 0.5),
+                         {"T0": [200.6, 210.0, 49.4, 0]})
+
+    def test_target_and_state_changes_are_always_published(self):
+        published = {"T0": [200.0, 210.0, 50.0, 0], "B": [60.0, 60.0, 40.0, 0]}
+        current = {"T0": [200.0, 0.0, 50.0, 0], "B": [60.0, 60.0, 40.0, STATUS_EXCEEDED]}
+        self.assertEqual(status_changes(published, current, 0.5), current)
+
+    def test_headroom_change_from_new_threshold(self):
+        published = {"T0": [200.0, 210.0, 50.0, 0]}
+        self.assertEqual(status_changes(published, {"T0": [200.0, 210.0, 80.0, 0]}, 0.5),
+                         {"T0": [200.0, 210.0, 80.0, 0]})
+
+    def test_removed_sensor_maps_to_none(self):
+        published = {"T0": [200.0, 210.0, 50.0, 0], "C": [35.0, None, None, 0]}
+        self.assertEqual(status_changes(published, {"T0": [200.0, 210.0, 50.0, 0]}, 0.5), {"C": None})
+
+
+class TestStatusPublisher(unittest.TestCase):
+    """Test suite for StatusPublisher"""
+
+    def test_publish_sends_only_changes(self):
+        rows = {"T0": [200.0, 210.0, 50.0, 0], "B": [60.0, 60.0, 40.0, 0]}
+        send = Mock()
+        publisher = StatusPublisher(lambda: dict(rows), send)
+
+        self.assertEqual(publisher.publish(), 2)
+        rows["T0"] = [201.0, 210.0, 49.0, 0]
+        self.assertEqual(publisher.publish(), 1)
+        self.assertEqual(publisher.publish(), 0)
+
+        message = send.call_args[0][0]
+        self.assertEqual(message["type"], "guard_status")
+        self.assertEqual(message["s"], {"T0": [201.0, 210.0, 49.0, 0]})
+        self.assertEqual(send.call_count, 2)
+
+    def test_reset_republishes_everything(self):
+        rows = {"T0": [200.0, 210.0, 50.0, 0]}
+        publisher = StatusPublisher(lambda: dict(rows), Mock())
+        publisher.publish()
+
+        publisher.reset()
+
+        self.assertEqual(publisher.publish(), 1)
+
+    def test_marks_are_coalesced(self):
+        """Test that a burst of reports leads to at most one message per interval"""
+        counter = [0]
+        sent = []
+
+        def state():
+            counter[0] += 1
+            return {"T0": [float(counter[0]), 210.0, 0.0, 0]}
+
+        publisher = StatusPublisher(state, sent.append, interval=100, epsilon=0.0)
+        publisher.start(Mock())
+        self.addCleanup(publisher.stop)
+
+        started = time.monotonic()
+        while time.monotonic() - started < 0.35:
+            publisher.mark()
+            time.sleep(0.0005)
+        elapsed = time.monotonic() - started
+        time.sleep(0.15)
+
+        self.assertGreaterEqual(len(sent), 2)
+        self.assertLessEqual(len(sent), int(elapsed / 0.1) + 2)
+
+    def test_idle_publisher_sends_nothing(self):
+        send = Mock()
+        publisher = StatusPublisher(lambda: {"T0": [200.0, 210.0, 50.0, 0]}, send, interval=50)
+        publisher.start(Mock())
+        self.addCleanup(publisher.stop)
+
+        time.sleep(0.15)
+
+        send.assert_not_called()
+
+    def test_interval_has_a_floor(self):
+        self.assertEqual(StatusPublisher(dict, Mock(), interval=1).interval, 0.05)
+
+
+class TestPluginGuardStatus(unittest.TestCase):
+    """Test the plugin side of the live guard status"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "enable_monitoring": True,
+            "status_interval": 50,
+            "status_epsilon": 0.5,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: float(self.settings_dict.get(path[0])))
+        self.addCleanup(self.plugin.on_shutdown)
+
+    def test_guard_status_rows(self):
+        self.plugin._trigger_emergency_shutdown = Mock()
+        self.plugin.temperature_callback(None, {"T0": (200.04, 210.0), "B": (105.0, 100.0), "C": (35.0, None)})
+        self.plugin._warned_missing_sensors.add("hotend")
+
+        rows = self.plugin._guard_status()
+
+        self.assertEqual(rows["T0"], [200.0, 210.0, 50.0, STATUS_DATA_TIMEOUT])
+        self.assertEqual(rows["B"], [105.0, 100.0, -5.0, STATUS_EXCEEDED])
+        self.assertEqual(rows["C"], [35.0, None, None, 0])
+
+    def test_callback_marks_publisher(self):
+        self.plugin._status_publisher = Mock()
+
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0)})
+
+        self.plugin._status_publisher.mark.assert_called_once_with()
+
+    def test_status_is_published_after_startup(self):
+        published = threading.Event()
+
+        def send_plugin_message(identifier, data):
+            if data["type"] == "guard_status":
+                published.set()
+        self.plugin._plugin_manager.send_plugin_message = Mock(side_effect=send_plugin_message)
+
+        self.plugin.on_after_startup()
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0)})
+
+        self.assertTrue(published.wait(2))
+
+    def test_zero_interval_disables_publisher(self):
+        self.settings_dict["status_interval"] = 0
+
+        self.plugin._configure_status_publisher()
+
+        self.assertIsNone(self.plugin._status_publisher)
+
+    def test_reconnect_resets_publisher(self):
+        self.plugin._status_publisher = Mock()
+
+        self.plugin._reset_state()
+
+        self.plugin._status_publisher.reset.assert_called_once_with()
+
+    @patch('flask.jsonify')
+    def test_on_api_get_status(self, mock_jsonify):
+        mock_jsonify.side_effect = lambda **kwargs: kwargs
+        self.plugin.temperature_callback(None, {"T0": (200.0, 210.0)})
+
+        result = self.plugin.on_api_get(Mock(args={"status": "1"}))
+
+        self.assertEqual(result["type"], "guard_status")
+        self.assertEqual(result["s"], {"T0": [200.0, 210.0, 50.0, 0]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+# coding=utf-8
+"""
+Unit tests that the plugin's Jinja2 templates are well-formed.
+"""
+
+from __future__ import absolute_import
+import glob
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import jinja2
+except ImportError:
+    # Installed with OctoPrint
+    jinja2 = None
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', 'octoprint_octo_fire_guard', 'templates')
+
+
+@unittest.skipIf(jinja2 is None, "jinja2 is not installed")
+class TestTemplates(unittest.TestCase):
+    """Test that every template parses"""
+
+    def test_templates_parse(self):
+        paths = sorted(glob.glob(os.path.join(TEMPLATE_DIR, '*.jinja2')))
+        self.assertTrue(paths)
+        environment = jinja2.Environment()
+        for path in paths:
+            with open(path, encoding='utf-8') as template:
+                source = template.read()
+            with self.subTest(template=os.path.basename(path)):
+                environment.parse(source, name=os.path.basename(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
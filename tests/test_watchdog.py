@@ -0,0 +1,267 @@
+# coding=utf-8
+"""
+Unit tests for the deadline scheduler that drives the data timeout watchdog.
+"""
+
+from __future__ import absolute_import
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.fakes import install_fakes
+install_fakes()
+
+from octoprint_octo_fire_guard import OctoFireGuardPlugin
+from octoprint_octo_fire_guard.watchdog import DeadlineScheduler, format_duration
+
+
+class TestFormatDuration(unittest.TestCase):
+    """Test suite for format_duration"""
+
+    def test_whole_minutes(self):
+        self.assertEqual(format_duration(300), "5 minutes")
+        self.assertEqual(format_duration(60.0), "1 minute")
+
+    def test_seconds(self):
+        self.assertEqual(format_duration(90), "90 seconds")
+        self.assertEqual(format_duration(1), "1 second")
+        self.assertEqual(format_duration(0.25), "0.25 seconds")
+
+
+class TestDeadlineScheduler(unittest.TestCase):
+    """Test suite for DeadlineScheduler"""
+
+    def setUp(self):
+        self.fired = []
+        self.fired_event = threading.Event()
+
+        def handler(key):
+            self.fired.append((key, time.monotonic()))
+            self.fired_event.set()
+
+        self.scheduler = DeadlineScheduler(handler)
+        self.addCleanup(self.scheduler.stop)
+
+    def test_fires_in_deadline_order(self):
+        """Test that keys fire once their deadline passes, earliest first"""
+        self.scheduler.start(Mock())
+        self.scheduler.arm("late", 0.06)
+        self.scheduler.arm("early", 0.02)
+
+        deadline = time.monotonic() + 5
+        while len(self.fired) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual([key for key, _ in self.fired], ["early", "late"])
+
+    def test_sub_second_deadline_is_not_late(self):
+        """Test that the worker sleeps until the deadline rather than polling"""
+        self.scheduler.start(Mock())
+        armed = time.monotonic()
+        self.scheduler.arm("hotend", 0.05)
+
+        self.assertTrue(self.fired_event.wait(5))
+        elapsed = self.fired[0][1] - armed
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertLess(elapsed, 0.5)
+
+    def test_rearm_replaces_deadline(self):
+        """Test that arming a key again supersedes its earlier deadline"""
+        self.scheduler.start(Mock())
+        self.scheduler.arm("hotend", 0.02)
+        self.scheduler.arm("hotend", 10)
+
+        self.assertFalse(self.fired_event.wait(0.1))
+        self.assertGreater(self.scheduler.deadline("hotend"), 5)
+
+    def test_earlier_deadline_wakes_sleeping_worker(self):
+        """Test that a new earliest deadline is honoured while the worker sleeps"""
+        self.scheduler.start(Mock())
+        self.scheduler.arm("heatbed", 10)
+        time.sleep(0.02)  # Let the worker go to sleep towards the late deadline
+
+        self.scheduler.arm("hotend", 0.02)
+
+        self.assertTrue(self.fired_event.wait(1))
+        self.assertEqual(self.fired[0][0], "hotend")
+
+    def test_cancel(self):
+        """Test that a cancelled key does not fire"""
+        self.scheduler.start(Mock())
+        self.scheduler.arm("hotend", 0.02)
+        self.scheduler.cancel("hotend")
+
+        self.assertFalse(self.fired_event.wait(0.1))
+        self.assertIsNone(self.scheduler.deadline("hotend"))
+
+    def test_handler_errors_do_not_stop_worker(self):
+        """Test that an exception in the handler is logged and later deadlines still fire"""
+        logger = Mock()
+        calls = []
+        done = threading.Event()
+
+        def handler(key):
+            calls.append(key)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            done.set()
+
+        scheduler = DeadlineScheduler(handler)
+        self.addCleanup(scheduler.stop)
+        scheduler.start(logger)
+        scheduler.arm("hotend", 0)
+        scheduler.arm("heatbed", 0.02)
+
+        self.assertTrue(done.wait(5))
+        logger.exception.assert_called_once()
+
+    def test_stop(self):
+        """Test that stop ends the worker without firing pending deadlines"""
+        self.scheduler.start(Mock())
+        self.scheduler.arm("hotend", 10)
+
+        self.scheduler.stop()
+
+        self.assertFalse(self.scheduler.is_running)
+        self.assertEqual(self.fired, [])
+
+
+class TestPluginDataWatchdog(unittest.TestCase):
+    """Test that the plugin arms the watchdog from the latest samples"""
+
+    def setUp(self):
+        self.plugin = OctoFireGuardPlugin()
+        self.plugin._logger = Mock()
+        self.plugin._plugin_manager = Mock()
+        self.plugin._printer = Mock()
+        self.plugin._printer.is_operational = Mock(return_value=True)
+        self.plugin._identifier = "octo_fire_guard"
+        self.settings_dict = {
+            "hotend_threshold": 250.0,
+            "heatbed_threshold": 100.0,
+            "termination_mode": "gcode",
+            "termination_gcode": "M112",
+            "enable_monitoring": True,
+            "enable_data_monitoring": True,
+            "temperature_data_timeout": 300,
+        }
+        self.plugin._settings = Mock()
+        self.plugin._settings.get = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.plugin._settings.get_boolean = Mock(side_effect=lambda path: bool(self.settings_dict.get(path[0])))
+        self.plugin._settings.get_float = Mock(side_effect=lambda path: self.settings_dict.get(path[0]))
+        self.addCleanup(self.plugin.on_shutdown)
+
+    def test_startup_arms_every_sensor_group(self):
+        """Test that startup arms a deadline one timeout ahead for hotend and heatbed"""
+        self.plugin.on_after_startup()
+
+        watchdog = self.plugin._monitoring_timer
+        self.assertTrue(watchdog.is_running)
+        for sensor_name in ("hotend", "heatbed"):
+            self.assertAlmostEqual(watchdog.deadline(sensor_name), 300, delta=1)
+
+    def test_shutdown_stops_watchdog(self):
+        """Test that shutdown stops the watchdog thread"""
+        self.plugin.on_after_startup()
+        watchdog = self.plugin._monitoring_timer
+
+        self.plugin.on_shutdown()
+
+        self.assertFalse(watchdog.is_running)
+        self.assertIsNone(self.plugin._monitoring_timer)
+        self.plugin._logger.info.assert_any_call("Temperature data monitoring timer stopped")
+
+    @patch('time.time')
+    def test_rearming_does_not_log_a_stop(self, mock_time):
+        """Test that only stopping the watchdog, not re-arming it, is logged as a stop"""
+        self.plugin.on_after_startup()
+        mock_time.return_value = 1000.0
+        self.plugin._last_hotend_data_time = 990.0
+        self.plugin._logger.info.reset_mock()
+
+        self.plugin._check_temperature_data_timeout()
+        self.plugin._reset_state()
+
+        stopped = [c for c in self.plugin._logger.info.call_args_list
+                   if c[0][0] == "Temperature data monitoring timer stopped"]
+        self.assertEqual(stopped, [])
+
+    @patch('time.time')
+    def test_check_rearms_from_latest_sample(self, mock_time):
+        """Test that a sensor is checked again when its timeout would expire"""
+        self.plugin.on_after_startup()
+        mock_time.return_value = 1000.0
+        self.plugin._last_hotend_data_time = 900.0
+        self.plugin._last_heatbed_data_time = 990.0
+
+        self.plugin._check_temperature_data_timeout()
+
+        watchdog = self.plugin._monitoring_timer
+        self.assertAlmostEqual(watchdog.deadline("hotend"), 200, delta=1)
+        self.assertAlmostEqual(watchdog.deadline("heatbed"), 290, delta=1)
+
+    @patch('time.time')
+    def test_missing_sensor_is_checked_again_after_timeout(self, mock_time):
+        """Test that a sensor already missing is re-armed one full timeout ahead"""
+        self.plugin.on_after_startup()
+        mock_time.return_value = 1000.0
+        self.plugin._last_hotend_data_time = 600.0
+
+        self.plugin._check_temperature_data_timeout()
+
+        self.assertTrue(self.plugin._data_timeout_warning_sent)
+        self.assertAlmostEqual(self.plugin._monitoring_timer.deadline("hotend"), 300, delta=1)
+
+    def test_sub_second_timeout_detects_stale_data(self):
+        """Test that a sub-second timeout produces a warning shortly after data stops"""
+        self.settings_dict["temperature_data_timeout"] = 0.1
+        warned = threading.Event()
+        warnings = []
+
+        def send_plugin_message(identifier, data):
+            # Live status messages are sent as well; wait for the warning
+            if data["type"] == "data_timeout_warning":
+                warnings.append(data)
+                warned.set()
+        self.plugin._plugin_manager.send_plugin_message = Mock(side_effect=send_plugin_message)
+
+        self.plugin.on_after_startup()
+        self.plugin.temperature_callback(None, {"tool0": (200.0, 210.0)})
+
+        self.assertTrue(warned.wait(2))
+        self.assertIn("0.1 seconds", warnings[0]["message"])
+
+    def test_settings_save_applies_new_timeout(self):
+        """Test that saving settings re-arms the watchdog with the new timeout"""
+        self.plugin.on_after_startup()
+
+        self.settings_dict["temperature_data_timeout"] = 30
+        self.plugin.on_settings_save({"temperature_data_timeout": 30})
+
+        self.assertAlmostEqual(self.plugin._monitoring_timer.deadline("hotend"), 30, delta=1)
+
+    def test_settings_save_disabling_stops_watchdog(self):
+        """Test that disabling data monitoring stops the watchdog"""
+        self.plugin.on_after_startup()
+
+        self.settings_dict["enable_data_monitoring"] = False
+        self.plugin.on_settings_save({"enable_data_monitoring": False})
+
+        self.assertIsNone(self.plugin._monitoring_timer)
+
+    def test_invalid_timeout_falls_back_to_default(self):
+        """Test that a missing, invalid or non-positive timeout is not used as is"""
+        self.settings_dict["temperature_data_timeout"] = "soon"
+        self.assertEqual(self.plugin._get_data_timeout(), 300.0)
+
+        self.settings_dict["temperature_data_timeout"] = 0
+        self.assertGreater(self.plugin._get_data_timeout(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()